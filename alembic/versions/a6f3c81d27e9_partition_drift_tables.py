@@ -0,0 +1,187 @@
+"""partition drift tables
+
+Revision ID: a6f3c81d27e9
+Revises: d7e2b9f4a158
+Create Date: 2026-10-19 22:38:52.917306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6f3c81d27e9'
+down_revision = 'd7e2b9f4a158'
+branch_labels = None
+depends_on = None
+
+
+# Child tables of drift_events, partitioned by the creation time of their drift event
+CHILD_TABLES = ['drift_findings', 'code_changes']
+
+# Name of the foreign key of each child table, before and after partitioning
+CHILD_FOREIGN_KEYS = {
+    'drift_findings': ('drift_findings_drift_event_id_fkey', 'fk_drift_findings_event'),
+    'code_changes': ('code_changes_drift_event_id_fkey', 'fk_code_changes_event'),
+}
+
+# Name, table and columns of each index, the same on the plain and the partitioned tables
+INDEXES = [
+    ('idx_drift_events_repo_created', 'drift_events', ['repo_id', sa.text('created_at DESC'), sa.text('id DESC')]),
+    ('idx_drift_events_repo_pr', 'drift_events', ['repo_id', 'pr_number', sa.text('created_at DESC')]),
+    ('idx_drift_events_head_sha', 'drift_events', ['head_sha', sa.text('created_at DESC')]),
+    ('idx_drift_findings_event', 'drift_findings', ['drift_event_id']),
+    ('idx_code_changes_event', 'code_changes', ['drift_event_id', 'file_path']),
+]
+
+# Months of partitions created ahead of the current one, the maintenance job keeps extending them
+MONTHS_AHEAD = 3
+
+
+# Renames a set of tables with a suffix, along with their indexes and primary keys, so new tables
+# can take their names
+def _rename_tables(tables: list[str], suffix: str) -> None:
+    for table in tables:
+        op.rename_table(table, f'{table}{suffix}')
+
+    renamed = ', '.join(f"'{table}{suffix}'" for table in tables)
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            idx record;
+        BEGIN
+            FOR idx IN
+                SELECT indexname FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename IN ({renamed})
+            LOOP
+                EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.indexname, idx.indexname || '{suffix}');
+            END LOOP;
+        END $$
+        """
+    )
+
+
+# Creates the indexes of the drift tables, along with the partial index of the active runs
+def _create_indexes() -> None:
+    op.create_index(
+        'idx_drift_active_runs',
+        'drift_events',
+        ['repo_id'],
+        unique=False,
+        postgresql_where=sa.text("processing_phase NOT IN ('completed', 'failed')"),
+    )
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def upgrade() -> None:
+    # The tables are rewritten, writes to them wait until the migration commits
+    _rename_tables(['drift_events'] + CHILD_TABLES, '_legacy')
+
+    op.execute("UPDATE drift_events_legacy SET created_at = coalesce(started_at, now()) WHERE created_at IS NULL")
+    op.execute(
+        """
+        CREATE TABLE drift_events (LIKE drift_events_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (created_at)
+        """
+    )
+    for table in CHILD_TABLES:
+        op.execute(
+            f"""
+            CREATE TABLE {table} (
+                LIKE {table}_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+                drift_event_created_at timestamptz NOT NULL
+            )
+            PARTITION BY RANGE (drift_event_created_at)
+            """
+        )
+
+    # One partition per month, from the month of the oldest drift event to a few months ahead.
+    # Months are counted in UTC, as the maintenance job counts them
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month_start timestamp := date_trunc(
+                'month', coalesce((SELECT min(created_at) FROM drift_events_legacy), now()) AT TIME ZONE 'UTC'
+            );
+            last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{MONTHS_AHEAD} months';
+            tbl text;
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                FOREACH tbl IN ARRAY ARRAY['drift_events', 'drift_findings', 'code_changes'] LOOP
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                        tbl || '_p' || to_char(month_start, 'YYYYMM'),
+                        tbl,
+                        month_start AT TIME ZONE 'UTC',
+                        (month_start + interval '1 month') AT TIME ZONE 'UTC'
+                    );
+                END LOOP;
+                month_start := month_start + interval '1 month';
+            END LOOP;
+        END $$
+        """
+    )
+
+    # Rows of a month without a partition land in the default one, until the maintenance job
+    # splits them into a partition of their month
+    for table in ['drift_events'] + CHILD_TABLES:
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    # Rows of a missing drift event are left behind, the cascade would have deleted them
+    op.execute('INSERT INTO drift_events SELECT * FROM drift_events_legacy')
+    for table in CHILD_TABLES:
+        op.execute(
+            f"""
+            INSERT INTO {table}
+            SELECT c.*, e.created_at FROM {table}_legacy c JOIN drift_events_legacy e ON e.id = c.drift_event_id
+            """
+        )
+
+    op.create_primary_key('drift_events_pkey', 'drift_events', ['id', 'created_at'])
+    op.create_foreign_key(
+        'drift_events_repo_id_fkey', 'drift_events', 'repositories', ['repo_id'], ['id'], ondelete='CASCADE'
+    )
+    for table in CHILD_TABLES:
+        op.create_primary_key(f'{table}_pkey', table, ['id', 'drift_event_created_at'])
+        op.create_foreign_key(
+            CHILD_FOREIGN_KEYS[table][1],
+            table,
+            'drift_events',
+            ['drift_event_id', 'drift_event_created_at'],
+            ['id', 'created_at'],
+            ondelete='CASCADE',
+        )
+    # Indexes of partitioned tables can't be built concurrently, the tables are new anyway
+    _create_indexes()
+
+    for table in CHILD_TABLES + ['drift_events']:
+        op.drop_table(f'{table}_legacy')
+
+
+def downgrade() -> None:
+    _rename_tables(['drift_events'] + CHILD_TABLES, '_partitioned')
+
+    op.execute('CREATE TABLE drift_events (LIKE drift_events_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    op.execute('INSERT INTO drift_events SELECT * FROM drift_events_partitioned')
+    for table in CHILD_TABLES:
+        op.execute(f'CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        op.execute(f'INSERT INTO {table} SELECT * FROM {table}_partitioned')
+        op.drop_column(table, 'drift_event_created_at')
+
+    op.create_primary_key('drift_events_pkey', 'drift_events', ['id'])
+    op.create_foreign_key(
+        'drift_events_repo_id_fkey', 'drift_events', 'repositories', ['repo_id'], ['id'], ondelete='CASCADE'
+    )
+    for table in CHILD_TABLES:
+        op.create_primary_key(f'{table}_pkey', table, ['id'])
+        op.create_foreign_key(
+            CHILD_FOREIGN_KEYS[table][0], table, 'drift_events', ['drift_event_id'], ['id'], ondelete='CASCADE'
+        )
+    _create_indexes()
+
+    # Dropping the partitioned tables drops their partitions along with them
+    for table in CHILD_TABLES + ['drift_events']:
+        op.drop_table(f'{table}_partitioned')
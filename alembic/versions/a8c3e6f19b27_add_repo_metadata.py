@@ -0,0 +1,34 @@
+"""add repo metadata
+
+Revision ID: a8c3e6f19b27
+Revises: f4a9d2c7e815
+Create Date: 2026-10-19 18:21:36.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c3e6f19b27'
+down_revision = 'f4a9d2c7e815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('repositories', sa.Column('description', sa.Text(), nullable=True))
+    op.add_column('repositories', sa.Column('language', sa.String(), nullable=True))
+    op.add_column('repositories', sa.Column('stargazers_count', sa.Integer(), nullable=True))
+    op.add_column('repositories', sa.Column('forks_count', sa.Integer(), nullable=True))
+    op.add_column('repositories', sa.Column('metadata_etag', sa.String(), nullable=True))
+    op.add_column('repositories', sa.Column('metadata_fetched_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('repositories', 'metadata_fetched_at')
+    op.drop_column('repositories', 'metadata_etag')
+    op.drop_column('repositories', 'forks_count')
+    op.drop_column('repositories', 'stargazers_count')
+    op.drop_column('repositories', 'language')
+    op.drop_column('repositories', 'description')
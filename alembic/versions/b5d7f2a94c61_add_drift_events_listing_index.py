@@ -0,0 +1,37 @@
+"""add drift events listing index
+
+Revision ID: b5d7f2a94c61
+Revises: a8c3e6f19b27
+Create Date: 2026-10-19 19:02:54.318270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d7f2a94c61'
+down_revision = 'a8c3e6f19b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so drift events keep being written while the index is created
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_drift_events_repo_created',
+            'drift_events',
+            ['repo_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_drift_events_repo_created',
+            table_name='drift_events',
+            postgresql_concurrently=True,
+        )
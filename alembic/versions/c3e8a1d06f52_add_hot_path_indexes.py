@@ -0,0 +1,40 @@
+"""add hot path indexes
+
+Revision ID: c3e8a1d06f52
+Revises: b5d7f2a94c61
+Create Date: 2026-10-19 19:47:08.561342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a1d06f52'
+down_revision = 'b5d7f2a94c61'
+branch_labels = None
+depends_on = None
+
+
+# Name, table and columns of each index. Repository.installation_id needs no index of its own,
+# it leads the index of the (installation_id, repo_name) unique constraint
+INDEXES = [
+    ('idx_drift_findings_event', 'drift_findings', ['drift_event_id']),
+    ('idx_code_changes_event', 'code_changes', ['drift_event_id', 'file_path']),
+    ('idx_drift_events_repo_pr', 'drift_events', ['repo_id', 'pr_number', sa.text('created_at DESC')]),
+    ('idx_drift_events_head_sha', 'drift_events', ['head_sha', sa.text('created_at DESC')]),
+    ('idx_notifications_user_created', 'notifications', ['user_id', sa.text('created_at DESC')]),
+]
+
+
+def upgrade() -> None:
+    # Built concurrently so the tables keep being written while the indexes are created
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""add clone state to repositories
+
+Revision ID: d3f1a7c2b9e4
+Revises: a424f218f7f0
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f1a7c2b9e4'
+down_revision = 'a424f218f7f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Repositories linked before this migration were cloned inline, so they start out ready
+    op.add_column('repositories', sa.Column('clone_status', sa.String(), server_default='ready', nullable=False))
+    op.alter_column('repositories', 'clone_status', server_default='pending')
+    op.add_column('repositories', sa.Column('clone_progress', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('repositories', sa.Column('clone_error', sa.Text(), nullable=True))
+    op.add_column('repositories', sa.Column('clone_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.create_check_constraint(
+        'check_clone_status',
+        'repositories',
+        "clone_status IN ('pending', 'cloning', 'ready', 'failed')",
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('check_clone_status', 'repositories', type_='check')
+    op.drop_column('repositories', 'clone_attempts')
+    op.drop_column('repositories', 'clone_error')
+    op.drop_column('repositories', 'clone_progress')
+    op.drop_column('repositories', 'clone_status')
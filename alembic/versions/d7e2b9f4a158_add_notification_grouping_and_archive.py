@@ -0,0 +1,85 @@
+"""add notification grouping and archive
+
+Revision ID: d7e2b9f4a158
+Revises: c3e8a1d06f52
+Create Date: 2026-10-19 21:14:36.208415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2b9f4a158'
+down_revision = 'c3e8a1d06f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('group_key', sa.Text(), nullable=True))
+    op.add_column(
+        'notifications',
+        sa.Column('group_count', sa.Integer(), server_default=sa.text('1'), nullable=False),
+    )
+    # Merged notifications keep their creation time, the coalesce window counts from their last event
+    op.add_column(
+        'notifications',
+        sa.Column('last_event_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.execute('UPDATE notifications SET last_event_at = created_at WHERE created_at IS NOT NULL')
+
+    # Partitions are created month by month by the archive job, as rows are moved into them
+    op.create_table(
+        'notifications_archive',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('is_read', sa.Boolean(), nullable=False),
+        sa.Column('group_key', sa.Text(), nullable=True),
+        sa.Column('group_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_event_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    op.create_index(
+        'idx_notifications_archive_user_created',
+        'notifications_archive',
+        ['user_id', sa.text('created_at DESC')],
+        unique=False,
+    )
+
+    # Built concurrently so notifications keep being written while the indexes are created
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_notifications_user_group',
+            'notifications',
+            ['user_id', 'group_key', sa.text('last_event_at DESC')],
+            unique=False,
+            postgresql_where=sa.text('group_key IS NOT NULL AND NOT is_read'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'idx_notifications_created',
+            'notifications',
+            ['created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_notifications_created', table_name='notifications', postgresql_concurrently=True)
+        op.drop_index('idx_notifications_user_group', table_name='notifications', postgresql_concurrently=True)
+
+    # Archived notifications are lost, they have no place in the live table
+    op.drop_index('idx_notifications_archive_user_created', table_name='notifications_archive')
+    op.drop_table('notifications_archive')
+    op.drop_column('notifications', 'last_event_at')
+    op.drop_column('notifications', 'group_count')
+    op.drop_column('notifications', 'group_key')
@@ -0,0 +1,42 @@
+"""add clone storage tracking
+
+Revision ID: e7b2c94d1f03
+Revises: d3f1a7c2b9e4
+Create Date: 2026-10-19 14:05:47.218394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c94d1f03'
+down_revision = 'd3f1a7c2b9e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('repositories', sa.Column('clone_size_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('repositories', sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('repositories', sa.Column('last_compacted_at', sa.DateTime(timezone=True), nullable=True))
+    op.drop_constraint('check_clone_status', 'repositories', type_='check')
+    op.create_check_constraint(
+        'check_clone_status',
+        'repositories',
+        "clone_status IN ('pending', 'cloning', 'ready', 'failed', 'evicted')",
+    )
+
+
+def downgrade() -> None:
+    # Evicted clones are re-cloned like newly linked repos
+    op.execute("UPDATE repositories SET clone_status = 'pending' WHERE clone_status = 'evicted'")
+    op.drop_constraint('check_clone_status', 'repositories', type_='check')
+    op.create_check_constraint(
+        'check_clone_status',
+        'repositories',
+        "clone_status IN ('pending', 'cloning', 'ready', 'failed')",
+    )
+    op.drop_column('repositories', 'last_compacted_at')
+    op.drop_column('repositories', 'last_used_at')
+    op.drop_column('repositories', 'clone_size_bytes')
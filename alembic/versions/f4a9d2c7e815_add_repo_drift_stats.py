@@ -0,0 +1,46 @@
+"""add repo drift stats
+
+Revision ID: f4a9d2c7e815
+Revises: e7b2c94d1f03
+Create Date: 2026-10-19 16:42:11.530917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a9d2c7e815'
+down_revision = 'e7b2c94d1f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'repo_drift_stats',
+        sa.Column('repo_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('drift_events_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('pr_waiting_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['repo_id'], ['repositories.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('repo_id'),
+    )
+
+    # Backfill the counters from the existing drift events
+    op.execute(
+        """
+        INSERT INTO repo_drift_stats (repo_id, drift_events_count, pr_waiting_count)
+        SELECT repo_id,
+               count(*),
+               count(*) FILTER (WHERE processing_phase = 'fix_pr_raised')
+        FROM drift_events
+        WHERE repo_id IS NOT NULL
+        GROUP BY repo_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('repo_drift_stats')
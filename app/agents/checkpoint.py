@@ -0,0 +1,336 @@
+import asyncio
+import random
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from redis import Redis
+from redis.typing import EncodableT, FieldT
+
+_KEY_PREFIX = "drift_checkpoint"
+_NODE_FAILURES_PREFIX = "drift_node_failures"
+
+
+# Redis replies are bytes, the client doesn't decode responses. Reads them as bytes either way
+def _reply_bytes(reply: bytes | str) -> bytes:
+    return reply if isinstance(reply, bytes) else reply.encode()
+
+
+# Reads a Redis reply as text
+def _reply_str(reply: bytes | str) -> str:
+    return reply.decode() if isinstance(reply, bytes) else reply
+
+
+# Thread id of the checkpoints of one drift analysis run, a new head commit starts a new thread
+def get_thread_id(drift_event_id: str, head_sha: str) -> str:
+    return f"{drift_event_id}:{head_sha}"
+
+
+# LangGraph checkpoint saver that keeps drift analysis checkpoints in Redis with a TTL
+class RedisCheckpointSaver(BaseCheckpointSaver[str]):
+    def __init__(self, redis_client: Redis, ttl_seconds: int):
+        super().__init__()
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    # Redis key for a part of a thread's checkpoint data
+    def _key(self, thread_id: str, *parts: str) -> str:
+        return ":".join([_KEY_PREFIX, thread_id, *parts])
+
+    # Serialises a value into a single Redis string ("<type>:<data>")
+    def _dump(self, value: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(value)
+        return type_.encode() + b":" + data
+
+    def _load(self, raw: bytes) -> Any:
+        type_, _, data = raw.partition(b":")
+        return self.serde.loads_typed((type_.decode(), data))
+
+    # Loads the channel values stored for the given versions
+    def _load_channel_values(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> dict[str, Any]:
+        channels = list(versions)
+        values: dict[str, Any] = {}
+        if channels:
+            fields = [f"{channel}@{versions[channel]}" for channel in channels]
+            raw_values = self.redis.hmget(self._key(thread_id, checkpoint_ns, "blobs"), fields)
+            for channel, raw in zip(channels, raw_values):
+                if raw is not None:
+                    values[channel] = self._load(_reply_bytes(raw))
+        return values
+
+    # Loads the pending writes of a checkpoint in the order they were made
+    def _load_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list[tuple[str, str, Any]]:
+        raw_writes = self.redis.hvals(self._key(thread_id, checkpoint_ns, "writes", checkpoint_id))
+        writes = [self._load(_reply_bytes(raw)) for raw in raw_writes]
+        writes.sort(key=lambda w: writes_sort_key(w["task_path"], w["task_id"], w["idx"]))
+        return [(w["task_id"], w["channel"], w["value"]) for w in writes]
+
+    # Builds the checkpoint tuple of a stored checkpoint record
+    def _build_tuple(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, raw: bytes
+    ) -> CheckpointTuple:
+        record = self._load(raw)
+        checkpoint: Checkpoint = record["checkpoint"]
+        parent_checkpoint_id = record["parent_checkpoint_id"]
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channel_values(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=record["metadata"],
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    # Refreshes the TTL of every key written for a thread
+    def _expire(self, pipe: Any, keys: list[str]) -> None:
+        for key in keys:
+            pipe.expire(key, self.ttl_seconds)
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        checkpoints_key = self._key(thread_id, checkpoint_ns, "checkpoints")
+
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            # Checkpoint ids are time ordered, the largest one is the latest checkpoint
+            checkpoint_ids = self.redis.hkeys(checkpoints_key)
+            if not checkpoint_ids:
+                return None
+            checkpoint_id = max(_reply_str(cid) for cid in checkpoint_ids)
+
+        raw = self.redis.hget(checkpoints_key, checkpoint_id)
+        if raw is None:
+            return None
+        return self._build_tuple(thread_id, checkpoint_ns, checkpoint_id, _reply_bytes(raw))
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        # Checkpoints are only looked up per thread, listing across threads isn't supported
+        if not config:
+            return
+
+        thread_id: str = config["configurable"]["thread_id"]
+        wanted_ns = config["configurable"].get("checkpoint_ns")
+        wanted_id = get_checkpoint_id(config)
+        before_id = get_checkpoint_id(before) if before else None
+
+        namespaces = sorted(
+            _reply_str(ns) for ns in self.redis.smembers(self._key(thread_id, "ns"))
+        )
+        for checkpoint_ns in namespaces:
+            if wanted_ns is not None and checkpoint_ns != wanted_ns:
+                continue
+
+            records = self.redis.hgetall(self._key(thread_id, checkpoint_ns, "checkpoints"))
+            for cid, raw in sorted(records.items(), key=lambda r: r[0], reverse=True):
+                checkpoint_id = _reply_str(cid)
+                if wanted_id and checkpoint_id != wanted_id:
+                    continue
+                if before_id and checkpoint_id >= before_id:
+                    continue
+
+                checkpoint_tuple = self._build_tuple(
+                    thread_id, checkpoint_ns, checkpoint_id, _reply_bytes(raw)
+                )
+                if filter and not all(
+                    checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()
+                ):
+                    continue
+
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values: dict[str, Any] = stored.pop("channel_values")  # type: ignore[misc]
+
+        # Channel values are stored once per version
+        blobs: dict[FieldT, EncodableT] = {
+            f"{channel}@{version}": self._dump(values[channel])
+            for channel, version in new_versions.items()
+            if channel in values
+        }
+        record = {
+            "checkpoint": stored,
+            "metadata": get_checkpoint_metadata(config, metadata),
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+        }
+
+        keys = [
+            self._key(thread_id, "ns"),
+            self._key(thread_id, checkpoint_ns, "checkpoints"),
+            self._key(thread_id, checkpoint_ns, "blobs"),
+        ]
+        pipe = self.redis.pipeline()
+        pipe.sadd(keys[0], checkpoint_ns)
+        pipe.hset(keys[1], checkpoint["id"], self._dump(record))
+        if blobs:
+            pipe.hset(keys[2], mapping=blobs)
+        self._expire(pipe, keys)
+        pipe.execute()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id: str = config["configurable"]["checkpoint_id"]
+        writes_key = self._key(thread_id, checkpoint_ns, "writes", checkpoint_id)
+
+        mapping: dict[FieldT, EncodableT] = {}
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            field = f"{task_id}:{write_idx}"
+
+            # Regular writes are only saved once, special writes (errors, interrupts) overwrite
+            if write_idx >= 0 and self.redis.hexists(writes_key, field):
+                continue
+            mapping[field] = self._dump(
+                {
+                    "task_id": task_id,
+                    "channel": channel,
+                    "value": value,
+                    "task_path": task_path,
+                    "idx": write_idx,
+                }
+            )
+
+        if not mapping:
+            return
+        pipe = self.redis.pipeline()
+        pipe.hset(writes_key, mapping=mapping)
+        self._expire(pipe, [writes_key])
+        pipe.execute()
+
+    def delete_thread(self, thread_id: str) -> None:
+        keys = list(self.redis.scan_iter(match=self._key(thread_id, "*")))
+        if keys:
+            self.redis.delete(*keys)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+# Counts a failure of a node for a drift analysis thread and returns the node's failure count
+def record_node_failure(redis_client: Redis, thread_id: str, node: str, ttl_seconds: int) -> int:
+    key = f"{_NODE_FAILURES_PREFIX}:{thread_id}"
+    pipe = redis_client.pipeline()
+    pipe.hincrby(key, node, 1)
+    pipe.expire(key, ttl_seconds)
+    count, _ = pipe.execute()
+    return int(count)
+
+
+# Deletes the checkpoints and node failure counts of a drift analysis thread
+def clear_checkpoint(redis_client: Redis, thread_id: str) -> None:
+    RedisCheckpointSaver(redis_client, ttl_seconds=0).delete_thread(thread_id)
+    redis_client.delete(f"{_NODE_FAILURES_PREFIX}:{thread_id}")
@@ -0,0 +1,58 @@
+# Raised when an edit can't be applied (anchor missing, ambiguous, out of range or overlapping)
+class EditApplyError(Exception):
+    pass
+
+
+# Returns the character offset of the start of each line (plus the end of the content)
+def _line_offsets(content: str) -> list[int]:
+    offsets = [0]
+    for line in content.splitlines(keepends=True):
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+# Locates the span an edit replaces in the original content and returns it with its new text
+def _edit_span(content: str, offsets: list[int], edit: dict) -> tuple[int, int, str]:
+    old_text = edit.get("old_text") or ""
+    new_text = edit.get("new_text") or ""
+    if old_text:
+        count = content.count(old_text)
+        if count == 0:
+            raise EditApplyError(f"old_text not found: {old_text[:80]!r}")
+        if count > 1:
+            raise EditApplyError(f"old_text matches {count} times: {old_text[:80]!r}")
+        start = content.index(old_text)
+        return start, start + len(old_text), new_text
+
+    # Line range edits use the 1-based inclusive numbering shown to the LLM
+    start_line, end_line = edit.get("start_line"), edit.get("end_line")
+    line_count = len(offsets) - 1
+    if start_line is None or end_line is None:
+        raise EditApplyError("edit has neither old_text nor a line range")
+    if not 1 <= start_line <= end_line <= line_count:
+        raise EditApplyError(f"line range {start_line}-{end_line} outside 1-{line_count}")
+
+    # Replaced lines keep their final line break, deleted lines lose it
+    start, end = offsets[start_line - 1], offsets[end_line]
+    if new_text and content[start:end].endswith("\n"):
+        end -= 1
+        new_text = new_text.rstrip("\n")
+    return start, end, new_text
+
+
+# Applies the LLM's edits to the content, all spans refer to the original content
+def apply_edits(content: str, edits: list[dict]) -> str:
+    if not edits:
+        raise EditApplyError("no edits returned")
+
+    offsets = _line_offsets(content)
+    spans = sorted((_edit_span(content, offsets, edit) for edit in edits), key=lambda s: s[0])
+
+    for (_, prev_end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start < prev_end:
+            raise EditApplyError("edits overlap")
+
+    # Apply from the bottom up so earlier offsets stay valid
+    for start, end, new_text in reversed(spans):
+        content = content[:start] + new_text + content[end:]
+    return content
@@ -0,0 +1,151 @@
+import re
+from dataclasses import dataclass
+
+# ATX headings (# Title) - setext headings are rare in docs and not indexed
+_HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$")
+
+# Opening/closing fences of fenced code blocks, headings inside them are ignored
+_FENCE_RE = re.compile(r"^[ \t]{0,3}(`{3,}|~{3,})")
+
+# Separators the planner may use between heading names in a section path
+_PATH_SEPARATOR_RE = re.compile(r"\s*(?:>|/|»|→)\s*")
+
+
+# A markdown section, from its heading line up to the next heading of the same or higher level
+@dataclass(frozen=True)
+class DocSection:
+    path: tuple[str, ...]
+    level: int
+    start_line: int
+    end_line: int
+    start_byte: int
+    end_byte: int
+
+    @property
+    def title(self) -> str:
+        return self.path[-1]
+
+    def contains(self, other: "DocSection") -> bool:
+        return self.start_line <= other.start_line and other.end_line <= self.end_line
+
+
+# Normalises a heading or planner section name for comparison
+def _normalise(name: str) -> str:
+    name = name.strip().lstrip("#").strip()
+    name = name.replace("`", "").replace("*", "")
+    return re.sub(r"\s+", " ", name).lower()
+
+
+# Builds an index of every heading in the markdown content mapped to its line and byte range
+def build_section_index(content: str) -> list[DocSection]:
+    lines = content.splitlines(keepends=True)
+
+    # Byte offset of the start of each line (plus the end of the document)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line.encode("utf-8")))
+
+    headings: list[tuple[int, int, str]] = []
+    fence: str | None = None
+    for idx, line in enumerate(lines):
+        fence_match = _FENCE_RE.match(line)
+        if fence_match:
+            marker = fence_match.group(1)
+            if fence is None:
+                fence = marker[0] * 3
+            elif marker.startswith(fence):
+                fence = None
+            continue
+        if fence is not None:
+            continue
+
+        heading_match = _HEADING_RE.match(line.rstrip("\r\n"))
+        if heading_match:
+            headings.append((idx, len(heading_match.group(1)), heading_match.group(2).strip()))
+
+    sections: list[DocSection] = []
+    stack: list[tuple[int, str]] = []
+    for i, (start, level, title) in enumerate(headings):
+        # A section ends at the next heading with the same or a higher level
+        end = len(lines)
+        for next_start, next_level, _ in headings[i + 1 :]:
+            if next_level <= level:
+                end = next_start
+                break
+
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, title))
+
+        sections.append(
+            DocSection(
+                path=tuple(t for _, t in stack),
+                level=level,
+                start_line=start,
+                end_line=end,
+                start_byte=offsets[start],
+                end_byte=offsets[end],
+            )
+        )
+
+    return sections
+
+
+# Finds the section a planner section name refers to, returns None if missing or ambiguous
+def find_section(index: list[DocSection], section_name: str) -> DocSection | None:
+    if not section_name or not section_name.strip():
+        return None
+
+    wanted = [_normalise(p) for p in _PATH_SEPARATOR_RE.split(section_name) if p.strip()]
+    if not wanted:
+        return None
+
+    # Match the trailing part of the heading path, "Auth > Login" matches "API > Auth > Login"
+    matches = [
+        section
+        for section in index
+        if len(section.path) >= len(wanted)
+        and [_normalise(p) for p in section.path[-len(wanted) :]] == wanted
+    ]
+
+    # Fall back to the full name in case the heading itself contains a separator character
+    if not matches and len(wanted) > 1:
+        full_name = _normalise(section_name)
+        matches = [section for section in index if _normalise(section.title) == full_name]
+
+    if len(matches) != 1:
+        return None
+    return matches[0]
+
+
+# Drops sections nested inside other sections so every line is rewritten at most once
+def merge_overlapping_sections(sections: list[DocSection]) -> list[DocSection]:
+    merged: list[DocSection] = []
+    for section in sorted(sections, key=lambda s: (s.start_line, -s.end_line)):
+        if merged and merged[-1].contains(section):
+            continue
+        merged.append(section)
+    return merged
+
+
+# Returns the raw text of a section
+def get_section_text(content: str, section: DocSection) -> str:
+    lines = content.splitlines(keepends=True)
+    return "".join(lines[section.start_line : section.end_line])
+
+
+# Replaces each section's lines with its new text and returns the updated document
+def splice_sections(content: str, replacements: list[tuple[DocSection, str]]) -> str:
+    lines = content.splitlines(keepends=True)
+
+    # Splice from the bottom up so earlier line numbers stay valid
+    for section, new_text in sorted(replacements, key=lambda r: r[0].start_line, reverse=True):
+        original = "".join(lines[section.start_line : section.end_line])
+
+        # Keep the blank-line spacing before the next heading the same as the original
+        trailing = original[len(original.rstrip("\r\n")) :]
+        new_text = new_text.rstrip("\r\n") + trailing
+
+        lines[section.start_line : section.end_line] = new_text.splitlines(keepends=True)
+
+    return "".join(lines)
@@ -1,16 +1,17 @@
-from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph
 from langgraph.graph.state import CompiledStateGraph
 
-from app.agents.state import DriftAnalysisState
 from app.agents.nodes import (
-    scout_changes,
-    retrieve_docs,
-    deep_analyze,
     aggregate_results,
+    apply_changes,
+    deep_analyze,
     plan_updates,
+    retrieve_docs,
     rewrite_docs,
-    apply_changes,
+    scout_changes,
 )
+from app.agents.state import DriftAnalysisState
 
 
 # Route to doc gen if drift is found else end the graph execution
@@ -21,8 +22,11 @@ def should_generate_docs(state: DriftAnalysisState) -> str:
     return "__end__"
 
 
-# Build and compile the Delta LangGraph workflow
-def build_drift_analysis_graph() -> CompiledStateGraph:
+# Build and compile the Delta LangGraph workflow (async nodes, run it with ainvoke), with a
+# checkpointer runs can be resumed
+def build_drift_analysis_graph(
+    checkpointer: BaseCheckpointSaver | None = None,
+) -> CompiledStateGraph:
     graph = StateGraph(DriftAnalysisState)  # type: ignore[bad-specialization]
 
     # Drift analysis nodes
@@ -50,7 +54,7 @@ def build_drift_analysis_graph() -> CompiledStateGraph:
     graph.add_edge("rewrite_docs", "apply_changes")
     graph.add_edge("apply_changes", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
 drift_analysis_graph = build_drift_analysis_graph()
@@ -1,12 +1,66 @@
+import asyncio
+from functools import cache
+from weakref import WeakKeyDictionary
+
 from langchain_google_genai import ChatGoogleGenerativeAI
 
+from app.agents.rate_limiter import RedisTokenBucketRateLimiter
 from app.core.config import settings
+from app.core.queue import redis_conn
 
 
-# Factory function to get a configured Gemini LLM instance
-def get_llm(temperature: float = 0) -> ChatGoogleGenerativeAI:
+# Returns the rate limiter shared by every client of the model, None when rate limiting is off
+@cache
+def _get_rate_limiter(model: str) -> RedisTokenBucketRateLimiter | None:
+    if settings.LLM_REQUESTS_PER_MINUTE <= 0:
+        return None
+    return RedisTokenBucketRateLimiter(
+        redis_conn,
+        key=f"llm_rate_limit:{model}",
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    )
+
+
+# Clients of each running event loop, keyed by model and temperature. A client's HTTP connections
+# are bound to the loop they were opened on, so a client never outlives its loop
+_clients_by_loop: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[tuple[str, float], ChatGoogleGenerativeAI]
+] = WeakKeyDictionary()
+
+
+# Builds the client for a model and temperature
+def _build_llm(model: str, temperature: float) -> ChatGoogleGenerativeAI:
+    # max_retries retries 408/429/5xx responses per call with jittered exponential backoff
     return ChatGoogleGenerativeAI(
-        model=settings.LLM_MODEL,
+        model=model,
         google_api_key=settings.GEMINI_API_KEY,
         temperature=temperature,
+        max_retries=settings.LLM_MAX_RETRIES,
+        rate_limiter=_get_rate_limiter(model),
     )
+
+
+# Gets the client for a model and temperature, built once per event loop. Each asyncio.run, e.g.
+# one per drift analysis, gets fresh clients. Outside a running loop a new client is built
+def _get_cached_llm(model: str, temperature: float) -> ChatGoogleGenerativeAI:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _build_llm(model, temperature)
+
+    clients = _clients_by_loop.setdefault(loop, {})
+    key = (model, temperature)
+    if key not in clients:
+        clients[key] = _build_llm(model, temperature)
+    return clients[key]
+
+
+# Factory function to get a configured Gemini LLM instance
+def get_llm(temperature: float = 0) -> ChatGoogleGenerativeAI:
+    return _get_cached_llm(settings.LLM_MODEL, temperature)
+
+
+# Drops the cached clients and rate limiters (used when settings change, e.g. in tests)
+def clear_llm_cache() -> None:
+    _clients_by_loop.clear()
+    _get_rate_limiter.cache_clear()
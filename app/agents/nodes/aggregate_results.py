@@ -1,16 +1,13 @@
 import asyncio
 from typing import Any
-from datetime import datetime, timezone
 
-from app.db.base import DriftEvent, DriftFinding
-from app.services.github_api import update_github_check_run
-from app.services.notification_service import create_notification
 from app.agents.state import DriftAnalysisState
+from app.services.drift_store import save_drift_results
+from app.services.github_api import update_github_check_run
 
 
 # Node persists all findings to the DB and updates the GH Check Run
-def aggregate_results(state: DriftAnalysisState) -> dict[str, Any]:
-    session = state["session"]
+async def aggregate_results(state: DriftAnalysisState) -> dict[str, Any]:
     drift_event_id = state["drift_event_id"]
     findings: list[dict] = state["findings"]
 
@@ -36,74 +33,48 @@ def aggregate_results(state: DriftAnalysisState) -> dict[str, Any]:
             summary += f"{i}. {f.get('code_path', '?')} - {f.get('drift_type', '?')} (score: {f.get('drift_score', 0):.1f})\n"
             summary += f"   {f.get('explanation', '')}\n\n"
 
-    # Add each finding as a DriftFinding record in DB
-    for f in findings:
-        doc_paths = f.get("matched_doc_paths", [])
-        doc_file_path = doc_paths[0] if doc_paths else None
-
-        finding = DriftFinding(
-            drift_event_id=drift_event_id,
-            code_path=f.get("code_path", ""),
-            doc_file_path=doc_file_path,
-            change_type=f.get("change_type"),
-            drift_type=f.get("drift_type"),
-            drift_score=f.get("drift_score"),
-            explanation=f.get("explanation"),
-            confidence=f.get("confidence"),
-        )
-        session.add(finding)
-
-    # Update the drift event record with the final score, conclusion and logs
-    drift_event = session.query(DriftEvent).filter(DriftEvent.id == drift_event_id).first()
-
-    if drift_event:
-        drift_event.overall_drift_score = overall_score
-        drift_event.drift_result = drift_result
-        drift_event.summary = summary
-        drift_event.processing_phase = "completed"
-        drift_event.completed_at = datetime.now(timezone.utc)
-
-        if drift_event.repository and drift_event.repository.installation:
-            user_id = drift_event.repository.installation.user_id
-            if user_id:
-                repo_name = drift_event.repository.repo_name
-                pr_number = drift_event.pr_number
-                if drift_result == "clean":
-                    notif_content = f"Drift analysis for PR #{pr_number} in {repo_name} completed - No documentation drift detected."
-                elif drift_result == "missing_docs":
-                    notif_content = f"Drift analysis for PR #{pr_number} in {repo_name} completed - Missing documentation detected (score: {overall_score:.2f})."
-                else:
-                    notif_content = f"Drift analysis for PR #{pr_number} in {repo_name} completed - Documentation drift detected (score: {overall_score:.2f})."
-                create_notification(session, user_id, notif_content)
-
-        session.commit()
+    # Notify the repo owner about the outcome
+    pr_number = state["pr_number"]
+    repo_name = state["repo_full_name"]
+    if drift_result == "clean":
+        notif_content = f"Drift analysis for PR #{pr_number} in {repo_name} completed - No documentation drift detected."
+    elif drift_result == "missing_docs":
+        notif_content = f"Drift analysis for PR #{pr_number} in {repo_name} completed - Missing documentation detected (score: {overall_score:.2f})."
     else:
+        notif_content = f"Drift analysis for PR #{pr_number} in {repo_name} completed - Documentation drift detected (score: {overall_score:.2f})."
+
+    # Persist the findings, final score, conclusion and notification in one short transaction
+    saved = await asyncio.to_thread(
+        save_drift_results,
+        drift_event_id,
+        findings,
+        overall_score,
+        drift_result,
+        summary,
+        user_id=state.get("user_id"),
+        notification=notif_content,
+        drift_event_created_at=state["drift_event_created_at"],
+    )
+    if not saved:
         print(f"DriftEvent {drift_event_id} not found in DB")
-        session.commit()
 
     # Push the final result to GH as a completed Check Run
-    if drift_event and drift_event.check_run_id:
-        repo = drift_event.repository
-        repo_full_name = repo.repo_name
-        installation_id = repo.installation_id
-        check_run_id = drift_event.check_run_id
-
+    check_run_id = state.get("check_run_id")
+    if saved and check_run_id:
         conclusion = "success" if drift_result == "clean" else "action_required"
         title = "Delta Drift Analysis"
 
         try:
-            asyncio.run(
-                update_github_check_run(
-                    repo_full_name=repo_full_name,
-                    check_run_id=check_run_id,
-                    installation_id=installation_id,
-                    status="completed",
-                    conclusion=conclusion,
-                    title=title,
-                    summary=summary,
-                )
+            await update_github_check_run(
+                repo_full_name=repo_name,
+                check_run_id=check_run_id,
+                installation_id=state["installation_id"],
+                status="completed",
+                conclusion=conclusion,
+                title=title,
+                summary=summary,
             )
         except Exception as exc:
             print(f"GitHub Check Run update failed: {exc}")
 
-    return {"findings": []}
+    return {"findings": [], "drift_summary": summary}
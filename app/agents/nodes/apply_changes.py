@@ -1,36 +1,26 @@
 import asyncio
-import subprocess
+from collections.abc import Awaitable
 from pathlib import Path
 from typing import Any
 
 from app.agents.state import DriftAnalysisState
-from app.services.git_service import commit_and_push_docs_branch
+from app.services.drift_store import save_docs_pr
+from app.services.git_service import commit_and_push_docs_branch, run_git
 from app.services.github_api import (
-    get_installation_access_token,
     create_docs_pull_request,
+    get_installation_access_token,
     request_pr_review,
     update_github_check_run,
 )
-from app.services.notification_service import create_notification
-from app.db.base import DriftEvent
 
 
 # Commits changes, pushes, and opens a docs PR
-def _commit_and_pr(state: DriftAnalysisState) -> None:
-    session = state["session"]
+async def _commit_and_pr(state: DriftAnalysisState) -> None:
     drift_event_id = state["drift_event_id"]
-
-    drift_event = session.query(DriftEvent).filter(DriftEvent.id == drift_event_id).first()
-    if not drift_event:
-        print(f"_commit_and_pr: DriftEvent {drift_event_id} not found")
-        return
-
-    repo = drift_event.repository
-    session.refresh(repo)
-    repo_full_name = repo.repo_name
-    installation_id = repo.installation_id
-    original_branch = drift_event.head_branch
-    pr_number = drift_event.pr_number
+    repo_full_name = state["repo_full_name"]
+    installation_id = state["installation_id"]
+    original_branch = state["head_branch"]
+    pr_number = state["pr_number"]
     findings = state["findings"]
     rewrite_results = state.get("rewrite_results", [])
 
@@ -39,105 +29,117 @@ def _commit_and_pr(state: DriftAnalysisState) -> None:
         print(f"_commit_and_pr: no rewrite results - skipping for event {drift_event_id}")
         return
 
-    access_token = asyncio.run(get_installation_access_token(installation_id))
+    # Get a token and the current branch name (the docs branch we checked out earlier) together
+    access_token, branch_result = await asyncio.gather(
+        get_installation_access_token(installation_id),
+        run_git(["rev-parse", "--abbrev-ref", "HEAD"], state["repo_path"], timeout=30),
+    )
+    docs_branch = (
+        branch_result.stdout.strip()
+        if branch_result.returncode == 0
+        else f"docs/delta-fix/{original_branch}"
+    )
 
     # Commit and push changed .md files
-    push_success = asyncio.run(
-        commit_and_push_docs_branch(
-            repo_path=state["repo_path"],
-            pr_number=pr_number,
-            access_token=access_token,
-            repo_full_name=repo_full_name,
-        )
+    push_success = await commit_and_push_docs_branch(
+        repo_path=state["repo_path"],
+        pr_number=pr_number,
+        access_token=access_token,
+        repo_full_name=repo_full_name,
     )
 
     if not push_success:
         print(f"_commit_and_pr: push failed for event {drift_event_id}")
         return
 
-    # Get the current branch name (the docs branch we checked out earlier)
-    branch_result = subprocess.run(
-        ["git", "-C", state["repo_path"], "rev-parse", "--abbrev-ref", "HEAD"],
-        capture_output=True,
-        text=True,
-        timeout=30,
-    )
-    docs_branch = (
-        branch_result.stdout.strip()
-        if branch_result.returncode == 0
-        else f"docs/delta-fix/{original_branch}"
-    )
-
     # Create the docs PR targeting the original branch
     summary_lines = [f"- `{f.get('code_path', '?')}`: {f.get('explanation', '')}" for f in findings]
     drift_summary = "\n".join(summary_lines) if summary_lines else None
     updates_summary = state.get("doc_updates_summary") or None
 
-    docs_pr_number = asyncio.run(
-        create_docs_pull_request(
-            installation_id=installation_id,
-            repo_full_name=repo_full_name,
-            head_branch=docs_branch,
-            base_branch=original_branch,
-            pr_number=pr_number,
-            drift_summary=drift_summary,
-            updates_summary=updates_summary,
-        )
+    docs_pr_number = await create_docs_pull_request(
+        installation_id=installation_id,
+        repo_full_name=repo_full_name,
+        head_branch=docs_branch,
+        base_branch=original_branch,
+        pr_number=pr_number,
+        drift_summary=drift_summary,
+        updates_summary=updates_summary,
     )
 
-    # Store the docs PR number in the drift event and update processing phase
-    if docs_pr_number:
-        drift_event.docs_pr_number = docs_pr_number
-        drift_event.processing_phase = "fix_pr_raised"
-
-        # Request review if a reviewer is configured for the repo
-        if repo.reviewer:
-            asyncio.run(
-                request_pr_review(
-                    installation_id=installation_id,
-                    repo_full_name=repo_full_name,
-                    pr_number=docs_pr_number,
-                    reviewer=repo.reviewer,
-                )
+    if not docs_pr_number:
+        return
+
+    # Saving the PR, requesting review and linking the check run are independent of each other
+    follow_ups: list[Awaitable[Any]] = [
+        # Store the docs PR number and phase in the drift event and notify the user
+        asyncio.to_thread(
+            save_docs_pr,
+            drift_event_id,
+            docs_pr_number,
+            user_id=state.get("user_id"),
+            notification=f"Documentation PR #{docs_pr_number} raised for {repo_full_name} to resolve drift found in PR #{pr_number}.",
+            drift_event_created_at=state["drift_event_created_at"],
+        )
+    ]
+
+    # Request review if a reviewer is configured for the repo
+    reviewer = state.get("reviewer")
+    if reviewer:
+        follow_ups.append(
+            request_pr_review(
+                installation_id=installation_id,
+                repo_full_name=repo_full_name,
+                pr_number=docs_pr_number,
+                reviewer=reviewer,
             )
+        )
 
-        # Update the original check run to add Resolve link and add PR link to summary
-        if drift_event.check_run_id:
-            fix_pr_url = f"https://github.com/{repo_full_name}/pull/{docs_pr_number}"
-            updated_summary = (
-                drift_event.summary or ""
-            ) + f"\n\n**Documentation Fixes:** [{repo_full_name}#{docs_pr_number}]({fix_pr_url})"
-            try:
-                asyncio.run(
-                    update_github_check_run(
-                        repo_full_name=repo_full_name,
-                        check_run_id=drift_event.check_run_id,
-                        installation_id=installation_id,
-                        status="completed",
-                        conclusion="action_required",
-                        title="Documentation Drift Detected",
-                        summary=updated_summary,
-                        details_url=fix_pr_url,
-                    )
-                )
-            except Exception as check_run_exc:
-                print(f"Failed to update check run with fix PR link: {check_run_exc}")
-
-    # Notify the user
-    user_id = repo.installation.user_id if repo.installation else None
-    if user_id:
-        if docs_pr_number:
-            create_notification(
-                session,
-                user_id,
-                f"Documentation PR #{docs_pr_number} raised for {repo_full_name} to resolve drift found in PR #{pr_number}.",
+    # Update the original check run to add Resolve link and add PR link to summary
+    check_run_id = state.get("check_run_id")
+    if check_run_id:
+        follow_ups.append(
+            _link_fix_pr(
+                state.get("drift_summary"),
+                repo_full_name,
+                installation_id,
+                check_run_id,
+                docs_pr_number,
             )
+        )
 
-    session.commit()
+    await asyncio.gather(*follow_ups)
+
+
+# Adds the docs PR link to the original check run, failures are only logged
+async def _link_fix_pr(
+    drift_summary: str | None,
+    repo_full_name: str,
+    installation_id: int,
+    check_run_id: int,
+    docs_pr_number: int,
+) -> None:
+    fix_pr_url = f"https://github.com/{repo_full_name}/pull/{docs_pr_number}"
+    updated_summary = (
+        drift_summary or ""
+    ) + f"\n\n**Documentation Fixes:** [{repo_full_name}#{docs_pr_number}]({fix_pr_url})"
+    try:
+        await update_github_check_run(
+            repo_full_name=repo_full_name,
+            check_run_id=check_run_id,
+            installation_id=installation_id,
+            status="completed",
+            conclusion="action_required",
+            title="Documentation Drift Detected",
+            summary=updated_summary,
+            details_url=fix_pr_url,
+        )
+    except Exception as check_run_exc:
+        print(f"Failed to update check run with fix PR link: {check_run_exc}")
 
 
 # Node writes the rewritten content to the local .md files
-def apply_changes(state: DriftAnalysisState) -> dict[str, Any]:
+async def apply_changes(state: DriftAnalysisState) -> dict[str, Any]:
     rewrite_results: list[dict] = state["rewrite_results"]
     repo_path: str = state["repo_path"]
 
@@ -171,5 +173,5 @@ def apply_changes(state: DriftAnalysisState) -> dict[str, Any]:
             print(f"Error writing {full_path}: {exc}")
             continue
 
-    _commit_and_pr(state)
+    await _commit_and_pr(state)
     return {}
@@ -1,35 +1,86 @@
-import subprocess
+import asyncio
 from typing import Any, cast
 
-from app.schemas import LLMDriftFinding
 from app.agents.llm import get_llm
-from app.agents.state import DriftAnalysisState
 from app.agents.prompts import DEEP_ANALYZE_SYSTEM_PROMPT, build_deep_analyze_user_prompt
+from app.agents.state import DriftAnalysisState
+from app.core.config import settings
+from app.schemas import LLMDriftFinding
+from app.services.drift_progress import publish_progress
 
 
-# Return git diff output for a specific file between commits
-def _get_git_diff(repo_path: str, base_sha: str, head_sha: str, file_path: str) -> str | None:
+# Returns the summarised patch of a file from the PR's parsed diff, None when the diff has no
+# entry or no patch for it
+def _get_file_patch(file_diffs: dict[str, dict], file_path: str) -> str | None:
+    file_diff = file_diffs.get(file_path)
+    if not file_diff:
+        return None
+    return file_diff["patch"]
+
+
+# Sends one payload with its diff to the LLM, returns the finding or None when there's no drift
+async def _analyze_payload(
+    structured_llm: Any,
+    payload: dict,
+    file_diffs: dict[str, dict],
+    position: str,
+) -> dict | None:
+    code_path: str = payload["code_path"]
+    change_type: str = payload["change_type"]
+    elements: list[str] = payload.get("elements", [])
+    old_elements: list[str] = payload.get("old_elements", [])
+    matched_doc_snippets: str = payload.get("matched_doc_snippets", "")
+
+    # Get the raw diff to include in the LLM prompt
+    diff = _get_file_patch(file_diffs, code_path)
+
+    if diff is None:
+        print("ERROR: Could not retrieve git diff")
+        return None
+
+    if not diff.strip():
+        return None
+
+    user_prompt = build_deep_analyze_user_prompt(
+        code_path=code_path,
+        change_type=change_type,
+        elements=elements,
+        old_elements=old_elements,
+        diff=diff,
+        matched_doc_snippets=matched_doc_snippets,
+    )
+
     try:
-        # Run the git diff command
-        result = subprocess.run(
-            ["git", "-C", repo_path, "diff", base_sha, head_sha, "--", file_path],
-            capture_output=True,
-            text=True,
-            timeout=30,
+        # Invoke the LLM
+        raw_result = await structured_llm.ainvoke(
+            [
+                {"role": "system", "content": DEEP_ANALYZE_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ]
         )
-        if result.returncode != 0:
-            return None
-        return result.stdout
-    except (subprocess.TimeoutExpired, OSError):
+        result = cast(LLMDriftFinding, raw_result)
+    except Exception as exc:
+        print(f"LLM error on payload {position}: {exc}")
+        raise
+
+    # Record findings where the LLM confirms actual drift
+    if not result.drift_detected:
         return None
+    return {
+        "code_path": code_path,
+        "change_type": change_type,
+        "drift_type": result.drift_type,
+        "drift_score": result.drift_score,
+        "explanation": result.explanation,
+        "confidence": result.confidence,
+        "matched_doc_paths": payload.get("matched_doc_paths", []),
+    }
 
 
 # Node sends each payload to the LLM for semantic drift analysis
-def deep_analyze(state: DriftAnalysisState) -> dict[str, Any]:
+async def deep_analyze(state: DriftAnalysisState) -> dict[str, Any]:
     analysis_payloads: list[dict] = state["analysis_payloads"]
-    repo_path: str = state["repo_path"]
-    base_sha: str = state["base_sha"]
-    head_sha: str = state["head_sha"]
+    file_diffs: dict[str, dict] = state["file_diffs"]
 
     # Skip LLM calls if retrieve_docs found nothing to analyse
     if not analysis_payloads:
@@ -38,60 +89,27 @@ def deep_analyze(state: DriftAnalysisState) -> dict[str, Any]:
     # Initialise Gemini with structured output bound to LLMDriftFinding
     structured_llm = get_llm().with_structured_output(LLMDriftFinding)
 
-    new_findings: list[dict] = []
-
-    # Build the prompt with the diff and matched doc snippets
-    for i, payload in enumerate(analysis_payloads, 1):
-        code_path: str = payload["code_path"]
-        change_type: str = payload["change_type"]
-        elements: list[str] = payload.get("elements", [])
-        old_elements: list[str] = payload.get("old_elements", [])
-        matched_doc_snippets: str = payload.get("matched_doc_snippets", "")
-
-        # Get the raw diff to include in the LLM prompt
-        diff = _get_git_diff(repo_path, base_sha, head_sha, code_path)
-
-        if diff is None:
-            print("ERROR: Could not retrieve git diff")
-            continue
-
-        if not diff.strip():
-            continue
-
-        user_prompt = build_deep_analyze_user_prompt(
-            code_path=code_path,
-            change_type=change_type,
-            elements=elements,
-            old_elements=old_elements,
-            diff=diff,
-            matched_doc_snippets=matched_doc_snippets,
-        )
-
-        try:
-            # Invoke the LLM
-            raw_result = structured_llm.invoke(
-                [
-                    {"role": "system", "content": DEEP_ANALYZE_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ]
-            )
-            result = cast(LLMDriftFinding, raw_result)
-        except Exception as exc:
-            print(f"LLM error on payload {i}/{len(analysis_payloads)}: {exc}")
-            raise
-
-        # Record findings where the LLM confirms actual drift
-        if result.drift_detected:
-            new_findings.append(
-                {
-                    "code_path": code_path,
-                    "change_type": change_type,
-                    "drift_type": result.drift_type,
-                    "drift_score": result.drift_score,
-                    "explanation": result.explanation,
-                    "confidence": result.confidence,
-                    "matched_doc_paths": payload.get("matched_doc_paths", []),
-                }
+    # Payloads are analysed concurrently, bounded so one large PR can't flood the LLM quota
+    semaphore = asyncio.Semaphore(max(1, settings.DEEP_ANALYZE_CONCURRENCY))
+    done = 0
+
+    async def _bounded_analyze(i: int, payload: dict) -> dict | None:
+        nonlocal done
+        async with semaphore:
+            finding = await _analyze_payload(
+                structured_llm,
+                payload,
+                file_diffs,
+                f"{i}/{len(analysis_payloads)}",
             )
+        # Each analysed file is pushed to the live streams of the drift event
+        done += 1
+        await publish_progress(state, "deep_analyze", done, len(analysis_payloads))
+        return finding
+
+    results = await asyncio.gather(
+        *(_bounded_analyze(i, payload) for i, payload in enumerate(analysis_payloads, 1))
+    )
 
-    return {"findings": new_findings}
+    # Findings keep the order of the payloads
+    return {"findings": [finding for finding in results if finding]}
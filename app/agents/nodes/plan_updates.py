@@ -1,52 +1,44 @@
 import asyncio
 from pathlib import Path
 from typing import Any, cast
-from app.db.base import DriftEvent
-from app.schemas.llm import UpdatePlan
+
 from app.agents.llm import get_llm
+from app.agents.prompts import DOC_GEN_PLAN_SYSTEM_PROMPT, build_doc_gen_plan_user_prompt
 from app.agents.state import DriftAnalysisState
+from app.schemas.llm import UpdatePlan
+from app.services.drift_store import set_processing_phase
 from app.services.git_service import create_docs_branch
-from app.agents.prompts import DOC_GEN_PLAN_SYSTEM_PROMPT, build_doc_gen_plan_user_prompt
 from app.services.github_api import get_installation_access_token
 
 
 # Creates a docs branch off the original PR branch
-def _checkout_docs(state: DriftAnalysisState) -> None:
-    session = state["session"]
+async def _checkout_docs(state: DriftAnalysisState) -> None:
     drift_event_id = state["drift_event_id"]
 
-    drift_event = session.query(DriftEvent).filter(DriftEvent.id == drift_event_id).first()
-    if not drift_event:
-        print(f"_checkout_docs: DriftEvent {drift_event_id} not found")
-        return
-
-    repo = drift_event.repository
-    repo_full_name = repo.repo_name
-    installation_id = repo.installation_id
-    original_branch = drift_event.head_branch
-    pr_number = drift_event.pr_number
-
-    access_token = asyncio.run(get_installation_access_token(installation_id))
-    branch_name = asyncio.run(
-        create_docs_branch(
-            repo_path=state["repo_path"],
-            original_branch=original_branch,
-            access_token=access_token,
-            repo_full_name=repo_full_name,
-            pr_number=pr_number,
-        )
+    access_token = await get_installation_access_token(state["installation_id"])
+    branch_name = await create_docs_branch(
+        repo_path=state["repo_path"],
+        original_branch=state["head_branch"],
+        access_token=access_token,
+        repo_full_name=state["repo_full_name"],
+        pr_number=state["pr_number"],
+        start_sha=state["head_sha"],
     )
 
     if not branch_name:
         raise RuntimeError(f"Failed to create docs branch for event {drift_event_id}")
 
-    drift_event.processing_phase = "generating"
-    session.commit()
+    await asyncio.to_thread(
+        set_processing_phase,
+        drift_event_id,
+        "generating",
+        state["drift_event_created_at"],
+    )
 
 
 # Node analyses drift findings and maps them to specific doc files/sections
-def plan_updates(state: DriftAnalysisState) -> dict[str, Any]:
-    _checkout_docs(state)
+async def plan_updates(state: DriftAnalysisState) -> dict[str, Any]:
+    await _checkout_docs(state)
 
     drift_findings: list[dict] = state["findings"]
     repo_path: str = state["repo_path"]
@@ -74,7 +66,7 @@ def plan_updates(state: DriftAnalysisState) -> dict[str, Any]:
     user_prompt = build_doc_gen_plan_user_prompt(existing_md_files, drift_findings, docs_policies)
 
     try:
-        raw_result = structured_llm.invoke(
+        raw_result = await structured_llm.ainvoke(
             [
                 {"role": "system", "content": DOC_GEN_PLAN_SYSTEM_PROMPT},
                 {"role": "user", "content": user_prompt},
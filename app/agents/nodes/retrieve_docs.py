@@ -3,31 +3,35 @@ import re
 from typing import Any
 
 from app.agents.state import DriftAnalysisState
+from app.core.config import settings
+from app.services.drift_progress import publish_progress
+from app.services.git_service import list_files, read_blobs, split_by_size
 
 # Number of lines above and below a match to include in a snippet for context
 _CONTEXT_LINES = 15
 
 
-# Recursively loads all markdown files from the docs directory
-def _load_markdown_files(docs_dir: str) -> dict[str, str]:
-    docs: dict[str, str] = {}
+# Loads all markdown files under the docs directory as they are at the head commit.
+# Keyed by their path inside the clone, the same paths the docs are later rewritten at
+async def _load_markdown_files(
+    repo_path: str, head_sha: str, docs_root_path: str
+) -> dict[str, str]:
+    file_paths = await list_files(repo_path, head_sha, docs_root_path.strip("/"))
+    md_paths = [file_path for file_path in file_paths if file_path.endswith(".md")]
 
-    if not os.path.isdir(docs_dir):
-        return docs
+    # Docs over the byte cap are skipped rather than loaded whole
+    md_paths, oversized = await split_by_size(
+        repo_path, head_sha, md_paths, settings.MAX_FILE_BYTES
+    )
+    for file_path in oversized:
+        print(f"Skipping {file_path}: over the {settings.MAX_FILE_BYTES} byte limit")
 
-    for root, _dirs, files in os.walk(docs_dir):
-        for fname in files:
-            # Get all .md files
-            if not fname.endswith(".md"):
-                continue
-            abs_path = os.path.join(root, fname)
-            try:
-                with open(abs_path, "r", encoding="utf-8") as f:
-                    docs[abs_path] = f.read()
-            except OSError:
-                continue
-
-    return docs
+    contents = await read_blobs(repo_path, head_sha, md_paths)
+    return {
+        os.path.join(repo_path, file_path): content
+        for file_path, content in contents.items()
+        if content is not None
+    }
 
 
 # Returns a section of content around the first line that mentions the element
@@ -41,8 +45,8 @@ def _extract_snippet(content: str, element: str, context_lines: int = _CONTEXT_L
     return ""
 
 
-# Node searches documentation for references to changed code elements
-def retrieve_docs(state: DriftAnalysisState) -> dict[str, Any]:
+# Node searches documentation at the head commit for references to changed code elements
+async def retrieve_docs(state: DriftAnalysisState) -> dict[str, Any]:
     change_elements: list[dict] = state["change_elements"]
     repo_path: str = state["repo_path"]
     docs_root_path: str = state["docs_root_path"]
@@ -50,8 +54,7 @@ def retrieve_docs(state: DriftAnalysisState) -> dict[str, Any]:
     new_findings: list[dict] = []
     new_payloads: list[dict] = []
 
-    docs_dir = os.path.join(repo_path, docs_root_path.lstrip("/"))
-    doc_files = _load_markdown_files(docs_dir)
+    doc_files = await _load_markdown_files(repo_path, state["head_sha"], docs_root_path)
 
     # For each changed file, search docs for any matching element names
     for i, ce in enumerate(change_elements, 1):
@@ -129,4 +132,5 @@ def retrieve_docs(state: DriftAnalysisState) -> dict[str, Any]:
             }
         )
 
+    await publish_progress(state, "retrieve_docs", len(change_elements), len(change_elements))
     return {"findings": new_findings, "analysis_payloads": new_payloads}
@@ -1,14 +1,36 @@
+import asyncio
+import tempfile
+from collections.abc import Awaitable, Callable
+from contextlib import aclosing
 from pathlib import Path
 from typing import Any
 
+from app.agents.doc_edits import apply_edits
+from app.agents.doc_sections import (
+    DocSection,
+    build_section_index,
+    find_section,
+    get_section_text,
+    merge_overlapping_sections,
+    splice_sections,
+)
 from app.agents.llm import get_llm
-from app.agents.state import DriftAnalysisState
 from app.agents.prompts import (
-    get_rewrite_system_prompt,
-    build_doc_gen_rewrite_prompt,
     DOC_UPDATES_SUMMARY_SYSTEM_PROMPT,
+    build_doc_gen_edit_prompt,
+    build_doc_gen_rewrite_prompt,
+    build_doc_gen_section_rewrite_prompt,
     build_doc_updates_summary_prompt,
+    get_rewrite_system_prompt,
 )
+from app.agents.rewrite_guard import DegenerateOutputError, RewriteStreamValidator
+from app.agents.state import DriftAnalysisState
+from app.core.config import settings
+from app.schemas.llm import DocEditPlan
+from app.services.drift_progress import publish_progress
+
+# Streamed rewrites larger than this are spooled to disk instead of memory
+_STREAM_SPOOL_BYTES = 1024 * 1024
 
 
 # Extracts the text from the LLM response, handling both plain string and list of blocks formats
@@ -20,8 +42,337 @@ def _extract_text(content: Any) -> str:
     return str(content)
 
 
+# Strips markdown code fences if the LLM wrapped the output in them
+def _strip_code_fences(text: str) -> str:
+    if text.startswith("```markdown"):
+        text = text[len("```markdown") :].strip()
+    if text.startswith("```"):
+        text = text[3:].strip()
+    if text.endswith("```"):
+        text = text[:-3].strip()
+    return text
+
+
+# Sends the rewrite prompt to the LLM and returns the cleaned up text
+async def _invoke_rewrite(llm: Any, system_prompt: str, user_prompt: str, original: str) -> str:
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+    if not settings.DOC_REWRITE_STREAMING:
+        result = await llm.ainvoke(messages)
+        text = _extract_text(result.content) if hasattr(result, "content") else str(result)
+        return _strip_code_fences(text)
+
+    # Degenerate output is aborted mid-stream and retried, the last error is raised
+    attempts = max(1, settings.DOC_REWRITE_MAX_ATTEMPTS)
+    for attempt in range(1, attempts + 1):
+        try:
+            return await _stream_rewrite(llm, messages, original)
+        except DegenerateOutputError as exc:
+            print(f"Degenerate rewrite output (attempt {attempt}/{attempts}): {exc}")
+            if attempt == attempts:
+                raise
+    raise DegenerateOutputError("no rewrite attempts were made")
+
+
+# Streams the rewrite into a temp file while validating it, aborts as soon as it degenerates
+async def _stream_rewrite(llm: Any, messages: list[dict], original: str) -> str:
+    validator = RewriteStreamValidator(original)
+    finish_reason = None
+
+    # Spooled so typical docs stay in memory and only very large outputs go to disk
+    with tempfile.SpooledTemporaryFile(max_size=_STREAM_SPOOL_BYTES, mode="w+") as buffer:
+        async with aclosing(llm.astream(messages)) as stream:
+            async for chunk in stream:
+                text = _extract_text(chunk.content) if hasattr(chunk, "content") else str(chunk)
+                buffer.write(text)
+                validator.feed(text)
+
+                metadata = getattr(chunk, "response_metadata", None) or {}
+                finish_reason = metadata.get("finish_reason") or finish_reason
+
+        buffer.seek(0)
+        text = _strip_code_fences(buffer.read().strip())
+
+    validator.finish(text, finish_reason=finish_reason)
+    return text
+
+
+# Maps each planned target onto a section of the doc, returns None if any target can't be located
+def _resolve_target_sections(
+    content: str, targets: list[dict]
+) -> list[tuple[DocSection, list[str]]] | None:
+    index = build_section_index(content)
+    if not index:
+        return None
+
+    located: list[tuple[DocSection, str]] = []
+    for target in targets:
+        section = find_section(index, target.get("section", ""))
+        if section is None:
+            return None
+        located.append((section, target.get("description", "")))
+
+    # Descriptions of nested targets are folded into the enclosing section
+    resolved: list[tuple[DocSection, list[str]]] = []
+    for section in merge_overlapping_sections([s for s, _ in located]):
+        descriptions = [desc for s, desc in located if section.contains(s)]
+        resolved.append((section, descriptions))
+    return resolved
+
+
+# Rewrites only the targeted sections and splices them back into the original content
+async def _rewrite_sections(
+    llm: Any,
+    system_prompt: str,
+    doc_path: str,
+    current_content: str,
+    sections: list[tuple[DocSection, list[str]]],
+) -> str:
+    replacements: list[tuple[DocSection, str]] = []
+    for section, descriptions in sections:
+        section_text = get_section_text(current_content, section)
+        user_prompt = build_doc_gen_section_rewrite_prompt(
+            doc_path=doc_path,
+            section_path=" > ".join(section.path),
+            section_content=section_text.rstrip("\n"),
+            change_descriptions=descriptions,
+        )
+        new_section = await _invoke_rewrite(llm, system_prompt, user_prompt, section_text)
+
+        # Keep the original heading if the LLM dropped it so the document structure is preserved
+        if not new_section.lstrip().startswith("#"):
+            heading_line = section_text.splitlines()[0]
+            new_section = f"{heading_line}\n{new_section}"
+
+        replacements.append((section, new_section))
+
+    return splice_sections(current_content, replacements)
+
+
+# Asks the LLM for a list of edits to a region of the doc and applies them locally
+async def _edit_region(
+    llm: Any,
+    edit_system_prompt: str,
+    doc_path: str,
+    region_text: str,
+    descriptions: list[str],
+    section_path: str | None = None,
+) -> str:
+    user_prompt = build_doc_gen_edit_prompt(
+        doc_path=doc_path,
+        current_content=region_text,
+        change_descriptions=descriptions,
+        section_path=section_path,
+    )
+    structured_llm = llm.with_structured_output(DocEditPlan)
+    plan = await structured_llm.ainvoke(
+        [
+            {"role": "system", "content": edit_system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+    )
+    return apply_edits(region_text, [edit.model_dump() for edit in plan.edits])
+
+
+# Edits the planned sections (or the whole file), returns None if any edit can't be applied
+async def _edit_doc(
+    llm: Any,
+    edit_system_prompt: str,
+    doc_path: str,
+    current_content: str,
+    targets: list[dict],
+    sections: list[tuple[DocSection, list[str]]] | None,
+) -> str | None:
+    try:
+        if not sections:
+            return await _edit_region(
+                llm,
+                edit_system_prompt,
+                doc_path,
+                current_content,
+                [t.get("description", "") for t in targets],
+            )
+
+        replacements: list[tuple[DocSection, str]] = []
+        for section, descriptions in sections:
+            new_section = await _edit_region(
+                llm,
+                edit_system_prompt,
+                doc_path,
+                get_section_text(current_content, section),
+                descriptions,
+                section_path=" > ".join(section.path),
+            )
+            replacements.append((section, new_section))
+        return splice_sections(current_content, replacements)
+    except Exception as exc:
+        print(f"Edits could not be applied to {doc_path}, falling back to a full rewrite: {exc}")
+        return None
+
+
+# Rewrites a single doc file, returns None if the file can't be read
+async def _rewrite_doc(
+    llm: Any,
+    system_prompt: str,
+    repo_path: str,
+    doc_path: str,
+    targets: list[dict],
+    edit_system_prompt: str | None = None,
+) -> dict | None:
+    full_path = Path(repo_path) / doc_path
+
+    # Ensure the path is within the repo
+    try:
+        resolved = full_path.resolve()
+        repo_resolved = Path(repo_path).resolve()
+        if not str(resolved).startswith(str(repo_resolved)):
+            print(f"Path traversal blocked for {doc_path}")
+            return None
+    except Exception:
+        print(f"Could not resolve path {doc_path}")
+        return None
+
+    if not full_path.exists():
+        print(f"Doc file not found: {full_path}")
+        return None
+
+    try:
+        current_content = full_path.read_text(encoding="utf-8")
+    except Exception as exc:
+        print(f"Error reading {full_path}: {exc}")
+        return None
+
+    # Rewrite only the planned sections when all of them can be located in the file
+    sections = _resolve_target_sections(current_content, targets)
+
+    # In edit mode the LLM only returns the edits, the full rewrite is kept as the fallback
+    if edit_system_prompt:
+        new_content = await _edit_doc(
+            llm, edit_system_prompt, doc_path, current_content, targets, sections
+        )
+        if new_content is not None:
+            return {"doc_path": doc_path, "new_content": new_content}
+
+    if sections:
+        new_content = await _rewrite_sections(
+            llm, system_prompt, doc_path, current_content, sections
+        )
+    else:
+        user_prompt = build_doc_gen_rewrite_prompt(
+            doc_path=doc_path,
+            current_content=current_content,
+            change_descriptions=[t.get("description", "") for t in targets],
+        )
+        new_content = await _invoke_rewrite(llm, system_prompt, user_prompt, current_content)
+
+    return {"doc_path": doc_path, "new_content": new_content}
+
+
+# Rewrites all doc files concurrently, failed or timed out files are skipped.
+# on_progress is awaited with the number of files done so far as each one finishes
+async def _rewrite_all_docs(
+    llm: Any,
+    system_prompt: str,
+    repo_path: str,
+    grouped: dict[str, list[dict]],
+    edit_system_prompt: str | None = None,
+    on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+) -> list[dict]:
+    semaphore = asyncio.Semaphore(max(1, settings.DOC_REWRITE_CONCURRENCY))
+    done = 0
+
+    async def _bounded_rewrite(doc_path: str, targets: list[dict]) -> dict | None:
+        nonlocal done
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    _rewrite_doc(
+                        llm, system_prompt, repo_path, doc_path, targets, edit_system_prompt
+                    ),
+                    timeout=settings.DOC_REWRITE_TIMEOUT_SECONDS,
+                )
+            except TimeoutError:
+                print(f"LLM timeout rewriting {doc_path}")
+                return None
+            except Exception as exc:
+                print(f"LLM error rewriting {doc_path}: {exc}")
+                return None
+            finally:
+                done += 1
+                if on_progress:
+                    await on_progress(done, len(grouped))
+
+    # gather keeps the results in the same order as the planned files
+    results = await asyncio.gather(
+        *(_bounded_rewrite(doc_path, targets) for doc_path, targets in grouped.items())
+    )
+    return [r for r in results if r]
+
+
+# Builds the updates summary from the planned change descriptions without an LLM call
+def _build_local_summary(rewrite_results: list[dict], grouped: dict[str, list[dict]]) -> str:
+    lines = []
+    for r in rewrite_results:
+        descriptions = [t.get("description", "") for t in grouped.get(r["doc_path"], [])]
+        summary = "; ".join(d.strip().rstrip(".") for d in descriptions if d.strip())
+        lines.append(f"- `{r['doc_path']}` - {summary or 'documentation updated'}")
+    return "\n".join(lines)
+
+
+# Summarises the per-file updates with the LLM, falls back to the local summary on error
+async def _summarise_updates(rewrite_results: list[dict], grouped: dict[str, list[dict]]) -> str:
+    if not settings.DOC_UPDATES_SUMMARY_USE_LLM:
+        return _build_local_summary(rewrite_results, grouped)
+
+    file_changes = [
+        {
+            "doc_path": r["doc_path"],
+            "descriptions": [t.get("description", "") for t in grouped[r["doc_path"]]]
+            or ["documentation updated"],
+        }
+        for r in rewrite_results
+    ]
+    summary_prompt = build_doc_updates_summary_prompt(file_changes)
+    try:
+        summary_llm = get_llm(temperature=0.1)
+        summary_result = await summary_llm.ainvoke(
+            [
+                {"role": "system", "content": DOC_UPDATES_SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": summary_prompt},
+            ]
+        )
+        return (
+            _extract_text(summary_result.content)
+            if hasattr(summary_result, "content")
+            else str(summary_result)
+        ).strip()
+    except Exception as exc:
+        print(f"rewrite_docs: summary LLM error: {exc}")
+        return _build_local_summary(rewrite_results, grouped)
+
+
+# Runs the rewrites and builds a short summary of what changes were made
+async def _rewrite_and_summarise(
+    llm: Any,
+    system_prompt: str,
+    repo_path: str,
+    grouped: dict[str, list[dict]],
+    edit_system_prompt: str | None = None,
+    on_progress: Callable[[int, int], Awaitable[None]] | None = None,
+) -> tuple[list[dict], str]:
+    rewrite_results = await _rewrite_all_docs(
+        llm, system_prompt, repo_path, grouped, edit_system_prompt, on_progress
+    )
+    if not rewrite_results:
+        return rewrite_results, ""
+    return rewrite_results, await _summarise_updates(rewrite_results, grouped)
+
+
 # Node rewrites each target doc file using the LLM
-def rewrite_docs(state: DriftAnalysisState) -> dict[str, Any]:
+async def rewrite_docs(state: DriftAnalysisState) -> dict[str, Any]:
     target_files: list[dict] = state["target_files"]
     repo_path: str = state["repo_path"]
     style_preference: str = state.get("style_preference", "professional")
@@ -32,107 +383,24 @@ def rewrite_docs(state: DriftAnalysisState) -> dict[str, Any]:
 
     # Initialise Gemini for rewriting
     llm = get_llm(temperature=0.2)
-
-    rewrite_results: list[dict] = []
+    system_prompt = get_rewrite_system_prompt(style_preference, docs_policies)
+    edit_system_prompt = (
+        get_rewrite_system_prompt(style_preference, docs_policies, edit_mode=True)
+        if settings.DOC_REWRITE_MODE == "edit"
+        else None
+    )
 
     # Group targets by doc_path so each file is rewritten once with all its changes
-    grouped: dict[str, list[str]] = {}
+    grouped: dict[str, list[dict]] = {}
     for target in target_files:
-        doc_path = target["doc_path"]
-        description = target.get("description", "")
-        grouped.setdefault(doc_path, []).append(description)
+        grouped.setdefault(target["doc_path"], []).append(target)
 
-    for doc_path, change_descriptions in grouped.items():
-        # Read the current file content
-        full_path = Path(repo_path) / doc_path
+    # Each rewritten file is pushed to the live streams of the drift event
+    async def _on_progress(done: int, total: int) -> None:
+        await publish_progress(state, "rewrite_docs", done, total)
 
-        # Ensure the path is within the repo
-        try:
-            resolved = full_path.resolve()
-            repo_resolved = Path(repo_path).resolve()
-            if not str(resolved).startswith(str(repo_resolved)):
-                print(f"Path traversal blocked for {doc_path}")
-                continue
-        except Exception:
-            print(f"Could not resolve path {doc_path}")
-            continue
-
-        if not full_path.exists():
-            print(f"Doc file not found: {full_path}")
-            continue
-
-        try:
-            current_content = full_path.read_text(encoding="utf-8")
-        except Exception as exc:
-            print(f"Error reading {full_path}: {exc}")
-            continue
-
-        user_prompt = build_doc_gen_rewrite_prompt(
-            doc_path=doc_path,
-            current_content=current_content,
-            change_descriptions=change_descriptions,
-        )
-
-        try:
-            result = llm.invoke(
-                [
-                    {
-                        "role": "system",
-                        "content": get_rewrite_system_prompt(style_preference, docs_policies),
-                    },
-                    {"role": "user", "content": user_prompt},
-                ]
-            )
-            new_content: str = (
-                _extract_text(result.content) if hasattr(result, "content") else str(result)
-            )
-
-            # Strip markdown code fences if the LLM wrapped the output
-            if new_content.startswith("```markdown"):
-                new_content = new_content[len("```markdown") :].strip()
-            if new_content.startswith("```"):
-                new_content = new_content[3:].strip()
-            if new_content.endswith("```"):
-                new_content = new_content[:-3].strip()
-
-            rewrite_results.append(
-                {
-                    "doc_path": doc_path,
-                    "new_content": new_content,
-                }
-            )
-        except Exception as exc:
-            print(f"LLM error rewriting {doc_path}: {exc}")
-            continue
-
-    # Build a simple summary of what changes were made
-    doc_updates_summary = ""
-    if rewrite_results:
-        file_changes = [
-            {
-                "doc_path": doc_path,
-                "descriptions": grouped.get(doc_path, ["documentation updated"]),
-            }
-            for doc_path in (r["doc_path"] for r in rewrite_results)
-        ]
-        summary_prompt = build_doc_updates_summary_prompt(file_changes)
-        try:
-            summary_llm = get_llm(temperature=0.1)
-            summary_result = summary_llm.invoke(
-                [
-                    {"role": "system", "content": DOC_UPDATES_SUMMARY_SYSTEM_PROMPT},
-                    {"role": "user", "content": summary_prompt},
-                ]
-            )
-            doc_updates_summary = (
-                _extract_text(summary_result.content)
-                if hasattr(summary_result, "content")
-                else str(summary_result)
-            ).strip()
-        except Exception as exc:
-            print(f"rewrite_docs: summary LLM error: {exc}")
-            doc_updates_summary = "\n".join(
-                f"- `{r['doc_path']}` - documentation updated" for r in rewrite_results
-            )
+    rewrite_results, doc_updates_summary = await _rewrite_and_summarise(
+        llm, system_prompt, repo_path, grouped, edit_system_prompt, _on_progress
+    )
 
     return {"rewrite_results": rewrite_results, "doc_updates_summary": doc_updates_summary}
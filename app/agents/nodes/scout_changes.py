@@ -1,10 +1,15 @@
-import os
 import ast
-import subprocess
+import asyncio
+import re
 from typing import Any
 
-from app.db.base import CodeChange
 from app.agents.state import DriftAnalysisState
+from app.core.config import settings
+from app.services.drift_progress import publish_progress
+from app.services.git_service import merge_base, read_blobs, split_by_size
+
+# Matches a top level class or function definition in a diff line stripped of its +/-/space prefix
+_TOP_LEVEL_DEFINITION = re.compile(r"^(?:async\s+def|def|class)\s+(\w+)")
 
 
 # Fetch route path strings from FastAPI/Flask style decorator arguments
@@ -56,99 +61,135 @@ def _extract_elements_from_source(source: str, filename: str = "<string>") -> li
     return elements
 
 
-# Retrieves the content of a file at a specific git commit
-def _get_git_file_content(repo_path: str, commit_sha: str, file_path: str) -> str | None:
-    try:
-        # Use git show at the specified commit sha
-        result = subprocess.run(
-            ["git", "-C", repo_path, "show", f"{commit_sha}:{file_path}"],
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
-        if result.returncode != 0:
-            return None
-        return result.stdout
-    except (subprocess.TimeoutExpired, OSError):
-        return None
-
-
-# Node queries changed Python files (MVP supports only Python) and extracts their code elements
-def scout_changes(state: DriftAnalysisState) -> dict[str, Any]:
-    session = state["session"]
-    drift_event_id = state["drift_event_id"]
+# Extracts the current and previous code elements of one changed file from its two sources
+def _scout_change(change: dict, new_source: str | None, old_source: str | None) -> dict:
+    file_path = change["file_path"]
+    change_type = change["change_type"]
+    elements: list[str] = []
+    old_elements: list[str] = []
+
+    # For deleted files, reading elements only from the base commit
+    if change_type != "deleted":
+        if new_source is None:
+            print(f"File read error: {file_path} not found at the head commit")
+            return {
+                "file_path": file_path,
+                "change_type": change_type,
+                "elements": elements,
+                "old_elements": old_elements,
+            }
+        elements = _extract_elements_from_source(new_source, file_path)
+
+    # For modified and deleted files, extract the elements at the base commit
+    if change_type in ("modified", "deleted") and old_source:
+        old_elements = _extract_elements_from_source(old_source, file_path)
+
+    return {
+        "file_path": file_path,
+        "change_type": change_type,
+        "elements": elements,
+        "old_elements": old_elements,
+    }
+
+
+# Extracts the code elements of a file too large to parse from its diff alone: definitions on added,
+# removed and context lines, and the enclosing definitions git names in the hunk headers
+def _scout_change_from_diff(change: dict, file_diff: dict | None) -> dict:
+    elements: list[str] = []
+    old_elements: list[str] = []
+
+    in_hunks = False
+    for line in ((file_diff or {}).get("patch") or "").split("\n"):
+        if line.startswith("@@"):
+            in_hunks = True
+            match = _TOP_LEVEL_DEFINITION.match(line.split("@@", 2)[-1].strip())
+            sides = "+-"
+        elif in_hunks:
+            # Context lines are on both sides, added ones only in the head, removed ones in the base
+            match = _TOP_LEVEL_DEFINITION.match(line[1:])
+            sides = "+-" if line[:1] == " " else line[:1]
+        else:
+            # Skip the file header before the first hunk
+            continue
+
+        if not match:
+            continue
+        if "+" in sides and match.group(1) not in elements:
+            elements.append(match.group(1))
+        if "-" in sides and match.group(1) not in old_elements:
+            old_elements.append(match.group(1))
+
+    return {
+        "file_path": change["file_path"],
+        "change_type": change["change_type"],
+        "elements": elements if change["change_type"] != "deleted" else [],
+        "old_elements": old_elements if change["change_type"] != "added" else [],
+    }
+
+
+# Checks whether a source read within the byte cap still has too many lines to parse
+def _over_line_cap(source: str | None) -> bool:
+    return source is not None and source.count("\n") > settings.MAX_FILE_LINES
+
+
+# Node picks the changed Python files (MVP supports only Python) and extracts their code elements.
+# Sources are read from the base and head commits, so it doesn't matter what is checked out
+async def scout_changes(state: DriftAnalysisState) -> dict[str, Any]:
     repo_path = state["repo_path"]
     base_sha = state["base_sha"]
+    head_sha = state["head_sha"]
 
     # Only consider changed files flagged as code and not ignored
-    code_changes = (
-        session.query(CodeChange)
-        .filter(
-            CodeChange.drift_event_id == drift_event_id,
-            CodeChange.is_code.is_(True),
-            CodeChange.is_ignored.is_(False),
-        )
-        .all()
-    )
+    code_changes = [cc for cc in state["code_changes"] if cc["is_code"] and not cc["is_ignored"]]
 
     # Check only Python files for AST based element extraction
-    py_changes = [cc for cc in code_changes if cc.file_path.endswith(".py")]
-
-    change_elements: list[dict] = []
-
-    # Extract current and previous code elements for each changed file
-    for i, change in enumerate(py_changes, 1):
-        elements: list[str] = []
-        old_elements: list[str] = []
-
-        # For deleted files, reading elements only from the base commit
-        if change.change_type == "deleted":
-            old_source = _get_git_file_content(repo_path, base_sha, change.file_path)
-            if old_source:
-                old_elements = _extract_elements_from_source(old_source, change.file_path)
-
-            change_elements.append(
-                {
-                    "file_path": change.file_path,
-                    "change_type": change.change_type,
-                    "elements": elements,
-                    "old_elements": old_elements,
-                }
-            )
-            continue
+    py_changes = [cc for cc in code_changes if cc["file_path"].endswith(".py")]
+
+    # The diff is three-dot, so the old side of a change is read where the PR branched off base
+    old_sha = await merge_base(repo_path, base_sha, head_sha) or base_sha
+
+    # A renamed file is read at its old path in the base commit
+    file_diffs: dict[str, dict] = state["file_diffs"]
+    old_paths = {
+        cc["file_path"]: (file_diffs.get(cc["file_path"], {}).get("old_path") or cc["file_path"])
+        for cc in py_changes
+    }
+
+    # Read every changed file at both commits, one batch per commit
+    new_paths = [cc["file_path"] for cc in py_changes if cc["change_type"] != "deleted"]
+    base_paths = [
+        old_paths[cc["file_path"]]
+        for cc in py_changes
+        if cc["change_type"] in ("modified", "deleted")
+    ]
+    # Sizes are probed first, so a huge generated file is never loaded into the worker
+    (new_within, new_over), (base_within, base_over) = await asyncio.gather(
+        split_by_size(repo_path, head_sha, new_paths, settings.MAX_FILE_BYTES),
+        split_by_size(repo_path, old_sha, base_paths, settings.MAX_FILE_BYTES),
+    )
+    new_sources, old_sources = await asyncio.gather(
+        read_blobs(repo_path, head_sha, new_within),
+        read_blobs(repo_path, old_sha, base_within),
+    )
 
-        abs_path = os.path.join(repo_path, change.file_path)
-        # Read the source file content
-        try:
-            with open(abs_path, "r", encoding="utf-8") as f:
-                source = f.read()
-        except (FileNotFoundError, OSError) as exc:
-            print(f"File read error: {exc}")
-            change_elements.append(
-                {
-                    "file_path": change.file_path,
-                    "change_type": change.change_type,
-                    "elements": elements,
-                    "old_elements": old_elements,
-                }
-            )
+    change_elements = []
+    for change in py_changes:
+        file_path = change["file_path"]
+        new_source = new_sources.get(file_path)
+        old_source = old_sources.get(old_paths[file_path])
+
+        # Over limit files take the summarised path and are scouted from their diff
+        if (
+            file_path in new_over
+            or old_paths[file_path] in base_over
+            or _over_line_cap(new_source)
+            or _over_line_cap(old_source)
+        ):
+            print(f"Scouting {file_path} from its diff, the file is over the size limits")
+            change_elements.append(_scout_change_from_diff(change, file_diffs.get(file_path)))
             continue
 
-        elements = _extract_elements_from_source(source, change.file_path)
-
-        # For modified files, extract old elements along with new elements
-        if change.change_type == "modified":
-            old_source = _get_git_file_content(repo_path, base_sha, change.file_path)
-            if old_source:
-                old_elements = _extract_elements_from_source(old_source, change.file_path)
-
-        change_elements.append(
-            {
-                "file_path": change.file_path,
-                "change_type": change.change_type,
-                "elements": elements,
-                "old_elements": old_elements,
-            }
-        )
+        change_elements.append(_scout_change(change, new_source, old_source))
 
+    await publish_progress(state, "scout_changes", len(change_elements), len(py_changes))
     return {"change_elements": change_elements}
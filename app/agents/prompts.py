@@ -14,7 +14,8 @@ DOC_GEN_PLAN_SYSTEM_PROMPT = (
     "(each describing a discrepancy between code and documentation), produce a "
     "structured plan that maps each finding to the specific markdown file and "
     "section that needs to be updated. For each entry output: doc_path (the "
-    "relative path to the .md file), section (heading or area to update), "
+    "relative path to the .md file), section (the exact heading text of the "
+    "section to update, written as 'Parent > Child' for nested headings), "
     "action (one of 'update', 'add', 'remove'), and a brief description of "
     "the required change."
 )
@@ -29,39 +30,63 @@ _REWRITE_COMMON_RULES = (
     "the new code. DO NOT add new sections or duplicate content. "
     "If the drift is about MISSING documentation, add a concise new section "
     "in the most appropriate location within the existing document structure. "
-    "Return the complete updated file content as a single markdown string "
+    "Return the complete updated content you were given (the whole file, or the "
+    "whole section when only one section is provided) as a single markdown string "
     "with ONLY the necessary edits applied."
 )
 
-# System prompts for different writing styles
-DOC_GEN_REWRITE_PROMPTS: dict[str, str] = {
+# Common system prompt that instructs LLM to return a list of edits instead of the whole file
+_EDIT_COMMON_RULES = (
+    "You will receive the current contents of a markdown documentation file (or a single "
+    "section of it) with numbered lines, along with a description of code changes that "
+    "caused documentation drift. Do NOT return the document. Instead return a list of "
+    "edits that, applied to the content, bring it in line with the code changes. "
+    "For each edit either set old_text to a passage copied EXACTLY from the content "
+    "(without the line numbers, long enough to occur only once) and new_text to its "
+    "replacement, or leave old_text empty and set start_line and end_line (inclusive) to "
+    "the numbered lines that new_text replaces. To add content, use the passage it should "
+    "follow as old_text and repeat that passage at the start of new_text. "
+    "Keep every edit as small as possible and never let two edits overlap."
+)
+
+# Opening sentences for the different writing styles, shared by the rewrite and edit prompts
+_STYLE_INTROS: dict[str, str] = {
     "concise": (
         "You are a technical writer who values brevity above all else. "
         "Keep sentences short and direct. Use bullet points over paragraphs. "
         "Remove filler words. Every sentence must convey essential information. "
-        + _REWRITE_COMMON_RULES
     ),
     "descriptive": (
         "You are a thorough technical writer who provides rich detail. "
         "Explain the WHY behind changes, include usage examples where helpful, "
         "and provide context so readers fully understand the impact. "
-        "Use clear paragraphs with supporting details. " + _REWRITE_COMMON_RULES
+        "Use clear paragraphs with supporting details. "
     ),
     "professional": (
         "You are an expert technical writer with a formal, polished tone. "
         "Use precise language, proper terminology, and a structured format. "
         "Write in third person, avoid colloquialisms, and maintain a "
-        "consistent authoritative voice throughout. " + _REWRITE_COMMON_RULES
+        "consistent authoritative voice throughout. "
     ),
     "technical": (
         "You are a developer writing docs for other developers. "
         "Focus on code-level details: function signatures, parameter types, "
         "return values, endpoint paths, and configuration keys. "
         "Use inline code formatting liberally. Skip high-level prose - "
-        "readers want exact specifications, not overviews. " + _REWRITE_COMMON_RULES
+        "readers want exact specifications, not overviews. "
     ),
 }
 
+# System prompts for different writing styles
+DOC_GEN_REWRITE_PROMPTS: dict[str, str] = {
+    style: intro + _REWRITE_COMMON_RULES for style, intro in _STYLE_INTROS.items()
+}
+
+# System prompts for different writing styles when the LLM returns edits
+DOC_GEN_EDIT_PROMPTS: dict[str, str] = {
+    style: intro + _EDIT_COMMON_RULES for style, intro in _STYLE_INTROS.items()
+}
+
 # By default returns with professional style
 DOC_GEN_REWRITE_SYSTEM_PROMPT = DOC_GEN_REWRITE_PROMPTS["professional"]
 
@@ -96,13 +121,15 @@ def build_deep_analyze_user_prompt(
     )
 
 
-# Returns the rewrite system prompt for the given style and appends user doc policies if set
+# Returns the rewrite (or edit) system prompt for the style and appends user doc policies if set
 def get_rewrite_system_prompt(
     style_preference: str | None,
     docs_policies: str | None = None,
+    edit_mode: bool = False,
 ) -> str:
+    prompts = DOC_GEN_EDIT_PROMPTS if edit_mode else DOC_GEN_REWRITE_PROMPTS
     key = (style_preference or "professional").lower().strip()
-    base_prompt = DOC_GEN_REWRITE_PROMPTS.get(key, DOC_GEN_REWRITE_PROMPTS["professional"])
+    base_prompt = prompts.get(key, prompts["professional"])
     if not docs_policies:
         return base_prompt
     return (
@@ -131,6 +158,51 @@ def build_doc_gen_rewrite_prompt(
     )
 
 
+# Builds the user prompt for rewriting a single planned section of a doc
+def build_doc_gen_section_rewrite_prompt(
+    doc_path: str,
+    section_path: str,
+    section_content: str,
+    change_descriptions: list[str],
+) -> str:
+    changes_block = "\n".join(f"- {desc}" for desc in change_descriptions)
+    return (
+        f"## Section to Update\n"
+        f"**File:** `{doc_path}`\n"
+        f"**Section:** {section_path}\n\n"
+        f"### Current Section Content\n```markdown\n{section_content}\n```\n\n"
+        f"### Required Changes\n{changes_block}\n\n"
+        f"Rewrite ONLY the section above to accurately reflect these code changes. "
+        f"Edit the existing text in-place - do NOT append new sections or duplicate content. "
+        f"Keep the section heading line unchanged. "
+        f"Return the full updated section, starting with its heading line, and nothing else."
+    )
+
+
+# Builds the user prompt for the edit mode of rewrite_docs, with line numbers on the content
+def build_doc_gen_edit_prompt(
+    doc_path: str,
+    current_content: str,
+    change_descriptions: list[str],
+    section_path: str | None = None,
+) -> str:
+    changes_block = "\n".join(f"- {desc}" for desc in change_descriptions)
+    numbered = "\n".join(
+        f"{number}| {line}" for number, line in enumerate(current_content.splitlines(), 1)
+    )
+    section_line = f"**Section:** {section_path}\n" if section_path else ""
+    return (
+        f"## Document to Update\n"
+        f"**File:** `{doc_path}`\n"
+        f"{section_line}\n"
+        f"### Current Content (numbered lines)\n```markdown\n{numbered}\n```\n\n"
+        f"### Required Changes\n{changes_block}\n\n"
+        f"Return the list of edits needed to make the content above accurately reflect "
+        f"these code changes. Copy old_text exactly, without the line number prefixes. "
+        f"Do NOT return the full content."
+    )
+
+
 # Builds the user prompt for the doc updates summary node, including list of changed files and change desc
 def build_doc_updates_summary_prompt(file_changes: list[dict]) -> str:
     lines = []
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from langchain_core.rate_limiters import BaseRateLimiter
+from redis import Redis
+from redis.exceptions import RedisError
+
+# Refills the bucket based on the time since the last request and takes a token if one is free.
+# Returns 0 when a token was taken, otherwise the milliseconds until the next token is available.
+# Uses the Redis server clock so every worker process sees the same time.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call("TIME")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) / rate * 1000)
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 60)
+return wait_ms
+"""
+
+# Upper bound on a single sleep so a waiting caller re-checks the bucket regularly
+_MAX_SLEEP_SECONDS = 1.0
+
+
+# Token bucket rate limiter shared by every worker process through Redis
+class RedisTokenBucketRateLimiter(BaseRateLimiter):
+    def __init__(
+        self,
+        redis_client: Redis,
+        key: str,
+        requests_per_minute: int,
+        burst: int | None = None,
+    ):
+        self.key = key
+        self.rate = requests_per_minute / 60
+        self.capacity = burst or max(1, requests_per_minute // 6)
+        self._script = redis_client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    # Tries to take a token, returns the seconds to wait before trying again (0 if acquired)
+    def _try_acquire(self) -> float:
+        try:
+            wait_ms = self._script(keys=[self.key], args=[self.rate, self.capacity])
+        except RedisError as exc:
+            # Fail open, the API's own 429s and the call retries still protect the quota
+            print(f"Rate limiter unavailable, continuing without it: {exc}")
+            return 0
+        return int(wait_ms) / 1000
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                return True
+            if not blocking:
+                return False
+            time.sleep(min(wait, _MAX_SLEEP_SECONDS))
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire)
+            if wait <= 0:
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(min(wait, _MAX_SLEEP_SECONDS))
@@ -0,0 +1,146 @@
+import re
+
+from app.agents.doc_sections import build_section_index
+
+# Streamed output may grow to this multiple of the original (plus some slack for added sections)
+_MAX_SIZE_RATIO = 3.0
+_SIZE_SLACK_CHARS = 2000
+
+# Final output smaller than this fraction of a non-trivial original is treated as truncated
+_MIN_SIZE_RATIO = 0.5
+_MIN_CHECKED_LENGTH = 800
+
+# Same non-blank line repeated this many times in a row is treated as a generation loop
+_MAX_REPEATED_LINES = 8
+
+# A block of 20-200 chars repeated 5+ times back to back at the end of the stream is a loop
+_REPEATED_BLOCK_RE = re.compile(r"(.{20,200}?)\1{4,}$", re.DOTALL)
+_TAIL_WINDOW_CHARS = 2000
+_TAIL_CHECK_INTERVAL_CHARS = 256
+
+# Share of the original headings that may disappear (planned removals drop whole sections)
+_MAX_DROPPED_HEADING_RATIO = 0.2
+
+# Finish reasons reported by the model when it stopped because of the output token limit
+_TRUNCATED_FINISH_REASONS = {"MAX_TOKENS", "length"}
+
+
+# Raised when a rewrite is degenerate (looping, runaway, truncated or structurally broken)
+class DegenerateOutputError(Exception):
+    pass
+
+
+# Returns the heading titles of a markdown document in order
+def _heading_titles(content: str) -> list[str]:
+    return [section.title.strip().lower() for section in build_section_index(content)]
+
+
+# Validates a streamed rewrite chunk by chunk so broken output can be aborted early
+class RewriteStreamValidator:
+    def __init__(self, original: str):
+        self.original = original
+        self.original_headings = _heading_titles(original)
+        self.max_length = int(len(original) * _MAX_SIZE_RATIO) + _SIZE_SLACK_CHARS
+        self.max_dropped_headings = max(
+            1, int(len(self.original_headings) * _MAX_DROPPED_HEADING_RATIO)
+        )
+
+        self.length = 0
+        self.tail = ""
+        self.unchecked_chars = 0
+        self.in_fence = False
+        self.first_line_seen = False
+        self.partial_line = ""
+        self.last_line: str | None = None
+        self.repeat_count = 0
+        self.seen_headings: set[str] = set()
+
+    # Checks the output received so far, raises DegenerateOutputError on the first problem found
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+
+        self.length += len(chunk)
+        if self.length > self.max_length:
+            raise DegenerateOutputError(
+                f"output grew to {self.length} chars for a {len(self.original)} char original"
+            )
+
+        # The tail regex is relatively costly so it only runs every few hundred chars
+        self.tail = (self.tail + chunk)[-_TAIL_WINDOW_CHARS:]
+        self.unchecked_chars += len(chunk)
+        if self.unchecked_chars >= _TAIL_CHECK_INTERVAL_CHARS:
+            self.unchecked_chars = 0
+            if _REPEATED_BLOCK_RE.search(self.tail):
+                raise DegenerateOutputError("output is repeating the same block")
+
+        # Only complete lines are checked, the last partial line waits for the next chunk
+        lines = (self.partial_line + chunk).split("\n")
+        self.partial_line = lines.pop()
+        for line in lines:
+            self._check_line(line)
+
+    # Runs the checks that need the complete output (truncation and heading preservation)
+    def finish(self, output: str, finish_reason: str | None = None) -> None:
+        if self.partial_line:
+            self._check_line(self.partial_line)
+            self.partial_line = ""
+
+        if finish_reason in _TRUNCATED_FINISH_REASONS:
+            raise DegenerateOutputError(f"output stopped early ({finish_reason})")
+
+        if not output.strip():
+            raise DegenerateOutputError("output is empty")
+
+        if (
+            len(self.original) >= _MIN_CHECKED_LENGTH
+            and len(output) < len(self.original) * _MIN_SIZE_RATIO
+        ):
+            raise DegenerateOutputError(
+                f"output is {len(output)} chars for a {len(self.original)} char original"
+            )
+
+        # An odd number of fence lines means the output was cut off inside a code block
+        fence_lines = [line for line in output.splitlines() if line.lstrip().startswith("```")]
+        if len(fence_lines) % 2 != 0:
+            raise DegenerateOutputError("output ends inside an unclosed code block")
+
+        output_headings = set(_heading_titles(output))
+        dropped = [h for h in self.original_headings if h not in output_headings]
+        if len(dropped) > self.max_dropped_headings:
+            raise DegenerateOutputError(f"output dropped headings {dropped}")
+
+    # Tracks consecutive repeated lines and headings skipped over while streaming
+    def _check_line(self, line: str) -> None:
+        stripped = line.strip()
+        if not stripped:
+            return
+
+        if stripped == self.last_line:
+            self.repeat_count += 1
+            if self.repeat_count >= _MAX_REPEATED_LINES:
+                raise DegenerateOutputError(f"line repeated {self.repeat_count} times: {stripped}")
+        else:
+            self.last_line = stripped
+            self.repeat_count = 1
+
+        # A fence on the very first line is the LLM wrapping the whole output, not a code block
+        is_first_line = not self.first_line_seen
+        self.first_line_seen = True
+        if stripped.startswith(("```", "~~~")):
+            if not is_first_line:
+                self.in_fence = not self.in_fence
+            return
+
+        if self.in_fence or not stripped.startswith("#"):
+            return
+
+        title = stripped.lstrip("#").strip().rstrip("#").strip().lower()
+        self.seen_headings.add(title)
+
+        # Once a later original heading shows up, any earlier original heading not seen is dropped
+        if title in self.original_headings:
+            position = self.original_headings.index(title)
+            dropped = [h for h in self.original_headings[:position] if h not in self.seen_headings]
+            if len(dropped) > self.max_dropped_headings:
+                raise DegenerateOutputError(f"output skipped headings {dropped}")
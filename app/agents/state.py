@@ -1,5 +1,5 @@
 import operator
-from typing import Annotated, Any, NotRequired, TypedDict
+from typing import Annotated, NotRequired, TypedDict
 
 
 # Shared state passed between each node of the workflow
@@ -7,15 +7,32 @@ class DriftAnalysisState(TypedDict):
     drift_event_id: str
     base_sha: str
     head_sha: str
-    session: Any
     repo_path: str
     docs_root_path: str
+
+    # Snapshot of the drift event loaded before the run, nodes never query the DB
+    repo_id: str
+    repo_full_name: str
+    installation_id: int
+    head_branch: str
+    pr_number: int
+    check_run_id: int | None
+    reviewer: str | None
+    user_id: str | None
+    code_changes: list[dict]
+    # ISO creation time of the drift event, keeps its writes to the partition of its month
+    drift_event_created_at: str
+
+    # The PR's base...head diff parsed per file before the run, keyed by the file's new path
+    file_diffs: dict[str, dict]
+
     change_elements: list[dict]
     analysis_payloads: list[dict]
 
     findings: Annotated[list[dict], operator.add]
     target_files: list[dict]
     rewrite_results: list[dict]
+    drift_summary: NotRequired[str]
     doc_updates_summary: NotRequired[str]
     style_preference: str
     docs_policies: NotRequired[str]
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from app.routers import auth, webhooks, repos, dashboard, notifications
+
+from app.routers import admin, auth, dashboard, notifications, repos, webhooks
 
 # Main router
 api_router = APIRouter()
@@ -10,3 +11,4 @@ api_router.include_router(webhooks.router, prefix="/webhook", tags=["Webhooks"])
 api_router.include_router(repos.router, prefix="/repos", tags=["Repositories"])
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
 api_router.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
+api_router.include_router(admin.router, prefix="/admin", tags=["Admin"])
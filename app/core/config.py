@@ -33,11 +33,94 @@ class Settings(BaseSettings):
     # LLM Config
     GEMINI_API_KEY: str
     LLM_MODEL: str
+    LLM_REQUESTS_PER_MINUTE: int = 60
+    LLM_MAX_RETRIES: int = 6
+
+    # Deep analysis config
+    DEEP_ANALYZE_CONCURRENCY: int = 4
+
+    # File size limits config, larger files and diffs take a summarised path
+    MAX_FILE_BYTES: int = 1024 * 1024
+    MAX_FILE_LINES: int = 20000
+    MAX_DIFF_BYTES: int = 64 * 1024
+    MAX_DIFF_LINES: int = 1500
+
+    # Doc rewrite config
+    DOC_REWRITE_CONCURRENCY: int = 4
+    DOC_REWRITE_TIMEOUT_SECONDS: int = 180
+    DOC_REWRITE_MODE: str = "edit"
+    DOC_REWRITE_STREAMING: bool = True
+    DOC_REWRITE_MAX_ATTEMPTS: int = 2
+    DOC_UPDATES_SUMMARY_USE_LLM: bool = True
+
+    # Drift analysis checkpoint config
+    GRAPH_CHECKPOINT_TTL_SECONDS: int = 86400
+    MAX_NODE_RETRIES: int = 3
+
+    # Repository clone config
+    CLONE_WORKERS: int = 2
+    CLONE_MAX_RETRIES: int = 3
+    CLONE_RETRY_INTERVAL_SECONDS: int = 60
+    CLONE_JOB_TIMEOUT_SECONDS: int = 3600
+    CLONE_PROGRESS_STEP: int = 5
+
+    # Repository sync config
+    REPO_SYNC_LOCK_TIMEOUT_SECONDS: int = 600
+    REPO_SYNC_LOCK_WAIT_SECONDS: int = 300
+
+    # Repository storage config
+    REPOS_DISK_QUOTA_BYTES: int = 50 * 1024**3
+    REPO_COMPACT_IDLE_DAYS: int = 7
+    REPO_EVICT_MIN_IDLE_HOURS: int = 24
+    REPO_STORAGE_LOCK_TIMEOUT_SECONDS: int = 3600
+
+    # Comma separated emails of the users allowed on the admin endpoints
+    ADMIN_EMAILS: str = ""
+
+    # Dashboard config, 0 disables the stats cache
+    DASHBOARD_STATS_CACHE_TTL_SECONDS: int = 15
+
+    # Dashboard repo metadata config. Metadata younger than the fresh age is served as is, up to
+    # the stale age it is served while refreshed in the background, older it is fetched first
+    REPO_METADATA_FRESH_SECONDS: int = 300
+    REPO_METADATA_STALE_SECONDS: int = 86400
+    REPO_METADATA_TIMEOUT_SECONDS: int = 10
+
+    # Notifications config, 0 disables the unread count cache
+    NOTIFICATIONS_UNREAD_CACHE_TTL_SECONDS: int = 60
+    # Unread notifications of the same kind within the window are merged into one, 0 disables it
+    NOTIFICATIONS_COALESCE_WINDOW_SECONDS: int = 600
+    # Notifications older than the retention are moved to the archive, whose monthly partitions
+    # are dropped once past the archive retention. The archive job runs this often, in batches
+    NOTIFICATIONS_RETENTION_DAYS: int = 90
+    NOTIFICATIONS_ARCHIVE_RETENTION_DAYS: int = 365
+    NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS: int = 3600
+    NOTIFICATIONS_ARCHIVE_BATCH_SIZE: int = 5000
+
+    # Drift history config. Drift events, findings and code changes are partitioned by month,
+    # partitions are created this many months ahead. Months past the retention are dropped, or
+    # detached and kept as plain tables with "detach". 0 keeps the whole history
+    DRIFT_PARTITION_MONTHS_AHEAD: int = 3
+    DRIFT_HISTORY_RETENTION_DAYS: int = 0
+    DRIFT_PARTITION_EXPIRY: str = "drop"
+    DRIFT_PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 86400
+
+    # Auth cache config. Verified access tokens are remembered in process for this long, so
+    # requests skip decrypting them. Bounded to the max size, least recently used first out.
+    # 0 turns the cache off
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = 60
+    AUTH_TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    # Server-Sent Events config, quiet streams get a keep-alive comment this often
+    SSE_HEARTBEAT_SECONDS: int = 15
 
     # Git config for commits
     GIT_AUTHOR_NAME: str
     GIT_AUTHOR_EMAIL: str
 
+    # Git subprocess config (optional)
+    GIT_MAX_CONCURRENT_PER_HOST: int = 4
+
     # Load values from .env file
     model_config = SettingsConfigDict(
         case_sensitive=True,
@@ -0,0 +1,52 @@
+import base64
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+
+# Encodes the sort key of the last row of a page into an opaque cursor for the next page
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+# Decodes a cursor back into its sort key, raises ValueError for cursors that weren't issued here
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+# Pages a query newest first on (created_at, id). Rows after the cursor are found by seeking the
+# index on the sort key, so deep pages cost as much as the first one. Returns the rows of the
+# page and the cursor of the next page, None on the last page
+def paginate_by_created_at(
+    query: Query,
+    created_at: InstrumentedAttribute,
+    row_id: InstrumentedAttribute,
+    limit: int,
+    cursor: str | None = None,
+) -> tuple[list, str | None]:
+    if cursor:
+        after_created_at, after_id = decode_cursor(cursor)
+        # The plain bound on created_at lets Postgres skip the partitions after the cursor
+        query = query.filter(
+            and_(
+                tuple_(created_at, row_id) < tuple_(after_created_at, after_id),
+                created_at <= after_created_at,
+            )
+        )
+
+    # One extra row tells whether there is a page after this one
+    rows = query.order_by(created_at.desc(), row_id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_at.key), getattr(last, row_id.key))
@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio
 from rq import Queue
 
 from app.core.config import settings
@@ -6,3 +7,9 @@ from app.core.config import settings
 # Shared Redis connection and RQ task queue
 redis_conn = redis.from_url(settings.REDIS_URL)
 task_queue = Queue(connection=redis_conn)
+
+# Separate queue for repository clones, served by its own workers so clones can't starve drift jobs
+clone_queue = Queue("clones", connection=redis_conn)
+
+# Async Redis connection for the pub/sub streams the API pushes to clients
+async_redis_conn = redis.asyncio.from_url(settings.REDIS_URL)
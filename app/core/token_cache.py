@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import UTC, datetime
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.user import User
+
+# Verified access tokens, least recently used first, mapped to the monotonic time they expire
+# at and the id of their user. Users are loaded again per request, so changes to them show
+_verified_tokens: OrderedDict[str, tuple[float, UUID]] = OrderedDict()
+_lock = threading.Lock()
+
+
+# Remembers the user an access token was verified for, until the cache TTL or the token's own
+# expiry, whichever comes first. The least recently used tokens go once the cache is full
+def remember_access_token(token: str, user: User, expires_at: str | None = None) -> None:
+    ttl = settings.AUTH_TOKEN_CACHE_TTL_SECONDS
+    if ttl <= 0:
+        return
+
+    now = time.monotonic()
+    expiry = now + ttl
+    if expires_at:
+        remaining = datetime.fromisoformat(expires_at) - datetime.now(UTC)
+        expiry = min(expiry, now + remaining.total_seconds())
+
+    with _lock:
+        _verified_tokens[token] = (expiry, user.id)
+        _verified_tokens.move_to_end(token)
+        while len(_verified_tokens) > max(1, settings.AUTH_TOKEN_CACHE_MAX_SIZE):
+            _verified_tokens.popitem(last=False)
+
+
+# Gets the user of a remembered access token by its primary key, skipping the token's
+# verification. Returns None when the token isn't remembered, has expired or its user is gone
+def get_cached_user(db: Session, token: str) -> User | None:
+    if settings.AUTH_TOKEN_CACHE_TTL_SECONDS <= 0:
+        return None
+
+    with _lock:
+        entry = _verified_tokens.get(token)
+        if entry is None:
+            return None
+        expiry, user_id = entry
+        if expiry <= time.monotonic():
+            del _verified_tokens[token]
+            return None
+        _verified_tokens.move_to_end(token)
+
+    user = db.get(User, user_id)
+    if user is None:
+        forget_access_token(token)
+    return user
+
+
+# Forgets an access token, so it is verified in full again, e.g. on logout. Only this process's
+# cache forgets it, other workers keep serving it until their TTL runs out
+def forget_access_token(token: str) -> None:
+    with _lock:
+        _verified_tokens.pop(token, None)
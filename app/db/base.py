@@ -1,10 +1,22 @@
 from app.db.base_class import Base as Base
-from app.models.user import User as User
-from app.models.installation import Installation as Installation
-from app.models.repository import Repository as Repository
+from app.models.drift import (
+    CodeChange as CodeChange,
+)
 from app.models.drift import (
     DriftEvent as DriftEvent,
+)
+from app.models.drift import (
     DriftFinding as DriftFinding,
-    CodeChange as CodeChange,
 )
-from app.models.notification import Notification as Notification
+from app.models.drift import (
+    RepoDriftStats as RepoDriftStats,
+)
+from app.models.installation import Installation as Installation
+from app.models.notification import (
+    Notification as Notification,
+)
+from app.models.notification import (
+    NotificationArchive as NotificationArchive,
+)
+from app.models.repository import Repository as Repository
+from app.models.user import User as User
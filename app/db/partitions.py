@@ -0,0 +1,72 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import Connection, text
+from sqlalchemy.orm import Session
+
+
+# First instant of the month a time falls in, in UTC
+def month_start(moment: datetime) -> datetime:
+    return moment.astimezone(UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+# First instant of the month after the one starting at start
+def next_month(start: datetime) -> datetime:
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+# Name of the partition of a table holding a month, e.g. drift_events_p202610
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m}"
+
+
+# Name of the default partition of a table, e.g. drift_events_default
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+# Bounds of the partition holding a month, as given to CREATE TABLE and ATTACH PARTITION
+def month_bounds(start: datetime) -> str:
+    return f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_month(start).isoformat()}')"
+
+
+# Creates the partition of a range partitioned table holding a month, unless it already exists.
+# Returns the partition's name
+def create_month_partition(db: Session | Connection, table: str, start: datetime) -> str:
+    name = partition_name(table, start)
+    db.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} {month_bounds(start)}")
+    )
+    return name
+
+
+# Creates the default partition of a range partitioned table, unless it already exists, so rows
+# of a month without a partition are still written. Returns the partition's name
+def create_default_partition(db: Session | Connection, table: str) -> str:
+    name = default_partition_name(table)
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} DEFAULT"))
+    return name
+
+
+# Lists the monthly partitions of a table as (name, month start), oldest first. Partitions not
+# named after a month are left out, they weren't made here
+def list_month_partitions(db: Session | Connection, table: str) -> list[tuple[str, datetime]]:
+    names = (
+        db.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:parent AS regclass)"
+            ),
+            {"parent": table},
+        )
+        .scalars()
+        .all()
+    )
+
+    partitions = []
+    for name in names:
+        try:
+            start = datetime.strptime(name.removeprefix(f"{table}_p"), "%Y%m")
+        except ValueError:
+            continue
+        partitions.append((name, start.replace(tzinfo=UTC)))
+    return sorted(partitions, key=lambda partition: partition[1])
@@ -1,11 +1,14 @@
-from typing import Generator
+from collections.abc import Generator
 from datetime import timedelta
+
 from fastapi import Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
+
 from app.core import security
 from app.core.config import settings
-from app.models.user import User
+from app.core.token_cache import get_cached_user, remember_access_token
 from app.db.session import SessionLocal
+from app.models.user import User
 
 
 # Dependency to get a DB session for each request
@@ -21,15 +24,21 @@ def get_db_connection() -> Generator:
 def get_current_user(
     request: Request, response: Response, db: Session = Depends(get_db_connection)
 ):
-    # First tries verification with the access token from cookies
+    # First tries verification with the access token from cookies, recently verified ones are
+    # served from the token cache
     access_token = request.cookies.get("access_token")
 
     if access_token:
+        user = get_cached_user(db, access_token)
+        if user:
+            return user
+
         payload = security.verify_token(access_token)
         if payload and payload.get("type") == "access":
             user_id = payload.get("sub")
             user = db.query(User).filter(User.id == user_id).first()
             if user:
+                remember_access_token(access_token, user, payload.get("exp"))
                 return user
 
     # If access token fails, verifies through refresh token
@@ -48,7 +57,7 @@ def get_current_user(
         raise HTTPException(status_code=401, detail="User not found")
 
     # Makes sure the refresh token matches refresh token hash stored in DB
-    if not user.current_refresh_token_hash or not security.verify_hash(
+    if not user.current_refresh_token_hash or not security.verify_token_digest(
         refresh_token, user.current_refresh_token_hash
     ):
         raise HTTPException(status_code=401, detail="Invalid refresh token")
@@ -68,3 +77,14 @@ def get_current_user(
     )
 
     return user
+
+
+# Dependency that only lets through users listed in ADMIN_EMAILS
+def get_current_admin_user(current_user: User = Depends(get_current_user)):
+    admin_emails = {
+        email.strip().lower() for email in settings.ADMIN_EMAILS.split(",") if email.strip()
+    }
+    if not current_user.email or current_user.email.lower() not in admin_emails:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return current_user
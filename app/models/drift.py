@@ -1,19 +1,22 @@
 import uuid
 from datetime import datetime
+
 from sqlalchemy import (
-    String,
-    Integer,
-    Float,
-    DateTime,
-    ForeignKey,
-    text,
     BigInteger,
+    Boolean,
     CheckConstraint,
+    DateTime,
+    Float,
+    ForeignKey,
+    ForeignKeyConstraint,
     Index,
-    Boolean,
+    Integer,
+    String,
+    text,
 )
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
 from app.db.base_class import Base
 
 
@@ -45,8 +48,9 @@ class DriftEvent(Base):
 
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # Part of the primary key, drift events are partitioned by month of creation
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=text("now()")
+        DateTime(timezone=True), primary_key=True, server_default=text("now()")
     )
 
     repository = relationship("Repository")
@@ -65,6 +69,18 @@ class DriftEvent(Base):
             "repo_id",
             postgresql_where=text("processing_phase NOT IN ('completed', 'failed')"),
         ),
+        # Serves the newest first, keyset paginated listing of a repo's drift events
+        Index(
+            "idx_drift_events_repo_created",
+            "repo_id",
+            text("created_at DESC"),
+            text("id DESC"),
+        ),
+        # Serves the lookup of a PR's latest drift event on every push to the PR
+        Index("idx_drift_events_repo_pr", "repo_id", "pr_number", text("created_at DESC")),
+        # Serves the lookup of the latest drift event of a commit when checks are re-requested
+        Index("idx_drift_events_head_sha", "head_sha", text("created_at DESC")),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -74,8 +90,10 @@ class DriftFinding(Base):
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()")
     )
-    drift_event_id: Mapped[uuid.UUID | None] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("drift_events.id", ondelete="CASCADE")
+    drift_event_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True))
+    # Creation time of the drift event, partitions the rows by the same month as their event
+    drift_event_created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
     )
 
     code_path: Mapped[str] = mapped_column(String, nullable=False)
@@ -101,6 +119,14 @@ class DriftFinding(Base):
             "drift_type IN ('outdated_docs', 'missing_docs', 'ambiguous_docs')",
             name="check_start_drift_type",
         ),
+        ForeignKeyConstraint(
+            ["drift_event_id", "drift_event_created_at"],
+            ["drift_events.id", "drift_events.created_at"],
+            ondelete="CASCADE",
+            name="fk_drift_findings_event",
+        ),
+        Index("idx_drift_findings_event", "drift_event_id"),
+        {"postgresql_partition_by": "RANGE (drift_event_created_at)"},
     )
 
 
@@ -110,8 +136,10 @@ class CodeChange(Base):
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()")
     )
-    drift_event_id: Mapped[uuid.UUID | None] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("drift_events.id", ondelete="CASCADE")
+    drift_event_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True))
+    # Creation time of the drift event, partitions the rows by the same month as their event
+    drift_event_created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
     )
 
     file_path: Mapped[str] = mapped_column(String, nullable=False)
@@ -126,4 +154,34 @@ class CodeChange(Base):
         CheckConstraint(
             "change_type IN ('added', 'modified', 'deleted')", name="check_code_change_type"
         ),
+        ForeignKeyConstraint(
+            ["drift_event_id", "drift_event_created_at"],
+            ["drift_events.id", "drift_events.created_at"],
+            ondelete="CASCADE",
+            name="fk_code_changes_event",
+        ),
+        # Also serves the code changes of a drift event paged in file path order
+        Index("idx_code_changes_event", "drift_event_id", "file_path"),
+        {"postgresql_partition_by": "RANGE (drift_event_created_at)"},
+    )
+
+
+# Per repo counters behind the dashboard stats, kept up to date by the drift pipeline and webhook
+# handlers so the dashboard never counts the drift event history
+class RepoDriftStats(Base):
+    __tablename__ = "repo_drift_stats"
+
+    repo_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("repositories.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    drift_events_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
+    pr_waiting_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=text("now()")
     )
@@ -1,8 +1,10 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Boolean, DateTime, ForeignKey, Text, text
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, Text, text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
 from app.db.base_class import Base
 
 
@@ -19,8 +21,61 @@ class Notification(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     is_read: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
+    # Notifications of the same kind share a group key, repeats within a window bump the count
+    group_key: Mapped[str | None] = mapped_column(Text, nullable=True)
+    group_count: Mapped[int] = mapped_column(
+        Integer, default=1, server_default=text("1"), nullable=False
+    )
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=text("now()")
     )
+    # Time of the latest notification merged into this one, the coalesce window counts from it
+    last_event_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=text("now()"), nullable=False
+    )
 
     user = relationship("User")
+
+    __table_args__ = (
+        # Serves a user's notifications listed newest first
+        Index("idx_notifications_user_created", "user_id", text("created_at DESC")),
+        # Serves the lookup of the unread notification a new one is merged into
+        Index(
+            "idx_notifications_user_group",
+            "user_id",
+            "group_key",
+            text("last_event_at DESC"),
+            postgresql_where=text("group_key IS NOT NULL AND NOT is_read"),
+        ),
+        # Serves the archive job, which moves the oldest notifications first
+        Index("idx_notifications_created", "created_at"),
+    )
+
+
+# Notifications past their retention, partitioned by month of creation so expired months are
+# dropped whole instead of deleted row by row. Partitions are created by the archive job
+class NotificationArchive(Base):
+    __tablename__ = "notifications_archive"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    is_read: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    group_key: Mapped[str | None] = mapped_column(Text, nullable=True)
+    group_count: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # Part of the primary key, a partitioned table's keys must include the partition column
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    last_event_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=text("now()"), nullable=False
+    )
+
+    __table_args__ = (
+        Index("idx_notifications_archive_user_created", "user_id", text("created_at DESC")),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
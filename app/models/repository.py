@@ -1,17 +1,21 @@
 import uuid
 from datetime import datetime
+
 from sqlalchemy import (
-    String,
-    Text,
+    BigInteger,
     Boolean,
+    CheckConstraint,
     DateTime,
     ForeignKey,
-    text,
-    BigInteger,
+    Integer,
+    String,
+    Text,
     UniqueConstraint,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
 from app.db.base_class import Base
 
 
@@ -36,6 +40,31 @@ class Repository(Base):
     reviewer: Mapped[str | None] = mapped_column(String)
     docs_policies: Mapped[str | None] = mapped_column(Text)
 
+    # Clone state, drift analysis is deferred until the clone is ready
+    clone_status: Mapped[str] = mapped_column(
+        String, nullable=False, default="pending", server_default="pending"
+    )
+    clone_progress: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    clone_error: Mapped[str | None] = mapped_column(Text)
+    clone_attempts: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+    # Disk usage of the clone, tracked so cold clones can be compacted or evicted under the quota
+    clone_size_bytes: Mapped[int | None] = mapped_column(BigInteger)
+    last_used_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    last_compacted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    # GitHub metadata shown on the dashboard, refreshed with conditional requests on its ETag
+    description: Mapped[str | None] = mapped_column(Text)
+    language: Mapped[str | None] = mapped_column(String)
+    stargazers_count: Mapped[int | None] = mapped_column(Integer)
+    forks_count: Mapped[int | None] = mapped_column(Integer)
+    metadata_etag: Mapped[str | None] = mapped_column(String)
+    metadata_fetched_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
     last_synced_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=text("now()")
@@ -47,4 +76,10 @@ class Repository(Base):
         foreign_keys=[installation_id],
     )
 
-    __table_args__ = (UniqueConstraint("installation_id", "repo_name"),)
+    __table_args__ = (
+        UniqueConstraint("installation_id", "repo_name"),
+        CheckConstraint(
+            "clone_status IN ('pending', 'cloning', 'ready', 'failed', 'evicted')",
+            name="check_clone_status",
+        ),
+    )
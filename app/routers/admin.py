@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.queue import clone_queue
+from app.deps import get_current_admin_user, get_db_connection
+from app.models.user import User
+from app.services.drift_stats import rebuild_drift_stats
+from app.services.repo_storage import enforce_storage_quota, get_storage_report
+
+router = APIRouter()
+
+
+# Endpoint to get the disk usage of the cloned repos, the eviction policy and eviction order
+@router.get("/storage")
+def get_storage(
+    db: Session = Depends(get_db_connection),
+    current_user: User = Depends(get_current_admin_user),
+):
+    return get_storage_report(db)
+
+
+# Endpoint to run a storage pass now instead of waiting for the next clone to trigger one
+@router.post("/storage/enforce", status_code=202)
+def enforce_storage(current_user: User = Depends(get_current_admin_user)):
+    try:
+        job = clone_queue.enqueue(enforce_storage_quota)
+    except Exception as e:
+        print(f"Failed to enqueue storage pass: {e!s}")
+        raise HTTPException(status_code=500, detail="Failed to enqueue storage pass")
+
+    return {"job_id": job.id}
+
+
+# Endpoint to recount the dashboard drift counters of every repo from the drift event history
+@router.post("/drift-stats/rebuild")
+def rebuild_stats(
+    db: Session = Depends(get_db_connection),
+    current_user: User = Depends(get_current_admin_user),
+):
+    try:
+        repos_count = rebuild_drift_stats(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to rebuild drift stats: {e!s}")
+        raise HTTPException(status_code=500, detail="Failed to rebuild drift stats")
+
+    return {"repos_count": repos_count}
@@ -1,14 +1,16 @@
-import httpx
 from datetime import timedelta
-from fastapi import APIRouter, Depends, Response, Request, HTTPException
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
 from app import schemas
 from app.core import security
-from app.models.user import User
 from app.core.config import settings
+from app.core.token_cache import forget_access_token
+from app.deps import get_current_user, get_db_connection
 from app.models.installation import Installation
-from app.deps import get_db_connection, get_current_user
+from app.models.user import User
 
 router = APIRouter()
 
@@ -45,8 +47,8 @@ def create_user(
     refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     refresh_token = security.create_refresh_token(user.id, expires_delta=refresh_token_expires)
 
-    # Store the refresh token hash in DB for validation (during refresh logic)
-    user.current_refresh_token_hash = security.get_hash(refresh_token)
+    # Store the refresh token digest in DB for validation (during refresh logic)
+    user.current_refresh_token_hash = security.get_token_digest(refresh_token)
     db.commit()
 
     # Send both tokens as httponly (To prevent XSS Scripting) cookies
@@ -93,8 +95,8 @@ def login(response: Response, user_in: schemas.UserLogin, db: Session = Depends(
     refresh_token_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     refresh_token = security.create_refresh_token(user.id, expires_delta=refresh_token_expires)
 
-    # Store the refresh token hash in DB for validation (during refresh logic)
-    user.current_refresh_token_hash = security.get_hash(refresh_token)
+    # Store the refresh token digest in DB for validation (during refresh logic)
+    user.current_refresh_token_hash = security.get_token_digest(refresh_token)
     db.commit()
 
     # Send both tokens as httponly (To prevent XSS Scripting) cookies
@@ -129,6 +131,7 @@ def logout(response: Response, request: Request, db: Session = Depends(get_db_co
     # Get user id from Access token (if fails then from refresh token)
     access_token = request.cookies.get("access_token")
     if access_token:
+        forget_access_token(access_token)
         payload = security.verify_token(access_token)
         if payload:
             user_id = payload.get("sub")
@@ -1,13 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
-from app.deps import get_db_connection, get_current_user
-from app.models.user import User
+from app.deps import get_current_user, get_db_connection
 from app.models.installation import Installation
 from app.models.repository import Repository
-from app.models.drift import DriftEvent
-from app.services.github_api import get_repo_details
+from app.models.user import User
+from app.services.drift_stats import get_user_dashboard_stats
+from app.services.repo_metadata import get_dashboard_repo_details, refresh_repo_metadata
 
 router = APIRouter()
 
@@ -17,58 +16,16 @@ router = APIRouter()
 def get_dashboard_stats(
     db: Session = Depends(get_db_connection), current_user: User = Depends(get_current_user)
 ):
-    # Counts number of installations for the user
-    installations_count = int(
-        db.query(func.count(Installation.id))
-        .filter(Installation.user_id == current_user.id)
-        .scalar()
-        or 0
-    )
-
-    # Counts the number of linked repos across all installations
-    repos_count = int(
-        db.query(func.count(Repository.id))
-        .join(Installation, Repository.installation_id == Installation.installation_id)
-        .filter(Installation.user_id == current_user.id)
-        .scalar()
-        or 0
-    )
-
-    # Counts the number of  drift events across all repos
-    drift_events_count = int(
-        db.query(func.count(DriftEvent.id))
-        .join(Repository, DriftEvent.repo_id == Repository.id)
-        .join(Installation, Repository.installation_id == Installation.installation_id)
-        .filter(Installation.user_id == current_user.id)
-        .scalar()
-        or 0
-    )
-
-    # Counts drift events where Delta has raised a docs-fix PR and is still waiting for merge
-    pr_waiting_count = int(
-        db.query(func.count(DriftEvent.id))
-        .join(Repository, DriftEvent.repo_id == Repository.id)
-        .join(Installation, Repository.installation_id == Installation.installation_id)
-        .filter(
-            Installation.user_id == current_user.id,
-            DriftEvent.processing_phase == "fix_pr_raised",
-        )
-        .scalar()
-        or 0
-    )
-
-    return {
-        "installations_count": installations_count,
-        "repos_linked_count": repos_count,
-        "drift_events_count": drift_events_count,
-        "pr_waiting_count": pr_waiting_count,
-    }
+    # One query over the user's repos and their drift counters, cached for a few seconds
+    return get_user_dashboard_stats(db, current_user.id)
 
 
 # Endpoint to get the 5 most recent linked repos and its details
 @router.get("/repos")
 async def get_dashboard_repos(
-    db: Session = Depends(get_db_connection), current_user: User = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db_connection),
+    current_user: User = Depends(get_current_user),
 ):
     recent_repos = (
         db.query(Repository)
@@ -79,27 +36,14 @@ async def get_dashboard_repos(
         .all()
     )
 
-    results = []
-    for repo in recent_repos:
-        # Parse owner/repo from full name
-        repo_owner, repo_name = repo.repo_name.split("/")
-        try:
-            # Fetch live data from GitHub API
-            if not repo.installation_id:
-                raise ValueError("No installation ID for repository")
-            details = await get_repo_details(repo.installation_id, repo_owner, repo_name)
-            results.append(details)
-        except Exception:
-            # Fallback if GitHub API fails
-            results.append(
-                {
-                    "name": repo.repo_name,
-                    "description": "Error fetching details",
-                    "language": "Unknown",
-                    "stargazers_count": 0,
-                    "forks_count": 0,
-                    "avatar_url": None,
-                }
-            )
+    # Served from the stored GitHub metadata, only missing or expired metadata is fetched inline
+    results, stale = await get_dashboard_repo_details(recent_repos)
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to store fetched repo metadata: {e}")
 
+    if stale:
+        background_tasks.add_task(refresh_repo_metadata, stale)
     return results
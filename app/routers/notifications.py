@@ -1,26 +1,76 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.deps import get_db_connection, get_current_user
+from app.core.pagination import paginate_by_created_at
+from app.deps import get_current_user, get_db_connection
 from app.models.notification import Notification
 from app.models.user import User
 from app.schemas.notification import NotificationResponse
+from app.services.live_events import stream_events
+from app.services.notification_service import (
+    get_unread_count,
+    invalidate_unread_count,
+    notification_channel,
+)
 
 router = APIRouter()
 
 
-# Endpoint to get all notifications for the current user
+# Endpoint to get the notifications of the current user, newest first, one page at a time.
+# The next page's cursor is sent in X-Next-Cursor
 @router.get("/", response_model=list[NotificationResponse])
 def get_notifications(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
     db: Session = Depends(get_db_connection),
     current_user: User = Depends(get_current_user),
 ):
-    return (
-        db.query(Notification)
-        .filter(Notification.user_id == current_user.id)
-        .order_by(Notification.created_at.desc())
-        .all()
+    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    try:
+        notifications, next_cursor = paginate_by_created_at(
+            query, Notification.created_at, Notification.id, limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return notifications
+
+
+# Endpoint to get the number of unread notifications of the current user
+@router.get("/unread-count")
+def get_notifications_unread_count(
+    db: Session = Depends(get_db_connection),
+    current_user: User = Depends(get_current_user),
+):
+    return {"unread_count": get_unread_count(db, current_user.id)}
+
+
+# Dependency returning the notification channel of the current user. Sync dependencies run in
+# the threadpool, so closing the session used for auth never blocks the stream's event loop
+def _notification_stream_channel(
+    db: Session = Depends(get_db_connection),
+    current_user: User = Depends(get_current_user),
+) -> str:
+    # The stream can stay open for hours, so the session used for auth gives its connection back
+    db.close()
+    return notification_channel(current_user.id)
+
+
+# Endpoint streaming new notifications of the current user as Server-Sent Events
+@router.get("/stream")
+async def stream_notifications(
+    request: Request, channel: str = Depends(_notification_stream_channel)
+):
+    return StreamingResponse(
+        stream_events(request.is_disconnected, channel),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -46,6 +96,7 @@ def mark_notification_as_read(
     # Mark the notification as read
     notification.is_read = True
     db.commit()
+    invalidate_unread_count(current_user.id)
     db.refresh(notification)
     return notification
 
@@ -63,6 +114,7 @@ def mark_all_notifications_as_read(
     ).update({"is_read": True})
 
     db.commit()
+    invalidate_unread_count(current_user.id)
     return {"message": "All notifications marked as read"}
 
 
@@ -87,6 +139,7 @@ def delete_notification(
 
     db.delete(notification)
     db.commit()
+    invalidate_unread_count(current_user.id)
     return {"message": "Notification deleted"}
 
 
@@ -99,4 +152,5 @@ def delete_all_notifications(
     db.query(Notification).filter(Notification.user_id == current_user.id).delete()
 
     db.commit()
+    invalidate_unread_count(current_user.id)
     return {"message": "All notifications deleted"}
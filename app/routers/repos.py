@@ -1,24 +1,36 @@
+import os
+from datetime import datetime
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Session
-import os
 
-from app.deps import get_db_connection, get_current_user
-from app.models.drift import DriftEvent, DriftFinding, CodeChange
-from app.models.user import User
+from app.core.config import settings
+from app.core.pagination import paginate_by_created_at
+from app.deps import get_current_user, get_db_connection
+from app.models.drift import CodeChange, DriftEvent, DriftFinding
 from app.models.installation import Installation
 from app.models.repository import Repository
+from app.models.user import User
 from app.schemas.drift import (
-    DriftEventListResponse,
+    CodeChangeResponse,
     DriftEventDetailResponse,
+    DriftEventListResponse,
     DriftFindingResponse,
-    CodeChangeResponse,
 )
-from app.schemas.repository import RepositorySettings, RepositoryActivation, RepositoryResponse
-from app.core.config import settings
+from app.schemas.repository import RepositoryActivation, RepositoryResponse, RepositorySettings
+from app.services.drift_progress import drift_event_channel, repo_drift_events_channel
+from app.services.drift_stats import get_repo_drift_events_count
+from app.services.live_events import stream_events
 
 router = APIRouter()
 
+# Filtered drift event counts stop at this many rows and are reported as estimates past it
+DRIFT_EVENTS_COUNT_CAP = 1000
+
 
 # Endpoint to get all linked repos for the current user
 @router.get("/", response_model=list[RepositoryResponse])
@@ -90,10 +102,19 @@ def toggle_repo_activation(
     return repo
 
 
-# Endpoint to get basic details of all drift events for a repo
+# Endpoint to get basic details of a repo's drift events, newest first, one page at a time.
+# The next page's cursor is sent in X-Next-Cursor and an estimate of the total in X-Total-Count
 @router.get("/{repo_id}/drift-events", response_model=list[DriftEventListResponse])
 def get_drift_events(
     repo_id: UUID,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    processing_phase: str | None = None,
+    drift_result: str | None = None,
+    pr_number: int | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
     db: Session = Depends(get_db_connection),
     current_user: User = Depends(get_current_user),
 ):
@@ -108,72 +129,277 @@ def get_drift_events(
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
 
-    # Returning the drift events with minimal data
-    events = (
-        db.query(DriftEvent)
-        .filter(DriftEvent.repo_id == repo_id)
-        .order_by(DriftEvent.created_at.desc())
-        .all()
-    )
+    # Filters are applied in the database, on top of the (repo_id, created_at, id) index
+    query = db.query(DriftEvent).filter(DriftEvent.repo_id == repo_id)
+    filters = []
+    if processing_phase is not None:
+        filters.append(DriftEvent.processing_phase == processing_phase)
+    if drift_result is not None:
+        filters.append(DriftEvent.drift_result == drift_result)
+    if pr_number is not None:
+        filters.append(DriftEvent.pr_number == pr_number)
+    if created_after is not None:
+        filters.append(DriftEvent.created_at >= created_after)
+    if created_before is not None:
+        filters.append(DriftEvent.created_at < created_before)
+    if filters:
+        query = query.filter(*filters)
+
+    try:
+        # Returning the drift events with minimal data
+        events, next_cursor = paginate_by_created_at(
+            query, DriftEvent.created_at, DriftEvent.id, limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Unfiltered totals come from the repo's counter, filtered ones from a count capped at a limit
+    if filters:
+        total = (
+            db.query(func.count())
+            .select_from(
+                query.with_entities(DriftEvent.id).limit(DRIFT_EVENTS_COUNT_CAP + 1).subquery()
+            )
+            .scalar()
+        )
+        response.headers["X-Total-Count"] = str(min(total, DRIFT_EVENTS_COUNT_CAP))
+        response.headers["X-Total-Count-Exact"] = str(total <= DRIFT_EVENTS_COUNT_CAP).lower()
+    else:
+        response.headers["X-Total-Count"] = str(get_repo_drift_events_count(db, repo_id))
+        response.headers["X-Total-Count-Exact"] = "true"
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return events
 
 
-# Endpoint to get a single drift event with all details, drift findings, and code changes
-@router.get("/{repo_id}/drift-events/{event_id}", response_model=DriftEventDetailResponse)
-def get_drift_event_detail(
+# Streams the events published to a channel to the client as Server-Sent Events
+def _event_stream(request: Request, channel: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_events(request.is_disconnected, channel),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Dependency checking the current user owns the repo and returning its drift events channel.
+# Sync dependencies run in the threadpool, so the query never blocks the stream's event loop
+def _repo_drift_events_stream_channel(
     repo_id: UUID,
-    event_id: UUID,
     db: Session = Depends(get_db_connection),
     current_user: User = Depends(get_current_user),
-):
-    # Verify user owns the repo
+) -> str:
     repo = (
-        db.query(Repository)
+        db.query(Repository.id)
         .join(Installation, Repository.installation_id == Installation.installation_id)
         .filter(Repository.id == repo_id, Installation.user_id == current_user.id)
         .first()
     )
-
     if not repo:
         raise HTTPException(status_code=404, detail="Repository not found")
 
-    # Get drift event
-    event = (
-        db.query(DriftEvent)
-        .filter(DriftEvent.id == event_id, DriftEvent.repo_id == repo_id)
-        .first()
+    # The stream can stay open for hours, so the session used for auth gives its connection back
+    db.close()
+    return repo_drift_events_channel(repo_id)
+
+
+# Endpoint streaming the phase changes and analysis progress of all drift events of a repo as
+# Server-Sent Events. Declared before the detail endpoint so "stream" isn't read as an event id
+@router.get("/{repo_id}/drift-events/stream")
+async def stream_repo_drift_events(
+    request: Request, channel: str = Depends(_repo_drift_events_stream_channel)
+):
+    return _event_stream(request, channel)
+
+
+# Builds a JSON object of the given columns, keyed by their names
+def _json_object(*columns):
+    pairs = []
+    for column in columns:
+        pairs.extend([literal_column(f"'{column.key}'"), column])
+    return func.json_build_object(*pairs)
+
+
+# Endpoint to get a single drift event with all details, drift findings, and a page of its code
+# changes. Everything is read in one query, findings and code changes aggregated into JSON arrays.
+# The subqueries also match the event's created_at, so only the partition of its month is read
+@router.get("/{repo_id}/drift-events/{event_id}", response_model=DriftEventDetailResponse)
+def get_drift_event_detail(
+    repo_id: UUID,
+    event_id: UUID,
+    code_changes_limit: int = Query(500, ge=1, le=5000),
+    code_changes_offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db_connection),
+    current_user: User = Depends(get_current_user),
+):
+    findings = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(
+                        _json_object(
+                            DriftFinding.id,
+                            DriftFinding.code_path,
+                            DriftFinding.doc_file_path,
+                            DriftFinding.change_type,
+                            DriftFinding.drift_type,
+                            DriftFinding.drift_score,
+                            DriftFinding.explanation,
+                            DriftFinding.confidence,
+                            DriftFinding.created_at,
+                        ),
+                        DriftFinding.created_at.desc(),
+                    )
+                ),
+                literal_column("'[]'::json"),
+            )
+        )
+        .where(
+            DriftFinding.drift_event_id == event_id,
+            DriftFinding.drift_event_created_at == DriftEvent.created_at,
+        )
+        .scalar_subquery()
     )
 
-    if not event:
-        raise HTTPException(status_code=404, detail="Drift event not found")
+    code_changes_page = (
+        select(
+            CodeChange.id,
+            CodeChange.file_path,
+            CodeChange.change_type,
+            CodeChange.is_code,
+            CodeChange.is_ignored,
+        )
+        .where(
+            CodeChange.drift_event_id == event_id,
+            CodeChange.drift_event_created_at == DriftEvent.created_at,
+        )
+        .correlate(DriftEvent)
+        .order_by(CodeChange.file_path, CodeChange.id)
+        .limit(code_changes_limit)
+        .offset(code_changes_offset)
+        .subquery()
+    )
+    code_changes = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(
+                        _json_object(*code_changes_page.c),
+                        code_changes_page.c.file_path,
+                        code_changes_page.c.id,
+                    )
+                ),
+                literal_column("'[]'::json"),
+            )
+        )
+        .select_from(code_changes_page)
+        .scalar_subquery()
+    )
 
-    # Get drift findings and code changes
-    drift_findings = (
-        db.query(DriftFinding)
-        .filter(DriftFinding.drift_event_id == event_id)
-        .order_by(DriftFinding.created_at.desc())
-        .all()
+    code_changes_total = (
+        select(func.count(CodeChange.id))
+        .where(
+            CodeChange.drift_event_id == event_id,
+            CodeChange.drift_event_created_at == DriftEvent.created_at,
+        )
+        .scalar_subquery()
+    )
+
+    # Verify user owns the repo while getting the drift event
+    row = (
+        db.query(
+            DriftEvent.id,
+            DriftEvent.pr_number,
+            DriftEvent.base_branch,
+            DriftEvent.head_branch,
+            DriftEvent.processing_phase,
+            DriftEvent.drift_result,
+            DriftEvent.overall_drift_score,
+            DriftEvent.created_at,
+            DriftEvent.docs_pr_number,
+            DriftEvent.error_message,
+            DriftEvent.started_at,
+            DriftEvent.completed_at,
+            Repository.repo_name,
+            findings.label("findings"),
+            code_changes.label("code_changes"),
+            code_changes_total.label("code_changes_total"),
+        )
+        .join(Repository, DriftEvent.repo_id == Repository.id)
+        .join(Installation, Repository.installation_id == Installation.installation_id)
+        .filter(
+            DriftEvent.id == event_id,
+            DriftEvent.repo_id == repo_id,
+            Installation.user_id == current_user.id,
+        )
+        .first()
     )
 
-    code_changes = db.query(CodeChange).filter(CodeChange.drift_event_id == event_id).all()
+    if not row:
+        # Only a missing event needs the ownership check, to tell the two not found cases apart
+        repo = (
+            db.query(Repository.id)
+            .join(Installation, Repository.installation_id == Installation.installation_id)
+            .filter(Repository.id == repo_id, Installation.user_id == current_user.id)
+            .first()
+        )
+        if not repo:
+            raise HTTPException(status_code=404, detail="Repository not found")
+        raise HTTPException(status_code=404, detail="Drift event not found")
+
+    event = row._asdict()
 
     # Strip the full repo clone base path from doc_file_path
-    repo_clone_base = os.path.join(settings.REPOS_BASE_PATH, repo.repo_name)
+    repo_clone_base = os.path.join(settings.REPOS_BASE_PATH, event.pop("repo_name"))
 
     def strip_repo_clone_base(doc_path):
         if doc_path and doc_path.startswith(repo_clone_base):
             return doc_path[len(repo_clone_base) :].lstrip("/")
         return doc_path
 
+    code_changes = event.pop("code_changes") or []
     findings_response = []
-    for f in drift_findings:
-        finding_dict = f.__dict__.copy()
-        finding_dict["doc_file_path"] = strip_repo_clone_base(finding_dict.get("doc_file_path"))
-        findings_response.append(DriftFindingResponse(**finding_dict))
+    for finding in event.pop("findings") or []:
+        finding["doc_file_path"] = strip_repo_clone_base(finding.get("doc_file_path"))
+        findings_response.append(DriftFindingResponse(**finding))
 
     # Build response with nested data
     return DriftEventDetailResponse(
-        **event.__dict__,
+        **event,
         findings=findings_response,
-        code_changes=[CodeChangeResponse(**c.__dict__) for c in code_changes],
+        code_changes=[CodeChangeResponse(**c) for c in code_changes],
+    )
+
+
+# Dependency checking the current user owns the drift event and returning its channel.
+# Sync dependencies run in the threadpool, so the query never blocks the stream's event loop
+def _drift_event_stream_channel(
+    repo_id: UUID,
+    event_id: UUID,
+    db: Session = Depends(get_db_connection),
+    current_user: User = Depends(get_current_user),
+) -> str:
+    drift_event = (
+        db.query(DriftEvent.id)
+        .join(Repository, DriftEvent.repo_id == Repository.id)
+        .join(Installation, Repository.installation_id == Installation.installation_id)
+        .filter(
+            DriftEvent.id == event_id,
+            DriftEvent.repo_id == repo_id,
+            Installation.user_id == current_user.id,
+        )
+        .first()
     )
+    if not drift_event:
+        raise HTTPException(status_code=404, detail="Drift event not found")
+
+    # The stream can stay open for hours, so the session used for auth gives its connection back
+    db.close()
+    return drift_event_channel(event_id)
+
+
+# Endpoint streaming the phase changes and analysis progress of one drift event as Server-Sent
+# Events
+@router.get("/{repo_id}/drift-events/{event_id}/stream")
+async def stream_drift_event(request: Request, channel: str = Depends(_drift_event_stream_channel)):
+    return _event_stream(request, channel)
@@ -1,15 +1,27 @@
+from .llm import DocEdit as DocEdit
+from .llm import DocEditPlan as DocEditPlan
+from .llm import LLMDriftFinding as LLMDriftFinding
+from .llm import PlannedUpdate as PlannedUpdate
+from .llm import UpdatePlan as UpdatePlan
+from .message import Message as Message
+from .repository import (
+    RepositoryActivation as RepositoryActivation,
+)
+from .repository import (
+    RepositoryResponse as RepositoryResponse,
+)
+from .repository import (
+    RepositorySettings as RepositorySettings,
+)
 from .user import (
     User as User,
+)
+from .user import (
     UserCreate as UserCreate,
+)
+from .user import (
     UserLogin as UserLogin,
-    UserLoginResponse as UserLoginResponse,
 )
-from .message import Message as Message
-from .repository import (
-    RepositorySettings as RepositorySettings,
-    RepositoryActivation as RepositoryActivation,
-    RepositoryResponse as RepositoryResponse,
+from .user import (
+    UserLoginResponse as UserLoginResponse,
 )
-from .llm import LLMDriftFinding as LLMDriftFinding
-from .llm import PlannedUpdate as PlannedUpdate
-from .llm import UpdatePlan as UpdatePlan
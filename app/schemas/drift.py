@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from typing import Optional
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -12,9 +12,9 @@ class DriftEventListResponse(BaseModel):
     head_branch: str
     processing_phase: str
     drift_result: str
-    overall_drift_score: Optional[float]
+    overall_drift_score: float | None
     created_at: datetime
-    docs_pr_number: Optional[int] = None
+    docs_pr_number: int | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -23,12 +23,12 @@ class DriftEventListResponse(BaseModel):
 class DriftFindingResponse(BaseModel):
     id: uuid.UUID
     code_path: str
-    doc_file_path: Optional[str] = None
-    change_type: Optional[str]
-    drift_type: Optional[str]
-    drift_score: Optional[float]
-    explanation: Optional[str]
-    confidence: Optional[float]
+    doc_file_path: str | None = None
+    change_type: str | None
+    drift_type: str | None
+    drift_score: float | None
+    explanation: str | None
+    confidence: float | None
     created_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
@@ -38,8 +38,8 @@ class DriftFindingResponse(BaseModel):
 class CodeChangeResponse(BaseModel):
     id: uuid.UUID
     file_path: str
-    change_type: Optional[str]
-    is_code: Optional[bool]
+    change_type: str | None
+    is_code: bool | None
     is_ignored: bool
 
     model_config = ConfigDict(from_attributes=True)
@@ -47,10 +47,11 @@ class CodeChangeResponse(BaseModel):
 
 # Schema for drift event detail with nested findings and code changes
 class DriftEventDetailResponse(DriftEventListResponse):
-    error_message: Optional[str]
-    started_at: Optional[datetime]
-    completed_at: Optional[datetime]
+    error_message: str | None
+    started_at: datetime | None
+    completed_at: datetime | None
     findings: list[DriftFindingResponse] = []
     code_changes: list[CodeChangeResponse] = []
+    code_changes_total: int = 0
 
     model_config = ConfigDict(from_attributes=True)
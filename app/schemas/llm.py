@@ -1,4 +1,5 @@
 from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -31,3 +32,22 @@ class PlannedUpdate(BaseModel):
 
 class UpdatePlan(BaseModel):
     updates: list[PlannedUpdate]
+
+
+# Structured output schemas for the edit mode of the rewrite_docs LLM call
+class DocEdit(BaseModel):
+    old_text: str = Field(
+        default="",
+        description="Exact passage to replace, copied verbatim. Empty for a line range edit.",
+    )
+    new_text: str = Field(description="Replacement text for the passage or line range.")
+    start_line: int | None = Field(
+        default=None, description="First replaced line (1-based), only when old_text is empty."
+    )
+    end_line: int | None = Field(
+        default=None, description="Last replaced line (inclusive), only when old_text is empty."
+    )
+
+
+class DocEditPlan(BaseModel):
+    edits: list[DocEdit]
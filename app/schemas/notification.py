@@ -1,5 +1,6 @@
 import uuid
 from datetime import datetime
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -9,4 +10,6 @@ class NotificationResponse(BaseModel):
     id: uuid.UUID
     content: str
     is_read: bool
+    group_count: int = 1
     created_at: datetime
+    last_event_at: datetime | None = None
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, ConfigDict
-from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
 
 
 # Base Repository schema
@@ -11,12 +11,12 @@ class RepositoryBase(BaseModel):
 
 # Schema for updating repository settings
 class RepositorySettings(BaseModel):
-    docs_root_path: Optional[str] = None
-    target_branch: Optional[str] = None
-    style_preference: Optional[str] = None
-    file_ignore_patterns: Optional[list[str]] = None
-    reviewer: Optional[str] = None
-    docs_policies: Optional[str] = None
+    docs_root_path: str | None = None
+    target_branch: str | None = None
+    style_preference: str | None = None
+    file_ignore_patterns: list[str] | None = None
+    reviewer: str | None = None
+    docs_policies: str | None = None
 
 
 # Schema for toggling repo active status
@@ -30,13 +30,16 @@ class RepositoryResponse(BaseModel):
     repo_name: str
     is_active: bool  # User controlled
     is_suspended: bool  # System controlled
-    avatar_url: Optional[str]
-    docs_root_path: Optional[str]
-    target_branch: Optional[str]
-    style_preference: Optional[str]
-    file_ignore_patterns: Optional[list[str]]
-    reviewer: Optional[str]
-    docs_policies: Optional[str]
-    last_synced_at: Optional[datetime]
+    avatar_url: str | None
+    docs_root_path: str | None
+    target_branch: str | None
+    style_preference: str | None
+    file_ignore_patterns: list[str] | None
+    reviewer: str | None
+    docs_policies: str | None
+    last_synced_at: datetime | None
+    clone_status: str | None = None
+    clone_progress: int | None = None
+    clone_error: str | None = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -1,31 +1,72 @@
 import asyncio
 import fnmatch
 import subprocess
-from datetime import datetime, timezone
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
+from datetime import UTC, datetime
+
+from app.agents.checkpoint import (
+    RedisCheckpointSaver,
+    clear_checkpoint,
+    get_thread_id,
+    record_node_failure,
+)
+from app.agents.graph import build_drift_analysis_graph
+from app.agents.policy_guard import validate_and_sanitize_policies
+from app.agents.state import DriftAnalysisState
 from app.core.config import settings
-from app.db.base import DriftEvent, DriftFinding, CodeChange
-from app.core.queue import task_queue
-from app.services.git_service import get_local_repo_path, pull_branches
-from app.services.github_api import update_github_check_run, get_installation_access_token
+from app.core.queue import redis_conn, task_queue
+from app.db.base import CodeChange, DriftEvent, DriftFinding
+from app.db.session import SessionLocal
+from app.services.drift_stats import set_phase
+from app.services.drift_store import drift_event_filter, load_drift_snapshot
+from app.services.git_service import diff_commits, get_local_repo_path, is_generated, run_git
+from app.services.github_api import update_github_check_run
 from app.services.notification_service import create_notification
-from app.agents.state import DriftAnalysisState
-from app.agents.graph import drift_analysis_graph
-from app.agents.policy_guard import validate_and_sanitize_policies
+from app.services.repo_clone import is_clone_pending, rehydrate_clone
+from app.services.repo_sync import ensure_pr_commits
 
 
-# Creates a separate SQLAlchemy session for use in background tasks
+# Creates a SQLAlchemy session from the shared connection pool for use in background tasks
 def _create_session():
-    engine = create_engine(settings.POSTGRES_CONNECTION_URL, pool_pre_ping=True)
-    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return Session()
+    return SessionLocal()
 
 
-# Extracts code changes and its metadata from git diff
-def _extract_and_save_code_changes(session, drift_event):
+# Builds the drift analysis graph with a Redis checkpointer
+def _build_checkpointed_graph():
+    saver = RedisCheckpointSaver(redis_conn, ttl_seconds=settings.GRAPH_CHECKPOINT_TTL_SECONDS)
+    return build_drift_analysis_graph(checkpointer=saver)
+
+
+# Returns the node a previous run of this thread stopped at, None if there is nothing to resume
+async def _get_resume_node(graph, config) -> str | None:
+    snapshot = await graph.aget_state(config)
+    return snapshot.next[0] if snapshot.next else None
+
+
+# Marks the GH check run as in progress, a failed update doesn't abort the analysis
+async def _mark_check_run_in_progress(
+    repo_full_name: str, check_run_id: int, installation_id: int
+) -> None:
+    try:
+        await update_github_check_run(
+            repo_full_name=repo_full_name,
+            check_run_id=check_run_id,
+            installation_id=installation_id,
+            status="in_progress",
+            title="Delta Drift Analysis",
+            summary="Analysing PR for documentation drift...",
+        )
+    except Exception as e:
+        print(f"Failed to update check run to in_progress: {e}")
+
+
+# Waits for a background task started earlier in the job, if there is one
+async def _wait_for(task: asyncio.Task | None) -> None:
+    if task is not None:
+        await task
+
+
+# Extracts code changes and its metadata from the PR's diff, returns the parsed per file diffs
+async def _extract_and_save_code_changes(session, drift_event):
     repo_full_name = drift_event.repository.repo_name
     base_sha = drift_event.base_sha
     head_sha = drift_event.head_sha
@@ -37,50 +78,29 @@ def _extract_and_save_code_changes(session, drift_event):
         raise Exception(f"Local repository not found at {repo_path}")
 
     try:
-        # Get a fresh access token and fetch all remote refs (only for PRs targeting the configured branch)
+        # Make sure both commits are local (only for PRs targeting the configured branch).
+        # The repo sync from the PR's webhook has usually fetched them already
         if drift_event.base_branch == drift_event.repository.target_branch:
             try:
-                installation_id = drift_event.repository.installation_id
-                access_token = asyncio.run(get_installation_access_token(installation_id))
-                head_branch = drift_event.head_branch
-                base_branch = drift_event.base_branch
-                asyncio.run(pull_branches(repo_full_name, access_token, [base_branch, head_branch]))
+                await ensure_pr_commits(
+                    repo_full_name,
+                    drift_event.repository.installation_id,
+                    drift_event.base_branch,
+                    drift_event.pr_number,
+                    [base_sha, head_sha],
+                )
             except Exception as auth_err:
                 print(f"Warning: authenticated fetch failed, trying plain fetch: {auth_err}")
-                subprocess.run(
-                    ["git", "-C", str(repo_path), "fetch", "origin"],
-                    capture_output=True,
-                    text=True,
-                    timeout=120,
-                )
-
-        # Get a list of changed files using git diff
-        result = subprocess.run(
-            ["git", "-C", str(repo_path), "diff", "--name-status", f"{base_sha}...{head_sha}"],
-            capture_output=True,
-            text=True,
-            timeout=60,
-        )
+                await run_git(["fetch", "origin"], repo_path, timeout=120)
 
-        if result.returncode != 0:
-            raise Exception(f"Git diff failed: {result.stderr}")
+        # Diff the PR once, every node reads the changed files and their hunks from this
+        file_diffs = await diff_commits(repo_path, base_sha, head_sha)
 
-        # Parse the git diff output and create CodeChange records
-        for line in result.stdout.strip().split("\n"):
-            if not line:
-                continue
+        for file_diff in file_diffs:
+            file_path = file_diff["file_path"]
 
-            parts = line.split("\t")
-            if len(parts) < 2:
-                continue
-
-            status = parts[0]
-            file_path = parts[1]
-
-            # Map git file status to change_type
-            change_type_map = {"A": "added", "M": "modified", "D": "deleted"}
-
-            change_type = change_type_map.get(status, "modified")
+            # Renames are stored as modifications of the new path, the source path stays in the diff
+            change_type = "modified" if file_diff["status"] == "renamed" else file_diff["status"]
 
             # Determine if the changed file is a code file (excluding common non-code files)
             non_code_extensions = {
@@ -98,6 +118,10 @@ def _extract_and_save_code_changes(session, drift_event):
             }
             is_code = not any(file_path.lower().endswith(ext) for ext in non_code_extensions)
 
+            # Binary and generated files (lock files, bundles, compiled protos) aren't analysed
+            if file_diff["is_binary"] or is_generated(file_diff):
+                is_code = False
+
             # Check if file matches any of the repo's ignore patterns
             ignore_patterns: list[str] = drift_event.repository.file_ignore_patterns or []
             is_ignored = any(fnmatch.fnmatch(file_path, pattern) for pattern in ignore_patterns)
@@ -105,6 +129,7 @@ def _extract_and_save_code_changes(session, drift_event):
             # Create CodeChange record in DB
             code_change = CodeChange(
                 drift_event_id=drift_event.id,
+                drift_event_created_at=drift_event.created_at,
                 file_path=file_path,
                 change_type=change_type,
                 is_code=is_code,
@@ -113,101 +138,171 @@ def _extract_and_save_code_changes(session, drift_event):
             session.add(code_change)
 
         session.commit()
+        return file_diffs
 
     except subprocess.TimeoutExpired:
         raise Exception(f"Timeout while extracting code changes for {repo_full_name}")
     except Exception as e:
         session.rollback()
-        raise Exception(f"Error extracting code changes: {str(e)}")
+        raise Exception(f"Error extracting code changes: {e!s}")
 
 
-# Main task that orchestrates the drift analysis process for a PR
-def run_drift_analysis(drift_event_id: str):
+# Main task that orchestrates the drift analysis process for a PR, the whole job runs in one event loop.
+# The drift event's ISO creation time, when given, keeps its lookups to the partition of its month
+def run_drift_analysis(drift_event_id: str, drift_event_created_at: str | None = None):
     if not drift_event_id or drift_event_id == "None":
         print(f"ERROR: invalid drift_event_id: {drift_event_id!r}")
         return
 
+    asyncio.run(_run_drift_analysis(drift_event_id, drift_event_created_at))
+
+
+# Runs the drift analysis of a PR, git, GitHub and LLM calls share the job's event loop
+async def _run_drift_analysis(drift_event_id: str, drift_event_created_at: str | None = None):
     session = _create_session()
+    graph = None
+    config = None
+    in_progress_update = None
 
     try:
-        drift_event = session.query(DriftEvent).filter(DriftEvent.id == drift_event_id).first()
+        drift_event = (
+            session.query(DriftEvent)
+            .filter(*drift_event_filter(drift_event_id, drift_event_created_at))
+            .first()
+        )
 
         if not drift_event:
             print(f"Event {drift_event_id} not found in DB. Aborting.")
             return
+        drift_event_created_at = drift_event.created_at.isoformat()
+
+        # Left queued, the clone job enqueues it again once the repo is cloned
+        if rehydrate_clone(drift_event.repository):
+            session.commit()
+        if is_clone_pending(drift_event.repository):
+            print(f"Repository of event {drift_event_id} is still being cloned. Deferring.")
+            return
 
-        drift_event.processing_phase = "analyzing"
-        drift_event.started_at = datetime.now(timezone.utc)
+        # Recorded on the repo too, the storage manager evicts the least recently used clones first
+        set_phase(session, drift_event, "analyzing")
+        drift_event.started_at = datetime.now(UTC)
+        drift_event.repository.last_used_at = drift_event.started_at
         session.commit()
 
-        # Update GH check run to in_progress
+        # Update GH check run to in_progress while the code changes are extracted
         if (
             drift_event.check_run_id
             and drift_event.repository
             and drift_event.repository.installation
         ):
-            try:
-                asyncio.run(
-                    update_github_check_run(
-                        repo_full_name=drift_event.repository.repo_name,
-                        check_run_id=drift_event.check_run_id,
-                        installation_id=drift_event.repository.installation_id,
-                        status="in_progress",
-                        title="Delta Drift Analysis",
-                        summary="Analysing PR for documentation drift...",
-                    )
+            in_progress_update = asyncio.create_task(
+                _mark_check_run_in_progress(
+                    drift_event.repository.repo_name,
+                    drift_event.check_run_id,
+                    drift_event.repository.installation_id,
                 )
-            except Exception as e:
-                print(f"Failed to update check run to in_progress: {e}")
-
-        _extract_and_save_code_changes(session, drift_event)
-
-        repo_path = get_local_repo_path(drift_event.repository.repo_name)
-
-        # Run docs_policies through a guardrail before passing to the graph
-        docs_policies = validate_and_sanitize_policies(drift_event.repository.docs_policies)
-
-        initial_state: DriftAnalysisState = {
-            "drift_event_id": str(drift_event.id),
-            "base_sha": drift_event.base_sha,
-            "head_sha": drift_event.head_sha,
-            "session": session,
-            "repo_path": str(repo_path),
-            "docs_root_path": drift_event.repository.docs_root_path,
-            "change_elements": [],
-            "analysis_payloads": [],
-            "findings": [],
-            "target_files": [],
-            "rewrite_results": [],
-            "style_preference": drift_event.repository.style_preference or "professional",
-            **({"docs_policies": docs_policies} if docs_policies else {}),
-        }
-
-        drift_analysis_graph.invoke(initial_state)
+            )
+
+        # Checkpoints are keyed by event and head commit so a retry resumes where it failed
+        thread_id = get_thread_id(str(drift_event.id), drift_event.head_sha)
+        config = {"configurable": {"thread_id": thread_id}}
+        graph = _build_checkpointed_graph()
+
+        resume_node = await _get_resume_node(graph, config)
+        if resume_node:
+            print(f"Resuming drift analysis for event {drift_event_id} at {resume_node}")
+
+            # The checkpoint already holds the snapshot, release the connection before the LLM calls
+            session.close()
+            await _wait_for(in_progress_update)
+            await graph.ainvoke(None, config)
+        else:
+            file_diffs = await _extract_and_save_code_changes(session, drift_event)
+
+            repo_path = get_local_repo_path(drift_event.repository.repo_name)
+
+            # Run docs_policies through a guardrail before passing to the graph
+            docs_policies = validate_and_sanitize_policies(drift_event.repository.docs_policies)
+
+            initial_state: DriftAnalysisState = {
+                "drift_event_id": str(drift_event.id),
+                "base_sha": drift_event.base_sha,
+                "head_sha": drift_event.head_sha,
+                "repo_path": str(repo_path),
+                "docs_root_path": drift_event.repository.docs_root_path,
+                **load_drift_snapshot(session, drift_event),
+                "file_diffs": {file_diff["file_path"]: file_diff for file_diff in file_diffs},
+                "change_elements": [],
+                "analysis_payloads": [],
+                "findings": [],
+                "target_files": [],
+                "rewrite_results": [],
+                "style_preference": drift_event.repository.style_preference or "professional",
+                **({"docs_policies": docs_policies} if docs_policies else {}),
+            }
+
+            # Nodes work from the snapshot, release the connection before the LLM calls
+            session.close()
+            await _wait_for(in_progress_update)
+            await graph.ainvoke(initial_state, config)
+
+        # The run is complete, its checkpoints are no longer needed
+        try:
+            clear_checkpoint(redis_conn, thread_id)
+        except Exception as e:
+            print(f"Failed to clear checkpoint for {thread_id}: {e}")
 
     except Exception as e:
         print(f"ERROR: {e}")
         session.rollback()
 
-        # Retry logic on first 3 failures, then is marked as failed
+        # The in_progress update must land before the failure is reported
+        await _wait_for(in_progress_update)
+
+        # Retry logic, each node gets its own budget of MAX_NODE_RETRIES before the event fails
         try:
-            drift_event = session.query(DriftEvent).filter(DriftEvent.id == drift_event_id).first()
+            drift_event = (
+                session.query(DriftEvent)
+                .filter(*drift_event_filter(drift_event_id, drift_event_created_at))
+                .first()
+            )
             if drift_event:
-                if drift_event.retry_count < 3:
-                    # Clear stale findings and code changes from the failed run
-                    session.query(DriftFinding).filter(
-                        DriftFinding.drift_event_id == drift_event.id
-                    ).delete(synchronize_session=False)
-                    session.query(CodeChange).filter(
-                        CodeChange.drift_event_id == drift_event.id
-                    ).delete(synchronize_session=False)
-
-                    # Increment retry count and reset to a clean queued state
+                thread_id = get_thread_id(str(drift_event.id), drift_event.head_sha)
+
+                # The node that failed, None if the run failed before the graph started
+                failed_node = None
+                if graph is not None and config is not None:
+                    try:
+                        failed_node = await _get_resume_node(graph, config)
+                    except Exception as state_e:
+                        print(f"Failed to load checkpoint for {thread_id}: {state_e}")
+
+                node_failures = record_node_failure(
+                    redis_conn,
+                    thread_id,
+                    failed_node or "extract_code_changes",
+                    settings.GRAPH_CHECKPOINT_TTL_SECONDS,
+                )
+
+                if node_failures <= settings.MAX_NODE_RETRIES:
+                    # Without a checkpoint the run starts over, so clear its partial results
+                    if failed_node is None:
+                        session.query(DriftFinding).filter(
+                            DriftFinding.drift_event_id == drift_event.id,
+                            DriftFinding.drift_event_created_at == drift_event.created_at,
+                        ).delete(synchronize_session=False)
+                        session.query(CodeChange).filter(
+                            CodeChange.drift_event_id == drift_event.id,
+                            CodeChange.drift_event_created_at == drift_event.created_at,
+                        ).delete(synchronize_session=False)
+
+                        drift_event.drift_result = "pending"
+                        drift_event.overall_drift_score = None
+                        drift_event.summary = None
+
+                    # Increment retry count and put the event back in the queue
                     drift_event.retry_count += 1
-                    drift_event.processing_phase = "queued"
-                    drift_event.drift_result = "pending"
-                    drift_event.overall_drift_score = None
-                    drift_event.summary = None
+                    set_phase(session, drift_event, "queued")
                     drift_event.error_message = str(e)
                     drift_event.started_at = None
                     drift_event.completed_at = None
@@ -215,13 +310,14 @@ def run_drift_analysis(drift_event_id: str):
 
                     print(
                         f"Retrying drift analysis for event {drift_event_id} "
-                        f"(attempt {drift_event.retry_count}/3)..."
+                        f"from {failed_node or 'the start'} "
+                        f"(attempt {node_failures}/{settings.MAX_NODE_RETRIES})..."
                     )
-                    task_queue.enqueue(run_drift_analysis, drift_event_id)
+                    task_queue.enqueue(run_drift_analysis, drift_event_id, drift_event_created_at)
                     return
 
-                # if retry_count >= 3, mark as permanently failed and notify the user
-                drift_event.processing_phase = "failed"
+                # Node retries exhausted, mark as permanently failed and notify the user
+                set_phase(session, drift_event, "failed")
                 drift_event.drift_result = "error"
                 drift_event.error_message = str(e)
 
@@ -232,16 +328,14 @@ def run_drift_analysis(drift_event_id: str):
                     # Update the GitHub check run to reflect failure
                     if drift_event.check_run_id:
                         try:
-                            asyncio.run(
-                                update_github_check_run(
-                                    repo_full_name=repo.repo_name,
-                                    check_run_id=drift_event.check_run_id,
-                                    installation_id=repo.installation_id,
-                                    status="completed",
-                                    conclusion="failure",
-                                    title="Delta Drift Analysis",
-                                    summary="Drift analysis could not be completed due to an internal error. Please try again after some time by clicking **Re-run all checks**.",
-                                )
+                            await update_github_check_run(
+                                repo_full_name=repo.repo_name,
+                                check_run_id=drift_event.check_run_id,
+                                installation_id=repo.installation_id,
+                                status="completed",
+                                conclusion="failure",
+                                title="Delta Drift Analysis",
+                                summary="Drift analysis could not be completed due to an internal error. Please try again after some time by clicking **Re-run all checks**.",
                             )
                         except Exception as check_run_e:
                             print(f"Failed to update check run on failure: {check_run_e}")
@@ -0,0 +1,166 @@
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.partitions import (
+    create_month_partition,
+    default_partition_name,
+    list_month_partitions,
+    month_bounds,
+    month_start,
+    next_month,
+    partition_name,
+)
+from app.db.session import SessionLocal
+from app.services.drift_stats import rebuild_drift_stats
+
+# Tables partitioned by the month their drift event was created in. Events come first, so their
+# partition exists before the rows referencing it
+DRIFT_EVENTS_TABLE = "drift_events"
+DRIFT_CHILD_TABLES = ["drift_findings", "code_changes"]
+
+
+# Column a drift table is partitioned by
+def _partition_column(table: str) -> str:
+    return "created_at" if table == DRIFT_EVENTS_TABLE else "drift_event_created_at"
+
+
+# Moves the rows of the drift tables' default partitions into partitions of their own months.
+# Rows land there when their month had no partition yet, e.g. after maintenance stopped running
+# for a while, and a month's partition can't be created while the default holds rows of it.
+# Returns the names of the created partitions
+def split_default_partitions(db: Session) -> list[str]:
+    tables = [DRIFT_EVENTS_TABLE, *DRIFT_CHILD_TABLES]
+    # Writes to the defaults wait until the split commits, so no rows slip in behind it
+    for table in tables:
+        db.execute(text(f"LOCK TABLE {default_partition_name(table)} IN EXCLUSIVE MODE"))
+
+    # Findings and code changes share the month of their drift event
+    months = (
+        db.execute(
+            text(
+                "SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') "
+                f"FROM {default_partition_name(DRIFT_EVENTS_TABLE)}"
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    names = []
+    for month in sorted(months):
+        start = month.replace(tzinfo=UTC)
+        bounds = {"start": start, "end": next_month(start)}
+        for table in tables:
+            db.execute(
+                text(
+                    f"CREATE TABLE {partition_name(table, start)} "
+                    f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+            )
+            db.execute(
+                text(
+                    f"INSERT INTO {partition_name(table, start)} "
+                    f"SELECT * FROM {default_partition_name(table)} "
+                    f"WHERE {_partition_column(table)} >= :start AND {_partition_column(table)} < :end"
+                ),
+                bounds,
+            )
+
+        # Findings and code changes leave first, their foreign key holds on to the drift events
+        for table in [*DRIFT_CHILD_TABLES, DRIFT_EVENTS_TABLE]:
+            db.execute(
+                text(
+                    f"DELETE FROM {default_partition_name(table)} "
+                    f"WHERE {_partition_column(table)} >= :start AND {_partition_column(table)} < :end"
+                ),
+                bounds,
+            )
+        for table in tables:
+            name = partition_name(table, start)
+            db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {month_bounds(start)}"))
+            names.append(name)
+    return names
+
+
+# Creates the partitions of the drift tables from the current month to the months ahead, so
+# new drift events always have a partition to land in. Returns the names of the partitions
+def ensure_drift_partitions(db: Session, now: datetime) -> list[str]:
+    names = []
+    start = month_start(now)
+    for _ in range(max(0, settings.DRIFT_PARTITION_MONTHS_AHEAD) + 1):
+        for table in [DRIFT_EVENTS_TABLE, *DRIFT_CHILD_TABLES]:
+            names.append(create_month_partition(db, table, start))
+        start = next_month(start)
+    return names
+
+
+# Detaches a partition from its table. A detached partition of findings or code changes loses
+# its foreign key too, which would otherwise keep its drift events from being detached
+def _detach_partition(db: Session, table: str, name: str) -> None:
+    db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    if table == DRIFT_EVENTS_TABLE:
+        return
+
+    foreign_keys = (
+        db.execute(
+            text(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'"
+            ),
+            {"name": name},
+        )
+        .scalars()
+        .all()
+    )
+    for foreign_key in foreign_keys:
+        db.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT "{foreign_key}"'))
+
+
+# Removes the months of drift history that ended before a time, dropping or detaching them as
+# configured. The findings and code changes of a month go before its drift events, which can't
+# leave while rows still reference them. Returns the names of the removed partitions
+def expire_drift_partitions(db: Session, before: datetime) -> list[str]:
+    expired = []
+    for table in [*DRIFT_CHILD_TABLES, DRIFT_EVENTS_TABLE]:
+        for name, start in list_month_partitions(db, table):
+            if next_month(start) > before:
+                break
+
+            _detach_partition(db, table, name)
+            if settings.DRIFT_PARTITION_EXPIRY != "detach":
+                db.execute(text(f"DROP TABLE {name}"))
+            expired.append(name)
+    return expired
+
+
+# Keeps the drift tables' partitions in step with time: splits the default partitions into
+# months, creates the upcoming months and removes the months past the history retention, then
+# recounts the dashboard counters they were part of. Run periodically by the workers' cron
+# scheduler
+def maintain_drift_partitions() -> dict:
+    now = datetime.now(UTC)
+
+    session = SessionLocal()
+    try:
+        created = split_default_partitions(session)
+        created += ensure_drift_partitions(session, now)
+        session.commit()
+
+        expired = []
+        if settings.DRIFT_HISTORY_RETENTION_DAYS > 0:
+            before = now - timedelta(days=settings.DRIFT_HISTORY_RETENTION_DAYS)
+            expired = expire_drift_partitions(session, before)
+            if expired:
+                rebuild_drift_stats(session)
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    print(f"Drift partitions maintained, expired: {expired}")
+    return {"partitions": created, "expired": expired}
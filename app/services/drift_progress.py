@@ -0,0 +1,56 @@
+import asyncio
+from collections.abc import Mapping
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.services.live_events import publish_after_commit, publish_event
+
+
+# Redis pub/sub channel the progress of every drift event of a repo is pushed on
+def repo_drift_events_channel(repo_id: UUID | str) -> str:
+    return f"repo_drift_events:{repo_id}"
+
+
+# Redis pub/sub channel the progress of a single drift event is pushed on
+def drift_event_channel(drift_event_id: UUID | str) -> str:
+    return f"drift_event:{drift_event_id}"
+
+
+# Channels an update of a drift event goes to, its repo's is skipped when the repo is unknown
+def _channels(repo_id: UUID | str | None, drift_event_id: UUID | str) -> list[str]:
+    channels = [drift_event_channel(drift_event_id)]
+    if repo_id:
+        channels.append(repo_drift_events_channel(repo_id))
+    return channels
+
+
+# Pushes the new phase of a drift event to its live streams once the session commits
+def publish_phase_change(
+    db: Session, repo_id: UUID | str | None, drift_event_id: UUID | str, phase: str
+) -> None:
+    data = {
+        "drift_event_id": str(drift_event_id),
+        "repo_id": str(repo_id) if repo_id else None,
+        "processing_phase": phase,
+    }
+    for channel in _channels(repo_id, drift_event_id):
+        publish_after_commit(db, channel, "phase", data)
+
+
+# Pushes the progress of a graph node to the live streams of the drift event straight away.
+# Progress isn't stored anywhere, so there is no transaction to wait for. Redis is called from a
+# thread, so the nodes' event loop keeps running
+async def publish_progress(state: Mapping[str, Any], node: str, done: int, total: int) -> None:
+    drift_event_id = state["drift_event_id"]
+    repo_id = state["repo_id"]
+    data = {
+        "drift_event_id": drift_event_id,
+        "repo_id": repo_id,
+        "node": node,
+        "done": done,
+        "total": total,
+    }
+    for channel in _channels(repo_id, drift_event_id):
+        await asyncio.to_thread(publish_event, channel, "progress", data)
@@ -0,0 +1,170 @@
+import json
+import uuid
+from typing import cast
+
+from sqlalchemy import distinct, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.queue import redis_conn
+from app.models.drift import DriftEvent, RepoDriftStats
+from app.models.installation import Installation
+from app.models.repository import Repository
+from app.services.drift_progress import publish_phase_change
+
+# Phase of the drift events whose docs-fix PR is waiting to be merged
+PR_WAITING_PHASE = "fix_pr_raised"
+
+# Prefix of the Redis keys the dashboard stats of each user are cached under
+_CACHE_PREFIX = "dashboard_stats"
+
+
+# Adds to the counters of a repo, creating its row the first time the repo gets a drift event
+def _increment(
+    db: Session, repo_id: uuid.UUID | None, drift_events: int = 0, pr_waiting: int = 0
+) -> None:
+    if repo_id is None or (drift_events == 0 and pr_waiting == 0):
+        return
+
+    stmt = insert(RepoDriftStats).values(
+        repo_id=repo_id,
+        drift_events_count=max(drift_events, 0),
+        pr_waiting_count=max(pr_waiting, 0),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["repo_id"],
+        set_={
+            "drift_events_count": func.greatest(
+                RepoDriftStats.drift_events_count + drift_events, 0
+            ),
+            "pr_waiting_count": func.greatest(RepoDriftStats.pr_waiting_count + pr_waiting, 0),
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+# Counts a drift event just added to a repo
+def record_drift_event_created(
+    db: Session, repo_id: uuid.UUID | None, phase: str = "queued"
+) -> None:
+    _increment(db, repo_id, drift_events=1, pr_waiting=int(phase == PR_WAITING_PHASE))
+
+
+# Moves a drift event between the counters when its docs-fix PR starts or stops waiting
+def record_phase_change(
+    db: Session, repo_id: uuid.UUID | None, old_phase: str | None, new_phase: str
+) -> None:
+    delta = int(new_phase == PR_WAITING_PHASE) - int(old_phase == PR_WAITING_PHASE)
+    _increment(db, repo_id, pr_waiting=delta)
+
+
+# Sets the processing phase of a loaded drift event and keeps the counters in step
+def set_phase(db: Session, drift_event: DriftEvent, phase: str) -> None:
+    record_phase_change(db, drift_event.repo_id, drift_event.processing_phase, phase)
+    drift_event.processing_phase = phase
+    publish_phase_change(db, drift_event.repo_id, drift_event.id, phase)
+
+
+# Recounts every repo's counters from its drift events, repairing counters that drifted.
+# Scans the whole history, so it is meant for admins, not for the request path
+def rebuild_drift_stats(db: Session) -> int:
+    counts = (
+        select(
+            DriftEvent.repo_id,
+            func.count(DriftEvent.id),
+            func.count(DriftEvent.id).filter(DriftEvent.processing_phase == PR_WAITING_PHASE),
+        )
+        .where(DriftEvent.repo_id.isnot(None))
+        .group_by(DriftEvent.repo_id)
+    )
+
+    stmt = insert(RepoDriftStats).from_select(
+        ["repo_id", "drift_events_count", "pr_waiting_count"], counts
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["repo_id"],
+        set_={
+            "drift_events_count": stmt.excluded.drift_events_count,
+            "pr_waiting_count": stmt.excluded.pr_waiting_count,
+            "updated_at": func.now(),
+        },
+    )
+    # An INSERT runs on a cursor, its result carries the number of rows written
+    rebuilt = cast(CursorResult, db.execute(stmt)).rowcount
+
+    # Repos whose drift events are all gone have no row in the recount
+    db.query(RepoDriftStats).filter(
+        ~RepoDriftStats.repo_id.in_(
+            select(DriftEvent.repo_id).where(DriftEvent.repo_id.isnot(None))
+        )
+    ).update(
+        {
+            RepoDriftStats.drift_events_count: 0,
+            RepoDriftStats.pr_waiting_count: 0,
+            RepoDriftStats.updated_at: func.now(),
+        },
+        synchronize_session=False,
+    )
+    return rebuilt
+
+
+# Number of drift events of a repo read from its counter, without scanning its history
+def get_repo_drift_events_count(db: Session, repo_id: uuid.UUID) -> int:
+    count = (
+        db.query(RepoDriftStats.drift_events_count)
+        .filter(RepoDriftStats.repo_id == repo_id)
+        .scalar()
+    )
+    return int(count or 0)
+
+
+# Counts a user's installations, linked repos, drift events and waiting docs PRs in one query.
+# Drift events are summed from the per repo counters, so the cost grows with repos, not history
+def _query_dashboard_stats(db: Session, user_id: uuid.UUID) -> dict:
+    row = (
+        db.query(
+            func.count(distinct(Installation.id)),
+            func.count(Repository.id),
+            func.coalesce(func.sum(RepoDriftStats.drift_events_count), literal_column("0")),
+            func.coalesce(func.sum(RepoDriftStats.pr_waiting_count), literal_column("0")),
+        )
+        .select_from(Installation)
+        .outerjoin(Repository, Repository.installation_id == Installation.installation_id)
+        .outerjoin(RepoDriftStats, RepoDriftStats.repo_id == Repository.id)
+        .filter(Installation.user_id == user_id)
+        .one()
+    )
+
+    return {
+        "installations_count": int(row[0] or 0),
+        "repos_linked_count": int(row[1] or 0),
+        "drift_events_count": int(row[2] or 0),
+        "pr_waiting_count": int(row[3] or 0),
+    }
+
+
+# Returns the dashboard stats of a user, served from a short lived Redis cache when possible.
+# Redis errors fall back to the database so the dashboard keeps working without the cache
+def get_user_dashboard_stats(db: Session, user_id: uuid.UUID) -> dict:
+    ttl = settings.DASHBOARD_STATS_CACHE_TTL_SECONDS
+    cache_key = f"{_CACHE_PREFIX}:{user_id}"
+
+    if ttl > 0:
+        try:
+            cached = redis_conn.get(cache_key)
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            print(f"Warning: failed to read cached dashboard stats: {e}")
+
+    stats = _query_dashboard_stats(db, user_id)
+
+    if ttl > 0:
+        try:
+            redis_conn.set(cache_key, json.dumps(stats), ex=ttl)
+        except Exception as e:
+            print(f"Warning: failed to cache dashboard stats: {e}")
+    return stats
@@ -0,0 +1,207 @@
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from typing import Any, TypedDict
+
+from sqlalchemy import ColumnElement
+from sqlalchemy.orm import Session
+
+from app.db.base import CodeChange, DriftEvent, DriftFinding
+from app.db.session import SessionLocal
+from app.services.drift_progress import publish_phase_change
+from app.services.drift_stats import record_phase_change
+from app.services.notification_service import create_notification
+
+
+# Opens a short lived session that commits on success, so no connection is held between writes
+@contextmanager
+def _session_scope() -> Iterator[Session]:
+    session = SessionLocal()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Conditions matching a drift event by id and, when known, by its creation time, so only the
+# partition of its month is read. Takes the time as an ISO string, the way jobs and the graph's
+# state carry it
+def drift_event_filter(drift_event_id: str, created_at: str | None) -> list[ColumnElement[bool]]:
+    conditions = [DriftEvent.id == drift_event_id]
+    if created_at:
+        conditions.append(DriftEvent.created_at == datetime.fromisoformat(created_at))
+    return conditions
+
+
+# Updates a drift event and keeps the dashboard counters in step with its phase change.
+# The row is locked first, so concurrent updates can't both count the same change.
+# Returns the event's creation time, None when it no longer exists
+def _update_drift_event(
+    session: Session,
+    drift_event_id: str,
+    values: dict[Any, Any],
+    drift_event_created_at: str | None = None,
+) -> datetime | None:
+    conditions = drift_event_filter(drift_event_id, drift_event_created_at)
+    current = (
+        session.query(DriftEvent.repo_id, DriftEvent.processing_phase, DriftEvent.created_at)
+        .filter(*conditions)
+        .with_for_update()
+        .first()
+    )
+    updated = (
+        session.query(DriftEvent).filter(*conditions).update(values, synchronize_session=False)
+    )
+    if not updated or current is None:
+        return None
+
+    repo_id, previous_phase, created_at = current
+    if DriftEvent.processing_phase in values:
+        phase = values[DriftEvent.processing_phase]
+        record_phase_change(session, repo_id, previous_phase, phase)
+        publish_phase_change(session, repo_id, drift_event_id, phase)
+    return created_at
+
+
+# Plain, checkpointable values of a drift event that seed the graph's state
+class DriftSnapshot(TypedDict):
+    repo_id: str
+    repo_full_name: str
+    installation_id: int
+    head_branch: str
+    pr_number: int
+    check_run_id: int | None
+    reviewer: str | None
+    user_id: str | None
+    code_changes: list[dict]
+    drift_event_created_at: str
+
+
+# Loads everything the graph needs about a drift event into plain, checkpointable values
+def load_drift_snapshot(session: Session, drift_event: DriftEvent) -> DriftSnapshot:
+    repo = drift_event.repository
+    # The GitHub calls of the graph all go through the repo's installation
+    if repo.installation_id is None:
+        raise ValueError(f"Repository {repo.repo_name} has no installation")
+    user_id = repo.installation.user_id if repo.installation else None
+
+    code_changes = (
+        session.query(CodeChange)
+        .filter(
+            CodeChange.drift_event_id == drift_event.id,
+            CodeChange.drift_event_created_at == drift_event.created_at,
+        )
+        .all()
+    )
+
+    return {
+        "repo_id": str(repo.id),
+        "repo_full_name": repo.repo_name,
+        "installation_id": repo.installation_id,
+        "head_branch": drift_event.head_branch,
+        "pr_number": drift_event.pr_number,
+        "check_run_id": drift_event.check_run_id,
+        "reviewer": repo.reviewer,
+        "user_id": str(user_id) if user_id else None,
+        "code_changes": [
+            {
+                "file_path": cc.file_path,
+                "change_type": cc.change_type,
+                "is_code": cc.is_code,
+                "is_ignored": cc.is_ignored,
+            }
+            for cc in code_changes
+        ],
+        "drift_event_created_at": drift_event.created_at.isoformat(),
+    }
+
+
+# Writes the findings, final result and user notification in one transaction.
+# Returns False when the drift event no longer exists
+def save_drift_results(
+    drift_event_id: str,
+    findings: list[dict],
+    overall_score: float,
+    drift_result: str,
+    summary: str,
+    user_id: str | None = None,
+    notification: str | None = None,
+    drift_event_created_at: str | None = None,
+) -> bool:
+    with _session_scope() as session:
+        created_at = _update_drift_event(
+            session,
+            drift_event_id,
+            {
+                DriftEvent.overall_drift_score: overall_score,
+                DriftEvent.drift_result: drift_result,
+                DriftEvent.summary: summary,
+                DriftEvent.processing_phase: "completed",
+                DriftEvent.completed_at: datetime.now(UTC),
+            },
+            drift_event_created_at,
+        )
+        if created_at is None:
+            return False
+
+        # Replace findings from an earlier attempt so a resumed run doesn't duplicate them.
+        # The event's creation time keeps both to the partition of its month
+        session.query(DriftFinding).filter(
+            DriftFinding.drift_event_id == drift_event_id,
+            DriftFinding.drift_event_created_at == created_at,
+        ).delete(synchronize_session=False)
+        session.add_all(
+            DriftFinding(
+                drift_event_id=drift_event_id,
+                drift_event_created_at=created_at,
+                code_path=f.get("code_path", ""),
+                doc_file_path=(f.get("matched_doc_paths") or [None])[0],
+                change_type=f.get("change_type"),
+                drift_type=f.get("drift_type"),
+                drift_score=f.get("drift_score"),
+                explanation=f.get("explanation"),
+                confidence=f.get("confidence"),
+            )
+            for f in findings
+        )
+
+        if user_id and notification:
+            create_notification(session, uuid.UUID(user_id), notification)
+    return True
+
+
+# Moves a drift event to a new processing phase
+def set_processing_phase(
+    drift_event_id: str, phase: str, drift_event_created_at: str | None = None
+) -> None:
+    with _session_scope() as session:
+        _update_drift_event(
+            session, drift_event_id, {DriftEvent.processing_phase: phase}, drift_event_created_at
+        )
+
+
+# Stores the raised docs PR on the drift event and notifies the user in one transaction
+def save_docs_pr(
+    drift_event_id: str,
+    docs_pr_number: int,
+    user_id: str | None = None,
+    notification: str | None = None,
+    drift_event_created_at: str | None = None,
+) -> None:
+    with _session_scope() as session:
+        _update_drift_event(
+            session,
+            drift_event_id,
+            {
+                DriftEvent.docs_pr_number: docs_pr_number,
+                DriftEvent.processing_phase: "fix_pr_raised",
+            },
+            drift_event_created_at,
+        )
+        if user_id and notification:
+            create_notification(session, uuid.UUID(user_id), notification)
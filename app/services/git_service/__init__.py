@@ -1,14 +1,30 @@
-from .utils import get_local_repo_path
-from .repository import clone_repository, remove_cloned_repository
-from .branches import pull_branches, create_docs_branch, commit_and_push_docs_branch
 from app.core.config import settings
 
+from .branches import commit_and_push_docs_branch, create_docs_branch
+from .diff import diff_commits, is_generated, parse_diff, summarise_patch
+from .objects import list_files, read_blob_sizes, read_blobs, split_by_size
+from .refs import fetch_refs, has_commits, merge_base
+from .repository import clone_repository, remove_cloned_repository
+from .runner import run_git
+from .utils import get_local_repo_path
+
 __all__ = [
-    "get_local_repo_path",
     "clone_repository",
-    "remove_cloned_repository",
-    "pull_branches",
-    "create_docs_branch",
     "commit_and_push_docs_branch",
+    "create_docs_branch",
+    "diff_commits",
+    "fetch_refs",
+    "get_local_repo_path",
+    "has_commits",
+    "is_generated",
+    "list_files",
+    "merge_base",
+    "parse_diff",
+    "read_blob_sizes",
+    "read_blobs",
+    "remove_cloned_repository",
+    "run_git",
     "settings",
+    "split_by_size",
+    "summarise_patch",
 ]
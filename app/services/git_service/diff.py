@@ -0,0 +1,322 @@
+import codecs
+import fnmatch
+import re
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.git_service.runner import run_git
+
+# Path patterns of tool made files (lock files, minified bundles, compiled protos, vendored code)
+_GENERATED_PATTERNS = (
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.lock",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*.generated.*",
+    "dist/*",
+    "build/*",
+    "vendor/*",
+    "node_modules/*",
+)
+
+# Markers code generators leave at the top of the files they write, by convention: a comment
+# line opening with @generated, or Go's "Code generated ... DO NOT EDIT."
+_GENERATED_MARKER = re.compile(r"^\W*(?:@generated\b|Code generated .* DO NOT EDIT\.)")
+
+# Number of leading lines of a new file searched for a generator marker
+_GENERATED_MARKER_LINES = 5
+
+# Added lines longer than this on average are taken as minified code
+_MINIFIED_LINE_LENGTH = 500
+
+# Headers of the hunks left out of a summarised patch that are still listed
+_MAX_OMITTED_HUNKS_LISTED = 20
+
+# Matches hunk headers like "@@ -12,7 +12,9 @@ def handler():", counts default to 1 when omitted
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+
+
+# Decodes a path git quoted because of special characters, like "a/t\303\251st.py"
+def _unquote(path: str) -> str:
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+
+    raw = codecs.escape_decode(path[1:-1].encode("utf-8"))[0]
+    return raw.decode("utf-8", errors="replace")
+
+
+# Strips the a/ or b/ prefix from a path of the diff header, None for /dev/null
+def _strip_prefix(path: str) -> str | None:
+    # Git ends the ---/+++ paths with a tab when they contain spaces
+    path = _unquote(path.rstrip("\t"))
+    if path == "/dev/null":
+        return None
+    return path[2:] if path[:2] in ("a/", "b/") else path
+
+
+# Recovers the path from a "diff --git a/<path> b/<path>" line, where both sides are the same path
+def _path_from_git_header(line: str) -> str:
+    rest = line[len("diff --git ") :]
+    if rest.startswith('"'):
+        return _strip_prefix(rest[: rest.index('" ', 1) + 1]) or ""
+    return rest[2 : 2 + (len(rest) - 5) // 2]
+
+
+# Parses one file's section of a patch into its status, paths, hunks and line counts
+def _parse_file_diff(lines: list[str]) -> dict:
+    old_path: str | None = None
+    new_path: str | None = None
+    rename_from: str | None = None
+    rename_to: str | None = None
+    status = "modified"
+    similarity: int | None = None
+    is_binary = False
+    hunks: list[dict] = []
+    additions = 0
+    deletions = 0
+
+    for line in lines[1:]:
+        if hunks:
+            if line.startswith("+"):
+                additions += 1
+            elif line.startswith("-"):
+                deletions += 1
+
+        match = _HUNK_HEADER.match(line) if line.startswith("@@") else None
+        if match:
+            old_start, old_lines, new_start, new_lines, section = match.groups()
+            hunks.append(
+                {
+                    "old_start": int(old_start),
+                    "old_lines": int(old_lines) if old_lines is not None else 1,
+                    "new_start": int(new_start),
+                    "new_lines": int(new_lines) if new_lines is not None else 1,
+                    "section": section,
+                }
+            )
+        elif hunks:
+            continue
+        elif line.startswith("new file mode"):
+            status = "added"
+        elif line.startswith("deleted file mode"):
+            status = "deleted"
+        elif line.startswith("rename from "):
+            rename_from = _unquote(line[len("rename from ") :])
+        elif line.startswith("rename to "):
+            rename_to = _unquote(line[len("rename to ") :])
+        elif line.startswith("similarity index "):
+            similarity = int(line[len("similarity index ") :].rstrip("%"))
+        elif line.startswith("--- "):
+            old_path = _strip_prefix(line[4:])
+        elif line.startswith("+++ "):
+            new_path = _strip_prefix(line[4:])
+        elif line.startswith("Binary files ") or line == "GIT binary patch":
+            is_binary = True
+
+    if rename_from is not None:
+        status = "renamed"
+
+    header_path = _path_from_git_header(lines[0])
+    file_path = rename_to or new_path or old_path or header_path
+    return {
+        "file_path": file_path,
+        "old_path": rename_from,
+        "status": status,
+        "similarity": similarity,
+        "is_binary": is_binary,
+        "hunks": hunks,
+        "additions": additions,
+        "deletions": deletions,
+        "patch": "".join(f"{line}\n" for line in lines),
+    }
+
+
+# Statuses of the --raw output, anything else (modified, type changed) is a modification
+_RAW_STATUSES = {"A": "added", "D": "deleted", "R": "renamed"}
+
+
+# Splits a git diff -z --raw --numstat output into one entry per changed file, with its status,
+# paths and line counts but no patch. Both lists come in the same order, numstat after raw
+def _parse_probe(output: str) -> list[dict]:
+    tokens = output.split("\0")
+    entries: list[dict] = []
+    counts: list[tuple[str, str]] = []
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith(":"):
+            # ":<modes> <shas> R086", the paths follow, the source first for a rename
+            status = token.rsplit(" ", 1)[-1]
+            renamed = status[0] == "R"
+            entries.append(
+                {
+                    "file_path": tokens[i + 2] if renamed else tokens[i + 1],
+                    "old_path": tokens[i + 1] if renamed else None,
+                    "status": _RAW_STATUSES.get(status[0], "modified"),
+                    "similarity": int(status[1:]) if renamed and status[1:] else None,
+                    "is_binary": False,
+                    "hunks": [],
+                    "additions": 0,
+                    "deletions": 0,
+                    "patch": None,
+                }
+            )
+            i += 3 if renamed else 2
+        elif token:
+            # "<added>\t<deleted>\t<path>", the path is empty and both paths follow for a rename
+            additions, deletions, path = token.split("\t", 2)
+            counts.append((additions, deletions))
+            i += 1 if path else 3
+        else:
+            i += 1
+
+    for entry, (additions, deletions) in zip(entries, counts):
+        # Binary files have no line counts
+        entry["is_binary"] = additions == "-"
+        entry["additions"] = int(additions) if additions != "-" else 0
+        entry["deletions"] = int(deletions) if deletions != "-" else 0
+    return entries
+
+
+# Splits a git diff --patch output into one parsed entry per changed file
+def parse_diff(output: str) -> list[dict]:
+    file_diffs: list[dict] = []
+    current: list[str] = []
+
+    # Split on \n only, as file contents may hold \r or other line breaks splitlines() would cut at
+    lines = output.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+
+    for line in lines:
+        # Hunk lines always start with a space, + or -, so this only matches file headers
+        if line.startswith("diff --git "):
+            if current:
+                file_diffs.append(_parse_file_diff(current))
+            current = [line]
+        elif current:
+            current.append(line)
+
+    if current:
+        file_diffs.append(_parse_file_diff(current))
+    return file_diffs
+
+
+# Diffs what a PR changed (base...head, from the merge base) detecting renames. The changed files
+# are probed first, binary and generated files get no patch, and the other patches are
+# summarised to the diff caps. Raises when git fails or times out, as there is nothing
+# to analyse without the diff
+async def diff_commits(repo_path: str | Path, base_sha: str, head_sha: str) -> list[dict]:
+    options = ["-c", "core.quotePath=false", "diff", "-M", "--no-color", "--no-ext-diff"]
+    commits = f"{base_sha}...{head_sha}"
+
+    result = await run_git([*options, "-z", "--raw", "--numstat", commits], repo_path, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"Git diff failed: {result.stderr}")
+    entries = _parse_probe(result.stdout)
+
+    # Files over the caps keep their patch, it is summarised below
+    skipped = [
+        entry for entry in entries if entry["is_binary"] or _is_generated_path(entry["file_path"])
+    ]
+    if len(skipped) == len(entries):
+        return entries
+
+    # Both sides of a skipped rename are left out, so the rest pair up as in the probe
+    excluded = [
+        f":(exclude,literal){path}"
+        for entry in skipped
+        for path in (entry["file_path"], entry["old_path"])
+        if path is not None
+    ]
+    result = await run_git(
+        [
+            *options,
+            "--patch",
+            "--no-textconv",
+            "--src-prefix=a/",
+            "--dst-prefix=b/",
+            commits,
+            "--",
+            *excluded,
+        ],
+        repo_path,
+        timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Git diff failed: {result.stderr}")
+
+    patched = {file_diff["file_path"]: file_diff for file_diff in parse_diff(result.stdout)}
+    for file_diff in patched.values():
+        file_diff["patch"] = summarise_patch(
+            file_diff, settings.MAX_DIFF_BYTES, settings.MAX_DIFF_LINES
+        )
+    return [patched.get(entry["file_path"], entry) for entry in entries]
+
+
+# Checks whether a path matches the patterns of tool made files
+def _is_generated_path(file_path: str) -> bool:
+    name = file_path.rsplit("/", 1)[-1]
+    return any(
+        fnmatch.fnmatch(file_path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in _GENERATED_PATTERNS
+    )
+
+
+# Checks whether a changed file was produced by a tool rather than written by hand, from its path,
+# a generator marker at the top of the file or added lines as long as minified code
+def is_generated(file_diff: dict) -> bool:
+    if _is_generated_path(file_diff["file_path"]):
+        return True
+
+    added = [
+        line[1:]
+        for line in (file_diff["patch"] or "").split("\n")
+        if line.startswith("+") and not line.startswith("+++ ")
+    ]
+    if not added:
+        return False
+
+    # The marker is only trusted in the first lines of a hunk starting at the top of the file
+    hunks = file_diff["hunks"]
+    if (
+        hunks
+        and hunks[0]["new_start"] <= 1
+        and any(_GENERATED_MARKER.match(line) for line in added[:_GENERATED_MARKER_LINES])
+    ):
+        return True
+
+    return sum(len(line) for line in added) / len(added) > _MINIFIED_LINE_LENGTH
+
+
+# Returns the patch of a file cut down to the byte and line caps. An over limit patch keeps its
+# leading lines up to the caps, followed by the totals and the headers of the hunks left out
+def summarise_patch(file_diff: dict, max_bytes: int, max_lines: int) -> str:
+    patch = file_diff["patch"]
+    if len(patch.encode("utf-8")) <= max_bytes and patch.count("\n") <= max_lines:
+        return patch
+
+    kept: list[str] = []
+    size = 0
+    lines = patch.split("\n")
+    for line in lines:
+        size += len(line.encode("utf-8")) + 1
+        if size > max_bytes or len(kept) >= max_lines:
+            break
+        kept.append(line)
+
+    omitted = [line for line in lines[len(kept) :] if _HUNK_HEADER.match(line)]
+    return (
+        "\n".join(kept)
+        + "\n... diff truncated, "
+        + f"+{file_diff['additions']} -{file_diff['deletions']} lines in total"
+        + f" and {len(omitted)} more hunk(s) not shown:\n"
+        + "".join(f"{header}\n" for header in omitted[:_MAX_OMITTED_HUNKS_LISTED])
+    )
@@ -0,0 +1,123 @@
+import subprocess
+from pathlib import Path
+
+from app.services.git_service.runner import run_git
+
+
+# Splits git cat-file --batch output into one entry per requested object.
+# Each entry is the raw blob, or None when the object is missing or isn't a blob
+def _parse_batch_output(output: bytes, count: int) -> list[bytes | None]:
+    contents: list[bytes | None] = []
+    position = 0
+
+    for _ in range(count):
+        header_end = output.find(b"\n", position)
+        if header_end == -1:
+            break
+        header = output[position:header_end]
+        position = header_end + 1
+
+        # Missing objects are reported as "<name> missing" with no content following
+        if header.endswith((b" missing", b" ambiguous")):
+            contents.append(None)
+            continue
+
+        _, object_type, size = header.split(b" ")
+        content = output[position : position + int(size)]
+        position += int(size) + 1
+        contents.append(content if object_type == b"blob" else None)
+
+    return contents + [None] * (count - len(contents))
+
+
+# Reads files as they are at a commit straight from the object store, the working tree is never touched.
+# One git cat-file --batch process serves every path, missing and binary files map to None
+async def read_blobs(
+    repo_path: str | Path, commit_sha: str, file_paths: list[str]
+) -> dict[str, str | None]:
+    if not file_paths:
+        return {}
+
+    request = "".join(f"{commit_sha}:{file_path}\n" for file_path in file_paths)
+    try:
+        result = await run_git(
+            ["cat-file", "--batch"],
+            repo_path,
+            timeout=60,
+            input=request.encode("utf-8"),
+            text=False,
+        )
+    except subprocess.TimeoutExpired:
+        print(f"Timeout while reading files at {commit_sha}")
+        return {file_path: None for file_path in file_paths}
+
+    if result.returncode != 0:
+        print(f"Failed to read files at {commit_sha}: {result.stderr.decode(errors='replace')}")
+        return {file_path: None for file_path in file_paths}
+
+    blobs: dict[str, str | None] = {}
+    for file_path, content in zip(file_paths, _parse_batch_output(result.stdout, len(file_paths))):
+        try:
+            blobs[file_path] = content.decode("utf-8") if content is not None else None
+        except UnicodeDecodeError:
+            blobs[file_path] = None
+    return blobs
+
+
+# Reads the size of files at a commit without loading them, like git cat-file -s for every path.
+# One git cat-file --batch-check process serves every path, missing files and directories are None
+async def read_blob_sizes(
+    repo_path: str | Path, commit_sha: str, file_paths: list[str]
+) -> dict[str, int | None]:
+    if not file_paths:
+        return {}
+
+    request = "".join(f"{commit_sha}:{file_path}\n" for file_path in file_paths)
+    try:
+        result = await run_git(
+            ["cat-file", "--batch-check"], repo_path, timeout=60, input=request.encode("utf-8")
+        )
+    except subprocess.TimeoutExpired:
+        print(f"Timeout while probing file sizes at {commit_sha}")
+        return {file_path: None for file_path in file_paths}
+
+    if result.returncode != 0:
+        print(f"Failed to probe file sizes at {commit_sha}: {result.stderr}")
+        return {file_path: None for file_path in file_paths}
+
+    # Each line is "<sha> <type> <size>", or "<name> missing" when the path isn't in the commit
+    sizes: dict[str, int | None] = {file_path: None for file_path in file_paths}
+    for file_path, line in zip(file_paths, result.stdout.split("\n")):
+        parts = line.split(" ")
+        if len(parts) == 3 and parts[1] == "blob":
+            sizes[file_path] = int(parts[2])
+    return sizes
+
+
+# Splits the paths of a commit into those small enough to read and those over the byte cap.
+# Missing files land in neither list
+async def split_by_size(
+    repo_path: str | Path, commit_sha: str, file_paths: list[str], max_bytes: int
+) -> tuple[list[str], list[str]]:
+    sizes = await read_blob_sizes(repo_path, commit_sha, file_paths)
+    within = [path for path, size in sizes.items() if size is not None and size <= max_bytes]
+    over = [path for path, size in sizes.items() if size is not None and size > max_bytes]
+    return within, over
+
+
+# Lists the files under a directory of a commit's tree, relative to the repo root
+async def list_files(repo_path: str | Path, commit_sha: str, directory: str = "") -> list[str]:
+    pathspec = ["--", directory] if directory else []
+    try:
+        result = await run_git(
+            ["ls-tree", "-r", "-z", "--name-only", commit_sha, *pathspec], repo_path, timeout=60
+        )
+    except subprocess.TimeoutExpired:
+        print(f"Timeout while listing files at {commit_sha}")
+        return []
+
+    if result.returncode != 0:
+        print(f"Failed to list files at {commit_sha}: {result.stderr}")
+        return []
+
+    return [file_path for file_path in result.stdout.split("\0") if file_path]
@@ -0,0 +1,145 @@
+import asyncio
+import re
+import subprocess
+import weakref
+from collections.abc import Callable
+from pathlib import Path
+
+from app.core.config import settings
+
+# Host every remote points at, network commands are throttled per host
+GITHUB_HOST = "github.com"
+
+# Git subcommands that talk to the remote
+NETWORK_COMMANDS = {"clone", "fetch", "pull", "push", "ls-remote"}
+
+# Git progress output rewrites the same line with \r, so split on both
+_LINE_BREAK = re.compile(r"[\r\n]")
+
+# Per event loop semaphores, as worker jobs each run on their own loop
+_host_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+# Returns the git subcommand, skipping any leading -c key=value options
+def _subcommand(args: list[str]) -> str | None:
+    skip_next = False
+    for arg in args:
+        if skip_next:
+            skip_next = False
+        elif arg in ("-c", "-C"):
+            skip_next = True
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+# Returns the semaphore bounding concurrent network commands against a host
+def _host_semaphore(host: str) -> asyncio.Semaphore:
+    semaphores = _host_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if host not in semaphores:
+        semaphores[host] = asyncio.Semaphore(settings.GIT_MAX_CONCURRENT_PER_HOST)
+    return semaphores[host]
+
+
+# Reads a stream to the end, passing each complete line to on_output as it arrives
+async def _read_stream(
+    stream: asyncio.StreamReader, on_output: Callable[[str], None] | None
+) -> bytes:
+    output = bytearray()
+    pending = ""
+    while chunk := await stream.read(4096):
+        output.extend(chunk)
+        if on_output is None:
+            continue
+
+        *lines, pending = _LINE_BREAK.split(pending + chunk.decode("utf-8", errors="replace"))
+        for line in lines:
+            if line:
+                on_output(line)
+
+    if on_output is not None and pending:
+        on_output(pending)
+    return bytes(output)
+
+
+# Kills git and reaps it so no orphaned process is left holding the repo lock
+async def _kill(process: asyncio.subprocess.Process) -> None:
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+    await process.wait()
+
+
+# Spawns git and collects its output, streaming lines to on_output when given
+async def _execute(
+    cmd: list[str],
+    timeout: float,
+    on_output: Callable[[str], None] | None,
+    input: bytes | None,
+    text: bool,
+) -> subprocess.CompletedProcess:
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if input is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    try:
+        if on_output is None:
+            stdout, stderr = await asyncio.wait_for(process.communicate(input), timeout)
+        else:
+            # Both pipes were requested above, so the streams are always set
+            assert process.stdout is not None and process.stderr is not None
+            stdout, stderr, _ = await asyncio.wait_for(
+                asyncio.gather(
+                    _read_stream(process.stdout, on_output),
+                    _read_stream(process.stderr, on_output),
+                    process.wait(),
+                ),
+                timeout,
+            )
+    except TimeoutError:
+        await _kill(process)
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except asyncio.CancelledError:
+        await _kill(process)
+        raise
+
+    # git has exited here, its return code is set
+    returncode = process.returncode or 0
+    if not text:
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    return subprocess.CompletedProcess(
+        cmd,
+        returncode,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+    )
+
+
+# Runs a git command without blocking the event loop.
+# Mirrors subprocess.run: returns a CompletedProcess and raises TimeoutExpired after killing git.
+# Cancelling the awaiting task kills git too, and network commands wait for a per host slot.
+# input is written to git's stdin, and text=False keeps the output as raw bytes
+async def run_git(
+    args: list[str],
+    repo_path: str | Path | None = None,
+    timeout: float = 60,
+    on_output: Callable[[str], None] | None = None,
+    input: bytes | None = None,
+    text: bool = True,
+) -> subprocess.CompletedProcess:
+    # Streamed output is read line by line alongside git, stdin is only written through communicate
+    if input is not None and on_output is not None:
+        raise ValueError("run_git can't stream output of a command that reads stdin")
+
+    cmd = ["git", *(["-C", str(repo_path)] if repo_path else []), *args]
+
+    if _subcommand(args) not in NETWORK_COMMANDS:
+        return await _execute(cmd, timeout, on_output, input, text)
+
+    async with _host_semaphore(GITHUB_HOST):
+        return await _execute(cmd, timeout, on_output, input, text)
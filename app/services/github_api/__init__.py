@@ -1,4 +1,7 @@
-from app.services.github_api.auth import get_installation_access_token
+from app.services.github_api.auth import (
+    forget_installation_access_token,
+    get_installation_access_token,
+)
 from app.services.github_api.check_runs import (
     create_queued_check_run,
     create_skipped_check_run,
@@ -6,20 +9,21 @@ from app.services.github_api.check_runs import (
     update_github_check_run,
 )
 from app.services.github_api.repos import (
-    get_repo_details,
+    create_docs_pull_request,
     get_commit,
+    get_repo_details,
     request_pr_review,
-    create_docs_pull_request,
 )
 
 __all__ = [
-    "get_installation_access_token",
+    "create_docs_pull_request",
     "create_queued_check_run",
     "create_skipped_check_run",
     "create_success_check_run",
-    "update_github_check_run",
-    "get_repo_details",
+    "forget_installation_access_token",
     "get_commit",
+    "get_installation_access_token",
+    "get_repo_details",
     "request_pr_review",
-    "create_docs_pull_request",
+    "update_github_check_run",
 ]
@@ -1,12 +1,42 @@
 import time
-import jwt
-import httpx
+from datetime import datetime
 from pathlib import Path
+
+import httpx
+import jwt
+
 from app.core.config import settings
 
+# Installation tokens minted by this process, by installation id, with the time they expire at
+_token_cache: dict[int, tuple[str, float]] = {}
+
+# Cached tokens are minted again this long before GitHub expires them
+_TOKEN_EXPIRY_MARGIN_SECONDS = 5 * 60
+
+# Lifetime assumed when GitHub doesn't say when a token expires (tokens last an hour)
+_DEFAULT_TOKEN_LIFETIME_SECONDS = 60 * 60
 
-# Get GitHub installation Access Token with Signed JWT for API calls
+
+# Reads the expiry time of a token from GitHub's expires_at, like "2016-07-11T22:14:10Z"
+def _token_expires_at(data: dict) -> float:
+    try:
+        return datetime.fromisoformat(data["expires_at"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return time.time() + _DEFAULT_TOKEN_LIFETIME_SECONDS
+
+
+# Drops the cached token of an installation, for tokens GitHub rejected before they expired
+def forget_installation_access_token(installation_id: int) -> None:
+    _token_cache.pop(installation_id, None)
+
+
+# Get GitHub installation Access Token with Signed JWT for API calls.
+# Tokens are reused until shortly before they expire instead of being minted for every call
 async def get_installation_access_token(installation_id: int) -> str:
+    cached = _token_cache.get(installation_id)
+    if cached and cached[1] - _TOKEN_EXPIRY_MARGIN_SECONDS > time.time():
+        return cached[0]
+
     # Load the Private Key from file
     try:
         key_path = Path(settings.GITHUB_PRIVATE_KEY_PATH)
@@ -38,4 +68,6 @@ async def get_installation_access_token(installation_id: int) -> str:
         if token_res.status_code != 201:
             raise Exception(f"Token Error: {token_res.text}")
 
-        return token_res.json()["token"]
+        data = token_res.json()
+        _token_cache[installation_id] = (data["token"], _token_expires_at(data))
+        return data["token"]
@@ -1,34 +1,62 @@
 import httpx
-from app.services.github_api.auth import get_installation_access_token
 
+from app.services.github_api.auth import (
+    forget_installation_access_token,
+    get_installation_access_token,
+)
 
-# Fetches repository details from GitHub API
-async def get_repo_details(installation_id: int, owner: str, repo_name: str):
+
+# Fetches repository details from GitHub API. With the ETag of the last fetch GitHub answers 304
+# when nothing changed, returned as None, and such requests don't count against the rate limit
+async def get_repo_details(
+    installation_id: int,
+    owner: str,
+    repo_name: str,
+    etag: str | None = None,
+    client: httpx.AsyncClient | None = None,
+) -> dict | None:
     access_token = await get_installation_access_token(installation_id)
 
-    async with httpx.AsyncClient() as client:
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/vnd.github+json",
+    }
+    if etag:
+        headers["If-None-Match"] = etag
+
+    # Callers fetching several repos pass their own client so the connections are shared
+    if client is None:
+        async with httpx.AsyncClient() as own_client:
+            repo_res = await own_client.get(
+                f"https://api.github.com/repos/{owner}/{repo_name}", headers=headers
+            )
+    else:
         repo_res = await client.get(
-            f"https://api.github.com/repos/{owner}/{repo_name}",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github+json",
-            },
+            f"https://api.github.com/repos/{owner}/{repo_name}", headers=headers
         )
 
-        if repo_res.status_code != 200:
-            raise Exception(f"GitHub API Error: {repo_res.text}")
+    if repo_res.status_code == 304:
+        return None
+
+    if repo_res.status_code == 401:
+        # The cached token was revoked, the next call mints a new one
+        forget_installation_access_token(installation_id)
+
+    if repo_res.status_code != 200:
+        raise Exception(f"GitHub API Error: {repo_res.text}")
 
-        # Fetches details about the repository to display in dashboard
-        data = repo_res.json()
+    # Fetches details about the repository to display in dashboard
+    data = repo_res.json()
 
-        return {
-            "name": data.get("full_name"),
-            "description": data.get("description"),
-            "language": data.get("language"),
-            "stargazers_count": data.get("stargazers_count"),
-            "forks_count": data.get("forks_count"),
-            "avatar_url": (data.get("owner") or {}).get("avatar_url"),
-        }
+    return {
+        "name": data.get("full_name"),
+        "description": data.get("description"),
+        "language": data.get("language"),
+        "stargazers_count": data.get("stargazers_count"),
+        "forks_count": data.get("forks_count"),
+        "avatar_url": (data.get("owner") or {}).get("avatar_url"),
+        "etag": repo_res.headers.get("ETag"),
+    }
 
 
 # Creates a Pull Request for auto-generated documentation updates
@@ -86,7 +114,7 @@ async def create_docs_pull_request(
                 return None
 
     except Exception as e:
-        print(f"Exception in create_docs_pull_request: {str(e)}")
+        print(f"Exception in create_docs_pull_request: {e!s}")
         return None
 
 
@@ -117,7 +145,7 @@ async def request_pr_review(
             return True
 
     except Exception as e:
-        print(f"Exception in request_pr_review: {str(e)}")
+        print(f"Exception in request_pr_review: {e!s}")
         return False
 
 
@@ -142,5 +170,5 @@ async def get_commit(installation_id: int, repo_full_name: str, sha: str) -> dic
             return res.json()
 
     except Exception as e:
-        print(f"Exception in get_commit: {str(e)}")
+        print(f"Exception in get_commit: {e!s}")
         return None
@@ -1,11 +1,14 @@
 from sqlalchemy.orm import Session
 
+from app.agents.checkpoint import clear_checkpoint, get_thread_id
+from app.core.queue import redis_conn, task_queue
+from app.models.drift import CodeChange, DriftEvent, DriftFinding
 from app.models.installation import Installation
-from app.models.drift import DriftEvent, DriftFinding, CodeChange
-from app.services.github_api import create_queued_check_run
-from app.core.queue import task_queue
 from app.services.drift_analysis import run_drift_analysis
+from app.services.drift_stats import set_phase
+from app.services.github_api import create_queued_check_run
 from app.services.notification_service import create_notification
+from app.services.repo_clone import is_clone_pending, rehydrate_clone
 
 
 # Handle when a user clicks "Re-run all checks" in the linked repo
@@ -35,15 +38,23 @@ async def _handle_check_suite_rerequested(db: Session, payload: dict):
     drift_event_id = str(drift_event.id)
 
     # Clear all stale findings and code changes from previous run
-    db.query(DriftFinding).filter(DriftFinding.drift_event_id == drift_event.id).delete(
-        synchronize_session=False
-    )
-    db.query(CodeChange).filter(CodeChange.drift_event_id == drift_event.id).delete(
-        synchronize_session=False
-    )
+    db.query(DriftFinding).filter(
+        DriftFinding.drift_event_id == drift_event.id,
+        DriftFinding.drift_event_created_at == drift_event.created_at,
+    ).delete(synchronize_session=False)
+    db.query(CodeChange).filter(
+        CodeChange.drift_event_id == drift_event.id,
+        CodeChange.drift_event_created_at == drift_event.created_at,
+    ).delete(synchronize_session=False)
+
+    # Drop checkpoints and node failure counts so the re-run starts from scratch
+    try:
+        clear_checkpoint(redis_conn, get_thread_id(drift_event_id, drift_event.head_sha))
+    except Exception as e:
+        print(f"Warning: failed to clear checkpoint for {drift_event_id}: {e}")
 
     # Reset the drift event back to a clean queued state
-    drift_event.processing_phase = "queued"
+    set_phase(db, drift_event, "queued")
     drift_event.drift_result = "pending"
     drift_event.overall_drift_score = None
     drift_event.summary = None
@@ -51,6 +62,7 @@ async def _handle_check_suite_rerequested(db: Session, payload: dict):
     drift_event.started_at = None
     drift_event.completed_at = None
     drift_event.check_run_id = None
+    drift_event.retry_count = 0
     db.flush()
 
     # Create a fresh GitHub check run
@@ -58,8 +70,12 @@ async def _handle_check_suite_rerequested(db: Session, payload: dict):
         db, drift_event_id, repo_full_name, drift_event.head_sha, installation_id
     )
 
-    # Re-enqueue the drift analysis job
-    task_queue.enqueue(run_drift_analysis, drift_event_id)
+    # Re-enqueue the drift analysis job, unless it has to wait for the repo's clone
+    rehydrate_clone(drift_event.repository)
+    if is_clone_pending(drift_event.repository):
+        print(f"Deferring drift analysis of {repo_full_name} until its clone is ready.")
+    else:
+        task_queue.enqueue(run_drift_analysis, drift_event_id, drift_event.created_at.isoformat())
 
     # Notify the user that drift analysis has been re-queued on their request
     installation = (
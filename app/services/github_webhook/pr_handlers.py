@@ -1,17 +1,38 @@
+from datetime import UTC, datetime
+
 from sqlalchemy.orm import Session
 
+from app.core.queue import task_queue
+from app.models.drift import CodeChange, DriftEvent, DriftFinding
 from app.models.installation import Installation
 from app.models.repository import Repository
-from app.models.drift import DriftEvent, DriftFinding, CodeChange
+from app.services.drift_analysis import run_drift_analysis
+from app.services.drift_progress import publish_phase_change
+from app.services.drift_stats import record_drift_event_created, set_phase
 from app.services.github_api import (
     create_queued_check_run,
     create_skipped_check_run,
     create_success_check_run,
     get_commit,
 )
-from app.core.queue import task_queue
-from app.services.drift_analysis import run_drift_analysis
-from app.services.notification_service import create_notification
+from app.services.notification_service import create_notification, drift_queued_group
+from app.services.repo_clone import is_clone_pending, rehydrate_clone
+from app.services.repo_sync import sync_repository
+
+
+# Enqueues the drift analysis of a PR, deferred while the repo's clone is pending or was evicted.
+# The repo sync goes first so the drift job finds its commits locally
+def _enqueue_drift_analysis(repo: Repository, drift_event_id: str, created_at: datetime):
+    rehydrate_clone(repo)
+    if is_clone_pending(repo):
+        print(f"Deferring drift analysis of {repo.repo_name} until its clone is ready.")
+        return
+
+    try:
+        task_queue.enqueue(sync_repository, str(repo.id))
+    except Exception as e:
+        print(f"Failed to enqueue sync for repository {repo.repo_name}: {e!s}")
+    task_queue.enqueue(run_drift_analysis, drift_event_id, created_at.isoformat())
 
 
 # Handle pr_opened webhook event
@@ -72,10 +93,14 @@ async def _handle_pr_opened(db: Session, payload: dict):
         head_sha=payload["pull_request"]["head"]["sha"],
         processing_phase="queued",
         drift_result="pending",
+        # Set here rather than by the DB, the drift job is enqueued with it to find the partition
+        created_at=datetime.now(UTC),
     )
     db.add(new_event)
     db.flush()
     db.refresh(new_event)
+    record_drift_event_created(db, repo.id)
+    publish_phase_change(db, repo.id, new_event.id, "queued")
 
     drift_event_id = str(new_event.id)
 
@@ -86,11 +111,11 @@ async def _handle_pr_opened(db: Session, payload: dict):
 
     # Enqueue the drift analysis as a background task
     if drift_event_id and drift_event_id != "None":
-        task_queue.enqueue(run_drift_analysis, drift_event_id)
+        _enqueue_drift_analysis(repo, drift_event_id, new_event.created_at)
     else:
         print(f"Error: DriftEvent ID is None for PR #{payload['number']} in {repo_full_name}.")
 
-    # Notify the user that the PR has been queued for drift analysis
+    # Notify the user that the PR has been queued for drift analysis, merged with other queued PRs
     installation = (
         db.query(Installation).filter(Installation.installation_id == installation_id).first()
     )
@@ -99,6 +124,7 @@ async def _handle_pr_opened(db: Session, payload: dict):
             db,
             installation.user_id,
             f"PR #{payload['number']} opened in {repo_full_name} has been received and queued for drift analysis.",
+            **drift_queued_group(repo_full_name),
         )
 
 
@@ -160,7 +186,7 @@ async def _handle_pr_synchronize(db: Session, payload: dict):
                 is_merge_commit = len(parents) >= 2
                 mentions_docs_pr = f"#{existing_event.docs_pr_number}" in commit_message
                 if is_merge_commit and mentions_docs_pr:
-                    existing_event.processing_phase = "fix_pr_merged"
+                    set_phase(db, existing_event, "fix_pr_merged")
                     db.flush()
                     await create_success_check_run(
                         repo_full_name,
@@ -171,7 +197,7 @@ async def _handle_pr_synchronize(db: Session, payload: dict):
                     )
                     return
         except Exception as e:
-            print(f"Error detecting docs-fix merge for PR #{pr_number}: {str(e)}")
+            print(f"Error detecting docs-fix merge for PR #{pr_number}: {e!s}")
 
     # Find the existing drift event for this PR and reset it for re-analysis
     drift_event = (
@@ -183,17 +209,19 @@ async def _handle_pr_synchronize(db: Session, payload: dict):
 
     if drift_event:
         # Clear stale findings and code changes from the previous run
-        db.query(DriftFinding).filter(DriftFinding.drift_event_id == drift_event.id).delete(
-            synchronize_session=False
-        )
-        db.query(CodeChange).filter(CodeChange.drift_event_id == drift_event.id).delete(
-            synchronize_session=False
-        )
+        db.query(DriftFinding).filter(
+            DriftFinding.drift_event_id == drift_event.id,
+            DriftFinding.drift_event_created_at == drift_event.created_at,
+        ).delete(synchronize_session=False)
+        db.query(CodeChange).filter(
+            CodeChange.drift_event_id == drift_event.id,
+            CodeChange.drift_event_created_at == drift_event.created_at,
+        ).delete(synchronize_session=False)
 
         # Update the SHAs and reset to a clean queued state
         drift_event.base_sha = new_base_sha
         drift_event.head_sha = new_head_sha
-        drift_event.processing_phase = "queued"
+        set_phase(db, drift_event, "queued")
         drift_event.drift_result = "pending"
         drift_event.overall_drift_score = None
         drift_event.summary = None
@@ -204,6 +232,7 @@ async def _handle_pr_synchronize(db: Session, payload: dict):
         db.flush()
 
         drift_event_id = str(drift_event.id)
+        created_at = drift_event.created_at
     else:
         # If no existing event found, then creates a fresh one
         new_event = DriftEvent(
@@ -215,19 +244,24 @@ async def _handle_pr_synchronize(db: Session, payload: dict):
             head_sha=new_head_sha,
             processing_phase="queued",
             drift_result="pending",
+            created_at=datetime.now(UTC),
         )
         db.add(new_event)
         db.flush()
         db.refresh(new_event)
+        record_drift_event_created(db, repo.id)
+        publish_phase_change(db, repo.id, new_event.id, "queued")
         drift_event_id = str(new_event.id)
+        created_at = new_event.created_at
 
     # Create a fresh GH check run
     await create_queued_check_run(db, drift_event_id, repo_full_name, new_head_sha, installation_id)
 
     # Enqueue drift analysis job
-    task_queue.enqueue(run_drift_analysis, drift_event_id)
+    _enqueue_drift_analysis(repo, drift_event_id, created_at)
 
-    # Notify the user that new commits have been detected and drift analysis is re-queued
+    # Notify the user that new commits have been detected and drift analysis is re-queued,
+    # merged with other queued PRs
     installation = (
         db.query(Installation).filter(Installation.installation_id == installation_id).first()
     )
@@ -236,4 +270,5 @@ async def _handle_pr_synchronize(db: Session, payload: dict):
             db,
             installation.user_id,
             f"PR #{pr_number} in {repo_full_name} has new commits and has been re-queued for drift analysis.",
+            **drift_queued_group(repo_full_name),
         )
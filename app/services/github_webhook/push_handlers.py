@@ -0,0 +1,33 @@
+from sqlalchemy.orm import Session
+
+from app.core.queue import task_queue
+from app.models.repository import Repository
+from app.services.repo_sync import sync_repository
+
+
+# Handle push webhook event, keeps the local clone fresh when the target branch moves
+async def _handle_push(db: Session, payload: dict):
+    installation_id = payload.get("installation", {}).get("id")
+    repo_full_name = payload.get("repository", {}).get("full_name")
+    ref = payload.get("ref")
+
+    if not installation_id or not repo_full_name or not ref:
+        print("Warning: Missing installation_id, repo_full_name or ref in push payload.")
+        return
+
+    repo = (
+        db.query(Repository)
+        .filter(
+            Repository.installation_id == installation_id, Repository.repo_name == repo_full_name
+        )
+        .first()
+    )
+
+    if not repo or not repo.is_active:
+        return
+
+    # Only the target branch is mirrored, PR branches are synced through their PR refs
+    if ref != f"refs/heads/{repo.target_branch or 'main'}":
+        return
+
+    task_queue.enqueue(sync_repository, str(repo.id))
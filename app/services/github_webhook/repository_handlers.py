@@ -1,11 +1,12 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import case
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
 
 from app.models.installation import Installation
 from app.models.repository import Repository
-from app.services.github_api import get_installation_access_token
-from app.services.git_service import clone_repository, remove_cloned_repository
-from app.services.notification_service import create_notification
+from app.services.git_service import remove_cloned_repository
+from app.services.notification_service import create_notifications
+from app.services.repo_clone import enqueue_clone
 
 
 # Upsert repositories (Insert if they don't exist or update existing repos)
@@ -23,24 +24,32 @@ async def _insert_repositories(
                 "repo_name": repo["full_name"],
                 "is_active": True,
                 "avatar_url": account_avatar_url,
+                "clone_status": "pending",
             }
         )
 
-    # Insert or update on conflict
+    # Insert or update on conflict, a repo whose clone failed before gets a fresh set of attempts
     stmt = insert(Repository).values(values_list)
+    clone_failed = Repository.clone_status == "failed"
     stmt = stmt.on_conflict_do_update(
         index_elements=["installation_id", "repo_name"],
-        set_={"is_active": True, "avatar_url": stmt.excluded.avatar_url},
-    )
-    db.execute(stmt)
-
-    try:
-        access_token = await get_installation_access_token(installation_id)
-        for repo in repos_list:
-            repo_full_name = repo["full_name"]
-            await clone_repository(repo_full_name, access_token)
-    except Exception as e:
-        print(f"Error cloning repositories for installation {installation_id}: {str(e)}")
+        set_={
+            "is_active": True,
+            "avatar_url": stmt.excluded.avatar_url,
+            "clone_status": case((clone_failed, "pending"), else_=Repository.clone_status),
+            "clone_attempts": case((clone_failed, 0), else_=Repository.clone_attempts),
+        },
+    ).returning(Repository.id, Repository.clone_status)
+    rows = db.execute(stmt).all()
+
+    # Clone in the background, the clone workers bound how many repos clone at once
+    for repo_id, clone_status in rows:
+        if clone_status != "pending":
+            continue
+        try:
+            enqueue_clone(str(repo_id))
+        except Exception as e:
+            print(f"Error enqueuing clone of repository {repo_id}: {e!s}")
 
 
 # Handle when repos are added to an existing installation
@@ -52,13 +61,15 @@ async def _handle_repos_added(db: Session, payload: dict):
 
     # Create a notification for new repos added
     installation = db.query(Installation).filter(Installation.installation_id == inst_id).first()
-    if installation and installation.user_id:
-        for repo in repos:
-            create_notification(
-                db,
-                installation.user_id,
-                f"Repository {repo['full_name']} has been successfully linked to Delta.",
-            )
+    if installation and installation.user_id and repos:
+        create_notifications(
+            db,
+            installation.user_id,
+            [
+                f"Repository {repo['full_name']} has been successfully linked to Delta."
+                for repo in repos
+            ],
+        )
 
 
 # Handle when repos are removed from an existing installation
@@ -76,7 +87,7 @@ def _handle_repos_removed(db: Session, payload: dict):
             try:
                 remove_cloned_repository(repo_name)
             except Exception as e:
-                print(f"Error removing repository {repo_name}: {str(e)}")
+                print(f"Error removing repository {repo_name}: {e!s}")
 
         db.query(Repository).filter(
             Repository.installation_id == inst_id, Repository.repo_name.in_(repo_full_names)
@@ -84,9 +95,11 @@ def _handle_repos_removed(db: Session, payload: dict):
 
         # Create a notification for repos removed
         if user_id:
-            for repo_name in repo_full_names:
-                create_notification(
-                    db,
-                    user_id,
-                    f"Repository {repo_name} has been successfully unlinked from Delta.",
-                )
+            create_notifications(
+                db,
+                user_id,
+                [
+                    f"Repository {repo_name} has been successfully unlinked from Delta."
+                    for repo_name in repo_full_names
+                ],
+            )
@@ -1,19 +1,20 @@
 from sqlalchemy.orm import Session
 
+from app.services.github_webhook.check_suite_handlers import _handle_check_suite_rerequested
 from app.services.github_webhook.installation_handlers import (
     _handle_installation_created,
     _handle_installation_deleted,
     _handle_installation_suspend,
 )
-from app.services.github_webhook.repository_handlers import (
-    _handle_repos_added,
-    _handle_repos_removed,
-)
 from app.services.github_webhook.pr_handlers import (
     _handle_pr_opened,
     _handle_pr_synchronize,
 )
-from app.services.github_webhook.check_suite_handlers import _handle_check_suite_rerequested
+from app.services.github_webhook.push_handlers import _handle_push
+from app.services.github_webhook.repository_handlers import (
+    _handle_repos_added,
+    _handle_repos_removed,
+)
 
 
 # Router to handle different types of GH webhook events
@@ -46,6 +47,10 @@ async def handle_github_event(db: Session, event_type: str, payload: dict):
         elif action == "synchronize":
             await _handle_pr_synchronize(db, payload)
 
+    # Pushes to the repo's target branch
+    elif event_type == "push":
+        await _handle_push(db, payload)
+
     # Check Suite re-run request
     elif event_type == "check_suite":
         action = payload.get("action")
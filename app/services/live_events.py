@@ -0,0 +1,72 @@
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from sqlalchemy.event import listens_for
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.queue import async_redis_conn, redis_conn
+
+
+# Publishes an event to the clients streaming a channel. Publishing is best effort, a client
+# that misses an event catches up from the REST endpoints, so Redis errors are only logged
+def publish_event(channel: str, event: str, data: dict) -> None:
+    try:
+        redis_conn.publish(channel, json.dumps({"event": event, "data": data}, default=str))
+    except Exception as e:
+        print(f"Warning: failed to publish {event} event to {channel}: {e}")
+
+
+# Formats a message received from a channel as a Server-Sent Event
+def _format_sse(message: dict) -> str:
+    payload = json.loads(message["data"])
+    return f"event: {payload['event']}\ndata: {json.dumps(payload['data'])}\n\n"
+
+
+# Streams the events published to channels as Server-Sent Events until the client disconnects.
+# A comment is sent whenever the channels stay quiet, so proxies keep the connection open
+async def stream_events(
+    is_disconnected: Callable[[], Awaitable[bool]], *channels: str
+) -> AsyncIterator[str]:
+    pubsub = async_redis_conn.pubsub()
+    await pubsub.subscribe(*channels)
+    try:
+        # Tells the client the subscription is live, events published from now on are delivered
+        yield ": connected\n\n"
+        while not await is_disconnected():
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=settings.SSE_HEARTBEAT_SECONDS
+            )
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+
+            try:
+                yield _format_sse(message)
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Warning: skipping malformed event on {message.get('channel')}: {e}")
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+# Key of the session info holding the events to publish once the session commits
+_PENDING_KEY = "pending_live_events"
+
+
+# Publishes an event once the session commits, so clients never see a change that was rolled back
+def publish_after_commit(db: Session, channel: str, event: str, data: dict) -> None:
+    db.info.setdefault(_PENDING_KEY, []).append((channel, event, data))
+
+
+# Publishes the events of a session that just committed
+@listens_for(Session, "after_commit")
+def _publish_committed_events(session: Session) -> None:
+    for channel, event, data in session.info.pop(_PENDING_KEY, []):
+        publish_event(channel, event, data)
+
+
+# Forgets the events of a rolled back session
+@listens_for(Session, "after_rollback")
+def _discard_rolled_back_events(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
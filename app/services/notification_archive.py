@@ -0,0 +1,105 @@
+from datetime import UTC, datetime, timedelta
+from typing import cast
+
+from sqlalchemy import delete, func, insert, inspect, select, text
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.partitions import create_month_partition, list_month_partitions, month_start, next_month
+from app.db.session import SessionLocal
+from app.models.notification import Notification, NotificationArchive
+
+# Columns copied from a notification to its archived row
+_ARCHIVED_COLUMNS = [
+    "id",
+    "user_id",
+    "content",
+    "is_read",
+    "group_key",
+    "group_count",
+    "created_at",
+    "last_event_at",
+]
+
+
+# Moves one batch of the oldest notifications created before a time into the archive, in a
+# single statement. Rows locked by a request are skipped and left for the next run
+def _archive_batch(db: Session, before: datetime, batch_size: int) -> int:
+    batch = (
+        select(Notification.id)
+        .where(Notification.created_at < before)
+        .order_by(Notification.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    moved = (
+        delete(Notification)
+        .where(Notification.id.in_(batch))
+        .returning(
+            *(inspect(Notification, raiseerr=True).columns[name] for name in _ARCHIVED_COLUMNS)
+        )
+        .cte("moved")
+    )
+    stmt = (
+        insert(NotificationArchive).from_select(_ARCHIVED_COLUMNS, select(*moved.c)).add_cte(moved)
+    )
+    # An INSERT runs on a cursor, its result carries the number of rows written
+    return cast(CursorResult, db.execute(stmt)).rowcount
+
+
+# Drops the archive partitions of the months that ended before a time, returns their names
+def _drop_expired_partitions(db: Session, before: datetime) -> list[str]:
+    dropped = []
+    for name, start in list_month_partitions(db, NotificationArchive.__tablename__):
+        if next_month(start) <= before:
+            db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return dropped
+
+
+# Moves the notifications past their retention into the archive, oldest month first and one batch
+# per transaction so no lock is held for long, then drops the archive months past the archive
+# retention. Run periodically by the workers' cron scheduler
+def archive_notifications() -> dict:
+    now = datetime.now(UTC)
+    archive_before = now - timedelta(days=settings.NOTIFICATIONS_RETENTION_DAYS)
+    drop_before = now - timedelta(days=settings.NOTIFICATIONS_ARCHIVE_RETENTION_DAYS)
+
+    session = SessionLocal()
+    archived = 0
+    try:
+        while True:
+            oldest = (
+                session.query(func.min(Notification.created_at))
+                .filter(Notification.created_at < archive_before)
+                .scalar()
+            )
+            if oldest is None:
+                break
+
+            # Every batch stays within one month, so it lands in a single partition
+            start = month_start(oldest)
+            create_month_partition(session, NotificationArchive.__tablename__, start)
+            moved = _archive_batch(
+                session,
+                min(archive_before, next_month(start)),
+                settings.NOTIFICATIONS_ARCHIVE_BATCH_SIZE,
+            )
+            session.commit()
+            archived += moved
+
+            # What is left is locked by requests, the next run picks it up
+            if not moved:
+                break
+
+        dropped = _drop_expired_partitions(session, drop_before)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    print(f"Archived {archived} notification(s), dropped archive partitions: {dropped}")
+    return {"archived": archived, "dropped_partitions": dropped}
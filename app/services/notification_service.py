@@ -1,9 +1,169 @@
 import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import event, func
 from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.queue import redis_conn
 from app.models.notification import Notification
+from app.services.live_events import publish_event
+
+# Key of the session info holding the notifications to push once the session commits
+_PENDING_KEY = "pending_notifications"
+
+# Prefix of the Redis keys the unread notification count of each user is cached under
+_UNREAD_CACHE_PREFIX = "notifications_unread"
+
+
+# Redis pub/sub channel the notifications of a user are pushed on
+def notification_channel(user_id: uuid.UUID | str) -> str:
+    return f"notifications:{user_id}"
+
 
+# Group of the "queued for drift analysis" notifications of a repo, so a burst of PRs shows up as
+# one notification. Passed as keyword arguments to create_notification
+def drift_queued_group(repo_full_name: str) -> dict[str, str]:
+    return {
+        "group_key": f"drift_queued:{repo_full_name}",
+        "group_content": f"{{count}} PRs in {repo_full_name} have been queued for drift analysis.",
+    }
 
-# Creates a notification for a user in the DB
-def create_notification(db: Session, user_id: uuid.UUID, content: str) -> None:
-    notification = Notification(user_id=user_id, content=content)
+
+# Payload of a notification as pushed to the live streams of its user
+def _notification_payload(notification: Notification) -> dict:
+    return {
+        "user_id": str(notification.user_id),
+        "id": str(notification.id),
+        "content": notification.content,
+        "is_read": notification.is_read,
+        "group_count": notification.group_count,
+        "created_at": notification.created_at.isoformat(),
+        "last_event_at": notification.last_event_at.isoformat(),
+    }
+
+
+# Creates a notification for a user in the DB. It is pushed to the user's live streams once the
+# session commits, so a rolled back notification is never seen.
+# Notifications with a group_key are merged into the user's unread one of the same group whose
+# last event is within the coalesce window. The merged one keeps its id and creation time, so
+# it stays put in paginated lists, and is reworded with group_content, formatted with the number
+# of notifications it stands for, and its last event time is bumped
+def create_notification(
+    db: Session,
+    user_id: uuid.UUID,
+    content: str,
+    group_key: str | None = None,
+    group_content: str | None = None,
+) -> None:
+    now = datetime.now(UTC)
+    window = settings.NOTIFICATIONS_COALESCE_WINDOW_SECONDS
+
+    if group_key and group_content and window > 0:
+        # Locked so concurrent webhooks count every notification they merge
+        existing = (
+            db.query(Notification)
+            .filter(
+                Notification.user_id == user_id,
+                Notification.group_key == group_key,
+                Notification.is_read.is_(False),
+                Notification.last_event_at >= now - timedelta(seconds=window),
+            )
+            .order_by(Notification.last_event_at.desc())
+            .with_for_update()
+            .first()
+        )
+        if existing:
+            existing.group_count += 1
+            existing.content = group_content.format(count=existing.group_count)
+            existing.last_event_at = now
+            db.info.setdefault(_PENDING_KEY, []).append(_notification_payload(existing))
+            return
+
+    # Id and time are set here rather than by the DB so the pushed event matches the stored row
+    notification = Notification(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        content=content,
+        is_read=False,
+        group_key=group_key,
+        group_count=1,
+        created_at=now,
+        last_event_at=now,
+    )
     db.add(notification)
+    db.info.setdefault(_PENDING_KEY, []).append(_notification_payload(notification))
+
+
+# Creates one notification per content for a user, for events that concern many things at once.
+# The rows are added together, so the flush writes them in one batched INSERT
+def create_notifications(db: Session, user_id: uuid.UUID, contents: list[str]) -> None:
+    now = datetime.now(UTC)
+    notifications = [
+        Notification(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            content=content,
+            is_read=False,
+            group_count=1,
+            created_at=now,
+            last_event_at=now,
+        )
+        for content in contents
+    ]
+    db.add_all(notifications)
+    db.info.setdefault(_PENDING_KEY, []).extend(
+        _notification_payload(notification) for notification in notifications
+    )
+
+
+# Pushes the notifications a session just committed and drops the user's cached unread count
+@event.listens_for(Session, "after_commit")
+def _push_committed_notifications(session: Session) -> None:
+    for notification in session.info.pop(_PENDING_KEY, []):
+        user_id = notification.pop("user_id")
+        invalidate_unread_count(user_id)
+        publish_event(notification_channel(user_id), "notification", notification)
+
+
+# Forgets the notifications of a rolled back session
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_notifications(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# Drops the cached unread count of a user, called whenever their notifications change
+def invalidate_unread_count(user_id: uuid.UUID | str) -> None:
+    try:
+        redis_conn.delete(f"{_UNREAD_CACHE_PREFIX}:{user_id}")
+    except Exception as e:
+        print(f"Warning: failed to invalidate the cached unread count: {e}")
+
+
+# Returns the number of unread notifications of a user, served from Redis when cached.
+# Redis errors fall back to the database so the count keeps working without the cache
+def get_unread_count(db: Session, user_id: uuid.UUID) -> int:
+    ttl = settings.NOTIFICATIONS_UNREAD_CACHE_TTL_SECONDS
+    cache_key = f"{_UNREAD_CACHE_PREFIX}:{user_id}"
+
+    if ttl > 0:
+        try:
+            cached = redis_conn.get(cache_key)
+            if cached is not None:
+                return int(cached)
+        except Exception as e:
+            print(f"Warning: failed to read the cached unread count: {e}")
+
+    count = int(
+        db.query(func.count(Notification.id))
+        .filter(Notification.user_id == user_id, Notification.is_read.is_(False))
+        .scalar()
+        or 0
+    )
+
+    if ttl > 0:
+        try:
+            redis_conn.set(cache_key, count, ex=ttl)
+        except Exception as e:
+            print(f"Warning: failed to cache the unread count: {e}")
+    return count
@@ -0,0 +1,262 @@
+import asyncio
+import re
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import Any
+
+from rq import Callback, Retry
+from rq.job import Job
+
+from app.core.config import settings
+from app.core.queue import clone_queue, task_queue
+from app.db.session import SessionLocal
+from app.models.drift import DriftEvent
+from app.models.repository import Repository
+from app.services.git_service import clone_repository, remove_cloned_repository
+from app.services.github_api import get_installation_access_token
+from app.services.notification_service import create_notification
+from app.services.repo_storage import enforce_storage_quota
+
+# Import path of the drift analysis task
+RUN_DRIFT_ANALYSIS = "app.services.drift_analysis.run_drift_analysis"
+
+# Clone states during which drift analysis of the repo is deferred
+CLONE_PENDING_STATUSES = {"pending", "cloning", "evicted"}
+
+# Share of the overall progress covered by each git clone phase, as (start, end) percentages
+_CLONE_PHASES = {
+    "Receiving objects": (0, 80),
+    "Resolving deltas": (80, 95),
+    "Updating files": (95, 100),
+}
+
+# Matches git progress lines like "Receiving objects:  45% (450/1000), 1.20 MiB | 2.00 MiB/s"
+_PROGRESS_LINE = re.compile(r"^(?:remote: )?([A-Za-z ]+):\s+(\d{1,3})%")
+
+
+# Checks whether drift analysis of a repo has to wait for its clone
+def is_clone_pending(repo: Repository) -> bool:
+    return repo.clone_status in CLONE_PENDING_STATUSES
+
+
+# Re-clones a repo whose clone was evicted to free disk space, a no-op for any other clone state.
+# Marked pending on the caller's session so the drift analysis defers until the clone is back
+def rehydrate_clone(repo: Repository) -> bool:
+    if repo.clone_status != "evicted":
+        return False
+
+    print(f"Re-cloning evicted repository {repo.repo_name}")
+    repo.clone_status = "pending"
+    repo.clone_progress = 0
+    repo.clone_attempts = 0
+    repo.clone_error = None
+    enqueue_clone(str(repo.id))
+    return True
+
+
+# Maps a git progress line to the overall clone progress, None for lines that aren't progress
+def parse_clone_progress(line: str) -> int | None:
+    match = _PROGRESS_LINE.match(line.strip())
+    if not match or match.group(1) not in _CLONE_PHASES:
+        return None
+
+    start, end = _CLONE_PHASES[match.group(1)]
+    percent = min(int(match.group(2)), 100)
+    return start + (end - start) * percent // 100
+
+
+# Enqueues the clone of a linked repo on the clone queue, failed attempts are retried with backoff
+def enqueue_clone(repo_id: str):
+    intervals = [
+        settings.CLONE_RETRY_INTERVAL_SECONDS * 2**attempt
+        for attempt in range(settings.CLONE_MAX_RETRIES)
+    ]
+    return clone_queue.enqueue(
+        clone_repository_job,
+        repo_id,
+        retry=Retry(max=settings.CLONE_MAX_RETRIES, interval=intervals) if intervals else None,
+        job_timeout=settings.CLONE_JOB_TIMEOUT_SECONDS,
+        on_failure=Callback(_on_clone_job_failure),
+    )
+
+
+# Writes clone state columns of a repo in a short lived session
+def _update_clone_state(repo_id: str, values: dict[Any, Any]) -> None:
+    session = SessionLocal()
+    try:
+        session.query(Repository).filter(Repository.id == repo_id).update(
+            values, synchronize_session=False
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Returns a progress callback that persists the clone progress whenever it advances a step
+def _progress_recorder(repo_id: str) -> Callable[[str], None]:
+    last_recorded = 0
+
+    def record(line: str) -> None:
+        nonlocal last_recorded
+        progress = parse_clone_progress(line)
+        if progress is None or progress < last_recorded + settings.CLONE_PROGRESS_STEP:
+            return
+
+        last_recorded = progress
+        try:
+            _update_clone_state(repo_id, {Repository.clone_progress: progress})
+        except Exception as e:
+            print(f"Failed to record clone progress of repository {repo_id}: {e}")
+
+    return record
+
+
+# Marks the clone as ready and enqueues the drift analyses that were deferred while it was pending
+def _finish_clone(repo_id: str) -> None:
+    now = datetime.now(UTC)
+    session = SessionLocal()
+    try:
+        # A fresh clone is a single pack, so there is nothing to compact yet
+        session.query(Repository).filter(Repository.id == repo_id).update(
+            {
+                Repository.clone_status: "ready",
+                Repository.clone_progress: 100,
+                Repository.clone_error: None,
+                Repository.last_synced_at: now,
+                Repository.last_compacted_at: now,
+            },
+            synchronize_session=False,
+        )
+        session.commit()
+
+        deferred_events = (
+            session.query(DriftEvent.id, DriftEvent.created_at)
+            .filter(
+                DriftEvent.repo_id == repo_id,
+                DriftEvent.processing_phase == "queued",
+                DriftEvent.started_at.is_(None),
+            )
+            .all()
+        )
+    finally:
+        session.close()
+
+    # Enqueued by path, as drift_analysis itself checks the clone state through this module
+    for drift_event_id, created_at in deferred_events:
+        task_queue.enqueue(RUN_DRIFT_ANALYSIS, str(drift_event_id), created_at.isoformat())
+
+    # Every clone grows the disk usage, so check it against the quota
+    try:
+        clone_queue.enqueue(enforce_storage_quota)
+    except Exception as e:
+        print(f"Failed to enqueue storage quota check after cloning repository {repo_id}: {e}")
+
+
+# Records a failed attempt, the repo is only marked failed once its retries are exhausted
+def _fail_clone(repo_id: str, attempts: int, error: str) -> None:
+    exhausted = attempts > settings.CLONE_MAX_RETRIES
+
+    session = SessionLocal()
+    try:
+        repo = session.query(Repository).filter(Repository.id == repo_id).first()
+        if not repo:
+            return
+
+        repo.clone_status = "failed" if exhausted else "pending"
+        repo.clone_error = error
+
+        # Drift analyses waiting for the clone can't run, let the user know
+        if exhausted and repo.installation and repo.installation.user_id:
+            create_notification(
+                session,
+                repo.installation.user_id,
+                f"Repository {repo.repo_name} could not be cloned, drift analysis is unavailable for it.",
+            )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# RQ failure callback of the clone job. A job killed at its timeout, or abandoned by a dead
+# worker, never gets to record its failure, which would leave the repo cloning for good and its
+# drift analyses deferred forever. Failures the job recorded itself left the repo cloning no more
+def _on_clone_job_failure(
+    job: Job, connection: Any, exc_type: type, exc_value: Any, tb: Any
+) -> None:
+    repo_id = job.args[0]
+
+    session = SessionLocal()
+    try:
+        current = (
+            session.query(Repository.clone_status, Repository.clone_attempts)
+            .filter(Repository.id == repo_id)
+            .first()
+        )
+    finally:
+        session.close()
+
+    if current is None:
+        return
+    clone_status, attempts = current
+    if clone_status != "cloning":
+        return
+    _fail_clone(repo_id, attempts, str(exc_value) or exc_type.__name__)
+
+
+# Background task that clones a newly linked repository and tracks its progress
+def clone_repository_job(repo_id: str) -> None:
+    asyncio.run(_clone_repository(repo_id))
+
+
+# Clones the repo from scratch, raising on failure so RQ retries the job
+async def _clone_repository(repo_id: str) -> None:
+    session = SessionLocal()
+    try:
+        repo = session.query(Repository).filter(Repository.id == repo_id).first()
+
+        # The webhook that enqueued the clone may not have committed yet, let the retry pick it up
+        if not repo:
+            raise LookupError(f"Repository {repo_id} not found")
+        if repo.clone_status == "ready":
+            return
+
+        # The clone token comes from the installation, without one retrying can't help
+        if repo.installation_id is None:
+            repo.clone_status = "failed"
+            repo.clone_error = "Repository has no installation"
+            session.commit()
+            return
+
+        repo_full_name = repo.repo_name
+        installation_id = repo.installation_id
+        target_branch = repo.target_branch or "main"
+
+        repo.clone_status = "cloning"
+        repo.clone_progress = 0
+        repo.clone_attempts += 1
+        attempts = repo.clone_attempts
+        session.commit()
+    finally:
+        session.close()
+
+    try:
+        # A failed attempt can leave a partial clone behind that git refuses to clone into
+        await asyncio.to_thread(remove_cloned_repository, repo_full_name)
+
+        access_token = await get_installation_access_token(installation_id)
+        repo_path = await clone_repository(
+            repo_full_name, access_token, target_branch, on_progress=_progress_recorder(repo_id)
+        )
+        if not repo_path:
+            raise RuntimeError(f"git clone of {repo_full_name} failed")
+    except Exception as e:
+        await asyncio.to_thread(_fail_clone, repo_id, attempts, str(e))
+        raise
+
+    await asyncio.to_thread(_finish_clone, repo_id)
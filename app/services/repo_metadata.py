@@ -0,0 +1,173 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import httpx
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.repository import Repository
+from app.services.github_api import get_installation_access_token, get_repo_details
+
+# Repo ids this process is revalidating in the background, so a refresh runs once per repo
+_refreshing: set[str] = set()
+
+
+# Plain snapshot of what is needed to fetch the metadata of a repo
+def _snapshot(repo: Repository) -> dict:
+    return {
+        "id": str(repo.id),
+        "repo_name": repo.repo_name,
+        "installation_id": repo.installation_id,
+        "metadata_etag": repo.metadata_etag,
+    }
+
+
+# Dashboard details of a repo from its stored metadata
+def _stored_details(repo: Repository) -> dict:
+    return {
+        "name": repo.repo_name,
+        "description": repo.description,
+        "language": repo.language,
+        "stargazers_count": repo.stargazers_count or 0,
+        "forks_count": repo.forks_count or 0,
+        "avatar_url": repo.avatar_url,
+    }
+
+
+# Dashboard details of a repo whose metadata was never fetched and GitHub failed to return
+def _fallback_details(repo: Repository) -> dict:
+    return {
+        "name": repo.repo_name,
+        "description": "Error fetching details",
+        "language": "Unknown",
+        "stargazers_count": 0,
+        "forks_count": 0,
+        "avatar_url": None,
+    }
+
+
+# How old the stored metadata of a repo is, None when it was never fetched
+def _metadata_age(repo: Repository, now: datetime) -> timedelta | None:
+    if repo.metadata_fetched_at is None:
+        return None
+    return now - repo.metadata_fetched_at
+
+
+# Fetches the metadata of one repo and returns the column values to store for it
+async def _fetch_one(client: httpx.AsyncClient, repo: dict) -> dict[str, Any]:
+    if not repo["installation_id"]:
+        raise ValueError("No installation ID for repository")
+
+    owner, name = repo["repo_name"].split("/", 1)
+    details = await get_repo_details(
+        repo["installation_id"], owner, name, etag=repo["metadata_etag"], client=client
+    )
+
+    values: dict[str, Any] = {"metadata_fetched_at": datetime.now(UTC)}
+
+    # A 304 means the stored metadata is still current, only its age is renewed
+    if details is not None:
+        values.update(
+            {
+                "description": details["description"],
+                "language": details["language"],
+                "stargazers_count": details["stargazers_count"],
+                "forks_count": details["forks_count"],
+                "metadata_etag": details["etag"],
+            }
+        )
+        if details["avatar_url"]:
+            values["avatar_url"] = details["avatar_url"]
+    return values
+
+
+# Fetches the metadata of repos concurrently over one HTTP client and returns the values to store
+# by repo id. Repos GitHub failed for are left out so their stored metadata is kept
+async def fetch_repo_metadata(repos: list[dict]) -> dict[str, dict[str, Any]]:
+    if not repos:
+        return {}
+
+    # Tokens are minted once per installation up front, the concurrent fetches then share them
+    installation_ids = {repo["installation_id"] for repo in repos if repo["installation_id"]}
+    await asyncio.gather(
+        *(get_installation_access_token(installation_id) for installation_id in installation_ids),
+        return_exceptions=True,
+    )
+
+    async with httpx.AsyncClient(timeout=settings.REPO_METADATA_TIMEOUT_SECONDS) as client:
+        results = await asyncio.gather(
+            *(_fetch_one(client, repo) for repo in repos), return_exceptions=True
+        )
+
+    fetched = {}
+    for repo, result in zip(repos, results):
+        if isinstance(result, BaseException):
+            print(f"Failed to fetch the metadata of {repo['repo_name']}: {result}")
+            continue
+        fetched[repo["id"]] = result
+    return fetched
+
+
+# Writes fetched metadata in a short lived session
+def _save_metadata(fetched: dict[str, dict[str, Any]]) -> None:
+    session = SessionLocal()
+    try:
+        for repo_id, metadata in fetched.items():
+            # Query.update is typed for column keys, the column names work as well
+            values: dict[Any, Any] = metadata
+            session.query(Repository).filter(Repository.id == repo_id).update(
+                values, synchronize_session=False
+            )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Background task revalidating the stale metadata of repos after the dashboard was served
+async def refresh_repo_metadata(repos: list[dict]) -> None:
+    repos = [repo for repo in repos if repo["id"] not in _refreshing]
+    _refreshing.update(repo["id"] for repo in repos)
+    try:
+        fetched = await fetch_repo_metadata(repos)
+        if fetched:
+            await asyncio.to_thread(_save_metadata, fetched)
+    except Exception as e:
+        print(f"Failed to refresh repo metadata: {e}")
+    finally:
+        _refreshing.difference_update(repo["id"] for repo in repos)
+
+
+# Returns the dashboard details of repos from their stored metadata, with the snapshots of the
+# repos to revalidate in the background. Fresh metadata is served as is and stale metadata is
+# served while it is revalidated. Metadata never fetched or past the stale age is fetched first,
+# all such repos concurrently, and set on the loaded repos for the caller to commit
+async def get_dashboard_repo_details(repos: list[Repository]) -> tuple[list[dict], list[dict]]:
+    now = datetime.now(UTC)
+    fresh_for = timedelta(seconds=settings.REPO_METADATA_FRESH_SECONDS)
+    stale_for = timedelta(seconds=settings.REPO_METADATA_STALE_SECONDS)
+
+    expired = []
+    stale = []
+    for repo in repos:
+        age = _metadata_age(repo, now)
+        if age is None or age > stale_for:
+            expired.append(repo)
+        elif age > fresh_for:
+            stale.append(_snapshot(repo))
+
+    fetched = await fetch_repo_metadata([_snapshot(repo) for repo in expired])
+    for repo in expired:
+        for column, value in fetched.get(str(repo.id), {}).items():
+            setattr(repo, column, value)
+
+    results = []
+    for repo in repos:
+        if repo.metadata_fetched_at is None:
+            results.append(_fallback_details(repo))
+        else:
+            results.append(_stored_details(repo))
+    return results, stale
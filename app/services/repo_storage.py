@@ -0,0 +1,290 @@
+import asyncio
+import os
+import subprocess
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.queue import redis_conn
+from app.db.session import SessionLocal
+from app.models.repository import Repository
+from app.services.git_service import get_local_repo_path, remove_cloned_repository, run_git
+from app.services.repo_sync import repo_sync_lock
+
+# Redis key of the lock keeping a single storage pass running at a time
+STORAGE_LOCK_KEY = "repo_storage_lock"
+
+# Used for clones with no recorded use or sync, so they sort as the coldest
+_NEVER = datetime.min.replace(tzinfo=UTC)
+
+
+# Returns the policy the disk quota of the cloned repos is enforced with
+def get_storage_policy() -> dict:
+    return {
+        "quota_bytes": settings.REPOS_DISK_QUOTA_BYTES,
+        "compact_idle_days": settings.REPO_COMPACT_IDLE_DAYS,
+        "evict_min_idle_hours": settings.REPO_EVICT_MIN_IDLE_HOURS,
+        "eviction_order": "inactive or suspended repos first, then least recently used",
+    }
+
+
+# Sums the size of every file under a directory without following symlinks, 0 if it doesn't exist
+def directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                # Git can remove a file while it is being measured
+                pass
+    return total
+
+
+# Plain snapshot of the storage columns of a repo
+def _snapshot(repo: Repository) -> dict:
+    return {
+        "id": str(repo.id),
+        "repo_name": repo.repo_name,
+        "clone_status": repo.clone_status,
+        "is_active": bool(repo.is_active),
+        "is_suspended": bool(repo.is_suspended),
+        "clone_size_bytes": repo.clone_size_bytes,
+        "last_used_at": repo.last_used_at,
+        "last_synced_at": repo.last_synced_at,
+        "last_compacted_at": repo.last_compacted_at,
+    }
+
+
+# When the clone was last needed, clones never used by a drift analysis count from their last sync
+def _last_used(repo: dict) -> datetime:
+    return repo["last_used_at"] or repo["last_synced_at"] or _NEVER
+
+
+# Orders clones coldest first: those of inactive or suspended repos, then least recently used
+def _eviction_order(repos: list[dict]) -> list[dict]:
+    return sorted(
+        repos, key=lambda repo: (repo["is_active"] and not repo["is_suspended"], _last_used(repo))
+    )
+
+
+# Checks whether a clone has been unused long enough to be evicted
+def _is_evictable(repo: dict, now: datetime) -> bool:
+    return _last_used(repo) <= now - timedelta(hours=settings.REPO_EVICT_MIN_IDLE_HOURS)
+
+
+# Checks whether an idle clone fetched new objects since it was last compacted
+def _needs_compaction(repo: dict, now: datetime) -> bool:
+    if _last_used(repo) > now - timedelta(days=settings.REPO_COMPACT_IDLE_DAYS):
+        return False
+
+    compacted_at = repo["last_compacted_at"]
+    synced_at = repo["last_synced_at"]
+    return compacted_at is None or (synced_at is not None and synced_at > compacted_at)
+
+
+# Builds the storage report of the admin endpoint from the recorded clone sizes.
+# Repos are listed coldest first, with their place in the eviction order when they can be evicted
+def get_storage_report(db: Session) -> dict:
+    now = datetime.now(UTC)
+    repos = _eviction_order([_snapshot(repo) for repo in db.query(Repository).all()])
+    usage = sum(repo["clone_size_bytes"] or 0 for repo in repos if repo["clone_status"] == "ready")
+
+    rank = 0
+    for repo in repos:
+        repo["eviction_rank"] = None
+        if repo["clone_status"] == "ready" and _is_evictable(repo, now):
+            rank += 1
+            repo["eviction_rank"] = rank
+
+    return {
+        "policy": get_storage_policy(),
+        "usage_bytes": usage,
+        "quota_bytes": settings.REPOS_DISK_QUOTA_BYTES,
+        "over_quota": usage > settings.REPOS_DISK_QUOTA_BYTES,
+        "repositories": repos,
+    }
+
+
+# Loads a snapshot of every repo whose clone is on disk
+def _load_ready_clones() -> list[dict]:
+    session = SessionLocal()
+    try:
+        repos = session.query(Repository).filter(Repository.clone_status == "ready").all()
+        return [_snapshot(repo) for repo in repos]
+    finally:
+        session.close()
+
+
+# Writes storage columns of a repo in a short lived session
+def _update_repository(repo_id: str, values: dict[Any, Any]) -> None:
+    session = SessionLocal()
+    try:
+        session.query(Repository).filter(Repository.id == repo_id).update(
+            values, synchronize_session=False
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Records the measured clone sizes in one transaction
+def _record_sizes(sizes: dict[str, int]) -> None:
+    session = SessionLocal()
+    try:
+        for repo_id, size in sizes.items():
+            session.query(Repository).filter(Repository.id == repo_id).update(
+                {Repository.clone_size_bytes: size}, synchronize_session=False
+            )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Checks a clone is still ready and idle, a drift analysis may have started using it since the
+# pass loaded it
+def _is_still_evictable(repo_id: str, now: datetime) -> bool:
+    idle_since = now - timedelta(hours=settings.REPO_EVICT_MIN_IDLE_HOURS)
+    session = SessionLocal()
+    try:
+        repo = (
+            session.query(Repository.id)
+            .filter(
+                Repository.id == repo_id,
+                Repository.clone_status == "ready",
+                or_(Repository.last_used_at.is_(None), Repository.last_used_at <= idle_since),
+            )
+            .first()
+        )
+        return repo is not None
+    finally:
+        session.close()
+
+
+# Repacks a clone with git gc and returns its new size, None when gc failed
+async def _compact_clone(repo: dict) -> int | None:
+    repo_path = get_local_repo_path(repo["repo_name"])
+
+    # Holding the sync lock keeps a fetch from writing objects while they are repacked
+    async with repo_sync_lock(repo["repo_name"]):
+        try:
+            result = await run_git(["gc", "--quiet"], repo_path, timeout=600)
+        except subprocess.TimeoutExpired:
+            print(f"Timeout while compacting the clone of {repo['repo_name']}")
+            return None
+
+    if result.returncode != 0:
+        print(f"Failed to compact the clone of {repo['repo_name']}: {result.stderr}")
+        return None
+
+    size = await asyncio.to_thread(directory_size, repo_path)
+    await asyncio.to_thread(
+        _update_repository,
+        repo["id"],
+        {
+            Repository.clone_size_bytes: size,
+            Repository.last_compacted_at: datetime.now(UTC),
+        },
+    )
+    return size
+
+
+# Deletes a clone from disk, the next PR of the repo clones it again. Clones a sync holds the lock
+# of, used since the pass loaded them or that couldn't be removed are left to the next pass
+async def _evict_clone(repo: dict, now: datetime) -> bool:
+    repo_name = repo["repo_name"]
+    async with repo_sync_lock(repo_name) as locked:
+        if not locked:
+            print(f"Skipping eviction of {repo_name}: a sync holds its lock")
+            return False
+        if not await asyncio.to_thread(_is_still_evictable, repo["id"], now):
+            return False
+
+        await asyncio.to_thread(remove_cloned_repository, repo_name)
+        if get_local_repo_path(repo_name).exists():
+            print(f"Failed to evict the clone of {repo_name}, it stays ready")
+            return False
+
+        # Marked once removed. A drift analysis that started meanwhile fails to read the tree and
+        # its retry finds the clone evicted, so it re-clones the repo
+        await asyncio.to_thread(
+            _update_repository,
+            repo["id"],
+            {Repository.clone_status: "evicted", Repository.clone_size_bytes: 0},
+        )
+    return True
+
+
+# Background task that keeps the cloned repos under the disk quota
+def enforce_storage_quota() -> dict | None:
+    return asyncio.run(_enforce_storage_quota())
+
+
+# Runs a storage pass unless another one already holds the storage lock
+async def _enforce_storage_quota() -> dict | None:
+    lock = redis_conn.lock(STORAGE_LOCK_KEY, timeout=settings.REPO_STORAGE_LOCK_TIMEOUT_SECONDS)
+    if not lock.acquire(blocking=False):
+        print("Skipping storage pass: another pass is running")
+        return None
+
+    try:
+        return await _run_storage_pass()
+    finally:
+        try:
+            lock.release()
+        except Exception as e:
+            print(f"Failed to release the storage lock: {e}")
+
+
+# Measures every clone, then compacts and finally evicts the coldest ones until usage is under the quota
+async def _run_storage_pass() -> dict:
+    now = datetime.now(UTC)
+    repos = await asyncio.to_thread(_load_ready_clones)
+    for repo in repos:
+        repo_path = get_local_repo_path(repo["repo_name"])
+        repo["clone_size_bytes"] = await asyncio.to_thread(directory_size, repo_path)
+    await asyncio.to_thread(_record_sizes, {repo["id"]: repo["clone_size_bytes"] for repo in repos})
+
+    quota = settings.REPOS_DISK_QUOTA_BYTES
+    usage = sum(repo["clone_size_bytes"] for repo in repos)
+    compacted = []
+    evicted = []
+
+    # Compacting is cheaper to undo than evicting, so it goes first
+    for repo in _eviction_order(repos):
+        if usage <= quota:
+            break
+        if not _needs_compaction(repo, now):
+            continue
+
+        size = await _compact_clone(repo)
+        if size is not None:
+            usage -= repo["clone_size_bytes"] - size
+            repo["clone_size_bytes"] = size
+            compacted.append(repo["repo_name"])
+
+    for repo in _eviction_order(repos):
+        if usage <= quota:
+            break
+        if not _is_evictable(repo, now):
+            continue
+
+        if await _evict_clone(repo, now):
+            usage -= repo["clone_size_bytes"]
+            evicted.append(repo["repo_name"])
+
+    print(
+        f"Storage pass done: {usage} of {quota} bytes used, "
+        f"compacted {len(compacted)} and evicted {len(evicted)} clone(s)"
+    )
+    return {"usage_bytes": usage, "quota_bytes": quota, "compacted": compacted, "evicted": evicted}
@@ -0,0 +1,131 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+
+from app.core.config import settings
+from app.core.queue import redis_conn
+from app.db.session import SessionLocal
+from app.models.repository import Repository
+from app.services.git_service import fetch_refs, get_local_repo_path, has_commits
+from app.services.github_api import get_installation_access_token
+
+
+# Redis key of the lock serialising fetches into a repo's local clone
+def _sync_lock_key(repo_full_name: str) -> str:
+    return f"repo_sync_lock:{repo_full_name}"
+
+
+# Refspec keeping a branch's remote tracking ref up to date
+def _branch_refspec(branch: str) -> str:
+    return f"+refs/heads/{branch}:refs/remotes/origin/{branch}"
+
+
+# Refspec mirroring the head commit of one PR, or of every PR with "*"
+def _pr_refspec(pr_number: int | str) -> str:
+    return f"+refs/pull/{pr_number}/head:refs/remotes/origin/pr/{pr_number}"
+
+
+# Holds the repo's sync lock, so a drift job waits for an in flight sync instead of fetching twice.
+# Fetching without the lock is still safe, so a lock that can't be taken in time is not an error.
+# Yields whether the lock was taken, for callers that must not run beside a sync
+@asynccontextmanager
+async def repo_sync_lock(repo_full_name: str) -> AsyncIterator[bool]:
+    lock = redis_conn.lock(
+        _sync_lock_key(repo_full_name),
+        timeout=settings.REPO_SYNC_LOCK_TIMEOUT_SECONDS,
+        blocking_timeout=settings.REPO_SYNC_LOCK_WAIT_SECONDS,
+    )
+    acquired = await asyncio.to_thread(lock.acquire)
+    if not acquired:
+        print(f"Timed out waiting for the sync lock of {repo_full_name}, fetching anyway")
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except Exception as e:
+                print(f"Failed to release the sync lock of {repo_full_name}: {e}")
+
+
+# Records when the repo's clone was last brought up to date with GitHub
+def _mark_synced(repo_id: str) -> None:
+    session = SessionLocal()
+    try:
+        session.query(Repository).filter(Repository.id == repo_id).update(
+            {Repository.last_synced_at: datetime.now(UTC)}, synchronize_session=False
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# Makes sure the commits of a PR are in the local clone, only fetching the refs when they are missing.
+# A sync from the PR's webhook usually got there first, in which case no network call is made
+async def ensure_pr_commits(
+    repo_full_name: str,
+    installation_id: int,
+    target_branch: str,
+    pr_number: int,
+    shas: list[str],
+) -> None:
+    repo_path = get_local_repo_path(repo_full_name)
+    if await has_commits(repo_path, shas):
+        return
+
+    async with repo_sync_lock(repo_full_name):
+        # A sync holding the lock may have fetched them meanwhile
+        if await has_commits(repo_path, shas):
+            return
+
+        access_token = await get_installation_access_token(installation_id)
+        fetched = await fetch_refs(
+            repo_full_name, access_token, [_branch_refspec(target_branch), _pr_refspec(pr_number)]
+        )
+
+    if not fetched or not await has_commits(repo_path, shas):
+        raise RuntimeError(f"Commits {', '.join(shas)} are not available for {repo_full_name}")
+
+
+# Background task that fetches the target branch and every PR head into a linked repo's clone
+def sync_repository(repo_id: str) -> None:
+    asyncio.run(_sync_repository(repo_id))
+
+
+# Syncs the clone of a repo and records last_synced_at when the fetch succeeded
+async def _sync_repository(repo_id: str) -> None:
+    session = SessionLocal()
+    try:
+        repo = session.query(Repository).filter(Repository.id == repo_id).first()
+        if not repo or not repo.is_active or not repo.installation_id:
+            print(f"Skipping sync of repository {repo_id}: not found or inactive")
+            return
+
+        # The clone job fetches everything itself, a sync would race it for the directory
+        if repo.clone_status != "ready":
+            print(f"Skipping sync of {repo.repo_name}: clone is {repo.clone_status}")
+            return
+
+        repo_full_name = repo.repo_name
+        installation_id = repo.installation_id
+        target_branch = repo.target_branch or "main"
+    finally:
+        session.close()
+
+    if not get_local_repo_path(repo_full_name).exists():
+        print(f"Skipping sync of {repo_full_name}: no local clone")
+        return
+
+    async with repo_sync_lock(repo_full_name):
+        access_token = await get_installation_access_token(installation_id)
+        fetched = await fetch_refs(
+            repo_full_name, access_token, [_branch_refspec(target_branch), _pr_refspec("*")]
+        )
+
+    if fetched:
+        await asyncio.to_thread(_mark_synced, repo_id)
@@ -1,80 +1,91 @@
-import uuid
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, patch
+
+import pytest
 
 from app.agents.nodes.aggregate_results import aggregate_results
 from app.agents.state import DriftAnalysisState
 
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+# =========== Fixtures ===========
+
+
+# Replaces the DB write with a mock that reports the drift event as found
+@pytest.fixture(autouse=True)
+def mock_save():
+    with patch("app.agents.nodes.aggregate_results.save_drift_results", return_value=True) as mock:
+        yield mock
+
 
 # =========== Helper Functions ===========
 
 
-# Helper function to build a minimal state dictionary
+# Helper function to build a minimal state dictionary with the drift event snapshot
 def _make_state(
     findings: list[dict] | None = None,
-    change_elements: list[dict] | None = None,
-    analysis_payloads: list[dict] | None = None,
     drift_event_id: str = "evt-1",
+    check_run_id: int | None = None,
+    user_id: str | None = USER_ID,
 ) -> DriftAnalysisState:
     return {
         "drift_event_id": drift_event_id,
         "base_sha": "abc123",
         "head_sha": "def456",
-        "session": MagicMock(),
         "repo_path": "/tmp/repo",
         "docs_root_path": "/docs",
-        "change_elements": change_elements or [],
-        "analysis_payloads": analysis_payloads or [],
+        "repo_full_name": "owner/repo",
+        "installation_id": 12345,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": check_run_id,
+        "reviewer": None,
+        "user_id": user_id,
+        "code_changes": [],
+        "change_elements": [],
+        "analysis_payloads": [],
         "findings": findings or [],
         "target_files": [],
         "rewrite_results": [],
         "style_preference": "professional",
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
 
-# Helper function to create a mock DriftEvent with repository relationship.
-def _make_drift_event(
-    check_run_id=None, repo_name="owner/repo", installation_id=12345, pr_number=42
-):
-    repo = MagicMock()
-    repo.repo_name = repo_name
-    repo.installation_id = installation_id
-    repo.installation = MagicMock()
-    repo.installation.user_id = uuid.UUID("00000000-0000-0000-0000-000000000001")
-
-    event = MagicMock()
-    event.check_run_id = check_run_id
-    event.pr_number = pr_number
-    event.repository = repo
-    return event
+# Returns the keyword view of the save_drift_results call
+def _saved(mock_save) -> dict:
+    args, kwargs = mock_save.call_args
+    names = ["drift_event_id", "findings", "overall_score", "drift_result", "summary"]
+    return {**dict(zip(names, args)), **kwargs}
 
 
 # =========== Tests ===========
 
 
-# Tests that empty findings produce a clean result with score 0.0 and no DriftFinding rows.
-def test_no_findings_clean():
+# Tests that empty findings produce a clean result with score 0.0 and no findings saved.
+@pytest.mark.asyncio
+async def test_no_findings_clean(mock_save):
     state = _make_state(findings=[])
-    drift_event = _make_drift_event()
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
 
-    with patch("app.agents.nodes.aggregate_results.create_notification"):
-        result = aggregate_results(state)
+    result = await aggregate_results(state)
 
-    assert result == {"findings": []}
+    assert result["findings"] == []
+    assert "No documentation drift" in result["drift_summary"]
 
-    # DriftEvent should be updated to clean
-    assert drift_event.overall_drift_score == 0.0
-    assert drift_event.drift_result == "clean"
-    assert drift_event.processing_phase == "completed"
-    assert "No documentation drift" in drift_event.summary
+    mock_save.assert_called_once()
+    saved = _saved(mock_save)
+    assert saved["drift_event_id"] == "evt-1"
+    assert saved["findings"] == []
+    assert saved["overall_score"] == 0.0
+    assert saved["drift_result"] == "clean"
+    assert "No documentation drift" in saved["summary"]
 
-    # No DriftFinding rows should be added
-    state["session"].add.assert_not_called()
-    state["session"].commit.assert_called_once()
 
-
-# Tests that findings present result in drift_detected and DriftFinding rows being created.
-def test_drift_detected_persists_findings():
+# Tests that findings present result in drift_detected and the findings being saved.
+@pytest.mark.asyncio
+async def test_drift_detected_persists_findings(mock_save):
     findings = [
         {
             "code_path": "src/routes.py",
@@ -86,27 +97,19 @@ def test_drift_detected_persists_findings():
         },
     ]
     state = _make_state(findings=findings)
-    drift_event = _make_drift_event()
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
-
-    with (
-        patch("app.agents.nodes.aggregate_results.DriftFinding") as mock_finding_cls,
-        patch("app.agents.nodes.aggregate_results.create_notification"),
-    ):
-        mock_finding_cls.return_value = MagicMock()
-        result = aggregate_results(state)
 
-    assert result == {"findings": []}
-    assert drift_event.drift_result == "drift_detected"
-    assert drift_event.overall_drift_score == 0.85
-    assert drift_event.processing_phase == "completed"
+    result = await aggregate_results(state)
 
-    # Only one DriftFinding row should be staged
-    state["session"].add.assert_called_once()
+    assert result["findings"] == []
+    saved = _saved(mock_save)
+    assert saved["drift_result"] == "drift_detected"
+    assert saved["overall_score"] == 0.85
+    assert saved["findings"] == findings
 
 
 # Tests that a finding with missing_docs sets drift_result to 'missing_docs'.
-def test_missing_docs_result():
+@pytest.mark.asyncio
+async def test_missing_docs_result(mock_save):
     findings = [
         {
             "code_path": "src/new.py",
@@ -126,41 +129,31 @@ def test_missing_docs_result():
         },
     ]
     state = _make_state(findings=findings)
-    drift_event = _make_drift_event()
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
-
-    with (
-        patch("app.agents.nodes.aggregate_results.DriftFinding") as mock_finding_cls,
-        patch("app.agents.nodes.aggregate_results.create_notification"),
-    ):
-        mock_finding_cls.return_value = MagicMock()
-        aggregate_results(state)
 
-    assert drift_event.drift_result == "missing_docs"
-    assert drift_event.overall_drift_score == 1.0
+    await aggregate_results(state)
 
-    # Two DriftFinding rows should be staged
-    assert state["session"].add.call_count == 2
-
-
-# Test that when drift_event is not found, session.commit is still called and no exception raised
-def test_drift_event_not_found_in_db_still_commits():
-    state = _make_state(findings=[])
+    saved = _saved(mock_save)
+    assert saved["drift_result"] == "missing_docs"
+    assert saved["overall_score"] == 1.0
+    assert len(saved["findings"]) == 2
 
-    # Simulating DriftEvent query returning None
-    state["session"].query.return_value.filter.return_value.first.return_value = None
 
-    result = aggregate_results(state)
+# Test that when drift_event is not found, no exception is raised and the check run is skipped
+@pytest.mark.asyncio
+@patch("app.agents.nodes.aggregate_results.update_github_check_run", new_callable=AsyncMock)
+async def test_drift_event_not_found_in_db_does_not_raise(mock_update, mock_save):
+    mock_save.return_value = False
+    state = _make_state(findings=[], check_run_id=99)
 
-    assert result == {"findings": []}
-    state["session"].commit.assert_called_once()
+    result = await aggregate_results(state)
 
-    # No DriftFinding rows should be added
-    state["session"].add.assert_not_called()
+    assert result["findings"] == []
+    mock_update.assert_not_called()
 
 
 # Test that overall_drift_score is the maximum across all findings
-def test_overall_drift_score_is_maximum():
+@pytest.mark.asyncio
+async def test_overall_drift_score_is_maximum(mock_save):
     findings = [
         {
             "code_path": "src/a.py",
@@ -180,40 +173,32 @@ def test_overall_drift_score_is_maximum():
         },
     ]
     state = _make_state(findings=findings)
-    drift_event = _make_drift_event()
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
 
-    with (
-        patch("app.agents.nodes.aggregate_results.DriftFinding"),
-        patch("app.agents.nodes.aggregate_results.create_notification"),
-    ):
-        aggregate_results(state)
+    await aggregate_results(state)
 
-    assert drift_event.overall_drift_score == 0.95
+    assert _saved(mock_save)["overall_score"] == 0.95
 
 
 # =========== Notifications Tests ===========
 
 
 # Test notification content when result is clean
-def test_notification_content_clean():
+@pytest.mark.asyncio
+async def test_notification_content_clean(mock_save):
     state = _make_state(findings=[])
-    drift_event = _make_drift_event()
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
 
-    with patch("app.agents.nodes.aggregate_results.create_notification") as mock_notif:
-        aggregate_results(state)
+    await aggregate_results(state)
 
-    mock_notif.assert_called_once()
-    _, user_id_arg, content = mock_notif.call_args[0]
-    assert user_id_arg == drift_event.repository.installation.user_id
-    assert "PR #42" in content
-    assert "owner/repo" in content
-    assert "No documentation drift detected" in content
+    saved = _saved(mock_save)
+    assert saved["user_id"] == USER_ID
+    assert "PR #42" in saved["notification"]
+    assert "owner/repo" in saved["notification"]
+    assert "No documentation drift detected" in saved["notification"]
 
 
 # Test notification content when documentation drift is detected
-def test_notification_content_drift_detected():
+@pytest.mark.asyncio
+async def test_notification_content_drift_detected(mock_save):
     findings = [
         {
             "code_path": "src/api.py",
@@ -225,26 +210,20 @@ def test_notification_content_drift_detected():
         }
     ]
     state = _make_state(findings=findings)
-    drift_event = _make_drift_event()
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
 
-    with (
-        patch("app.agents.nodes.aggregate_results.DriftFinding"),
-        patch("app.agents.nodes.aggregate_results.create_notification") as mock_notif,
-    ):
-        aggregate_results(state)
+    await aggregate_results(state)
 
-    mock_notif.assert_called_once()
-    _, user_id_arg, content = mock_notif.call_args[0]
-    assert user_id_arg == drift_event.repository.installation.user_id
-    assert "PR #42" in content
-    assert "owner/repo" in content
-    assert "Documentation drift detected" in content
-    assert "0.75" in content
+    saved = _saved(mock_save)
+    assert saved["user_id"] == USER_ID
+    assert "PR #42" in saved["notification"]
+    assert "owner/repo" in saved["notification"]
+    assert "Documentation drift detected" in saved["notification"]
+    assert "0.75" in saved["notification"]
 
 
 # Test notification content when missing docs drift is detected
-def test_notification_content_missing_docs():
+@pytest.mark.asyncio
+async def test_notification_content_missing_docs(mock_save):
     findings = [
         {
             "code_path": "src/new.py",
@@ -256,43 +235,33 @@ def test_notification_content_missing_docs():
         }
     ]
     state = _make_state(findings=findings)
-    drift_event = _make_drift_event()
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
-
-    with (
-        patch("app.agents.nodes.aggregate_results.DriftFinding"),
-        patch("app.agents.nodes.aggregate_results.create_notification") as mock_notif,
-    ):
-        aggregate_results(state)
-
-    mock_notif.assert_called_once()
-    _, user_id_arg, content = mock_notif.call_args[0]
-    assert user_id_arg == drift_event.repository.installation.user_id
-    assert "PR #42" in content
-    assert "owner/repo" in content
-    assert "Missing documentation detected" in content
-    assert "1.00" in content
-
-
-# Test no notification is sent when installation has no user_id
-def test_notification_not_sent_when_no_user_id():
-    state = _make_state(findings=[])
-    drift_event = _make_drift_event()
-    drift_event.repository.installation.user_id = None
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
 
-    with patch("app.agents.nodes.aggregate_results.create_notification") as mock_notif:
-        aggregate_results(state)
+    await aggregate_results(state)
+
+    saved = _saved(mock_save)
+    assert "PR #42" in saved["notification"]
+    assert "owner/repo" in saved["notification"]
+    assert "Missing documentation detected" in saved["notification"]
+    assert "1.00" in saved["notification"]
+
+
+# Test no user is passed for the notification when installation has no user_id
+@pytest.mark.asyncio
+async def test_notification_not_sent_when_no_user_id(mock_save):
+    state = _make_state(findings=[], user_id=None)
+
+    await aggregate_results(state)
 
-    mock_notif.assert_not_called()
+    assert _saved(mock_save)["user_id"] is None
 
 
 # =========== GH Check Run Tests ===========
 
 
 # Tests that when check_run_id exists, update_github_check_run is called.
+@pytest.mark.asyncio
 @patch("app.agents.nodes.aggregate_results.update_github_check_run", new_callable=AsyncMock)
-def test_check_run_updated(mock_update):
+async def test_check_run_updated(mock_update):
     findings = [
         {
             "code_path": "src/api.py",
@@ -303,37 +272,35 @@ def test_check_run_updated(mock_update):
             "confidence": 0.9,
         },
     ]
-    state = _make_state(findings=findings)
-    drift_event = _make_drift_event(check_run_id=999)
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
+    state = _make_state(findings=findings, check_run_id=999)
 
-    with patch("app.agents.nodes.aggregate_results.DriftFinding") as mock_finding_cls:
-        mock_finding_cls.return_value = MagicMock()
-        aggregate_results(state)
+    await aggregate_results(state)
 
     mock_update.assert_called_once()
+    _, kwargs = mock_update.call_args
+    assert kwargs["repo_full_name"] == "owner/repo"
+    assert kwargs["check_run_id"] == 999
+    assert kwargs["installation_id"] == 12345
 
 
 # Tests that when there is no check_run_id, the update helper is not called.
+@pytest.mark.asyncio
 @patch("app.agents.nodes.aggregate_results.update_github_check_run", new_callable=AsyncMock)
-def test_check_run_skipped_when_none(mock_update):
-    state = _make_state(findings=[])
-    drift_event = _make_drift_event(check_run_id=None)
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
+async def test_check_run_skipped_when_none(mock_update):
+    state = _make_state(findings=[], check_run_id=None)
 
-    aggregate_results(state)
+    await aggregate_results(state)
 
     mock_update.assert_not_called()
 
 
 # Test that the check run conclusion is "success" when drift_result is "clean"
+@pytest.mark.asyncio
 @patch("app.agents.nodes.aggregate_results.update_github_check_run", new_callable=AsyncMock)
-def test_check_run_conclusion_success_when_clean(mock_update):
-    state = _make_state(findings=[])
-    drift_event = _make_drift_event(check_run_id=42)
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
+async def test_check_run_conclusion_success_when_clean(mock_update):
+    state = _make_state(findings=[], check_run_id=42)
 
-    aggregate_results(state)
+    await aggregate_results(state)
 
     mock_update.assert_called_once()
     _, kwargs = mock_update.call_args
@@ -341,8 +308,9 @@ def test_check_run_conclusion_success_when_clean(mock_update):
 
 
 # Test that the check run conclusion is "action_required" when drift is detected
+@pytest.mark.asyncio
 @patch("app.agents.nodes.aggregate_results.update_github_check_run", new_callable=AsyncMock)
-def test_check_run_conclusion_action_required_when_drift(mock_update):
+async def test_check_run_conclusion_action_required_when_drift(mock_update):
     findings = [
         {
             "code_path": "src/api.py",
@@ -353,12 +321,9 @@ def test_check_run_conclusion_action_required_when_drift(mock_update):
             "confidence": 0.95,
         }
     ]
-    state = _make_state(findings=findings)
-    drift_event = _make_drift_event(check_run_id=42)
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
+    state = _make_state(findings=findings, check_run_id=42)
 
-    with patch("app.agents.nodes.aggregate_results.DriftFinding"):
-        aggregate_results(state)
+    await aggregate_results(state)
 
     mock_update.assert_called_once()
     _, kwargs = mock_update.call_args
@@ -366,15 +331,14 @@ def test_check_run_conclusion_action_required_when_drift(mock_update):
 
 
 # Test that a check run update exception is caught and does not propagate
+@pytest.mark.asyncio
 @patch("app.agents.nodes.aggregate_results.update_github_check_run", new_callable=AsyncMock)
-def test_check_run_update_exception_is_swallowed(mock_update):
+async def test_check_run_update_exception_is_swallowed(mock_update):
     mock_update.side_effect = Exception("GitHub API down")
 
-    state = _make_state(findings=[])
-    drift_event = _make_drift_event(check_run_id=99)
-    state["session"].query.return_value.filter.return_value.first.return_value = drift_event
+    state = _make_state(findings=[], check_run_id=99)
 
     # Should not raise even though update_github_check_run raises
-    result = aggregate_results(state)
+    result = await aggregate_results(state)
 
-    assert result == {"findings": []}
+    assert result["findings"] == []
@@ -1,20 +1,29 @@
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from app.agents.nodes.apply_changes import apply_changes
-from app.agents.state import DriftAnalysisState
+import pytest
 
+from app.agents.nodes.apply_changes import _commit_and_pr, apply_changes
+from app.agents.state import DriftAnalysisState
 
 # =========== Tests ===========
 
 
 # Tests that rewrite results are written to the correct paths on disk.
-def test_apply_changes_writes_files(tmp_path):
+@pytest.mark.asyncio
+async def test_apply_changes_writes_files(tmp_path):
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
         "change_elements": [],
         "analysis_payloads": [],
         "style_preference": "professional",
@@ -27,10 +36,13 @@ def test_apply_changes_writes_files(tmp_path):
                 "new_content": "# Updated API\nNew content here.",
             }
         ],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with patch("app.agents.nodes.apply_changes._commit_and_pr"):
-        result = apply_changes(state)
+        result = await apply_changes(state)
 
     assert result == {}
     written = (tmp_path / "docs" / "api.md").read_text(encoding="utf-8")
@@ -38,13 +50,21 @@ def test_apply_changes_writes_files(tmp_path):
 
 
 # Tests that a path traversal attempt outside the repo root is blocked.
-def test_apply_changes_blocks_path_traversal(tmp_path):
+@pytest.mark.asyncio
+async def test_apply_changes_blocks_path_traversal(tmp_path):
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
         "change_elements": [],
         "analysis_payloads": [],
         "style_preference": "professional",
@@ -57,23 +77,34 @@ def test_apply_changes_blocks_path_traversal(tmp_path):
                 "new_content": "malicious content",
             }
         ],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with patch("app.agents.nodes.apply_changes._commit_and_pr"):
-        result = apply_changes(state)
+        result = await apply_changes(state)
 
     assert result == {}
     assert not (tmp_path / "etc" / "passwd").exists()
 
 
 # Tests that non-markdown files in rewrite results are not written to disk.
-def test_apply_changes_skips_non_markdown(tmp_path):
+@pytest.mark.asyncio
+async def test_apply_changes_skips_non_markdown(tmp_path):
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
         "change_elements": [],
         "analysis_payloads": [],
         "style_preference": "professional",
@@ -86,10 +117,86 @@ def test_apply_changes_skips_non_markdown(tmp_path):
                 "new_content": "import os",
             }
         ],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with patch("app.agents.nodes.apply_changes._commit_and_pr"):
-        result = apply_changes(state)
+        result = await apply_changes(state)
 
     assert result == {}
     assert not (tmp_path / "app" / "main.py").exists()
+
+
+# Tests that a raised docs PR is saved with the notification and linked on the check run.
+@pytest.mark.asyncio
+async def test_commit_and_pr_saves_docs_pr_from_snapshot():
+    state: DriftAnalysisState = {
+        "drift_event_id": "evt-1",
+        "repo_path": "/tmp/repos/owner/repo",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": 777,
+        "reviewer": "octocat",
+        "user_id": "00000000-0000-0000-0000-000000000001",
+        "findings": [{"code_path": "app/auth.py", "explanation": "Auth changed"}],
+        "rewrite_results": [{"doc_path": "docs/api.md", "new_content": "# API"}],
+        "drift_summary": "Found 1 documentation drift(s)",
+        "base_sha": "base",
+        "head_sha": "head",
+        "docs_root_path": "/docs",
+        "code_changes": [],
+        "change_elements": [],
+        "analysis_payloads": [],
+        "target_files": [],
+        "style_preference": "professional",
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
+    }
+
+    with (
+        patch(
+            "app.agents.nodes.apply_changes.get_installation_access_token",
+            new_callable=AsyncMock,
+            return_value="token",
+        ),
+        patch(
+            "app.agents.nodes.apply_changes.commit_and_push_docs_branch",
+            new_callable=AsyncMock,
+            return_value=True,
+        ),
+        patch(
+            "app.agents.nodes.apply_changes.run_git",
+            new_callable=AsyncMock,
+            return_value=MagicMock(returncode=0, stdout="docs/delta-fix/feature\n"),
+        ) as mock_run_git,
+        patch(
+            "app.agents.nodes.apply_changes.create_docs_pull_request",
+            new_callable=AsyncMock,
+            return_value=101,
+        ),
+        patch(
+            "app.agents.nodes.apply_changes.request_pr_review", new_callable=AsyncMock
+        ) as mock_review,
+        patch(
+            "app.agents.nodes.apply_changes.update_github_check_run", new_callable=AsyncMock
+        ) as mock_check_run,
+        patch("app.agents.nodes.apply_changes.save_docs_pr") as mock_save,
+    ):
+        await _commit_and_pr(state)
+
+    mock_run_git.assert_awaited_once()
+    mock_save.assert_called_once()
+    args, kwargs = mock_save.call_args
+    assert args == ("evt-1", 101)
+    assert kwargs["user_id"] == "00000000-0000-0000-0000-000000000001"
+    assert "PR #101" in kwargs["notification"]
+    mock_review.assert_awaited_once()
+    assert mock_review.call_args.kwargs["reviewer"] == "octocat"
+    summary = mock_check_run.call_args.kwargs["summary"]
+    assert summary.startswith("Found 1 documentation drift(s)")
+    assert "owner/repo#101" in summary
@@ -1,12 +1,17 @@
-import pytest
+import asyncio
+import subprocess
 from typing import Literal
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
 
 from app.agents.nodes.deep_analyze import (
-    deep_analyze,
     LLMDriftFinding,
+    deep_analyze,
 )
 from app.agents.state import DriftAnalysisState
+from app.core.config import settings
+from app.services.git_service import diff_commits
 
 # =========== Helper Functions ===========
 
@@ -17,20 +22,31 @@ def _make_state(
     repo_path: str = "/tmp/repo",
     base_sha: str = "abc123def4",
     head_sha: str = "def456abc7",
+    file_diffs: dict[str, dict] | None = None,
 ) -> DriftAnalysisState:
     return {
         "drift_event_id": "evt-1",
         "base_sha": base_sha,
         "head_sha": head_sha,
-        "session": None,
         "repo_path": repo_path,
         "docs_root_path": "/docs",
         "change_elements": [],
         "analysis_payloads": analysis_payloads or [],
+        "file_diffs": file_diffs or {},
         "findings": [],
         "target_files": [],
         "rewrite_results": [],
         "style_preference": "professional",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
 
@@ -56,13 +72,14 @@ def _mock_drift_finding(drift_detected: bool, **kwargs) -> LLMDriftFinding:
 
 
 # Tests that when the LLM returns drift_detected=True, a finding dict is appended.
-@patch("app.agents.nodes.deep_analyze._get_git_diff")
+@pytest.mark.asyncio
+@patch("app.agents.nodes.deep_analyze._get_file_patch")
 @patch("app.agents.llm.ChatGoogleGenerativeAI")
-def test_drift_detected_produces_finding(mock_llm_class, mock_get_diff):
+async def test_drift_detected_produces_finding(mock_llm_class, mock_get_diff):
     mock_get_diff.return_value = "- @app.route('/date')\n+ @app.route('/today')"
 
     mock_structured = MagicMock()
-    mock_structured.invoke.return_value = _mock_drift_finding(True)
+    mock_structured.ainvoke = AsyncMock(return_value=_mock_drift_finding(True))
     mock_llm_instance = MagicMock()
     mock_llm_instance.with_structured_output.return_value = mock_structured
     mock_llm_class.return_value = mock_llm_instance
@@ -79,7 +96,7 @@ def test_drift_detected_produces_finding(mock_llm_class, mock_get_diff):
         ],
     )
 
-    result = deep_analyze(state)
+    result = await deep_analyze(state)
 
     assert len(result["findings"]) == 1
     finding = result["findings"][0]
@@ -92,13 +109,14 @@ def test_drift_detected_produces_finding(mock_llm_class, mock_get_diff):
 
 
 # Tests that when the LLM returns drift_detected=False, no findings are appended.
-@patch("app.agents.nodes.deep_analyze._get_git_diff")
+@pytest.mark.asyncio
+@patch("app.agents.nodes.deep_analyze._get_file_patch")
 @patch("app.agents.llm.ChatGoogleGenerativeAI")
-def test_no_drift_skipped(mock_llm_class, mock_get_diff):
+async def test_no_drift_skipped(mock_llm_class, mock_get_diff):
     mock_get_diff.return_value = "- # old comment\n+ # new comment"
 
     mock_structured = MagicMock()
-    mock_structured.invoke.return_value = _mock_drift_finding(False)
+    mock_structured.ainvoke = AsyncMock(return_value=_mock_drift_finding(False))
     mock_llm_instance = MagicMock()
     mock_llm_instance.with_structured_output.return_value = mock_structured
     mock_llm_class.return_value = mock_llm_instance
@@ -115,23 +133,25 @@ def test_no_drift_skipped(mock_llm_class, mock_get_diff):
         ],
     )
 
-    result = deep_analyze(state)
+    result = await deep_analyze(state)
 
     assert result["findings"] == []
 
 
 # Tests that no analysis payloads results in an immediate return with empty findings.
-def test_empty_payloads_returns_empty():
+@pytest.mark.asyncio
+async def test_empty_payloads_returns_empty():
     state = _make_state(analysis_payloads=[])
 
-    result = deep_analyze(state)
+    result = await deep_analyze(state)
 
     assert result == {"findings": []}
 
 
-# Tests that when the git diff returns None, the payload is skipped.
-@patch("app.agents.nodes.deep_analyze._get_git_diff")
-def test_git_diff_error_handled(mock_get_diff):
+# Tests that when the PR's diff has no entry for the file, the payload is skipped.
+@pytest.mark.asyncio
+@patch("app.agents.nodes.deep_analyze._get_file_patch")
+async def test_git_diff_error_handled(mock_get_diff):
     mock_get_diff.return_value = None
 
     state = _make_state(
@@ -146,22 +166,23 @@ def test_git_diff_error_handled(mock_get_diff):
         ],
     )
 
-    result = deep_analyze(state)
+    result = await deep_analyze(state)
 
     assert result["findings"] == []
 
 
 # Tests that with two payloads where one has drift and one doesn't, only one finding is produced.
-@patch("app.agents.nodes.deep_analyze._get_git_diff")
+@pytest.mark.asyncio
+@patch("app.agents.nodes.deep_analyze._get_file_patch")
 @patch("app.agents.llm.ChatGoogleGenerativeAI")
-def test_multiple_payloads(mock_llm_class, mock_get_diff):
+async def test_multiple_payloads(mock_llm_class, mock_get_diff):
     mock_get_diff.return_value = "some diff content"
 
     drift_response = _mock_drift_finding(True)
     clean_response = _mock_drift_finding(False)
 
     mock_structured = MagicMock()
-    mock_structured.invoke.side_effect = [drift_response, clean_response]
+    mock_structured.ainvoke = AsyncMock(side_effect=[drift_response, clean_response])
     mock_llm_instance = MagicMock()
     mock_llm_instance.with_structured_output.return_value = mock_structured
     mock_llm_class.return_value = mock_llm_instance
@@ -185,20 +206,46 @@ def test_multiple_payloads(mock_llm_class, mock_get_diff):
         ],
     )
 
-    result = deep_analyze(state)
+    result = await deep_analyze(state)
 
     assert len(result["findings"]) == 1
     assert result["findings"][0]["code_path"] == "src/api.py"
 
 
+# Tests that each analysed payload pushes the node's progress to the live streams.
+@pytest.mark.asyncio
+@patch("app.agents.nodes.deep_analyze.publish_progress")
+@patch("app.agents.nodes.deep_analyze._get_file_patch")
+@patch("app.agents.llm.ChatGoogleGenerativeAI")
+async def test_progress_published_per_payload(mock_llm_class, mock_get_diff, mock_progress):
+    mock_get_diff.return_value = "some diff content"
+
+    mock_structured = MagicMock()
+    mock_structured.ainvoke = AsyncMock(return_value=_mock_drift_finding(False))
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.with_structured_output.return_value = mock_structured
+    mock_llm_class.return_value = mock_llm_instance
+
+    payload = {"code_path": "src/api.py", "change_type": "modified", "elements": ["/users"]}
+    state = _make_state(analysis_payloads=[payload, {**payload, "code_path": "src/models.py"}])
+
+    await deep_analyze(state)
+
+    assert [c.args[1:] for c in mock_progress.call_args_list] == [
+        ("deep_analyze", 1, 2),
+        ("deep_analyze", 2, 2),
+    ]
+
+
 # Tests that when the LLM raises an exception, the exception propagates out of deep_analyze.
-@patch("app.agents.nodes.deep_analyze._get_git_diff")
+@pytest.mark.asyncio
+@patch("app.agents.nodes.deep_analyze._get_file_patch")
 @patch("app.agents.llm.ChatGoogleGenerativeAI")
-def test_llm_exception_handled(mock_llm_class, mock_get_diff):
+async def test_llm_exception_handled(mock_llm_class, mock_get_diff):
     mock_get_diff.return_value = "some diff"
 
     mock_structured = MagicMock()
-    mock_structured.invoke.side_effect = Exception("API rate limit exceeded")
+    mock_structured.ainvoke = AsyncMock(side_effect=Exception("API rate limit exceeded"))
     mock_llm_instance = MagicMock()
     mock_llm_instance.with_structured_output.return_value = mock_structured
     mock_llm_class.return_value = mock_llm_instance
@@ -216,4 +263,104 @@ def test_llm_exception_handled(mock_llm_class, mock_get_diff):
     )
 
     with pytest.raises(Exception, match="API rate limit exceeded"):
-        deep_analyze(state)
+        await deep_analyze(state)
+
+
+# Tests that payloads are analysed concurrently up to the limit and findings keep payload order.
+@pytest.mark.asyncio
+@patch("app.agents.nodes.deep_analyze._get_file_patch")
+@patch("app.agents.llm.ChatGoogleGenerativeAI")
+async def test_payloads_analysed_concurrently_in_order(mock_llm_class, mock_get_diff):
+    mock_get_diff.return_value = "some diff"
+    active = {"now": 0, "max": 0}
+
+    async def slow_invoke(messages):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return _mock_drift_finding(True)
+
+    mock_structured = MagicMock()
+    mock_structured.ainvoke = slow_invoke
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.with_structured_output.return_value = mock_structured
+    mock_llm_class.return_value = mock_llm_instance
+
+    state = _make_state(
+        analysis_payloads=[
+            {"code_path": f"src/mod{i}.py", "change_type": "modified"} for i in range(5)
+        ],
+    )
+
+    with patch("app.agents.nodes.deep_analyze.settings") as mock_settings:
+        mock_settings.DEEP_ANALYZE_CONCURRENCY = 2
+        result = await deep_analyze(state)
+
+    assert active["max"] == 2
+    assert [f["code_path"] for f in result["findings"]] == [f"src/mod{i}.py" for i in range(5)]
+
+
+# Tests that the patch sent to the LLM is read from the diff parsed before the run, without git.
+@pytest.mark.asyncio
+@patch("app.agents.llm.ChatGoogleGenerativeAI")
+async def test_patch_read_from_state_diff(mock_llm_class):
+    mock_structured = MagicMock()
+    mock_structured.ainvoke = AsyncMock(return_value=_mock_drift_finding(True))
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.with_structured_output.return_value = mock_structured
+    mock_llm_class.return_value = mock_llm_instance
+
+    patch_text = "diff --git a/src/api.py b/src/api.py\n-old_route\n+new_route\n"
+    state = _make_state(
+        analysis_payloads=[{"code_path": "src/api.py", "change_type": "modified"}],
+        file_diffs={"src/api.py": {"file_path": "src/api.py", "patch": patch_text}},
+    )
+
+    result = await deep_analyze(state)
+
+    assert len(result["findings"]) == 1
+    user_prompt = mock_structured.ainvoke.call_args[0][0][1]["content"]
+    assert "+new_route" in user_prompt
+
+
+# Tests that a code change over the diff line cap still reaches the LLM, summarised.
+@pytest.mark.asyncio
+@patch("app.agents.llm.ChatGoogleGenerativeAI")
+async def test_change_over_line_cap_analysed(mock_llm_class, tmp_path):
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+
+    git("init", "-q")
+    (tmp_path / "app.py").write_text("a = 0\n")
+    git("add", "-A")
+    git("commit", "-q", "-m", "base")
+    base_sha = git("rev-parse", "HEAD")
+    lines = settings.MAX_DIFF_LINES + 501
+    (tmp_path / "app.py").write_text("a = 0\n" + "".join(f"b{i} = {i}\n" for i in range(lines)))
+    git("commit", "-q", "-am", "head")
+    head_sha = git("rev-parse", "HEAD")
+
+    mock_structured = MagicMock()
+    mock_structured.ainvoke = AsyncMock(return_value=_mock_drift_finding(True))
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.with_structured_output.return_value = mock_structured
+    mock_llm_class.return_value = mock_llm_instance
+
+    file_diffs = {d["file_path"]: d for d in await diff_commits(tmp_path, base_sha, head_sha)}
+    state = _make_state(
+        analysis_payloads=[{"code_path": "app.py", "change_type": "modified"}],
+        file_diffs=file_diffs,
+    )
+
+    result = await deep_analyze(state)
+
+    assert [f["code_path"] for f in result["findings"]] == ["app.py"]
+    user_prompt = mock_structured.ainvoke.call_args[0][0][1]["content"]
+    assert "+b0 = 0" in user_prompt
+    assert f"diff truncated, +{lines} -0 lines in total" in user_prompt
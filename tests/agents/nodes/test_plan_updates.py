@@ -1,20 +1,29 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from app.agents.nodes.plan_updates import plan_updates
-from app.agents.state import DriftAnalysisState
+import pytest
 
+from app.agents.nodes.plan_updates import _checkout_docs, plan_updates
+from app.agents.state import DriftAnalysisState
 
 # =========== Tests ===========
 
 
 # Tests that empty findings return early with no target files.
-def test_plan_updates_empty_findings():
+@pytest.mark.asyncio
+async def test_plan_updates_empty_findings():
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
         "change_elements": [],
         "analysis_payloads": [],
         "style_preference": "professional",
@@ -22,16 +31,20 @@ def test_plan_updates_empty_findings():
         "repo_path": "/tmp/repos/owner/repo",
         "target_files": [],
         "rewrite_results": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with patch("app.agents.nodes.plan_updates._checkout_docs"):
-        result = plan_updates(state)
+        result = await plan_updates(state)
 
     assert result == {"target_files": []}
 
 
 # Tests that valid LLM output with real .md files produces target_files entries.
-def test_plan_updates_returns_target_files(tmp_path):
+@pytest.mark.asyncio
+async def test_plan_updates_returns_target_files(tmp_path):
     # Create a real .md file so the anti-hallucination scan finds it
     doc_file = tmp_path / "docs" / "api.md"
     doc_file.parent.mkdir(parents=True, exist_ok=True)
@@ -47,15 +60,22 @@ def test_plan_updates_returns_target_files(tmp_path):
 
     mock_llm_instance = MagicMock()
     mock_structured = MagicMock()
-    mock_structured.invoke.return_value = mock_plan
+    mock_structured.ainvoke = AsyncMock(return_value=mock_plan)
     mock_llm_instance.with_structured_output.return_value = mock_structured
 
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
         "change_elements": [],
         "analysis_payloads": [],
         "style_preference": "professional",
@@ -70,6 +90,9 @@ def test_plan_updates_returns_target_files(tmp_path):
         "repo_path": str(tmp_path),
         "target_files": [],
         "rewrite_results": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with (
@@ -79,7 +102,7 @@ def test_plan_updates_returns_target_files(tmp_path):
             return_value=mock_llm_instance,
         ),
     ):
-        result = plan_updates(state)
+        result = await plan_updates(state)
 
     assert len(result["target_files"]) == 1
     assert result["target_files"][0]["doc_path"] == "docs/api.md"
@@ -87,18 +110,26 @@ def test_plan_updates_returns_target_files(tmp_path):
 
 
 # Tests that an LLM error returns an empty target_files list instead of raising.
-def test_plan_updates_llm_error_returns_empty():
+@pytest.mark.asyncio
+async def test_plan_updates_llm_error_returns_empty():
     mock_llm_instance = MagicMock()
     mock_structured = MagicMock()
-    mock_structured.invoke.side_effect = Exception("LLM error")
+    mock_structured.ainvoke = AsyncMock(side_effect=Exception("LLM error"))
     mock_llm_instance.with_structured_output.return_value = mock_structured
 
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
         "change_elements": [],
         "analysis_payloads": [],
         "style_preference": "professional",
@@ -113,6 +144,9 @@ def test_plan_updates_llm_error_returns_empty():
         "repo_path": "/tmp/repos/owner/repo",
         "target_files": [],
         "rewrite_results": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with (
@@ -122,6 +156,61 @@ def test_plan_updates_llm_error_returns_empty():
             return_value=mock_llm_instance,
         ),
     ):
-        result = plan_updates(state)
+        result = await plan_updates(state)
 
     assert result == {"target_files": []}
+
+
+# Tests that the docs branch is created from the snapshot and the phase is moved to generating.
+@pytest.mark.asyncio
+async def test_checkout_docs_uses_snapshot_and_sets_phase():
+    state: DriftAnalysisState = {
+        "drift_event_id": "evt-1",
+        "head_sha": "def456",
+        "repo_path": "/tmp/repos/owner/repo",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
+        "base_sha": "base",
+        "docs_root_path": "/docs",
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "change_elements": [],
+        "analysis_payloads": [],
+        "findings": [],
+        "target_files": [],
+        "rewrite_results": [],
+        "style_preference": "professional",
+        "file_diffs": {},
+        "repo_id": "repo-1",
+    }
+
+    with (
+        patch(
+            "app.agents.nodes.plan_updates.get_installation_access_token",
+            new_callable=AsyncMock,
+            return_value="token",
+        ) as mock_token,
+        patch(
+            "app.agents.nodes.plan_updates.create_docs_branch",
+            new_callable=AsyncMock,
+            return_value="docs/delta-fix/feature",
+        ) as mock_branch,
+        patch("app.agents.nodes.plan_updates.set_processing_phase") as mock_phase,
+    ):
+        await _checkout_docs(state)
+
+    mock_token.assert_awaited_once_with(99)
+    mock_branch.assert_awaited_once_with(
+        repo_path="/tmp/repos/owner/repo",
+        original_branch="feature",
+        access_token="token",
+        repo_full_name="owner/repo",
+        pr_number=42,
+        start_sha="def456",
+    )
+    mock_phase.assert_called_once_with("evt-1", "generating", "2026-10-01T00:00:00+00:00")
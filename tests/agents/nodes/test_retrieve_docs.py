@@ -1,4 +1,8 @@
+import subprocess
 import textwrap
+from unittest.mock import patch
+
+import pytest
 
 from app.agents.nodes.retrieve_docs import retrieve_docs
 from app.agents.state import DriftAnalysisState
@@ -16,7 +20,6 @@ def _make_state(
         "drift_event_id": "evt-1",
         "base_sha": "abc123def4",
         "head_sha": "def456abc7",
-        "session": None,
         "repo_path": repo_path,
         "docs_root_path": docs_root_path,
         "change_elements": change_elements or [],
@@ -25,14 +28,42 @@ def _make_state(
         "target_files": [],
         "rewrite_results": [],
         "style_preference": "professional",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
 
+# Commits the files written under the state's repo path and runs the node against that commit
+async def _retrieve(state: DriftAnalysisState) -> dict:
+    repo_path = state["repo_path"]
+    subprocess.run(["git", "init", "-q", repo_path], check=True)
+    subprocess.run(["git", "-C", repo_path, "add", "-A"], check=True)
+    subprocess.run(
+        ["git", "-C", repo_path, "-c", "user.name=t", "-c", "user.email=t@t"]
+        + ["commit", "-q", "--allow-empty", "-m", "docs"],
+        check=True,
+    )
+    head = subprocess.run(
+        ["git", "-C", repo_path, "rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    return await retrieve_docs({**state, "head_sha": head})
+
+
 # =========== Tests ===========
 
 
 # Tests that an added file with no doc mentions produces a missing_docs finding.
-def test_fast_track_missing_docs(tmp_path):
+@pytest.mark.asyncio
+async def test_fast_track_missing_docs(tmp_path):
     (tmp_path / "docs").mkdir()
 
     state = _make_state(
@@ -47,7 +78,7 @@ def test_fast_track_missing_docs(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert len(result["findings"]) == 1
     finding = result["findings"][0]
@@ -60,7 +91,8 @@ def test_fast_track_missing_docs(tmp_path):
 
 
 # Tests that an added file whose elements are mentioned in docs produces a payload.
-def test_added_with_matches_no_finding(tmp_path):
+@pytest.mark.asyncio
+async def test_added_with_matches_no_finding(tmp_path):
     docs_dir = tmp_path / "docs"
     docs_dir.mkdir()
     (docs_dir / "api.md").write_text("## API\n\nThe `NewClass` handles user creation.\n")
@@ -77,7 +109,7 @@ def test_added_with_matches_no_finding(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert result["findings"] == []
     assert len(result["analysis_payloads"]) == 1
@@ -87,7 +119,8 @@ def test_added_with_matches_no_finding(tmp_path):
 
 
 # Tests that a modified file with an element found in docs produces an analysis payload with a snippet.
-def test_matched_docs_produce_payload(tmp_path):
+@pytest.mark.asyncio
+async def test_matched_docs_produce_payload(tmp_path):
     docs_dir = tmp_path / "docs"
     docs_dir.mkdir()
     doc_content = textwrap.dedent("""\
@@ -114,7 +147,7 @@ def test_matched_docs_produce_payload(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert result["findings"] == []
     assert len(result["analysis_payloads"]) == 1
@@ -126,7 +159,8 @@ def test_matched_docs_produce_payload(tmp_path):
 
 
 # Tests that when some elements match docs and some don't, a single payload with all elements is produced.
-def test_multiple_elements_partial_match(tmp_path):
+@pytest.mark.asyncio
+async def test_multiple_elements_partial_match(tmp_path):
     docs_dir = tmp_path / "docs"
     docs_dir.mkdir()
     (docs_dir / "guide.md").write_text("Use `existing_fn` for data processing.\n")
@@ -143,7 +177,7 @@ def test_multiple_elements_partial_match(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert len(result["analysis_payloads"]) == 1
     payload = result["analysis_payloads"][0]
@@ -152,7 +186,8 @@ def test_multiple_elements_partial_match(tmp_path):
 
 
 # Tests that a deleted file whose old_elements appear in docs produces a payload for LLM analysis.
-def test_deleted_files_with_docs(tmp_path):
+@pytest.mark.asyncio
+async def test_deleted_files_with_docs(tmp_path):
     docs_dir = tmp_path / "docs"
     docs_dir.mkdir()
     (docs_dir / "ref.md").write_text("The `OldClass` was used for legacy support.\n")
@@ -169,7 +204,7 @@ def test_deleted_files_with_docs(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert len(result["analysis_payloads"]) == 1
     assert result["analysis_payloads"][0]["change_type"] == "deleted"
@@ -177,7 +212,8 @@ def test_deleted_files_with_docs(tmp_path):
 
 
 # Tests that a renamed route not in docs but whose old name is in docs produces an LLM payload.
-def test_renamed_route_found_via_old_elements(tmp_path):
+@pytest.mark.asyncio
+async def test_renamed_route_found_via_old_elements(tmp_path):
     docs_dir = tmp_path / "docs"
     docs_dir.mkdir()
     (docs_dir / "api.md").write_text("## API\n\n`GET /date` returns the current date.\n")
@@ -194,7 +230,7 @@ def test_renamed_route_found_via_old_elements(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     # The old route '/date' matches the docs so it should produce a payload
     assert result["findings"] == []
@@ -206,7 +242,8 @@ def test_renamed_route_found_via_old_elements(tmp_path):
 
 
 # Tests that when neither old nor new elements are found in docs, an outdated_docs finding is produced.
-def test_modified_neither_old_nor_new_in_docs(tmp_path):
+@pytest.mark.asyncio
+async def test_modified_neither_old_nor_new_in_docs(tmp_path):
     (tmp_path / "docs").mkdir()
 
     state = _make_state(
@@ -221,7 +258,7 @@ def test_modified_neither_old_nor_new_in_docs(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert len(result["findings"]) == 1
     assert result["findings"][0]["drift_type"] == "outdated_docs"
@@ -229,7 +266,8 @@ def test_modified_neither_old_nor_new_in_docs(tmp_path):
 
 
 # Tests that a modified file with no extractable code elements falls back to the filename stem as a search term
-def test_empty_elements_falls_back_to_filename_stem(tmp_path):
+@pytest.mark.asyncio
+async def test_empty_elements_falls_back_to_filename_stem(tmp_path):
     (tmp_path / "docs").mkdir()
 
     state = _make_state(
@@ -244,7 +282,7 @@ def test_empty_elements_falls_back_to_filename_stem(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     # The file should not be silently skipped
     assert len(result["findings"]) == 1
@@ -254,7 +292,8 @@ def test_empty_elements_falls_back_to_filename_stem(tmp_path):
 
 
 # Tests that when the docs directory doesn't exist added code is marked with missing_docs.
-def test_missing_docs_dir(tmp_path):
+@pytest.mark.asyncio
+async def test_missing_docs_dir(tmp_path):
     state = _make_state(
         repo_path=str(tmp_path),
         docs_root_path="/nonexistent_docs",
@@ -268,14 +307,15 @@ def test_missing_docs_dir(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert len(result["findings"]) == 1
     assert result["findings"][0]["drift_type"] == "missing_docs"
 
 
 # Tests that a modified file with no doc matches produces an outdated_docs finding.
-def test_modified_zero_matches_outdated_docs(tmp_path):
+@pytest.mark.asyncio
+async def test_modified_zero_matches_outdated_docs(tmp_path):
     (tmp_path / "docs").mkdir()
 
     state = _make_state(
@@ -290,7 +330,7 @@ def test_modified_zero_matches_outdated_docs(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert len(result["findings"]) == 1
     finding = result["findings"][0]
@@ -299,7 +339,8 @@ def test_modified_zero_matches_outdated_docs(tmp_path):
 
 
 # Tests that a deleted file with no doc matches is silently skipped.
-def test_deleted_zero_matches_skipped(tmp_path):
+@pytest.mark.asyncio
+async def test_deleted_zero_matches_skipped(tmp_path):
     (tmp_path / "docs").mkdir()
 
     state = _make_state(
@@ -314,7 +355,35 @@ def test_deleted_zero_matches_skipped(tmp_path):
         ],
     )
 
-    result = retrieve_docs(state)
+    result = await _retrieve(state)
 
     assert result["findings"] == []
     assert result["analysis_payloads"] == []
+
+
+# Tests that docs over the byte cap are skipped instead of being loaded whole.
+@pytest.mark.asyncio
+async def test_oversized_docs_skipped(tmp_path):
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    (docs_dir / "small.md").write_text("Call `calculate_tax` to get the tax.\n")
+    (docs_dir / "huge.md").write_text("`calculate_tax` reference\n" * 100)
+
+    state = _make_state(
+        repo_path=str(tmp_path),
+        change_elements=[
+            {
+                "file_path": "src/tax.py",
+                "change_type": "modified",
+                "elements": ["calculate_tax"],
+                "old_elements": [],
+            },
+        ],
+    )
+
+    with patch("app.agents.nodes.retrieve_docs.settings") as mock_settings:
+        mock_settings.MAX_FILE_BYTES = 200
+        result = await _retrieve(state)
+
+    [payload] = result["analysis_payloads"]
+    assert payload["matched_doc_paths"] == [str(docs_dir / "small.md")]
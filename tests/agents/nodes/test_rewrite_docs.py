@@ -1,16 +1,36 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
 
 from app.agents.nodes.rewrite_docs import rewrite_docs
 from app.agents.state import DriftAnalysisState
+from app.schemas.llm import DocEdit, DocEditPlan
+
+
+# Helper to fake llm.astream, yielding the given text in small chunks like a streamed response
+def _fake_astream(text, finish_reason="STOP", chunk_size=8):
+    async def astream(messages):
+        for i in range(0, len(text), chunk_size):
+            chunk = MagicMock()
+            chunk.content = text[i : i + chunk_size]
+            chunk.response_metadata = {}
+            yield chunk
+        last = MagicMock()
+        last.content = ""
+        last.response_metadata = {"finish_reason": finish_reason}
+        yield last
+
+    return MagicMock(side_effect=astream)
 
 
 # Tests that empty target_files returns early with no rewrite results.
-def test_rewrite_docs_empty_targets():
+@pytest.mark.asyncio
+async def test_rewrite_docs_empty_targets():
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
         "change_elements": [],
         "analysis_payloads": [],
@@ -20,30 +40,38 @@ def test_rewrite_docs_empty_targets():
         "target_files": [],
         "rewrite_results": [],
         "doc_updates_summary": "",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
-    result = rewrite_docs(state)
+    result = await rewrite_docs(state)
 
     assert result == {"rewrite_results": []}
 
 
 # Tests that a valid target file is rewritten with the LLM response content.
-def test_rewrite_docs_rewrites_file(tmp_path):
+@pytest.mark.asyncio
+async def test_rewrite_docs_rewrites_file(tmp_path):
     doc_file = tmp_path / "docs" / "api.md"
     doc_file.parent.mkdir(parents=True, exist_ok=True)
     doc_file.write_text("# API\nOld content", encoding="utf-8")
 
-    mock_llm_response = MagicMock()
-    mock_llm_response.content = "# API\nUpdated content"
-
     mock_llm_instance = MagicMock()
-    mock_llm_instance.invoke.return_value = mock_llm_response
+    mock_llm_instance.astream = _fake_astream("# API\nUpdated content")
 
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
         "change_elements": [],
         "analysis_payloads": [],
@@ -61,13 +89,24 @@ def test_rewrite_docs_rewrites_file(tmp_path):
         ],
         "rewrite_results": [],
         "doc_updates_summary": "",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with patch(
         "app.agents.llm.ChatGoogleGenerativeAI",
         return_value=mock_llm_instance,
     ):
-        result = rewrite_docs(state)
+        result = await rewrite_docs(state)
 
     assert len(result["rewrite_results"]) == 1
     assert result["rewrite_results"][0]["doc_path"] == "docs/api.md"
@@ -75,22 +114,19 @@ def test_rewrite_docs_rewrites_file(tmp_path):
 
 
 # Tests that markdown code fences wrapping the LLM output are stripped.
-def test_rewrite_docs_strips_code_fences(tmp_path):
+@pytest.mark.asyncio
+async def test_rewrite_docs_strips_code_fences(tmp_path):
     doc_file = tmp_path / "docs" / "api.md"
     doc_file.parent.mkdir(parents=True, exist_ok=True)
     doc_file.write_text("# Old", encoding="utf-8")
 
-    mock_llm_response = MagicMock()
-    mock_llm_response.content = "```markdown\n# New Content\n```"
-
     mock_llm_instance = MagicMock()
-    mock_llm_instance.invoke.return_value = mock_llm_response
+    mock_llm_instance.astream = _fake_astream("```markdown\n# New Content\n```")
 
     state: DriftAnalysisState = {
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
         "change_elements": [],
         "analysis_payloads": [],
@@ -108,20 +144,32 @@ def test_rewrite_docs_strips_code_fences(tmp_path):
         ],
         "rewrite_results": [],
         "doc_updates_summary": "",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with patch(
         "app.agents.llm.ChatGoogleGenerativeAI",
         return_value=mock_llm_instance,
     ):
-        result = rewrite_docs(state)
+        result = await rewrite_docs(state)
 
     assert not result["rewrite_results"][0]["new_content"].startswith("```")
     assert "# New Content" in result["rewrite_results"][0]["new_content"]
 
 
 # Tests that a path traversal attempt outside the repo root is blocked.
-def test_rewrite_docs_blocks_path_traversal(tmp_path):
+@pytest.mark.asyncio
+async def test_rewrite_docs_blocks_path_traversal(tmp_path):
     doc_file = tmp_path / "docs" / "api.md"
     doc_file.parent.mkdir(parents=True, exist_ok=True)
     doc_file.write_text("# API", encoding="utf-8")
@@ -132,7 +180,6 @@ def test_rewrite_docs_blocks_path_traversal(tmp_path):
         "drift_event_id": "evt-1",
         "base_sha": "base",
         "head_sha": "head",
-        "session": None,
         "docs_root_path": "/docs",
         "change_elements": [],
         "analysis_payloads": [],
@@ -150,12 +197,428 @@ def test_rewrite_docs_blocks_path_traversal(tmp_path):
         ],
         "rewrite_results": [],
         "doc_updates_summary": "",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
     with patch(
         "app.agents.llm.ChatGoogleGenerativeAI",
         return_value=mock_llm_instance,
     ):
-        result = rewrite_docs(state)
+        result = await rewrite_docs(state)
+
+    assert result == {"rewrite_results": [], "doc_updates_summary": ""}
+
+
+# Tests that only the planned section is sent to the LLM and spliced back into the file.
+@pytest.mark.asyncio
+async def test_rewrite_docs_rewrites_only_target_section(tmp_path):
+    doc_file = tmp_path / "docs" / "api.md"
+    doc_file.parent.mkdir(parents=True, exist_ok=True)
+    doc_file.write_text(
+        "# API\nIntro\n\n## Login\nPOST /login\n\n## Logout\nPOST /logout\n", encoding="utf-8"
+    )
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.astream = _fake_astream("## Login\nPOST /v2/login")
+
+    state: DriftAnalysisState = {
+        "drift_event_id": "evt-1",
+        "base_sha": "base",
+        "head_sha": "head",
+        "docs_root_path": "/docs",
+        "change_elements": [],
+        "analysis_payloads": [],
+        "style_preference": "professional",
+        "findings": [],
+        "repo_path": str(tmp_path),
+        "target_files": [
+            {
+                "doc_path": "docs/api.md",
+                "section": "API > Login",
+                "action": "update",
+                "description": "Login moved to /v2/login",
+                "finding": {},
+            }
+        ],
+        "rewrite_results": [],
+        "doc_updates_summary": "",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
+    }
+
+    with patch(
+        "app.agents.llm.ChatGoogleGenerativeAI",
+        return_value=mock_llm_instance,
+    ):
+        result = await rewrite_docs(state)
+
+    # The rewrite prompt only carries the targeted section
+    rewrite_prompt = mock_llm_instance.astream.call_args_list[0].args[0][1]["content"]
+    assert "POST /login" in rewrite_prompt
+    assert "POST /logout" not in rewrite_prompt
+
+    assert result["rewrite_results"][0]["new_content"] == (
+        "# API\nIntro\n\n## Login\nPOST /v2/login\n\n## Logout\nPOST /logout\n"
+    )
+
+
+# Tests that the whole file is rewritten when the planned section is not found.
+@pytest.mark.asyncio
+async def test_rewrite_docs_falls_back_to_full_file_for_unknown_section(tmp_path):
+    doc_file = tmp_path / "docs" / "api.md"
+    doc_file.parent.mkdir(parents=True, exist_ok=True)
+    doc_file.write_text("# API\n## Login\nPOST /login\n", encoding="utf-8")
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.astream = _fake_astream(
+        "# API\n## Login\nPOST /login\n## Signup\nPOST /signup"
+    )
+
+    state: DriftAnalysisState = {
+        "drift_event_id": "evt-1",
+        "base_sha": "base",
+        "head_sha": "head",
+        "docs_root_path": "/docs",
+        "change_elements": [],
+        "analysis_payloads": [],
+        "style_preference": "professional",
+        "findings": [],
+        "repo_path": str(tmp_path),
+        "target_files": [
+            {
+                "doc_path": "docs/api.md",
+                "section": "Signup",
+                "action": "add",
+                "description": "Document the signup endpoint",
+                "finding": {},
+            }
+        ],
+        "rewrite_results": [],
+        "doc_updates_summary": "",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
+    }
+
+    with patch(
+        "app.agents.llm.ChatGoogleGenerativeAI",
+        return_value=mock_llm_instance,
+    ):
+        result = await rewrite_docs(state)
+
+    rewrite_prompt = mock_llm_instance.astream.call_args_list[0].args[0][1]["content"]
+    assert "Return the full updated markdown content." in rewrite_prompt
+    assert "## Signup" in result["rewrite_results"][0]["new_content"]
+
+
+# Helper to build a rewrite_docs state for the given repo path and targets
+def _make_state(repo_path, target_files) -> DriftAnalysisState:
+    return {
+        "drift_event_id": "evt-1",
+        "base_sha": "base",
+        "head_sha": "head",
+        "docs_root_path": "/docs",
+        "change_elements": [],
+        "analysis_payloads": [],
+        "style_preference": "professional",
+        "findings": [],
+        "repo_path": str(repo_path),
+        "target_files": target_files,
+        "rewrite_results": [],
+        "doc_updates_summary": "",
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": [],
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
+    }
+
+
+# Helper to write plain doc files (no headings, so each is rewritten as a whole)
+def _write_docs(tmp_path, names):
+    targets = []
+    for name in names:
+        doc_file = tmp_path / "docs" / name
+        doc_file.parent.mkdir(parents=True, exist_ok=True)
+        doc_file.write_text(f"old {name}", encoding="utf-8")
+        targets.append(
+            {
+                "doc_path": f"docs/{name}",
+                "section": "",
+                "action": "update",
+                "description": f"Update {name}.",
+                "finding": {},
+            }
+        )
+    return targets
+
+
+# Tests that files are rewritten concurrently but results keep the planned order.
+@pytest.mark.asyncio
+async def test_rewrite_docs_results_keep_plan_order(tmp_path):
+    targets = _write_docs(tmp_path, ["a.md", "b.md", "c.md"])
+
+    # The first file finishes last
+    async def fake_ainvoke(messages):
+        prompt = messages[1]["content"]
+        if "docs/a.md" in prompt:
+            await asyncio.sleep(0.05)
+        response = MagicMock()
+        response.content = "new " + (
+            "a" if "docs/a.md" in prompt else "b" if "docs/b.md" in prompt else "c"
+        )
+        return response
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.ainvoke = AsyncMock(side_effect=fake_ainvoke)
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 3
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 5
+        mock_settings.DOC_REWRITE_STREAMING = False
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = False
+        result = await rewrite_docs(_make_state(tmp_path, targets))
+
+    assert [r["doc_path"] for r in result["rewrite_results"]] == [
+        "docs/a.md",
+        "docs/b.md",
+        "docs/c.md",
+    ]
+    assert [r["new_content"] for r in result["rewrite_results"]] == ["new a", "new b", "new c"]
+
+
+# Tests that a failing or timed out file is skipped while the other files are still rewritten.
+@pytest.mark.asyncio
+async def test_rewrite_docs_tolerates_partial_failures(tmp_path):
+    targets = _write_docs(tmp_path, ["ok.md", "broken.md", "slow.md"])
+
+    async def fake_ainvoke(messages):
+        prompt = messages[1]["content"]
+        if "docs/broken.md" in prompt:
+            raise RuntimeError("boom")
+        if "docs/slow.md" in prompt:
+            await asyncio.sleep(1)
+        response = MagicMock()
+        response.content = "rewritten"
+        return response
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.ainvoke = AsyncMock(side_effect=fake_ainvoke)
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 2
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 0.1
+        mock_settings.DOC_REWRITE_STREAMING = False
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = False
+        result = await rewrite_docs(_make_state(tmp_path, targets))
+
+    assert [r["doc_path"] for r in result["rewrite_results"]] == ["docs/ok.md"]
+
+
+# Tests that the updates summary is built locally from the plan without an extra LLM call.
+@pytest.mark.asyncio
+async def test_rewrite_docs_local_summary_skips_llm(tmp_path):
+    targets = _write_docs(tmp_path, ["api.md"])
+    targets.append({**targets[0], "description": "Document the new header"})
+
+    mock_llm_response = MagicMock()
+    mock_llm_response.content = "rewritten"
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.ainvoke = AsyncMock(return_value=mock_llm_response)
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 4
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 5
+        mock_settings.DOC_REWRITE_STREAMING = False
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = False
+        result = await rewrite_docs(_make_state(tmp_path, targets))
 
+    # Only the single rewrite call, no summary call
+    assert mock_llm_instance.ainvoke.call_count == 1
+    assert result["doc_updates_summary"] == (
+        "- `docs/api.md` - Update api.md; Document the new header"
+    )
+
+
+# Tests that the LLM summary falls back to the local summary when the summary call fails.
+@pytest.mark.asyncio
+async def test_rewrite_docs_summary_falls_back_to_local(tmp_path):
+    targets = _write_docs(tmp_path, ["api.md"])
+
+    rewrite_response = MagicMock()
+    rewrite_response.content = "rewritten"
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.ainvoke = AsyncMock(side_effect=[rewrite_response, RuntimeError("quota")])
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 4
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 5
+        mock_settings.DOC_REWRITE_STREAMING = False
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = True
+        result = await rewrite_docs(_make_state(tmp_path, targets))
+
+    assert result["doc_updates_summary"] == "- `docs/api.md` - Update api.md"
+
+
+# Tests that a looping streamed rewrite is aborted early and retried.
+@pytest.mark.asyncio
+async def test_rewrite_docs_retries_degenerate_stream(tmp_path):
+    targets = _write_docs(tmp_path, ["api.md"])
+
+    mock_llm_instance = MagicMock()
+    looping = _fake_astream("same line\n" * 50)
+    good = _fake_astream("new api.md")
+    mock_llm_instance.astream = MagicMock(
+        side_effect=[looping.side_effect([]), good.side_effect([])]
+    )
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 4
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 5
+        mock_settings.DOC_REWRITE_STREAMING = True
+        mock_settings.DOC_REWRITE_MAX_ATTEMPTS = 2
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = False
+        result = await rewrite_docs(_make_state(tmp_path, targets))
+
+    assert mock_llm_instance.astream.call_count == 2
+    assert result["rewrite_results"][0]["new_content"] == "new api.md"
+
+
+# Tests that a file is skipped when every streamed attempt is truncated.
+@pytest.mark.asyncio
+async def test_rewrite_docs_skips_file_when_all_attempts_degenerate(tmp_path):
+    targets = _write_docs(tmp_path, ["api.md"])
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.astream = _fake_astream("new api", finish_reason="MAX_TOKENS")
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 4
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 5
+        mock_settings.DOC_REWRITE_STREAMING = True
+        mock_settings.DOC_REWRITE_MAX_ATTEMPTS = 2
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = False
+        result = await rewrite_docs(_make_state(tmp_path, targets))
+
+    assert mock_llm_instance.astream.call_count == 2
     assert result == {"rewrite_results": [], "doc_updates_summary": ""}
+
+
+# Tests that in edit mode the LLM edits are applied locally to the planned section.
+@pytest.mark.asyncio
+async def test_rewrite_docs_edit_mode_applies_edits(tmp_path):
+    doc_file = tmp_path / "docs" / "api.md"
+    doc_file.parent.mkdir(parents=True, exist_ok=True)
+    doc_file.write_text(
+        "# API\nIntro\n\n## Login\nPOST /login\n\n## Logout\nPOST /logout\n", encoding="utf-8"
+    )
+    target = {
+        "doc_path": "docs/api.md",
+        "section": "Login",
+        "action": "update",
+        "description": "Login moved to /v2/login",
+        "finding": {},
+    }
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.with_structured_output.return_value.ainvoke = AsyncMock(
+        return_value=DocEditPlan(edits=[DocEdit(old_text="POST /login", new_text="POST /v2/login")])
+    )
+    mock_llm_instance.astream = _fake_astream("unused")
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 4
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 5
+        mock_settings.DOC_REWRITE_MODE = "edit"
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = False
+        result = await rewrite_docs(_make_state(tmp_path, [target]))
+
+    edit_prompt = mock_llm_instance.with_structured_output.return_value.ainvoke.call_args.args[0]
+    assert "POST /logout" not in edit_prompt[1]["content"]
+    assert mock_llm_instance.astream.call_count == 0
+    assert result["rewrite_results"][0]["new_content"] == (
+        "# API\nIntro\n\n## Login\nPOST /v2/login\n\n## Logout\nPOST /logout\n"
+    )
+
+
+# Tests that a full rewrite is used when the LLM edits don't match the document.
+@pytest.mark.asyncio
+async def test_rewrite_docs_edit_mode_falls_back_to_rewrite(tmp_path):
+    targets = _write_docs(tmp_path, ["api.md"])
+
+    mock_llm_instance = MagicMock()
+    mock_llm_instance.with_structured_output.return_value.ainvoke = AsyncMock(
+        return_value=DocEditPlan(edits=[DocEdit(old_text="not in the doc", new_text="x")])
+    )
+    mock_llm_instance.astream = _fake_astream("new api.md")
+
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI", return_value=mock_llm_instance),
+        patch("app.agents.nodes.rewrite_docs.settings") as mock_settings,
+    ):
+        mock_settings.DOC_REWRITE_CONCURRENCY = 4
+        mock_settings.DOC_REWRITE_TIMEOUT_SECONDS = 5
+        mock_settings.DOC_REWRITE_MODE = "edit"
+        mock_settings.DOC_REWRITE_STREAMING = True
+        mock_settings.DOC_REWRITE_MAX_ATTEMPTS = 1
+        mock_settings.DOC_UPDATES_SUMMARY_USE_LLM = False
+        result = await rewrite_docs(_make_state(tmp_path, targets))
+
+    assert mock_llm_instance.astream.call_count == 1
+    assert result["rewrite_results"][0]["new_content"] == "new api.md"
@@ -1,26 +1,30 @@
+import subprocess
 import textwrap
-from unittest.mock import MagicMock, patch
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
 
 from app.agents.nodes.scout_changes import (
-    scout_changes,
     _extract_elements_from_source,
+    scout_changes,
 )
 from app.agents.state import DriftAnalysisState
-
+from app.services.git_service import read_blobs
 
 # =========== Helper Functions ===========
 
 
-# Helper function to build a mock CodeChange row
+# Helper function to build a code change entry of the drift event snapshot
 def _make_code_change(
     file_path: str, change_type: str = "modified", is_code: bool = True, is_ignored: bool = False
-):
-    cc = MagicMock()
-    cc.file_path = file_path
-    cc.change_type = change_type
-    cc.is_code = is_code
-    cc.is_ignored = is_ignored
-    return cc
+) -> dict:
+    return {
+        "file_path": file_path,
+        "change_type": change_type,
+        "is_code": is_code,
+        "is_ignored": is_ignored,
+    }
 
 
 # Helper function to build a minimal state dict
@@ -30,26 +34,68 @@ def _make_state(
     base_sha: str = "abc123def4",
     code_changes: list | None = None,
 ) -> DriftAnalysisState:
-    session = MagicMock()
-    filtered = [cc for cc in (code_changes or []) if not cc.is_ignored]
-    session.query.return_value.filter.return_value.all.return_value = filtered
-
     return {
         "drift_event_id": drift_event_id,
         "base_sha": base_sha,
         "head_sha": "def456abc7",
-        "session": session,
         "repo_path": repo_path,
         "docs_root_path": "/docs",
+        "repo_full_name": "owner/repo",
+        "installation_id": 12345,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": None,
+        "reviewer": None,
+        "user_id": None,
+        "code_changes": code_changes or [],
         "change_elements": [],
         "analysis_payloads": [],
         "findings": [],
         "target_files": [],
         "rewrite_results": [],
         "style_preference": "professional",
+        "file_diffs": {},
+        "repo_id": "repo-1",
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
     }
 
 
+# Commits everything under repo_path and returns the commit sha
+def _commit(repo_path) -> str:
+    subprocess.run(["git", "init", "-q", str(repo_path)], check=True)
+    subprocess.run(["git", "-C", str(repo_path), "add", "-A"], check=True)
+    subprocess.run(
+        ["git", "-C", str(repo_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+        + ["commit", "-q", "--allow-empty", "-m", "commit"],
+        check=True,
+    )
+    return subprocess.run(
+        ["git", "-C", str(repo_path), "rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+
+
+# Commits the files written under the state's repo path and runs the node with it as the head commit
+async def _scout(state: DriftAnalysisState) -> dict:
+    return await scout_changes({**state, "head_sha": _commit(state["repo_path"])})
+
+
+# Replaces the object store reads with a mock returning the given source for every path,
+# every path is within the size limits
+@contextmanager
+def _mock_read_blobs(source: str | None):
+    async def read_blobs(repo_path, commit_sha, file_paths):
+        return {file_path: source for file_path in file_paths if source is not None}
+
+    async def split_by_size(repo_path, commit_sha, file_paths, max_bytes):
+        return (file_paths if source is not None else []), []
+
+    with (
+        patch("app.agents.nodes.scout_changes.read_blobs", side_effect=read_blobs),
+        patch("app.agents.nodes.scout_changes.split_by_size", side_effect=split_by_size),
+    ):
+        yield
+
+
 # =========== Tests ===========
 
 
@@ -86,7 +132,8 @@ def test_extract_elements_from_source_syntax_error():
 
 
 # Tests that classes and functions are extracted from a valid Python file.
-def test_scout_changes_extracts_elements(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_extracts_elements(tmp_path):
     source = textwrap.dedent("""\
         class UserController:
             pass
@@ -104,7 +151,7 @@ def test_scout_changes_extracts_elements(tmp_path):
     cc = _make_code_change("src/controllers.py", "added")
     state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     assert len(result["change_elements"]) == 1
     elem = result["change_elements"][0]
@@ -114,7 +161,8 @@ def test_scout_changes_extracts_elements(tmp_path):
 
 
 # Tests that async def functions are extracted alongside sync ones.
-def test_scout_changes_async_functions(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_async_functions(tmp_path):
     source = textwrap.dedent("""\
         async def fetch_data():
             pass
@@ -131,7 +179,7 @@ def test_scout_changes_async_functions(tmp_path):
     cc = _make_code_change("pipeline.py", "added")
     state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     assert result["change_elements"][0]["elements"] == [
         "fetch_data",
@@ -142,37 +190,36 @@ def test_scout_changes_async_functions(tmp_path):
 
 
 # Tests that a modified file gets elements from head and old_elements from base.
-def test_scout_changes_modified_extracts_old_and_new(tmp_path):
-    # New version on disk
-    new_source = textwrap.dedent("""\
+@pytest.mark.asyncio
+async def test_scout_changes_modified_extracts_old_and_new(tmp_path):
+    # Old version in the base commit
+    old_source = textwrap.dedent("""\
         from flask import Flask
         app = Flask(__name__)
 
-        @app.route('/today')
+        @app.route('/date')
         def get_date():
-            return "today"
+            return "date"
     """)
     py_file = tmp_path / "routes.py"
-    py_file.write_text(new_source)
+    py_file.write_text(old_source)
+    base_sha = _commit(tmp_path)
 
-    # Old version from git
-    old_source = textwrap.dedent("""\
+    # New version in the head commit
+    new_source = textwrap.dedent("""\
         from flask import Flask
         app = Flask(__name__)
 
-        @app.route('/date')
+        @app.route('/today')
         def get_date():
-            return "date"
+            return "today"
     """)
+    py_file.write_text(new_source)
 
     cc = _make_code_change("routes.py", "modified")
-    state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
+    state = _make_state(repo_path=str(tmp_path), base_sha=base_sha, code_changes=[cc])
 
-    with patch(
-        "app.agents.nodes.scout_changes._get_git_file_content",
-        return_value=old_source,
-    ):
-        result = scout_changes(state)
+    result = await _scout(state)
 
     elem = result["change_elements"][0]
     assert "get_date" in elem["elements"]
@@ -181,8 +228,51 @@ def test_scout_changes_modified_extracts_old_and_new(tmp_path):
     assert "/date" in elem["old_elements"]
 
 
+# Tests that the old side is read where the PR branched off, not at a base that moved on since.
+@pytest.mark.asyncio
+async def test_scout_changes_reads_old_side_at_merge_base(tmp_path):
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+    py_file = tmp_path / "service.py"
+    py_file.write_text("def forked():\n    pass\n")
+    fork_sha = _commit(tmp_path)
+
+    # The base branch changed the file after the PR branched off
+    py_file.write_text("def merged_later():\n    pass\n")
+    base_sha = _commit(tmp_path)
+
+    subprocess.run(git + ["checkout", "-q", "-b", "feature", fork_sha], check=True)
+    py_file.write_text("def changed_by_pr():\n    pass\n")
+
+    cc = _make_code_change("service.py", "modified")
+    state = _make_state(repo_path=str(tmp_path), base_sha=base_sha, code_changes=[cc])
+
+    result = await _scout(state)
+
+    assert result["change_elements"][0]["elements"] == ["changed_by_pr"]
+    assert result["change_elements"][0]["old_elements"] == ["forked"]
+
+
+# Tests that the head commit is read even when the working tree holds something else.
+@pytest.mark.asyncio
+async def test_scout_changes_reads_head_commit_not_working_tree(tmp_path):
+    py_file = tmp_path / "service.py"
+    py_file.write_text("def committed():\n    pass\n")
+    head_sha = _commit(tmp_path)
+
+    # Another job's checkout left a different version on disk
+    py_file.write_text("def checked_out_elsewhere():\n    pass\n")
+
+    cc = _make_code_change("service.py", "added")
+    state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
+
+    result = await scout_changes({**state, "head_sha": head_sha})
+
+    assert result["change_elements"][0]["elements"] == ["committed"]
+
+
 # Tests that deleted files get old_elements from base commit via git show.
-def test_scout_changes_deleted_extracts_old_elements():
+@pytest.mark.asyncio
+async def test_scout_changes_deleted_extracts_old_elements():
     old_source = textwrap.dedent("""\
         class LegacyHandler:
             pass
@@ -194,27 +284,22 @@ def test_scout_changes_deleted_extracts_old_elements():
     cc = _make_code_change("src/legacy.py", "deleted")
     state = _make_state(code_changes=[cc])
 
-    with patch(
-        "app.agents.nodes.scout_changes._get_git_file_content",
-        return_value=old_source,
-    ):
-        result = scout_changes(state)
+    with _mock_read_blobs(old_source):
+        result = await scout_changes(state)
 
     elem = result["change_elements"][0]
     assert elem["elements"] == []
     assert elem["old_elements"] == ["LegacyHandler", "handle_legacy"]
 
 
-# Tests that if git show fails for a deleted file, old_elements is empty and no exception is raised.
-def test_scout_changes_deleted_git_show_fails():
+# Tests that an unreadable base blob of a deleted file gives empty old_elements without raising.
+@pytest.mark.asyncio
+async def test_scout_changes_deleted_git_show_fails():
     cc = _make_code_change("src/gone.py", "deleted")
     state = _make_state(code_changes=[cc])
 
-    with patch(
-        "app.agents.nodes.scout_changes._get_git_file_content",
-        return_value=None,
-    ):
-        result = scout_changes(state)
+    with _mock_read_blobs(None):
+        result = await scout_changes(state)
 
     elem = result["change_elements"][0]
     assert elem["elements"] == []
@@ -222,42 +307,41 @@ def test_scout_changes_deleted_git_show_fails():
 
 
 # Tests that non-Python files are skipped even when is_code is True (MVP constraint)
-def test_scout_changes_filters_non_python():
+@pytest.mark.asyncio
+async def test_scout_changes_filters_non_python():
     changes = [
         _make_code_change("app.js"),
         _make_code_change("README.txt"),
     ]
     state = _make_state(code_changes=changes)
 
-    result = scout_changes(state)
+    result = await scout_changes(state)
 
     assert result["change_elements"] == []
 
 
 # Tests that malformed Python code doesn't crash the node and produces empty elements.
-def test_scout_changes_handles_syntax_error(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_handles_syntax_error(tmp_path):
     py_file = tmp_path / "bad.py"
     py_file.write_text("def broken(:\n")
 
     cc = _make_code_change("bad.py", "modified")
     state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
 
-    with patch(
-        "app.agents.nodes.scout_changes._get_git_file_content",
-        return_value=None,
-    ):
-        result = scout_changes(state)
+    result = await _scout(state)
 
     assert len(result["change_elements"]) == 1
     assert result["change_elements"][0]["elements"] == []
 
 
 # Tests that a file missing from disk doesn't crash the node and produces empty elements.
-def test_scout_changes_handles_missing_file(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_handles_missing_file(tmp_path):
     cc = _make_code_change("does_not_exist.py", "modified")
     state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     assert len(result["change_elements"]) == 1
     assert result["change_elements"][0]["elements"] == []
@@ -265,16 +349,18 @@ def test_scout_changes_handles_missing_file(tmp_path):
 
 
 # Tests that no code changes in the DB returns an empty change_elements list.
-def test_scout_changes_empty_code_changes():
+@pytest.mark.asyncio
+async def test_scout_changes_empty_code_changes():
     state = _make_state(code_changes=[])
 
-    result = scout_changes(state)
+    result = await scout_changes(state)
 
     assert result == {"change_elements": []}
 
 
 # Tests that route strings from @app.route('/path') decorators are extracted.
-def test_scout_changes_extracts_flask_routes(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_extracts_flask_routes(tmp_path):
     source = textwrap.dedent("""\
         from flask import Flask
         app = Flask(__name__)
@@ -293,7 +379,7 @@ def test_scout_changes_extracts_flask_routes(tmp_path):
     cc = _make_code_change("routes.py", "added")
     state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     elements = result["change_elements"][0]["elements"]
     assert "get_date" in elements
@@ -303,7 +389,8 @@ def test_scout_changes_extracts_flask_routes(tmp_path):
 
 
 # Tests that route strings from @router.get('/path') and @router.post('/path') decorators are extracted.
-def test_scout_changes_extracts_fastapi_routes(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_extracts_fastapi_routes(tmp_path):
     source = textwrap.dedent("""\
         from fastapi import APIRouter
         router = APIRouter()
@@ -322,7 +409,7 @@ def test_scout_changes_extracts_fastapi_routes(tmp_path):
     cc = _make_code_change("api.py", "added")
     state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     elements = result["change_elements"][0]["elements"]
     assert "get_items" in elements
@@ -331,7 +418,8 @@ def test_scout_changes_extracts_fastapi_routes(tmp_path):
 
 
 # Tests that non-route decorators don't crash or produce false route elements.
-def test_scout_changes_non_route_decorators_safe(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_non_route_decorators_safe(tmp_path):
     source = textwrap.dedent("""\
         def login_required(f):
             return f
@@ -346,14 +434,15 @@ def test_scout_changes_non_route_decorators_safe(tmp_path):
     cc = _make_code_change("views.py", "added")
     state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     elements = result["change_elements"][0]["elements"]
     assert elements == ["login_required", "secret_page"]
 
 
 # Tests that code changes with is_ignored=True are excluded from processing
-def test_scout_changes_skips_ignored_files(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_skips_ignored_files(tmp_path):
     source = textwrap.dedent("""\
         def important_function():
             pass
@@ -365,13 +454,14 @@ def test_scout_changes_skips_ignored_files(tmp_path):
     ignored_cc = _make_code_change("src/service.py", "modified", is_ignored=True)
     state = _make_state(repo_path=str(tmp_path), code_changes=[ignored_cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     assert result["change_elements"] == []
 
 
 # Tests that only non-ignored files are processed when mixed with ignored ones
-def test_scout_changes_processes_non_ignored_only(tmp_path):
+@pytest.mark.asyncio
+async def test_scout_changes_processes_non_ignored_only(tmp_path):
     source = textwrap.dedent("""\
         def kept_function():
             pass
@@ -384,7 +474,74 @@ def test_scout_changes_processes_non_ignored_only(tmp_path):
     ignored_cc = _make_code_change("tests/test_kept.py", "modified", is_ignored=True)
     state = _make_state(repo_path=str(tmp_path), code_changes=[kept_cc, ignored_cc])
 
-    result = scout_changes(state)
+    result = await _scout(state)
 
     assert len(result["change_elements"]) == 1
     assert result["change_elements"][0]["file_path"] == "src/kept.py"
+
+
+# Tests that changes not flagged as code are excluded from processing
+@pytest.mark.asyncio
+async def test_scout_changes_skips_non_code_changes(tmp_path):
+    py_file = tmp_path / "scripts" / "generated.py"
+    py_file.parent.mkdir(parents=True)
+    py_file.write_text("def generated():\n    pass\n")
+
+    cc = _make_code_change("scripts/generated.py", "modified", is_code=False)
+    state = _make_state(repo_path=str(tmp_path), code_changes=[cc])
+
+    result = await _scout(state)
+
+    assert result["change_elements"] == []
+
+
+# Tests that a renamed file's old elements are read at its old path in the base commit.
+@pytest.mark.asyncio
+async def test_scout_changes_reads_renamed_file_at_old_path(tmp_path):
+    (tmp_path / "old_name.py").write_text("def old_handler():\n    pass\n")
+    base_sha = _commit(tmp_path)
+    (tmp_path / "old_name.py").unlink()
+    (tmp_path / "new_name.py").write_text("def new_handler():\n    pass\n")
+
+    cc = _make_code_change("new_name.py", "modified")
+    state = _make_state(repo_path=str(tmp_path), base_sha=base_sha, code_changes=[cc])
+    state["file_diffs"] = {"new_name.py": {"file_path": "new_name.py", "old_path": "old_name.py"}}
+
+    result = await _scout(state)
+
+    change = result["change_elements"][0]
+    assert change["elements"] == ["new_handler"]
+    assert change["old_elements"] == ["old_handler"]
+
+
+# Tests that a file over the byte cap is never read and is scouted from its diff instead.
+@pytest.mark.asyncio
+async def test_scout_changes_oversized_file_scouted_from_diff(tmp_path):
+    (tmp_path / "big.py").write_text("def kept():\n    pass\n" + "x = 1\n" * 100)
+    base_sha = _commit(tmp_path)
+    (tmp_path / "big.py").write_text("def kept():\n    pass\n" + "x = 2\n" * 100)
+
+    patch_text = (
+        "diff --git a/big.py b/big.py\n--- a/big.py\n+++ b/big.py\n"
+        "@@ -1,3 +1,4 @@ class Outer:\n"
+        " def kept():\n"
+        "-def removed():\n"
+        "+async def added():\n"
+        "+    x = 2\n"
+    )
+    cc = _make_code_change("big.py", "modified")
+    state = _make_state(repo_path=str(tmp_path), base_sha=base_sha, code_changes=[cc])
+    state["file_diffs"] = {"big.py": {"file_path": "big.py", "patch": patch_text}}
+
+    with (
+        patch("app.agents.nodes.scout_changes.settings") as mock_settings,
+        patch("app.agents.nodes.scout_changes.read_blobs", wraps=read_blobs) as mock_read,
+    ):
+        mock_settings.MAX_FILE_BYTES = 100
+        mock_settings.MAX_FILE_LINES = 20000
+        result = await _scout(state)
+
+    change = result["change_elements"][0]
+    assert change["elements"] == ["Outer", "kept", "added"]
+    assert change["old_elements"] == ["Outer", "kept", "removed"]
+    assert all(call.args[2] == [] for call in mock_read.call_args_list)
@@ -0,0 +1,180 @@
+import fnmatch
+import operator
+from typing import Annotated, Any, TypedDict, cast
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+from redis import Redis
+
+from app.agents.checkpoint import (
+    RedisCheckpointSaver,
+    clear_checkpoint,
+    get_thread_id,
+    record_node_failure,
+)
+
+
+# Minimal in-memory stand-in for the Redis commands used by the checkpoint saver
+class _FakeRedis:
+    def __init__(self):
+        self.data: dict[str, Any] = {}
+        self.ttls: dict[str, int] = {}
+
+    @staticmethod
+    def _b(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        h = self.data.setdefault(key, {})
+        if field is not None:
+            h[self._b(field)] = self._b(value)
+        for f, v in (mapping or {}).items():
+            h[self._b(f)] = self._b(v)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(self._b(field))
+
+    def hmget(self, key, fields):
+        return [self.hget(key, f) for f in fields]
+
+    def hkeys(self, key):
+        return list(self.data.get(key, {}))
+
+    def hvals(self, key):
+        return list(self.data.get(key, {}).values())
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def hexists(self, key, field):
+        return self._b(field) in self.data.get(key, {})
+
+    def hincrby(self, key, field, amount):
+        h = self.data.setdefault(key, {})
+        h[self._b(field)] = self._b(int(h.get(self._b(field), 0)) + amount)
+        return int(h[self._b(field)])
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(self._b(member))
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+# Helper to pass the fake where a Redis client is expected
+def _as_redis(fake: _FakeRedis) -> Redis:
+    return cast(Redis, fake)
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class _State(TypedDict):
+    head_sha: str
+    steps: Annotated[list[str], operator.add]
+
+
+# Helper to build a two node graph whose second node fails while should_fail is set
+def _build_graph(saver, calls, should_fail):
+    def first(state):
+        calls.append("first")
+        return {"steps": ["first"]}
+
+    def second(state):
+        calls.append("second")
+        if should_fail["value"]:
+            raise RuntimeError("LLM timeout")
+        return {"steps": [f"second:{state['head_sha']}"]}
+
+    graph = StateGraph(_State)  # type: ignore[bad-specialization]
+    graph.add_node("first", first)
+    graph.add_node("second", second)
+    graph.add_edge(START, "first")
+    graph.add_edge("first", "second")
+    graph.add_edge("second", END)
+    return graph.compile(checkpointer=saver)
+
+
+# =========== RedisCheckpointSaver Tests ===========
+
+
+# Tests that a failed run resumes from the failed node without re-running completed nodes.
+def test_checkpoint_resumes_from_failed_node():
+    redis = _FakeRedis()
+    calls: list[str] = []
+    should_fail = {"value": True}
+    config = {"configurable": {"thread_id": get_thread_id("evt-1", "head")}}
+
+    graph = _build_graph(RedisCheckpointSaver(_as_redis(redis), 3600), calls, should_fail)
+    with pytest.raises(RuntimeError):
+        graph.invoke({"head_sha": "head", "steps": []}, config)
+    assert graph.get_state(config).next == ("second",)
+
+    # A retry in a new job builds a new saver and picks the state up from Redis
+    should_fail["value"] = False
+    graph = _build_graph(RedisCheckpointSaver(_as_redis(redis), 3600), calls, should_fail)
+    result = graph.invoke(None, config)
+
+    assert calls == ["first", "second", "second"]
+    assert result["steps"] == ["first", "second:head"]
+
+
+# Tests that channel values are stored once per version and every key gets the TTL.
+def test_checkpoint_stores_channel_versions_with_ttl():
+    redis = _FakeRedis()
+    config = {"configurable": {"thread_id": "evt-1:head"}}
+    graph = _build_graph(RedisCheckpointSaver(_as_redis(redis), 600), [], {"value": False})
+
+    graph.invoke({"head_sha": "head", "steps": []}, config)
+
+    blobs = redis.data["drift_checkpoint:evt-1:head::blobs"]
+    assert any(field.startswith(b"head_sha@") for field in blobs)
+    assert any(field.startswith(b"steps@") for field in blobs)
+    assert set(redis.ttls.values()) == {600}
+
+
+# Tests that clearing a thread removes its checkpoints and node failure counts.
+def test_clear_checkpoint_removes_thread():
+    redis = _FakeRedis()
+    config = {"configurable": {"thread_id": "evt-1:head"}}
+    graph = _build_graph(RedisCheckpointSaver(_as_redis(redis), 600), [], {"value": False})
+    graph.invoke({"head_sha": "head", "steps": []}, config)
+    record_node_failure(_as_redis(redis), "evt-1:head", "second", 600)
+
+    clear_checkpoint(_as_redis(redis), "evt-1:head")
+
+    assert redis.data == {}
+
+
+# Tests that node failures are counted per node.
+def test_record_node_failure_counts_per_node():
+    redis = _FakeRedis()
+
+    assert record_node_failure(_as_redis(redis), "evt-1:head", "deep_analyze", 600) == 1
+    assert record_node_failure(_as_redis(redis), "evt-1:head", "deep_analyze", 600) == 2
+    assert record_node_failure(_as_redis(redis), "evt-1:head", "rewrite_docs", 600) == 1
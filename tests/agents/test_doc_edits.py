@@ -0,0 +1,79 @@
+import pytest
+
+from app.agents.doc_edits import EditApplyError, apply_edits
+
+CONTENT = "# API\n\n## Login\nPOST /login\n\n## Logout\nPOST /logout\n"
+
+
+# =========== apply_edits Tests ===========
+
+
+# Tests that an exact old_text edit replaces only the matched passage.
+def test_apply_edits_replaces_old_text():
+    result = apply_edits(CONTENT, [{"old_text": "POST /login", "new_text": "POST /v2/login"}])
+
+    assert result == CONTENT.replace("POST /login", "POST /v2/login")
+
+
+# Tests that content is added after an anchor passage repeated in new_text.
+def test_apply_edits_inserts_after_anchor():
+    result = apply_edits(
+        CONTENT,
+        [{"old_text": "POST /logout\n", "new_text": "POST /logout\n\n## Signup\nPOST /signup\n"}],
+    )
+
+    assert result.endswith("POST /logout\n\n## Signup\nPOST /signup\n")
+
+
+# Tests that a line range edit replaces the numbered lines and keeps the following line intact.
+def test_apply_edits_replaces_line_range():
+    result = apply_edits(
+        CONTENT, [{"start_line": 3, "end_line": 4, "new_text": "## Sign in\nPOST /signin\n"}]
+    )
+
+    assert result == "# API\n\n## Sign in\nPOST /signin\n\n## Logout\nPOST /logout\n"
+
+
+# Tests that several edits are all applied against the original positions.
+def test_apply_edits_applies_multiple_edits():
+    result = apply_edits(
+        CONTENT,
+        [
+            {"old_text": "POST /logout", "new_text": "DELETE /session"},
+            {"start_line": 1, "end_line": 1, "new_text": "# Auth API"},
+        ],
+    )
+
+    assert result == "# Auth API\n\n## Login\nPOST /login\n\n## Logout\nDELETE /session\n"
+
+
+# Tests that an old_text that isn't in the content is rejected.
+def test_apply_edits_rejects_missing_anchor():
+    with pytest.raises(EditApplyError):
+        apply_edits(CONTENT, [{"old_text": "GET /me", "new_text": "GET /users/me"}])
+
+
+# Tests that an old_text that matches more than once is rejected.
+def test_apply_edits_rejects_ambiguous_anchor():
+    with pytest.raises(EditApplyError):
+        apply_edits(CONTENT, [{"old_text": "POST /log", "new_text": "POST /v2/log"}])
+
+
+# Tests that overlapping edits and out of range lines are rejected.
+def test_apply_edits_rejects_overlap_and_bad_range():
+    with pytest.raises(EditApplyError):
+        apply_edits(
+            CONTENT,
+            [
+                {"old_text": "## Login\nPOST /login", "new_text": "x"},
+                {"start_line": 4, "end_line": 4, "new_text": "y"},
+            ],
+        )
+    with pytest.raises(EditApplyError):
+        apply_edits(CONTENT, [{"start_line": 5, "end_line": 99, "new_text": "z"}])
+
+
+# Tests that an empty edit list is rejected so the caller can fall back to a full rewrite.
+def test_apply_edits_rejects_empty_edits():
+    with pytest.raises(EditApplyError):
+        apply_edits(CONTENT, [])
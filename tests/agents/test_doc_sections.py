@@ -0,0 +1,137 @@
+from app.agents.doc_sections import (
+    build_section_index,
+    find_section,
+    get_section_text,
+    merge_overlapping_sections,
+    splice_sections,
+)
+
+_DOC = (
+    "Intro text\n"
+    "\n"
+    "# API\n"
+    "Overview\n"
+    "\n"
+    "## Auth\n"
+    "Auth text\n"
+    "\n"
+    "### Login\n"
+    "POST /login\n"
+    "\n"
+    "## Users\n"
+    "```python\n"
+    "# not a heading\n"
+    "```\n"
+    "\n"
+    "# FAQ\n"
+    "Questions"
+)
+
+
+# =========== build_section_index Tests ===========
+
+
+# Tests that every heading is indexed with its full heading path
+def test_index_builds_heading_paths():
+    index = build_section_index(_DOC)
+
+    assert [s.path for s in index] == [
+        ("API",),
+        ("API", "Auth"),
+        ("API", "Auth", "Login"),
+        ("API", "Users"),
+        ("FAQ",),
+    ]
+
+
+# Tests that a section spans up to the next heading of the same or higher level
+def test_index_section_line_ranges():
+    index = build_section_index(_DOC)
+    by_title = {s.title: s for s in index}
+
+    assert (by_title["API"].start_line, by_title["API"].end_line) == (2, 16)
+    assert (by_title["Auth"].start_line, by_title["Auth"].end_line) == (5, 11)
+    assert (by_title["Login"].start_line, by_title["Login"].end_line) == (8, 11)
+    assert by_title["FAQ"].end_line == len(_DOC.splitlines())
+
+
+# Tests that byte ranges line up with the section text
+def test_index_byte_ranges_match_section_text():
+    index = build_section_index(_DOC)
+    auth = next(s for s in index if s.title == "Auth")
+
+    raw = _DOC.encode("utf-8")[auth.start_byte : auth.end_byte].decode("utf-8")
+    assert raw == get_section_text(_DOC, auth)
+    assert raw.startswith("## Auth\n")
+
+
+# Tests that headings inside fenced code blocks are ignored
+def test_index_ignores_headings_in_code_fences():
+    index = build_section_index(_DOC)
+    assert all(s.title != "not a heading" for s in index)
+
+
+# Tests that a document without headings produces an empty index
+def test_index_empty_for_plain_text():
+    assert build_section_index("just some text\nmore text") == []
+
+
+# =========== find_section Tests ===========
+
+
+# Tests that a plain heading title is matched case-insensitively
+def test_find_section_by_title():
+    index = build_section_index(_DOC)
+    section = find_section(index, "## login")
+
+    assert section is not None
+    assert section.path == ("API", "Auth", "Login")
+
+
+# Tests that a heading path with separators is matched on its trailing part
+def test_find_section_by_path():
+    index = build_section_index(_DOC)
+    section = find_section(index, "Auth > Login")
+
+    assert section is not None
+    assert section.title == "Login"
+
+
+# Tests that unknown or ambiguous section names return None
+def test_find_section_missing_or_ambiguous():
+    index = build_section_index("# A\n## Setup\n# B\n## Setup\n")
+
+    assert find_section(index, "Install") is None
+    assert find_section(index, "Setup") is None
+    assert find_section(index, "B > Setup") is not None
+
+
+# =========== merge / splice Tests ===========
+
+
+# Tests that nested sections are dropped in favour of their enclosing section
+def test_merge_overlapping_sections_drops_nested():
+    index = build_section_index(_DOC)
+    by_title = {s.title: s for s in index}
+
+    merged = merge_overlapping_sections([by_title["Login"], by_title["Auth"], by_title["FAQ"]])
+
+    assert [s.title for s in merged] == ["Auth", "FAQ"]
+
+
+# Tests that replaced sections are spliced back without touching the rest of the document
+def test_splice_sections_replaces_only_targets():
+    index = build_section_index(_DOC)
+    by_title = {s.title: s for s in index}
+
+    result = splice_sections(
+        _DOC,
+        [
+            (by_title["Login"], "### Login\nPOST /v2/login\n"),
+            (by_title["FAQ"], "# FAQ\nNew questions"),
+        ],
+    )
+
+    assert "POST /v2/login\n\n## Users" in result
+    assert result.endswith("# FAQ\nNew questions")
+    assert result.startswith("Intro text\n\n# API\nOverview\n")
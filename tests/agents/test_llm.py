@@ -1,6 +1,7 @@
+import asyncio
 from unittest.mock import MagicMock, patch
-from app.agents.llm import get_llm
 
+from app.agents.llm import get_llm
 
 # =========== Tests ===========
 
@@ -42,6 +43,7 @@ def test_get_llm_uses_settings_model():
     ):
         mock_settings.LLM_MODEL = "gemini-test-model"
         mock_settings.GEMINI_API_KEY = "test-key"
+        mock_settings.LLM_REQUESTS_PER_MINUTE = 0
         get_llm()
 
     _, kwargs = mock_cls.call_args
@@ -56,21 +58,58 @@ def test_get_llm_uses_settings_api_key():
     ):
         mock_settings.LLM_MODEL = "gemini-test-model"
         mock_settings.GEMINI_API_KEY = "my-secret-key"
+        mock_settings.LLM_REQUESTS_PER_MINUTE = 0
         get_llm()
 
     _, kwargs = mock_cls.call_args
     assert kwargs["google_api_key"] == "my-secret-key"
 
 
-# Tests that each call to get_llm constructs a new instance
-def test_get_llm_returns_new_instance_each_call():
+# Tests that get_llm reuses one client per model and temperature within an event loop
+def test_get_llm_caches_instance_per_temperature():
     first = MagicMock()
     second = MagicMock()
 
-    with patch("app.agents.llm.ChatGoogleGenerativeAI", side_effect=[first, second]):
-        result_a = get_llm()
-        result_b = get_llm()
+    async def get_clients():
+        return get_llm(), get_llm(), get_llm(temperature=0.2)
+
+    with patch("app.agents.llm.ChatGoogleGenerativeAI", side_effect=[first, second]) as mock_cls:
+        result_a, result_b, result_c = asyncio.run(get_clients())
 
     assert result_a is first
-    assert result_b is second
-    assert result_a is not result_b
+    assert result_b is first
+    assert result_c is second
+    assert mock_cls.call_count == 2
+
+
+# Tests that each event loop gets its own client, so none is reused after its loop closed
+def test_get_llm_builds_client_per_event_loop():
+    first = MagicMock()
+    second = MagicMock()
+
+    async def get_client():
+        return get_llm()
+
+    with patch("app.agents.llm.ChatGoogleGenerativeAI", side_effect=[first, second]):
+        assert asyncio.run(get_client()) is first
+        assert asyncio.run(get_client()) is second
+
+
+# Tests that the clients share a Redis rate limiter and configured retries
+def test_get_llm_passes_rate_limiter_and_retries():
+    with (
+        patch("app.agents.llm.ChatGoogleGenerativeAI") as mock_cls,
+        patch("app.agents.llm.settings") as mock_settings,
+        patch("app.agents.llm.RedisTokenBucketRateLimiter") as mock_limiter_cls,
+    ):
+        mock_settings.LLM_MODEL = "gemini-test-model"
+        mock_settings.LLM_REQUESTS_PER_MINUTE = 120
+        mock_settings.LLM_MAX_RETRIES = 4
+        get_llm()
+        get_llm(temperature=0.2)
+
+    mock_limiter_cls.assert_called_once()
+    assert mock_limiter_cls.call_args.kwargs["requests_per_minute"] == 120
+    for _, kwargs in mock_cls.call_args_list:
+        assert kwargs["rate_limiter"] is mock_limiter_cls.return_value
+        assert kwargs["max_retries"] == 4
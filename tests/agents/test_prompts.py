@@ -1,13 +1,15 @@
 from app.agents.prompts import (
-    get_rewrite_system_prompt,
+    DOC_GEN_EDIT_PROMPTS,
+    DOC_GEN_REWRITE_PROMPTS,
+    build_deep_analyze_user_prompt,
+    build_doc_gen_edit_prompt,
     build_doc_gen_plan_user_prompt,
     build_doc_gen_rewrite_prompt,
-    build_deep_analyze_user_prompt,
+    build_doc_gen_section_rewrite_prompt,
     build_doc_updates_summary_prompt,
-    DOC_GEN_REWRITE_PROMPTS,
+    get_rewrite_system_prompt,
 )
 
-
 # =========== get_rewrite_system_prompt Tests ===========
 
 
@@ -335,6 +337,35 @@ def test_rewrite_prompt_empty_descriptions_renders():
     assert "### Required Changes" in result
 
 
+# =========== build_doc_gen_section_rewrite_prompt TESTS ===========
+
+
+# Tests that the section prompt carries the file, heading path and section content.
+def test_section_rewrite_prompt_contains_section_details():
+    result = build_doc_gen_section_rewrite_prompt(
+        doc_path="docs/api.md",
+        section_path="API > Login",
+        section_content="## Login\nPOST /login",
+        change_descriptions=["Login moved to /v2/login"],
+    )
+    assert "docs/api.md" in result
+    assert "API > Login" in result
+    assert "## Login\nPOST /login" in result
+    assert "- Login moved to /v2/login" in result
+
+
+# Tests that the section prompt asks for the section only, not the whole file.
+def test_section_rewrite_prompt_requests_section_only():
+    result = build_doc_gen_section_rewrite_prompt(
+        doc_path="docs/api.md",
+        section_path="Login",
+        section_content="## Login",
+        change_descriptions=[],
+    )
+    assert "Rewrite ONLY the section above" in result
+    assert "starting with its heading line" in result
+
+
 # =========== build_doc_updates_summary_prompt TESTS ===========
 
 
@@ -397,3 +428,30 @@ def test_summary_prompt_single_description_no_semicolon():
     )
     assert ";" not in result
     assert "Only one change" in result
+
+
+# Tests that edit mode returns the edit prompt for the style with the policies appended.
+def test_edit_mode_uses_edit_prompts():
+    result = get_rewrite_system_prompt(
+        "concise", docs_policies="Use British English", edit_mode=True
+    )
+    assert result.startswith(DOC_GEN_EDIT_PROMPTS["concise"])
+    assert "Use British English" in result
+    assert "Return the complete updated content" not in result
+
+
+# =========== build_doc_gen_edit_prompt TESTS ===========
+
+
+# Tests that the edit prompt numbers the content lines and asks for edits instead of the file.
+def test_edit_prompt_numbers_lines():
+    result = build_doc_gen_edit_prompt(
+        doc_path="docs/api.md",
+        current_content="## Login\nPOST /login",
+        change_descriptions=["Login moved to /v2/login"],
+        section_path="API > Login",
+    )
+    assert "1| ## Login" in result
+    assert "2| POST /login" in result
+    assert "**Section:** API > Login" in result
+    assert "Do NOT return the full content." in result
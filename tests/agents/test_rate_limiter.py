@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.agents.rate_limiter import RedisTokenBucketRateLimiter
+
+
+# Helper to build a limiter whose Lua script returns the given wait times in order
+def _make_limiter(*wait_ms):
+    redis_client = MagicMock()
+    script = MagicMock(side_effect=list(wait_ms))
+    redis_client.register_script.return_value = script
+    limiter = RedisTokenBucketRateLimiter(redis_client, key="llm:test", requests_per_minute=60)
+    return limiter, script
+
+
+# =========== RedisTokenBucketRateLimiter Tests ===========
+
+
+# Tests that the bucket capacity defaults to ten seconds worth of requests.
+def test_rate_limiter_defaults():
+    limiter, _ = _make_limiter()
+
+    assert limiter.rate == 1
+    assert limiter.capacity == 10
+
+
+# Tests that a free token is acquired with a single script call.
+def test_rate_limiter_acquires_free_token():
+    limiter, script = _make_limiter(0)
+
+    assert limiter.acquire() is True
+    script.assert_called_once_with(keys=["llm:test"], args=[1, 10])
+
+
+# Tests that a blocking acquire sleeps for the returned wait time and tries again.
+def test_rate_limiter_waits_for_token():
+    limiter, script = _make_limiter(250, 0)
+
+    with patch("app.agents.rate_limiter.time.sleep") as mock_sleep:
+        assert limiter.acquire() is True
+
+    mock_sleep.assert_called_once_with(0.25)
+    assert script.call_count == 2
+
+
+# Tests that a non-blocking acquire returns False when the bucket is empty.
+def test_rate_limiter_non_blocking_returns_false():
+    limiter, _ = _make_limiter(500)
+
+    assert limiter.acquire(blocking=False) is False
+
+
+# Tests that the limiter lets requests through when Redis is unavailable.
+def test_rate_limiter_fails_open_without_redis():
+    limiter, _ = _make_limiter(RedisConnectionError("down"))
+
+    assert limiter.acquire() is True
+
+
+# Tests that the async acquire waits without blocking the event loop.
+@pytest.mark.asyncio
+async def test_rate_limiter_async_acquire():
+    limiter, script = _make_limiter(100, 0)
+
+    with patch("app.agents.rate_limiter.asyncio.sleep") as mock_sleep:
+        assert await limiter.aacquire() is True
+
+    mock_sleep.assert_awaited_once_with(0.1)
+    assert script.call_count == 2
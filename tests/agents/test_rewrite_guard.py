@@ -0,0 +1,101 @@
+import pytest
+
+from app.agents.rewrite_guard import DegenerateOutputError, RewriteStreamValidator
+
+ORIGINAL = "# API\nIntro\n\n## Login\nPOST /login\n\n## Logout\nPOST /logout\n"
+
+
+# Helper to feed text to the validator in small chunks like a stream
+def _feed(validator, text, chunk_size=16):
+    for i in range(0, len(text), chunk_size):
+        validator.feed(text[i : i + chunk_size])
+
+
+# =========== Streaming Checks Tests ===========
+
+
+# Tests that a well formed rewrite passes both the streaming and final checks.
+def test_validator_accepts_good_rewrite():
+    output = "# API\nIntro\n\n## Login\nPOST /v2/login\n\n## Logout\nPOST /logout\n"
+    validator = RewriteStreamValidator(ORIGINAL)
+
+    _feed(validator, output)
+    validator.finish(output, finish_reason="STOP")
+
+
+# Tests that output repeating the same line is aborted while streaming.
+def test_validator_aborts_repeated_lines():
+    validator = RewriteStreamValidator(ORIGINAL)
+
+    with pytest.raises(DegenerateOutputError):
+        _feed(validator, "# API\n" + "- the same bullet\n" * 20)
+
+
+# Tests that output repeating the same block inside a single line is aborted while streaming.
+def test_validator_aborts_repeated_block():
+    validator = RewriteStreamValidator(ORIGINAL)
+
+    with pytest.raises(DegenerateOutputError):
+        _feed(validator, "# API\n" + "and the token is refreshed " * 40)
+
+
+# Tests that output growing far beyond the original is aborted while streaming.
+def test_validator_aborts_runaway_output():
+    validator = RewriteStreamValidator(ORIGINAL)
+
+    with pytest.raises(DegenerateOutputError):
+        _feed(validator, "".join(f"line {i} of generated text\n" for i in range(500)))
+
+
+# Tests that skipping over several original headings is detected while streaming.
+def test_validator_aborts_skipped_headings():
+    original = "# A\n\n## B\n\n## C\n\n## D\n\n## E\n"
+    validator = RewriteStreamValidator(original)
+
+    with pytest.raises(DegenerateOutputError):
+        _feed(validator, "# A\n\n## E\n")
+
+
+# Tests that headings inside code blocks are ignored by the heading checks.
+def test_validator_ignores_headings_in_code_blocks():
+    original = "# A\n\n## B\n\n## C\n\n## D\n\n## E\n"
+    output = "```markdown\n# A\n\n```bash\n## E\n```\n\n## B\n\n## C\n\n## D\n\n## E\n```"
+    validator = RewriteStreamValidator(original)
+
+    _feed(validator, output)
+
+
+# =========== Final Checks Tests ===========
+
+
+# Tests that output cut off by the token limit is rejected.
+def test_validator_rejects_max_tokens_finish():
+    validator = RewriteStreamValidator(ORIGINAL)
+
+    with pytest.raises(DegenerateOutputError):
+        validator.finish(ORIGINAL, finish_reason="MAX_TOKENS")
+
+
+# Tests that output much shorter than a long original is rejected as truncated.
+def test_validator_rejects_truncated_output():
+    original = "# API\n" + "Some documented behaviour.\n" * 60
+    validator = RewriteStreamValidator(original)
+
+    with pytest.raises(DegenerateOutputError):
+        validator.finish("# API\nSome documented behaviour.\n")
+
+
+# Tests that output ending inside an open code block is rejected.
+def test_validator_rejects_unclosed_code_block():
+    validator = RewriteStreamValidator(ORIGINAL)
+
+    with pytest.raises(DegenerateOutputError):
+        validator.finish(ORIGINAL + "\n```bash\ncurl /login\n")
+
+
+# Tests that dropping most of the original headings is rejected.
+def test_validator_rejects_dropped_headings():
+    validator = RewriteStreamValidator(ORIGINAL)
+
+    with pytest.raises(DegenerateOutputError):
+        validator.finish("Intro only\n")
@@ -0,0 +1,13 @@
+import pytest
+
+from app.agents.llm import clear_llm_cache
+
+# =========== Fixtures ===========
+
+
+# Clears the cached LLM clients so every test builds its own (usually mocked) client
+@pytest.fixture(autouse=True)
+def _clear_llm_cache():
+    clear_llm_cache()
+    yield
+    clear_llm_cache()
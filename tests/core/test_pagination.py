@@ -0,0 +1,71 @@
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.pagination import decode_cursor, encode_cursor, paginate_by_created_at
+from app.models.drift import DriftEvent
+
+NOW = datetime.now(UTC)
+
+
+# Helper to mock a chained query, every filter returns the same query
+def _query(rows):
+    query = MagicMock()
+    query.filter.return_value = query
+    query.order_by.return_value = query
+    query.limit.return_value = query
+    query.all.return_value = rows
+    return query
+
+
+# =========== Cursor Tests ===========
+
+
+# Test that a cursor decodes back to the sort key it was made from
+def test_cursor_round_trip():
+    row_id = uuid4()
+
+    assert decode_cursor(encode_cursor(NOW, row_id)) == (NOW, row_id)
+
+
+# Test that tampered or foreign cursors are rejected
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor(NOW, uuid4())[:-4] + "@@@@"])
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+# =========== paginate_by_created_at Tests ===========
+
+
+# Test that one extra row is fetched to tell whether a next page exists
+def test_paginate_by_created_at_pages():
+    rows = [MagicMock(created_at=NOW - timedelta(minutes=i), id=uuid4()) for i in range(3)]
+    query = _query(rows)
+
+    page, next_cursor = paginate_by_created_at(query, DriftEvent.created_at, DriftEvent.id, 2)
+
+    assert page == rows[:2]
+    assert next_cursor is not None
+    assert decode_cursor(next_cursor) == (rows[1].created_at, rows[1].id)
+    query.limit.assert_called_once_with(3)
+    query.filter.assert_not_called()
+
+
+# Test that the last page has no cursor and a cursor seeks past its row on (created_at, id)
+def test_paginate_by_created_at_after_cursor():
+    row_id = uuid4()
+    query = _query([MagicMock(created_at=NOW, id=uuid4())])
+
+    page, next_cursor = paginate_by_created_at(
+        query, DriftEvent.created_at, DriftEvent.id, 2, encode_cursor(NOW, row_id)
+    )
+
+    assert len(page) == 1
+    assert next_cursor is None
+    [condition] = query.filter.call_args.args
+    sql = str(condition.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("(drift_events.created_at, drift_events.id) < (")
@@ -1,4 +1,5 @@
 from datetime import timedelta
+
 from app.core import security
 
 # =========== Tests ===========
@@ -55,3 +56,24 @@ def test_expired_token():
 def test_invalid_token():
     payload = security.verify_token("invalid_token_string")
     assert payload is None
+
+
+# Test that refresh token digests verify only their own token
+def test_token_digest():
+    digest = security.get_token_digest("refresh_token")
+    assert digest.startswith("hmac-sha256$")
+    assert digest == security.get_token_digest("refresh_token")  # Same token, same digest
+    assert security.verify_token_digest("refresh_token", digest) is True
+    assert security.verify_token_digest("other_token", digest) is False
+
+
+# Test that refresh token hashes stored with bcrypt before digests still verify
+def test_token_digest_legacy_bcrypt_hash():
+    hashed = security.get_hash("refresh_token")
+    assert security.verify_token_digest("refresh_token", hashed) is True
+    assert security.verify_token_digest("other_token", hashed) is False
+
+
+# Test that the PASETO key is derived once and reused across tokens
+def test_paseto_key_is_cached():
+    assert security._get_paseto_key() is security._get_paseto_key()
@@ -0,0 +1,103 @@
+import uuid
+from datetime import UTC, datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core import token_cache
+from app.core.token_cache import forget_access_token, get_cached_user, remember_access_token
+from app.models.user import User
+
+# =========== Fixtures ===========
+
+
+# Replaces the settings with cache ones and starts every test with an empty cache
+@pytest.fixture(autouse=True)
+def cache_settings():
+    mock_settings = MagicMock()
+    mock_settings.AUTH_TOKEN_CACHE_TTL_SECONDS = 60
+    mock_settings.AUTH_TOKEN_CACHE_MAX_SIZE = 2
+    with (
+        patch("app.core.token_cache.settings", mock_settings),
+        patch.object(token_cache, "_verified_tokens", token_cache.OrderedDict()),
+    ):
+        yield mock_settings
+
+
+# Helper to create a user as loaded from the DB
+def _user(email: str = "test@example.com") -> User:
+    return User(id=uuid.uuid4(), email=email, full_name="Test User", password_hash="hashed")
+
+
+# =========== Token Cache Tests ===========
+
+
+# Test that a remembered token gives back its user, loaded by primary key
+def test_get_cached_user():
+    user = _user()
+    remember_access_token("token", user)
+    db = MagicMock()
+
+    cached = get_cached_user(db, "token")
+
+    assert cached is db.get.return_value
+    db.get.assert_called_once_with(User, user.id)
+
+
+# Test that a token whose user is gone is forgotten
+def test_get_cached_user_deleted_user():
+    remember_access_token("token", _user())
+    db = MagicMock()
+    db.get.return_value = None
+
+    assert get_cached_user(db, "token") is None
+    assert "token" not in token_cache._verified_tokens
+
+
+# Test that unknown tokens miss the cache
+def test_get_cached_user_unknown_token():
+    assert get_cached_user(MagicMock(), "token") is None
+
+
+# Test that tokens leave the cache once its TTL has passed
+def test_cached_token_expires_after_ttl():
+    db = MagicMock()
+    with patch("app.core.token_cache.time.monotonic", return_value=1000.0):
+        remember_access_token("token", _user())
+    with patch("app.core.token_cache.time.monotonic", return_value=1061.0):
+        assert get_cached_user(db, "token") is None
+
+    db.get.assert_not_called()
+
+
+# Test that tokens about to expire are only cached until they do
+def test_cached_token_expires_with_token():
+    expires_at = (datetime.now(UTC) + timedelta(seconds=5)).isoformat()
+    with patch("app.core.token_cache.time.monotonic", return_value=1000.0):
+        remember_access_token("token", _user(), expires_at)
+    with patch("app.core.token_cache.time.monotonic", return_value=1010.0):
+        assert get_cached_user(MagicMock(), "token") is None
+
+
+# Test that the least recently used token is evicted once the cache is full
+def test_cache_evicts_least_recently_used():
+    db = MagicMock()
+    remember_access_token("first", _user("first@example.com"))
+    remember_access_token("second", _user("second@example.com"))
+    get_cached_user(db, "first")
+
+    remember_access_token("third", _user("third@example.com"))
+
+    assert list(token_cache._verified_tokens) == ["first", "third"]
+
+
+# Test that forgotten tokens and a disabled cache always miss
+def test_forget_and_disabled_cache(cache_settings):
+    remember_access_token("token", _user())
+    forget_access_token("token")
+    assert get_cached_user(MagicMock(), "token") is None
+
+    cache_settings.AUTH_TOKEN_CACHE_TTL_SECONDS = 0
+    remember_access_token("token", _user())
+    assert get_cached_user(MagicMock(), "token") is None
+    assert len(token_cache._verified_tokens) == 0
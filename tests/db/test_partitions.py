@@ -0,0 +1,50 @@
+from datetime import UTC, datetime
+from unittest.mock import MagicMock
+
+from app.db.partitions import (
+    create_month_partition,
+    list_month_partitions,
+    month_start,
+    next_month,
+)
+
+# =========== Month Tests ===========
+
+
+# Test that months are bounded in UTC, across a year end
+def test_month_bounds():
+    moment = datetime(2026, 12, 31, 23, 30, tzinfo=UTC)
+
+    assert month_start(moment) == datetime(2026, 12, 1, tzinfo=UTC)
+    assert next_month(month_start(moment)) == datetime(2027, 1, 1, tzinfo=UTC)
+
+
+# =========== Partition Tests ===========
+
+
+# Test that a month's partition covers exactly that month
+def test_create_month_partition():
+    db = MagicMock()
+
+    name = create_month_partition(db, "drift_events", datetime(2026, 10, 1, tzinfo=UTC))
+
+    assert name == "drift_events_p202610"
+    assert str(db.execute.call_args.args[0]) == (
+        "CREATE TABLE IF NOT EXISTS drift_events_p202610 PARTITION OF drift_events FOR VALUES "
+        "FROM ('2026-10-01T00:00:00+00:00') TO ('2026-11-01T00:00:00+00:00')"
+    )
+
+
+# Test that monthly partitions are listed oldest first and foreign ones left out
+def test_list_month_partitions():
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = [
+        "drift_events_p202602",
+        "drift_events_p202601",
+        "drift_events_legacy",
+    ]
+
+    assert list_month_partitions(db, "drift_events") == [
+        ("drift_events_p202601", datetime(2026, 1, 1, tzinfo=UTC)),
+        ("drift_events_p202602", datetime(2026, 2, 1, tzinfo=UTC)),
+    ]
@@ -0,0 +1,116 @@
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.deps import get_current_user, get_db_connection
+from app.main import app
+from app.models.user import User
+
+# =========== Setup ===========
+
+client = TestClient(app)
+
+mock_user = MagicMock(spec=User)
+mock_user.id = uuid4()
+mock_user.email = "Admin@delta.com"
+
+
+# Signs in the mock user, restoring whatever override the other route tests installed
+@pytest.fixture(autouse=True)
+def signed_in_user():
+    previous = app.dependency_overrides.get(get_current_user)
+    app.dependency_overrides[get_current_user] = lambda: mock_user
+    yield mock_user
+    if previous:
+        app.dependency_overrides[get_current_user] = previous
+    else:
+        app.dependency_overrides.pop(get_current_user, None)
+
+
+# Provides a fresh mock database session injected as a FastAPI dependency
+@pytest.fixture
+def mock_db_session():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db_connection] = lambda: mock_db
+    yield mock_db
+    app.dependency_overrides.pop(get_db_connection, None)
+
+
+# Lists the mock user's email as an admin
+@pytest.fixture
+def admin_emails():
+    with patch("app.deps.settings") as mock_settings:
+        mock_settings.ADMIN_EMAILS = "ops@delta.com, admin@delta.com"
+        yield mock_settings
+
+
+# =========== GET /admin/storage Tests ===========
+
+
+# Tests that admins get the storage report.
+def test_get_storage_as_admin(mock_db_session, admin_emails):
+    report = {"policy": {}, "usage_bytes": 10, "quota_bytes": 100, "repositories": []}
+
+    with patch("app.routers.admin.get_storage_report", return_value=report) as mock_report:
+        response = client.get("/api/admin/storage")
+
+    assert response.status_code == 200
+    assert response.json() == report
+    mock_report.assert_called_once_with(mock_db_session)
+
+
+# Tests that users not listed in ADMIN_EMAILS are rejected.
+def test_get_storage_forbidden_for_non_admin(mock_db_session):
+    with patch("app.deps.settings") as mock_settings:
+        mock_settings.ADMIN_EMAILS = "ops@delta.com"
+        response = client.get("/api/admin/storage")
+
+    assert response.status_code == 403
+
+
+# =========== POST /admin/storage/enforce Tests ===========
+
+
+# Tests that a storage pass is enqueued on the clone queue.
+def test_enforce_storage_enqueues_pass(admin_emails):
+    with patch("app.routers.admin.clone_queue") as mock_queue:
+        mock_queue.enqueue.return_value = MagicMock(id="job-1")
+        response = client.post("/api/admin/storage/enforce")
+
+    assert response.status_code == 202
+    assert response.json() == {"job_id": "job-1"}
+    mock_queue.enqueue.assert_called_once()
+
+
+# Tests that a queue failure is reported as a server error.
+def test_enforce_storage_enqueue_failure(admin_emails):
+    with patch("app.routers.admin.clone_queue") as mock_queue:
+        mock_queue.enqueue.side_effect = Exception("redis down")
+        response = client.post("/api/admin/storage/enforce")
+
+    assert response.status_code == 500
+
+
+# =========== POST /admin/drift-stats/rebuild Tests ===========
+
+
+# Tests that the drift counters are rebuilt and committed.
+def test_rebuild_drift_stats(mock_db_session, admin_emails):
+    with patch("app.routers.admin.rebuild_drift_stats", return_value=12) as mock_rebuild:
+        response = client.post("/api/admin/drift-stats/rebuild")
+
+    assert response.status_code == 200
+    assert response.json() == {"repos_count": 12}
+    mock_rebuild.assert_called_once_with(mock_db_session)
+    mock_db_session.commit.assert_called_once()
+
+
+# Tests that a failed rebuild is rolled back.
+def test_rebuild_drift_stats_failure(mock_db_session, admin_emails):
+    with patch("app.routers.admin.rebuild_drift_stats", side_effect=Exception("db down")):
+        response = client.post("/api/admin/drift-stats/rebuild")
+
+    assert response.status_code == 500
+    mock_db_session.rollback.assert_called_once()
@@ -1,10 +1,11 @@
-import pytest
 from unittest.mock import MagicMock, patch
-from fastapi.testclient import TestClient
 from uuid import uuid4
 
-from app.main import app
+import pytest
+from fastapi.testclient import TestClient
+
 from app.deps import get_db_connection
+from app.main import app
 from app.models.user import User
 
 # =========== Setup ===========
@@ -111,7 +112,7 @@ def test_login_success(mock_db_session):
         patch("app.routers.auth.security.verify_hash", return_value=True),
         patch("app.routers.auth.security.create_access_token", return_value="access_tok"),
         patch("app.routers.auth.security.create_refresh_token", return_value="refresh_tok"),
-        patch("app.routers.auth.security.get_hash", return_value="hashed_refresh"),
+        patch("app.routers.auth.security.get_token_digest", return_value="refresh_digest"),
     ):
         response = client.post(
             "/api/auth/login", json={"email": "test@example.com", "password": "correctpassword"}
@@ -121,6 +122,7 @@ def test_login_success(mock_db_session):
     data = response.json()
     assert data["email"] == "test@example.com"
     assert data["name"] == "Test User"
+    assert mock_user.current_refresh_token_hash == "refresh_digest"
     mock_db_session.commit.assert_called()
 
 
@@ -1,10 +1,14 @@
+import json
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
 import pytest
-from unittest.mock import MagicMock, AsyncMock, patch
 from fastapi.testclient import TestClient
-from uuid import uuid4
 
+from app.deps import get_current_user, get_db_connection
 from app.main import app
-from app.deps import get_db_connection, get_current_user
+from app.models.repository import Repository
 from app.models.user import User
 
 # =========== Setup ===========
@@ -40,27 +44,34 @@ def mock_db_session():
 
 def test_get_dashboard_stats_success(mock_db_session):
     """Test that dashboard stats returns correct counts for the authenticated user."""
-    mock_db_session.query.return_value.filter.return_value.scalar.return_value = 3
-    mock_db_session.query.return_value.join.return_value.filter.return_value.scalar.return_value = 7
-    mock_db_session.query.return_value.join.return_value.join.return_value.filter.return_value.scalar.return_value = 21
+    stats_query = mock_db_session.query.return_value.select_from.return_value.outerjoin.return_value
+    stats_query.outerjoin.return_value.filter.return_value.one.return_value = (3, 7, 21, 2)
 
-    response = client.get("/api/dashboard/stats")
+    with patch("app.services.drift_stats.redis_conn") as mock_redis:
+        mock_redis.get.return_value = None
+        response = client.get("/api/dashboard/stats")
 
     assert response.status_code == 200
-    data = response.json()
-    assert "installations_count" in data
-    assert "repos_linked_count" in data
-    assert "drift_events_count" in data
-    assert "pr_waiting_count" in data
+    assert response.json() == {
+        "installations_count": 3,
+        "repos_linked_count": 7,
+        "drift_events_count": 21,
+        "pr_waiting_count": 2,
+    }
+
+    # All four counts come from a single query, then cached for the next poll
+    mock_db_session.query.assert_called_once()
+    mock_redis.set.assert_called_once()
 
 
 def test_get_dashboard_stats_all_zero(mock_db_session):
     """Test that dashboard stats returns zeros for a new user with no data."""
-    mock_db_session.query.return_value.filter.return_value.scalar.return_value = 0
-    mock_db_session.query.return_value.join.return_value.filter.return_value.scalar.return_value = 0
-    mock_db_session.query.return_value.join.return_value.join.return_value.filter.return_value.scalar.return_value = 0
+    stats_query = mock_db_session.query.return_value.select_from.return_value.outerjoin.return_value
+    stats_query.outerjoin.return_value.filter.return_value.one.return_value = (0, 0, None, None)
 
-    response = client.get("/api/dashboard/stats")
+    with patch("app.services.drift_stats.redis_conn") as mock_redis:
+        mock_redis.get.return_value = None
+        response = client.get("/api/dashboard/stats")
 
     assert response.status_code == 200
     data = response.json()
@@ -70,6 +81,26 @@ def test_get_dashboard_stats_all_zero(mock_db_session):
     assert data["pr_waiting_count"] == 0
 
 
+def test_get_dashboard_stats_served_from_cache(mock_db_session):
+    """Test that cached stats are returned without querying the database."""
+    cached = json.dumps(
+        {
+            "installations_count": 1,
+            "repos_linked_count": 2,
+            "drift_events_count": 3,
+            "pr_waiting_count": 0,
+        }
+    )
+
+    with patch("app.services.drift_stats.redis_conn") as mock_redis:
+        mock_redis.get.return_value = cached.encode()
+        response = client.get("/api/dashboard/stats")
+
+    assert response.status_code == 200
+    assert response.json()["drift_events_count"] == 3
+    mock_db_session.query.assert_not_called()
+
+
 def test_get_dashboard_stats_requires_auth():
     """Test that dashboard stats requires authentication."""
     app.dependency_overrides.pop(get_current_user, None)
@@ -84,39 +115,67 @@ def test_get_dashboard_stats_requires_auth():
 
 # =========== GET /dashboard/repos Tests ===========
 
+REPOS_QUERY = (
+    "query.return_value.join.return_value.filter.return_value"
+    ".order_by.return_value.limit.return_value.all.return_value"
+)
+
+
+def _mock_repo(fetched_at=None, **metadata):
+    """Builds a repo row with the given stored GitHub metadata."""
+    return Repository(
+        id=uuid4(),
+        repo_name="owner/delta-docs",
+        installation_id=101,
+        metadata_fetched_at=fetched_at,
+        **metadata,
+    )
+
+
+def _set_repos(mock_db, repos):
+    mock_db.configure_mock(**{REPOS_QUERY: repos})
 
-def test_get_dashboard_repos_success(mock_db_session):
-    """Test that dashboard repos returns repo details for the authenticated user."""
-    mock_repo = MagicMock()
-    mock_repo.repo_name = "owner/delta-docs"
-    mock_repo.installation_id = 101
 
-    mock_db_session.query.return_value.join.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [
-        mock_repo
-    ]
+def _patch_github():
+    """Patches the GitHub calls of the repo metadata service."""
+    return (
+        patch("app.services.repo_metadata.get_repo_details", new_callable=AsyncMock),
+        patch("app.services.repo_metadata.get_installation_access_token", new_callable=AsyncMock),
+    )
 
-    with patch("app.routers.dashboard.get_repo_details", new_callable=AsyncMock) as mock_details:
+
+def test_get_dashboard_repos_success(mock_db_session):
+    """Test that repos never fetched are fetched from GitHub, stored and returned."""
+    repo = _mock_repo()
+    _set_repos(mock_db_session, [repo])
+
+    details_patch, token_patch = _patch_github()
+    with details_patch as mock_details, token_patch:
         mock_details.return_value = {
-            "name": "delta-docs",
+            "name": "owner/delta-docs",
             "description": "Documentation drift detector",
             "language": "Python",
             "stargazers_count": 42,
             "forks_count": 5,
             "avatar_url": None,
+            "etag": 'W/"abc"',
         }
         response = client.get("/api/dashboard/repos")
 
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 1
-    assert data[0]["name"] == "delta-docs"
+    assert data[0]["name"] == "owner/delta-docs"
     assert data[0]["language"] == "Python"
     assert data[0]["stargazers_count"] == 42
+    assert repo.stargazers_count == 42
+    assert repo.metadata_etag == 'W/"abc"'
+    mock_db_session.commit.assert_called_once()
 
 
 def test_get_dashboard_repos_empty(mock_db_session):
     """Test that dashboard repos returns empty list when user has no repos."""
-    mock_db_session.query.return_value.join.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = []
+    _set_repos(mock_db_session, [])
 
     response = client.get("/api/dashboard/repos")
 
@@ -126,15 +185,11 @@ def test_get_dashboard_repos_empty(mock_db_session):
 
 def test_get_dashboard_repos_github_api_failure(mock_db_session):
     """Test that dashboard repos falls back gracefully when GitHub API fails."""
-    mock_repo = MagicMock()
-    mock_repo.repo_name = "owner/delta-docs"
-    mock_repo.installation_id = 101
-
-    mock_db_session.query.return_value.join.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [
-        mock_repo
-    ]
+    _set_repos(mock_db_session, [_mock_repo()])
 
-    with patch("app.routers.dashboard.get_repo_details", side_effect=Exception("GitHub API down")):
+    details_patch, token_patch = _patch_github()
+    with details_patch as mock_details, token_patch:
+        mock_details.side_effect = Exception("GitHub API down")
         response = client.get("/api/dashboard/repos")
 
     assert response.status_code == 200
@@ -142,3 +197,44 @@ def test_get_dashboard_repos_github_api_failure(mock_db_session):
     assert len(data) == 1
     assert data[0]["description"] == "Error fetching details"
     assert data[0]["name"] == "owner/delta-docs"
+
+
+def test_get_dashboard_repos_fresh_metadata_from_db(mock_db_session):
+    """Test that fresh metadata is served from the database without calling GitHub."""
+    repo = _mock_repo(
+        fetched_at=datetime.now(UTC),
+        description="Stored",
+        language="Python",
+        stargazers_count=7,
+        forks_count=1,
+    )
+    _set_repos(mock_db_session, [repo])
+
+    details_patch, token_patch = _patch_github()
+    with details_patch as mock_details, token_patch:
+        response = client.get("/api/dashboard/repos")
+
+    assert response.status_code == 200
+    assert response.json()[0]["description"] == "Stored"
+    assert response.json()[0]["stargazers_count"] == 7
+    mock_details.assert_not_awaited()
+
+
+def test_get_dashboard_repos_stale_metadata_revalidated_in_background(mock_db_session):
+    """Test that stale metadata is served at once and revalidated after the response."""
+    repo = _mock_repo(
+        fetched_at=datetime.now(UTC) - timedelta(hours=1),
+        description="Stored",
+        metadata_etag='W/"abc"',
+    )
+    _set_repos(mock_db_session, [repo])
+
+    with patch("app.routers.dashboard.refresh_repo_metadata", new_callable=AsyncMock) as refresh:
+        response = client.get("/api/dashboard/repos")
+
+    assert response.status_code == 200
+    assert response.json()[0]["description"] == "Stored"
+    assert refresh.await_args is not None
+    [stale] = refresh.await_args.args[0]
+    assert stale["id"] == str(repo.id)
+    assert stale["metadata_etag"] == 'W/"abc"'
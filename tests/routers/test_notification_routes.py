@@ -1,13 +1,14 @@
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
 import pytest
-from unittest.mock import MagicMock
 from fastapi.testclient import TestClient
-from uuid import uuid4
-from datetime import datetime, timezone
 
+from app.deps import get_current_user, get_db_connection
 from app.main import app
-from app.deps import get_db_connection, get_current_user
-from app.models.user import User
 from app.models.notification import Notification
+from app.models.user import User
 
 # =========== Setup ===========
 
@@ -36,6 +37,24 @@ def mock_db_session():
     app.dependency_overrides.pop(get_db_connection, None)
 
 
+@pytest.fixture(autouse=True)
+def mock_redis():
+    """Replaces Redis behind the unread count cache, which isn't running in tests."""
+    # Other test modules install their own user override at import, this module's user is used here
+    app.dependency_overrides[get_current_user] = override_get_current_user
+    with patch("app.services.notification_service.redis_conn") as mock:
+        mock.get.return_value = None
+        yield mock
+
+
+def _notifications_query(mock_db, notifications):
+    """Makes the chained notifications query return the given rows."""
+    query = mock_db.query.return_value.filter.return_value
+    query.filter.return_value = query
+    query.order_by.return_value.limit.return_value.all.return_value = notifications
+    return query
+
+
 def make_mock_notification(is_read=False):
     """Helper to create a real Notification model instance with proper typed fields."""
     notif = Notification(
@@ -43,7 +62,8 @@ def make_mock_notification(is_read=False):
         user_id=mock_user_id,
         content="New drift event detected in delta/backend",
         is_read=is_read,
-        created_at=datetime.now(timezone.utc),
+        group_count=1,
+        created_at=datetime.now(UTC),
     )
     return notif
 
@@ -56,21 +76,20 @@ def test_get_notifications_success(mock_db_session):
     notif1 = make_mock_notification()
     notif2 = make_mock_notification(is_read=True)
 
-    mock_db_session.query.return_value.filter.return_value.order_by.return_value.all.return_value = [
-        notif1,
-        notif2,
-    ]
+    query = _notifications_query(mock_db_session, [notif1, notif2])
 
     response = client.get("/api/notifications/")
 
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 2
+    assert "X-Next-Cursor" not in response.headers
+    query.order_by.return_value.limit.assert_called_once_with(51)
 
 
 def test_get_notifications_empty(mock_db_session):
     """Test that an empty list is returned when user has no notifications."""
-    mock_db_session.query.return_value.filter.return_value.order_by.return_value.all.return_value = []
+    _notifications_query(mock_db_session, [])
 
     response = client.get("/api/notifications/")
 
@@ -78,6 +97,73 @@ def test_get_notifications_empty(mock_db_session):
     assert response.json() == []
 
 
+def test_get_notifications_paginated(mock_db_session):
+    """Test that a full page returns a cursor, and the cursor narrows the next page's query."""
+    notifications = [make_mock_notification() for _ in range(3)]
+    query = _notifications_query(mock_db_session, notifications)
+
+    response = client.get("/api/notifications/?limit=2")
+
+    assert len(response.json()) == 2
+    cursor = response.headers["X-Next-Cursor"]
+
+    query = _notifications_query(mock_db_session, notifications[2:])
+    response = client.get(f"/api/notifications/?limit=2&cursor={cursor}")
+
+    assert len(response.json()) == 1
+    assert "X-Next-Cursor" not in response.headers
+    query.filter.assert_called_once()
+
+
+def test_get_notifications_invalid_cursor(mock_db_session):
+    """Test that a cursor that wasn't issued by the API is rejected."""
+    response = client.get("/api/notifications/?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+
+
+# =========== GET /notifications/unread-count Tests ===========
+
+
+def test_get_unread_count(mock_db_session, mock_redis):
+    """Test that the unread count is counted in the database and cached."""
+    mock_db_session.query.return_value.filter.return_value.scalar.return_value = 4
+
+    response = client.get("/api/notifications/unread-count")
+
+    assert response.status_code == 200
+    assert response.json() == {"unread_count": 4}
+    mock_redis.set.assert_called_once_with(f"notifications_unread:{mock_user_id}", 4, ex=60)
+
+
+def test_get_unread_count_cached(mock_db_session, mock_redis):
+    """Test that a cached unread count is served without querying the database."""
+    mock_redis.get.return_value = b"7"
+
+    response = client.get("/api/notifications/unread-count")
+
+    assert response.json() == {"unread_count": 7}
+    mock_db_session.query.assert_not_called()
+
+
+# =========== GET /notifications/stream Tests ===========
+
+
+def test_stream_notifications(mock_db_session):
+    """Test that the user's notification channel is streamed as Server-Sent Events."""
+
+    async def fake_stream(is_disconnected, *channels):
+        yield f"event: notification\ndata: {channels[0]}\n\n"
+
+    with patch("app.routers.notifications.stream_events", side_effect=fake_stream):
+        response = client.get("/api/notifications/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert f"data: notifications:{mock_user_id}" in response.text
+    mock_db_session.close.assert_called_once()
+
+
 # =========== PATCH /notifications/{id}/read Tests ===========
 
 
@@ -96,6 +182,17 @@ def test_mark_notification_as_read_success(mock_db_session):
     mock_db_session.refresh.assert_called_once_with(notif)
 
 
+def test_mark_notification_as_read_invalidates_unread_count(mock_db_session, mock_redis):
+    """Test that reading a notification drops the cached unread count."""
+    mock_db_session.query.return_value.filter.return_value.first.return_value = (
+        make_mock_notification()
+    )
+
+    client.patch(f"/api/notifications/{uuid4()}/read")
+
+    mock_redis.delete.assert_called_once_with(f"notifications_unread:{mock_user_id}")
+
+
 def test_mark_notification_as_read_not_found(mock_db_session):
     """Test that marking a non-existent notification raises 404."""
     mock_db_session.query.return_value.filter.return_value.first.return_value = None
@@ -1,13 +1,14 @@
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
 import pytest
-from unittest.mock import MagicMock
 from fastapi.testclient import TestClient
-from uuid import uuid4
 
+from app.deps import get_current_user, get_db_connection
 from app.main import app
-from app.deps import get_db_connection, get_current_user
-from app.models.user import User
-from app.models.repository import Repository
 from app.models.drift import DriftEvent
+from app.models.repository import Repository
+from app.models.user import User
 
 # Setup test client
 client = TestClient(app)
@@ -38,7 +39,6 @@ def mock_db_session():
     # Inject our mock db whenever fastapi asks for a database connection
     app.dependency_overrides[get_db_connection] = lambda: mock_db
     yield mock_db
-    pass
 
 
 # =========== GET /repos/ Tests ===========
@@ -195,6 +195,49 @@ def test_toggle_repo_activation_not_found(mock_db_session):
 # =========== GET /repos/{id}/drift-events Tests ===========
 
 
+# Helper to mock the lookup of a repo owned by the user
+def _repo_query(repo):
+    return MagicMock(
+        join=MagicMock(
+            return_value=MagicMock(
+                filter=MagicMock(return_value=MagicMock(first=MagicMock(return_value=repo)))
+            )
+        )
+    )
+
+
+# Helper to mock the chained drift events query, every filter returns the same query
+def _events_query(events):
+    query = MagicMock()
+    query.filter.return_value = query
+    query.order_by.return_value = query
+    query.limit.return_value = query
+    query.all.return_value = events
+    return query
+
+
+# Helper to build drift events, created a minute apart, newest first
+def _drift_events(repo_id, count):
+    from datetime import UTC, datetime, timedelta
+
+    now = datetime.now(UTC)
+    return [
+        DriftEvent(
+            id=uuid4(),
+            repo_id=repo_id,
+            pr_number=40 + i,
+            base_branch="main",
+            head_branch="feature-branch",
+            base_sha="abc1234",
+            head_sha="def5678",
+            processing_phase="queued",
+            drift_result="pending",
+            created_at=now - timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
 def test_get_drift_events_success(mock_db_session):
     repo_id = uuid4()
 
@@ -202,48 +245,13 @@ def test_get_drift_events_success(mock_db_session):
     mock_repo = Repository(
         id=repo_id, installation_id=1, repo_name="delta/events", is_active=True, is_suspended=False
     )
+    [mock_event] = _drift_events(repo_id, 1)
+    events_query = _events_query([mock_event])
 
-    # Mock finding the drift events
-    event1_id = uuid4()
-    from datetime import datetime, UTC
-
-    mock_event = DriftEvent(
-        id=event1_id,
-        repo_id=repo_id,
-        pr_number=42,
-        base_branch="main",
-        head_branch="feature-branch",
-        base_sha="abc1234",
-        head_sha="def5678",
-        processing_phase="queued",
-        drift_result="pending",
-        created_at=datetime.now(UTC),
-    )
-
-    # Setup database mocks
-    # We first join+filter for the repo, then filter+order_by for events
-    mock_db_session.query.side_effect = [
-        # First query: repo
-        MagicMock(
-            join=MagicMock(
-                return_value=MagicMock(
-                    filter=MagicMock(
-                        return_value=MagicMock(first=MagicMock(return_value=mock_repo))
-                    )
-                )
-            )
-        ),
-        # Second query: events
-        MagicMock(
-            filter=MagicMock(
-                return_value=MagicMock(
-                    order_by=MagicMock(
-                        return_value=MagicMock(all=MagicMock(return_value=[mock_event]))
-                    )
-                )
-            )
-        ),
-    ]
+    # Setup database mocks: the repo, the events, then the events counter of the repo
+    counter_query = MagicMock()
+    counter_query.filter.return_value.scalar.return_value = 1
+    mock_db_session.query.side_effect = [_repo_query(mock_repo), events_query, counter_query]
 
     response = client.get(f"/api/repos/{repo_id}/drift-events")
 
@@ -251,7 +259,75 @@ def test_get_drift_events_success(mock_db_session):
     data = response.json()
     assert len(data) == 1
     assert data[0]["processing_phase"] == "queued"
-    assert data[0]["pr_number"] == 42
+    assert data[0]["pr_number"] == 40
+    assert response.headers["X-Total-Count"] == "1"
+    assert "X-Next-Cursor" not in response.headers
+    events_query.limit.assert_called_once_with(51)
+
+
+# Test that a full page returns the cursor of its last event, which selects the next page
+def test_get_drift_events_paginated(mock_db_session):
+    repo_id = uuid4()
+    mock_repo = Repository(id=repo_id, installation_id=1, repo_name="delta/events")
+    events = _drift_events(repo_id, 3)
+
+    counter_query = MagicMock()
+    counter_query.filter.return_value.scalar.return_value = 3
+    mock_db_session.query.side_effect = [
+        _repo_query(mock_repo),
+        _events_query(events),
+        counter_query,
+    ]
+
+    response = client.get(f"/api/repos/{repo_id}/drift-events?limit=2")
+
+    assert response.status_code == 200
+    assert [e["pr_number"] for e in response.json()] == [40, 41]
+    cursor = response.headers["X-Next-Cursor"]
+
+    next_query = _events_query(events[2:])
+    mock_db_session.query.side_effect = [_repo_query(mock_repo), next_query, counter_query]
+
+    response = client.get(f"/api/repos/{repo_id}/drift-events?limit=2&cursor={cursor}")
+
+    assert [e["pr_number"] for e in response.json()] == [42]
+    assert "X-Next-Cursor" not in response.headers
+    # The cursor adds a keyset condition after the repo filter
+    assert next_query.filter.call_count == 2
+
+
+# Test that filters are applied in the query and the total is a capped count
+def test_get_drift_events_filtered(mock_db_session):
+    repo_id = uuid4()
+    mock_repo = Repository(id=repo_id, installation_id=1, repo_name="delta/events")
+    events_query = _events_query(_drift_events(repo_id, 1))
+
+    count_query = MagicMock()
+    count_query.select_from.return_value.scalar.return_value = 1001
+    mock_db_session.query.side_effect = [_repo_query(mock_repo), events_query, count_query]
+
+    response = client.get(
+        f"/api/repos/{repo_id}/drift-events"
+        "?processing_phase=completed&drift_result=drift_detected&pr_number=40"
+        "&created_after=2026-01-01T00:00:00Z"
+    )
+
+    assert response.status_code == 200
+    filters = events_query.filter.call_args_list[1].args
+    assert len(filters) == 4
+    assert response.headers["X-Total-Count"] == "1000"
+    assert response.headers["X-Total-Count-Exact"] == "false"
+
+
+# Test that a cursor that wasn't issued by the API is rejected
+def test_get_drift_events_invalid_cursor(mock_db_session):
+    repo_id = uuid4()
+    mock_repo = Repository(id=repo_id, installation_id=1, repo_name="delta/events")
+    mock_db_session.query.side_effect = [_repo_query(mock_repo), _events_query([])]
+
+    response = client.get(f"/api/repos/{repo_id}/drift-events?cursor=not-a-cursor")
+
+    assert response.status_code == 400
 
 
 def test_get_drift_events_repo_not_found(mock_db_session):
@@ -276,88 +352,75 @@ def test_get_drift_events_repo_not_found(mock_db_session):
 # =========== GET /repos/{id}/drift-events/{event_id} Tests ===========
 
 
-def test_get_drift_event_detail_success(mock_db_session):
-    """Test that a single drift event with its findings and code changes is returned."""
-    from datetime import datetime, UTC
-    from app.models.drift import DriftFinding, CodeChange
+# Helper to mock the single drift event detail query returning the given row
+def _detail_query(row):
+    query = MagicMock()
+    query.join.return_value = query
+    query.filter.return_value = query
+    query.first.return_value = row
+    return query
 
-    repo_id = uuid4()
-    event_id = uuid4()
 
-    mock_repo = Repository(
-        id=repo_id,
-        installation_id=1,
-        repo_name="delta/events",
-        is_active=True,
-        is_suspended=False,
-        docs_root_path="/docs",
-    )
+# Helper to build the row of the detail query, findings and code changes as aggregated JSON
+def _detail_row(event_id, findings, code_changes, code_changes_total=None):
+    from collections import namedtuple
+    from datetime import UTC, datetime
 
-    mock_event = DriftEvent(
+    DetailRow = namedtuple(
+        "DetailRow",
+        "id pr_number base_branch head_branch processing_phase drift_result overall_drift_score "
+        "created_at docs_pr_number error_message started_at completed_at repo_name findings "
+        "code_changes code_changes_total",
+    )
+    return DetailRow(
         id=event_id,
-        repo_id=repo_id,
         pr_number=99,
         base_branch="main",
         head_branch="feature-ai",
-        base_sha="aaa111",
-        head_sha="bbb222",
         processing_phase="completed",
         drift_result="drift_found",
-        created_at=datetime.now(UTC),
         overall_drift_score=None,
+        created_at=datetime.now(UTC),
+        docs_pr_number=None,
         error_message=None,
         started_at=None,
         completed_at=None,
+        repo_name="delta/events",
+        findings=findings,
+        code_changes=code_changes,
+        code_changes_total=len(code_changes) if code_changes_total is None else code_changes_total,
     )
 
-    mock_finding = DriftFinding(
-        id=uuid4(),
-        drift_event_id=event_id,
-        code_path="src/agent.py",
-        doc_file_path="/docs/agent.md",
-        change_type="modified",
-        drift_type="outdated_description",
-        drift_score=0.85,
-        explanation="Function signature changed",
-        confidence=0.9,
-        created_at=datetime.now(UTC),
-    )
 
-    mock_code_change = CodeChange(
-        id=uuid4(),
-        drift_event_id=event_id,
-        file_path="src/agent.py",
-        change_type="modified",
-        is_code=True,
-        is_ignored=False,
-    )
+def test_get_drift_event_detail_success(mock_db_session):
+    """Test that a single drift event with its findings and code changes is returned."""
+    from app.core.config import settings
 
-    # 4 sequential DB queries: repo → event → findings → code changes
+    repo_id = uuid4()
+    event_id = uuid4()
+
+    finding = {
+        "id": str(uuid4()),
+        "code_path": "src/agent.py",
+        "doc_file_path": f"{settings.REPOS_BASE_PATH}/delta/events/docs/agent.md",
+        "change_type": "modified",
+        "drift_type": "outdated_description",
+        "drift_score": 0.85,
+        "explanation": "Function signature changed",
+        "confidence": 0.9,
+        "created_at": "2026-10-19T18:21:36.904512+00:00",
+    }
+    code_change = {
+        "id": str(uuid4()),
+        "file_path": "src/agent.py",
+        "change_type": "modified",
+        "is_code": True,
+        "is_ignored": False,
+    }
+
+    # One query reads the event, its findings and its code changes
     mock_db_session.query.side_effect = [
-        MagicMock(
-            join=MagicMock(
-                return_value=MagicMock(
-                    filter=MagicMock(
-                        return_value=MagicMock(first=MagicMock(return_value=mock_repo))
-                    )
-                )
-            )
-        ),
-        MagicMock(
-            filter=MagicMock(return_value=MagicMock(first=MagicMock(return_value=mock_event)))
-        ),
-        MagicMock(
-            filter=MagicMock(
-                return_value=MagicMock(
-                    order_by=MagicMock(
-                        return_value=MagicMock(all=MagicMock(return_value=[mock_finding]))
-                    )
-                )
-            )
-        ),
-        MagicMock(
-            filter=MagicMock(return_value=MagicMock(all=MagicMock(return_value=[mock_code_change])))
-        ),
+        _detail_query(_detail_row(event_id, [finding], [code_change], code_changes_total=1200))
     ]
 
     response = client.get(f"/api/repos/{repo_id}/drift-events/{event_id}")
@@ -370,13 +433,25 @@ def test_get_drift_event_detail_success(mock_db_session):
     assert len(data["findings"]) == 1
     assert data["findings"][0]["code_path"] == "src/agent.py"
     assert data["findings"][0]["drift_score"] == 0.85
+    assert data["findings"][0]["doc_file_path"] == "docs/agent.md"
     assert len(data["code_changes"]) == 1
     assert data["code_changes"][0]["file_path"] == "src/agent.py"
+    assert data["code_changes_total"] == 1200
+    assert mock_db_session.query.call_count == 1
+
+
+def test_get_drift_event_detail_code_changes_page(mock_db_session):
+    """Test that the code changes page size is validated before querying."""
+    response = client.get(f"/api/repos/{uuid4()}/drift-events/{uuid4()}?code_changes_limit=0")
+
+    assert response.status_code == 422
+    mock_db_session.query.assert_not_called()
 
 
 def test_get_drift_event_detail_repo_not_found(mock_db_session):
     """Test that 404 is returned when repo does not belong to the user."""
     mock_db_session.query.side_effect = [
+        _detail_query(None),
         MagicMock(
             join=MagicMock(
                 return_value=MagicMock(
@@ -395,29 +470,85 @@ def test_get_drift_event_detail_repo_not_found(mock_db_session):
 def test_get_drift_event_detail_event_not_found(mock_db_session):
     """Test that 404 is returned when the drift event ID does not exist."""
     repo_id = uuid4()
-    mock_repo = Repository(
-        id=repo_id,
-        installation_id=1,
-        repo_name="delta/events",
-        is_active=True,
-        is_suspended=False,
-        docs_root_path="/docs",
-    )
 
     mock_db_session.query.side_effect = [
+        _detail_query(None),
         MagicMock(
             join=MagicMock(
                 return_value=MagicMock(
                     filter=MagicMock(
-                        return_value=MagicMock(first=MagicMock(return_value=mock_repo))
+                        return_value=MagicMock(first=MagicMock(return_value=(repo_id,)))
                     )
                 )
             )
         ),
-        MagicMock(filter=MagicMock(return_value=MagicMock(first=MagicMock(return_value=None)))),
     ]
 
     response = client.get(f"/api/repos/{repo_id}/drift-events/{uuid4()}")
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Drift event not found"
+
+
+# =========== GET /repos/{id}/drift-events/stream Tests ===========
+
+
+# Fake stream echoing the channel it was asked for, so tests can check which one is streamed
+async def _fake_stream(is_disconnected, *channels):
+    yield f"event: phase\ndata: {channels[0]}\n\n"
+
+
+def test_stream_repo_drift_events(mock_db_session):
+    """Test that the repo's drift event channel is streamed as Server-Sent Events."""
+    repo_id = uuid4()
+    query = mock_db_session.query.return_value.join.return_value.filter.return_value
+    query.first.return_value = (repo_id,)
+
+    with patch("app.routers.repos.stream_events", side_effect=_fake_stream):
+        response = client.get(f"/api/repos/{repo_id}/drift-events/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert f"data: repo_drift_events:{repo_id}" in response.text
+    mock_db_session.close.assert_called_once()
+
+
+def test_stream_repo_drift_events_not_found(mock_db_session):
+    """Test that 404 is returned when the user does not own the repo."""
+    query = mock_db_session.query.return_value.join.return_value.filter.return_value
+    query.first.return_value = None
+
+    with patch("app.routers.repos.stream_events") as mock_stream:
+        response = client.get(f"/api/repos/{uuid4()}/drift-events/stream")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Repository not found"
+    mock_stream.assert_not_called()
+
+
+# =========== GET /repos/{id}/drift-events/{event_id}/stream Tests ===========
+
+
+def test_stream_drift_event(mock_db_session):
+    """Test that the drift event's channel is streamed as Server-Sent Events."""
+    event_id = uuid4()
+    query = mock_db_session.query.return_value.join.return_value.join.return_value.filter
+    query.return_value.first.return_value = (event_id,)
+
+    with patch("app.routers.repos.stream_events", side_effect=_fake_stream):
+        response = client.get(f"/api/repos/{uuid4()}/drift-events/{event_id}/stream")
+
+    assert response.status_code == 200
+    assert f"data: drift_event:{event_id}" in response.text
+    mock_db_session.close.assert_called_once()
+
+
+def test_stream_drift_event_not_found(mock_db_session):
+    """Test that 404 is returned for a drift event the user does not own."""
+    query = mock_db_session.query.return_value.join.return_value.join.return_value.filter
+    query.return_value.first.return_value = None
+
+    response = client.get(f"/api/repos/{uuid4()}/drift-events/{uuid4()}/stream")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Drift event not found"
@@ -1,219 +1,10 @@
-import pytest
-from unittest.mock import MagicMock, patch
-from pathlib import Path
 import subprocess
-from app.services.git_service.branches import pull_branches
-from app.services.git_service import create_docs_branch, commit_and_push_docs_branch
-
-# =========== pull_branches Tests ===========
-
-
-# Tests that successful branch pulling works for multiple branches
-@pytest.mark.asyncio
-async def test_pull_branches_success():
-    repo_full_name = "owner/repo"
-    access_token = "test_token"
-    branches = ["main", "feature-branch"]
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-
-    with (
-        patch("subprocess.run", return_value=mock_result) as mock_run,
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=True),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
-
-        # Verify it returns True on success
-        assert result is True
-
-        # Verify git commands were called (Expected calls- set-url, fetch, checkout main, pull main, checkout feature-branch, pull feature-branch)
-        assert mock_run.call_count == 6
-
-
-# Tests that branch pulling fails when repository doesn't exist
-@pytest.mark.asyncio
-async def test_pull_branches_repo_not_exists():
-    repo_full_name = "owner/repo"
-    access_token = "test_token"
-    branches = ["main"]
-
-    with (
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=False),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
-
-        # Verify it returns False when repo doesn't exist
-        assert result is False
-
-
-# Tests that branch pulling fails with remote URL set failure
-@pytest.mark.asyncio
-async def test_pull_branches_set_url_failure():
-    repo_full_name = "owner/repo"
-    access_token = "test_token"
-    branches = ["main"]
-
-    mock_result = MagicMock()
-    mock_result.returncode = 1
-    mock_result.stderr = "fatal: No such remote 'origin'"
-
-    with (
-        patch("subprocess.run", return_value=mock_result),
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=True),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
-
-        # Verify it returns False when set-url fails
-        assert result is False
-
-
-# Tests that branch pulling fails with fetch failure
-@pytest.mark.asyncio
-async def test_pull_branches_fetch_failure():
-    repo_full_name = "owner/repo"
-    access_token = "test_token"
-    branches = ["main"]
-
-    def mock_run_side_effect(*args, **kwargs):
-        mock_result = MagicMock()
-        # First call (set-url) succeeds but second call (fetch) fails
-        if "set-url" in args[0]:
-            mock_result.returncode = 0
-        elif "fetch" in args[0]:
-            mock_result.returncode = 1
-            mock_result.stderr = "fatal: couldn't find remote ref"
-        else:
-            mock_result.returncode = 0
-        return mock_result
-
-    with (
-        patch("subprocess.run", side_effect=mock_run_side_effect),
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=True),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
-
-        # Verify it returns False when fetch fails
-        assert result is False
-
-
-# Tests that branch pulling continues with other branches upon checkout failure
-@pytest.mark.asyncio
-async def test_pull_branches_checkout_failure():
-    repo_full_name = "owner/repo"
-    access_token = "test_token"
-    branches = ["non-existent-branch", "main"]
-
-    call_count = [0]
-
-    def mock_run_side_effect(*args, **kwargs):
-        mock_result = MagicMock()
-        call_count[0] += 1
-
-        # set-url and fetch succeeds
-        if "set-url" in args[0] or "fetch" in args[0]:
-            mock_result.returncode = 0
-
-        # First checkout (non-existent-branch) fails
-        elif "checkout" in args[0] and call_count[0] == 3:
-            mock_result.returncode = 1
-            mock_result.stderr = "error: pathspec 'non-existent-branch' did not match"
-
-        # Other commands succeed
-        else:
-            mock_result.returncode = 0
-        return mock_result
-
-    with (
-        patch("subprocess.run", side_effect=mock_run_side_effect),
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=True),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
-
-        # Verify it still returns True (since it is supposed to continue even on failure)
-        assert result is True
-
-
-# Tests that branch pulling returns false on timeout
-@pytest.mark.asyncio
-async def test_pull_branches_timeout():
-    repo_full_name = "owner/repo"
-    access_token = "test_token"
-    branches = ["main"]
-
-    with (
-        patch("subprocess.run", side_effect=subprocess.TimeoutExpired("git", 500)),
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=True),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
-
-        # Verify it returns False on timeout
-        assert result is False
-
-
-# Tests that branch pulling returns false on general exception
-@pytest.mark.asyncio
-async def test_pull_branches_exception():
-    repo_full_name = "owner/repo"
-    access_token = "test_token"
-    branches = ["main"]
-
-    with (
-        patch("subprocess.run", side_effect=Exception("Unexpected error")),
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=True),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
-
-        # Verify it returns False on exception
-        assert result is False
-
-
-# Tests that branch pulling verifies access token is in remote URL
-@pytest.mark.asyncio
-async def test_pull_branches_includes_access_token():
-    repo_full_name = "owner/repo"
-    access_token = "ghp_test_token_12345"
-    branches = ["main"]
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-
-    with (
-        patch("subprocess.run", return_value=mock_result) as mock_run,
-        patch("app.services.git_service.utils.settings") as mock_settings,
-        patch.object(Path, "exists", return_value=True),
-    ):
-        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
-
-        result = await pull_branches(repo_full_name, access_token, branches)
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 
-        # Verify access token is included in the remote URL
-        set_url_call = mock_run.call_args_list[0]
-        assert "x-access-token" in str(set_url_call)
-        assert access_token in str(set_url_call)
-        assert result is True
+import pytest
 
+from app.services.git_service import commit_and_push_docs_branch, create_docs_branch
 
 # =========== create_docs_branch Tests ===========
 
@@ -227,7 +18,7 @@ async def test_create_docs_branch_success():
     mock_result.stderr = ""
 
     with (
-        patch("subprocess.run", return_value=mock_result) as mock_run,
+        patch("app.services.git_service.branches.run_git", return_value=mock_result) as mock_run,
         patch.object(Path, "exists", return_value=True),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -270,7 +61,9 @@ async def test_create_docs_branch_creation_failure():
         return mock_result
 
     with (
-        patch("subprocess.run", side_effect=mock_run_side_effect) as mock_run,
+        patch(
+            "app.services.git_service.branches.run_git", side_effect=mock_run_side_effect
+        ) as mock_run,
         patch.object(Path, "exists", return_value=True),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -329,7 +122,7 @@ async def test_create_docs_branch_fetch_failure():
         return mock_result
 
     with (
-        patch("subprocess.run", side_effect=mock_run_side_effect),
+        patch("app.services.git_service.branches.run_git", side_effect=mock_run_side_effect),
         patch.object(Path, "exists", return_value=True),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -350,7 +143,10 @@ async def test_create_docs_branch_fetch_failure():
 @pytest.mark.asyncio
 async def test_create_docs_branch_timeout():
     with (
-        patch("subprocess.run", side_effect=subprocess.TimeoutExpired("git", 500)),
+        patch(
+            "app.services.git_service.branches.run_git",
+            side_effect=subprocess.TimeoutExpired("git", 500),
+        ),
         patch.object(Path, "exists", return_value=True),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -367,6 +163,33 @@ async def test_create_docs_branch_timeout():
         assert result is None
 
 
+# Tests that a docs branch is cut from a local start commit without any network call
+@pytest.mark.asyncio
+async def test_create_docs_branch_from_local_start_sha():
+    mock_result = MagicMock()
+    mock_result.returncode = 0
+
+    with (
+        patch("app.services.git_service.branches.run_git", return_value=mock_result) as mock_run,
+        patch("app.services.git_service.branches.has_commits", return_value=True),
+        patch.object(Path, "exists", return_value=True),
+    ):
+        result = await create_docs_branch(
+            repo_path="/tmp/repos/owner/repo",
+            original_branch="feature",
+            access_token="test_token",
+            repo_full_name="owner/repo",
+            pr_number=42,
+            start_sha="head456",
+        )
+
+    assert result is not None
+    assert result.startswith("docs/delta-fix/feature-#42-")
+    mock_run.assert_called_once()
+    args = mock_run.call_args[0][0]
+    assert args == ["checkout", "-b", result, "head456"]
+
+
 # =========== commit_and_push_docs_branch Tests ===========
 
 
@@ -394,7 +217,9 @@ async def test_commit_and_push_docs_branch_success():
         return mock_result
 
     with (
-        patch("subprocess.run", side_effect=mock_run_side_effect) as mock_run,
+        patch(
+            "app.services.git_service.branches.run_git", side_effect=mock_run_side_effect
+        ) as mock_run,
         patch.object(Path, "exists", return_value=True),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -432,7 +257,9 @@ async def test_commit_and_push_docs_branch_nothing_to_commit():
         return mock_result
 
     with (
-        patch("subprocess.run", side_effect=mock_run_side_effect) as mock_run,
+        patch(
+            "app.services.git_service.branches.run_git", side_effect=mock_run_side_effect
+        ) as mock_run,
         patch.object(Path, "exists", return_value=True),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -477,7 +304,7 @@ async def test_commit_and_push_docs_branch_push_failure():
         return mock_result
 
     with (
-        patch("subprocess.run", side_effect=mock_run_side_effect),
+        patch("app.services.git_service.branches.run_git", side_effect=mock_run_side_effect),
         patch.object(Path, "exists", return_value=True),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -0,0 +1,296 @@
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from app.services.git_service.diff import diff_commits, is_generated, parse_diff, summarise_patch
+
+# =========== Helper Functions ===========
+
+
+# Runs a git command in the test repo and returns its stdout
+def _git(repo_path, *args) -> str:
+    return subprocess.run(
+        ["git", "-C", str(repo_path), "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+
+# Commits everything in the working tree and returns the new commit SHA
+def _commit(repo_path, message: str) -> str:
+    _git(repo_path, "add", "-A")
+    _git(repo_path, "commit", "-q", "-m", message)
+    return _git(repo_path, "rev-parse", "HEAD")
+
+
+# =========== parse_diff Tests ===========
+
+
+# Test a modified file is parsed with its hunks and line counts
+def test_parse_diff_modified_file():
+    output = (
+        "diff --git a/src/api.py b/src/api.py\n"
+        "index 1111111..2222222 100644\n"
+        "--- a/src/api.py\n"
+        "+++ b/src/api.py\n"
+        "@@ -1,3 +1,3 @@ def handler():\n"
+        " a\n"
+        "-b\n"
+        "+B\n"
+        " c\n"
+        "@@ -10 +10,2 @@\n"
+        "-x\n"
+        "+y\n"
+        "+z\n"
+    )
+
+    [file_diff] = parse_diff(output)
+
+    assert file_diff["file_path"] == "src/api.py"
+    assert file_diff["status"] == "modified"
+    assert file_diff["old_path"] is None
+    assert file_diff["additions"] == 3
+    assert file_diff["deletions"] == 2
+    assert file_diff["hunks"] == [
+        {
+            "old_start": 1,
+            "old_lines": 3,
+            "new_start": 1,
+            "new_lines": 3,
+            "section": "def handler():",
+        },
+        {"old_start": 10, "old_lines": 1, "new_start": 10, "new_lines": 2, "section": ""},
+    ]
+    assert file_diff["patch"] == output
+
+
+# Test added, deleted and binary files are split into their own entries
+def test_parse_diff_added_deleted_and_binary():
+    output = (
+        "diff --git a/new.py b/new.py\n"
+        "new file mode 100644\n"
+        "--- /dev/null\n"
+        "+++ b/new.py\n"
+        "@@ -0,0 +1 @@\n"
+        "+print('hi')\n"
+        "diff --git a/old.py b/old.py\n"
+        "deleted file mode 100644\n"
+        "--- a/old.py\n"
+        "+++ /dev/null\n"
+        "@@ -1 +0,0 @@\n"
+        "-print('bye')\n"
+        "diff --git a/logo.png b/logo.png\n"
+        "index 1111111..2222222 100644\n"
+        "Binary files a/logo.png and b/logo.png differ\n"
+    )
+
+    added, deleted, binary = parse_diff(output)
+
+    assert (added["file_path"], added["status"], added["additions"]) == ("new.py", "added", 1)
+    assert (deleted["file_path"], deleted["status"], deleted["deletions"]) == (
+        "old.py",
+        "deleted",
+        1,
+    )
+    assert binary["file_path"] == "logo.png"
+    assert binary["is_binary"] is True
+    assert binary["hunks"] == []
+
+
+# Test hunk lines that look like diff headers are counted as content, not parsed as headers
+def test_parse_diff_header_like_content():
+    output = (
+        "diff --git a/notes.txt b/notes.txt\n"
+        "--- a/notes.txt\n"
+        "+++ b/notes.txt\n"
+        "@@ -1 +1 @@\n"
+        "---- old rule\n"
+        "++++ new rule\n"
+    )
+
+    [file_diff] = parse_diff(output)
+
+    assert file_diff["file_path"] == "notes.txt"
+    assert (file_diff["additions"], file_diff["deletions"]) == (1, 1)
+
+
+# Test a pure rename keeps its similarity and source path, paths with spaces or quotes included
+def test_parse_diff_rename_with_special_paths():
+    output = (
+        'diff --git "a/docs/my \\"guide\\".md" "b/docs/new guide.md"\n'
+        "similarity index 100%\n"
+        'rename from "docs/my \\"guide\\".md"\n'
+        "rename to docs/new guide.md\n"
+    )
+
+    [file_diff] = parse_diff(output)
+
+    assert file_diff["file_path"] == "docs/new guide.md"
+    assert file_diff["old_path"] == 'docs/my "guide".md'
+    assert file_diff["status"] == "renamed"
+    assert file_diff["similarity"] == 100
+
+
+# =========== is_generated Tests ===========
+
+
+# Helper to parse the diff of a file added with the given lines
+def _added_file(file_path: str, lines: list[str]) -> dict:
+    body = "".join(f"+{line}\n" for line in lines)
+    [file_diff] = parse_diff(
+        f"diff --git a/{file_path} b/{file_path}\n"
+        "new file mode 100644\n"
+        "--- /dev/null\n"
+        f"+++ b/{file_path}\n"
+        f"@@ -0,0 +1,{len(lines)} @@\n{body}"
+    )
+    return file_diff
+
+
+# Test lock files, bundles, compiled protos and vendored code are detected from their path
+@pytest.mark.parametrize(
+    "file_path",
+    ["poetry.lock", "web/package-lock.json", "static/app.min.js", "api/user_pb2.py", "vendor/x.go"],
+)
+def test_is_generated_by_path(file_path):
+    assert is_generated(_added_file(file_path, ["x = 1"])) is True
+
+
+# Test a generator marker at the top of a file and minified lines are detected
+def test_is_generated_by_content():
+    marked = _added_file("src/client.py", ["# Code generated by protoc. DO NOT EDIT.", "x = 1"])
+    minified = _added_file("static/bundle.js", ["var a=1;" * 200])
+
+    assert is_generated(marked) is True
+    assert is_generated(minified) is True
+
+
+# Test handwritten code is not flagged, even when it mentions a marker further down
+def test_is_generated_handwritten_code():
+    lines = ["import os", "", "def main():", "    pass", "", "", "# this is not @generated"]
+
+    assert is_generated(_added_file("src/main.py", lines)) is False
+
+
+# Test only the generator conventions are taken as markers, not a comment asking not to edit
+def test_is_generated_anchored_markers():
+    facebook = _added_file("src/schema.js", ["/**", " * @generated SignedSource<<abc>>", " */"])
+    notes = _added_file("src/settings.py", ["# Do not edit without a review", "x = 1"])
+    autogen = _added_file("src/models.py", ["# Models are autogenerated from here", "x = 1"])
+
+    assert is_generated(facebook) is True
+    assert is_generated(notes) is False
+    assert is_generated(autogen) is False
+
+
+# =========== summarise_patch Tests ===========
+
+
+# Test a patch within the caps is returned unchanged
+def test_summarise_patch_within_caps():
+    file_diff = _added_file("src/main.py", ["x = 1", "y = 2"])
+
+    assert summarise_patch(file_diff, 10_000, 100) == file_diff["patch"]
+
+
+# Test an over limit patch keeps its first lines, the totals and the headers of the cut hunks
+def test_summarise_patch_over_caps():
+    hunks = "".join(
+        f"@@ -{i * 10},1 +{i * 10},1 @@ def f{i}():\n-old {i}\n+new {i}\n" for i in range(50)
+    )
+    [file_diff] = parse_diff("diff --git a/big.py b/big.py\n--- a/big.py\n+++ b/big.py\n" + hunks)
+
+    summary = summarise_patch(file_diff, 10_000, 9)
+
+    lines = summary.split("\n")
+    assert lines[:9] == file_diff["patch"].split("\n")[:9]
+    assert "+50 -50 lines in total and 48 more hunk(s) not shown" in summary
+    assert "@@ -20,1 +20,1 @@ def f2():" in summary
+    assert "@@ -490,1 +490,1 @@ def f49():" not in summary
+
+
+# =========== diff_commits Tests ===========
+
+
+# Test a PR is diffed in one call with renames detected and non-ASCII paths kept readable
+@pytest.mark.asyncio
+async def test_diff_commits_detects_renames(tmp_path):
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "módulo.py").write_text("".join(f"line {i}\n" for i in range(20)))
+    (tmp_path / "keep.py").write_text("a = 1\n")
+    base = _commit(tmp_path, "base")
+
+    (tmp_path / "módulo.py").rename(tmp_path / "renamed.py")
+    (tmp_path / "keep.py").write_text("a = 2\n")
+    (tmp_path / "added.md").write_text("# New\n")
+    head = _commit(tmp_path, "head")
+
+    file_diffs = {d["file_path"]: d for d in await diff_commits(tmp_path, base, head)}
+
+    assert set(file_diffs) == {"renamed.py", "keep.py", "added.md"}
+    assert file_diffs["renamed.py"]["status"] == "renamed"
+    assert file_diffs["renamed.py"]["old_path"] == "módulo.py"
+    assert file_diffs["keep.py"]["hunks"][0]["new_start"] == 1
+    assert "+a = 2\n" in file_diffs["keep.py"]["patch"]
+    assert file_diffs["added.md"]["status"] == "added"
+
+
+# Test only the PR's own changes are diffed when its base branch moved on since it forked
+@pytest.mark.asyncio
+async def test_diff_commits_from_merge_base(tmp_path):
+    _git(tmp_path, "init", "-q", "-b", "main")
+    (tmp_path / "shared.py").write_text("x = 1\n")
+    _commit(tmp_path, "init")
+
+    _git(tmp_path, "checkout", "-q", "-b", "feature")
+    (tmp_path / "feature.py").write_text("y = 1\n")
+    head = _commit(tmp_path, "feature")
+
+    _git(tmp_path, "checkout", "-q", "main")
+    (tmp_path / "main_only.py").write_text("z = 1\n")
+    base = _commit(tmp_path, "main moved on")
+
+    file_diffs = await diff_commits(tmp_path, base, head)
+
+    assert [d["file_path"] for d in file_diffs] == ["feature.py"]
+
+
+# Test a git failure is raised instead of returning an empty diff
+@pytest.mark.asyncio
+async def test_diff_commits_unknown_commit(tmp_path):
+    _git(tmp_path, "init", "-q")
+
+    with pytest.raises(RuntimeError, match="Git diff failed"):
+        await diff_commits(tmp_path, "0" * 40, "1" * 40)
+
+
+# Test binary and generated files get no patch, and the other patches are summarised, even
+# those over the line cap
+@pytest.mark.asyncio
+async def test_diff_commits_patches_only_readable_files(tmp_path):
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "logo.png").write_bytes(b"\x00\x01")
+    (tmp_path / "app.py").write_text("a = 1\n")
+    base = _commit(tmp_path, "base")
+
+    (tmp_path / "logo.png").write_bytes(b"\x00\x02")
+    (tmp_path / "app.py").write_text("".join(f"a = {i}\n" for i in range(8)))
+    (tmp_path / "poetry.lock").write_text("lock\n")
+    (tmp_path / "big.py").write_text("".join(f"b = {i}\n" for i in range(50)))
+    head = _commit(tmp_path, "head")
+
+    with patch("app.services.git_service.diff.settings") as mock_settings:
+        mock_settings.MAX_DIFF_LINES = 20
+        mock_settings.MAX_DIFF_BYTES = 100
+        file_diffs = {d["file_path"]: d for d in await diff_commits(tmp_path, base, head)}
+
+    assert set(file_diffs) == {"logo.png", "app.py", "poetry.lock", "big.py"}
+    assert file_diffs["logo.png"]["is_binary"] is True
+    assert file_diffs["logo.png"]["patch"] is None
+    assert file_diffs["poetry.lock"]["patch"] is None
+    assert (file_diffs["big.py"]["status"], file_diffs["big.py"]["additions"]) == ("added", 50)
+    assert "diff truncated, +50 -0 lines in total" in file_diffs["big.py"]["patch"]
+    assert "diff truncated, +7 -0 lines in total" in file_diffs["app.py"]["patch"]
+    assert file_diffs["app.py"]["hunks"][0]["new_start"] == 1
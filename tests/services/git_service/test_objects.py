@@ -0,0 +1,122 @@
+import subprocess
+
+import pytest
+
+from app.services.git_service.objects import list_files, read_blob_sizes, read_blobs, split_by_size
+
+# =========== Fixtures ===========
+
+
+# Creates a repo with one commit holding text, binary and nested files
+@pytest.fixture
+def repo(tmp_path):
+    (tmp_path / "docs" / "guide").mkdir(parents=True)
+    (tmp_path / "docs" / "index.md").write_text("# Index\n")
+    (tmp_path / "docs" / "guide" / "setup.md").write_text("Setup — naïve ünïcode\n")
+    (tmp_path / "app.py").write_text("def main():\n    pass\n")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff\xfe")
+
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    subprocess.run(["git", "-C", str(tmp_path), "add", "-A"], check=True)
+    subprocess.run(
+        ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+        + ["commit", "-q", "-m", "init"],
+        check=True,
+    )
+    head = subprocess.run(
+        ["git", "-C", str(tmp_path), "rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    return tmp_path, head
+
+
+# =========== read_blobs Tests ===========
+
+
+# Test files are read from the commit even after the working tree changed
+@pytest.mark.asyncio
+async def test_read_blobs_reads_commit_contents(repo):
+    repo_path, head = repo
+    (repo_path / "app.py").write_text("changed on disk\n")
+
+    blobs = await read_blobs(repo_path, head, ["app.py", "docs/guide/setup.md", "docs/index.md"])
+
+    assert blobs == {
+        "app.py": "def main():\n    pass\n",
+        "docs/guide/setup.md": "Setup — naïve ünïcode\n",
+        "docs/index.md": "# Index\n",
+    }
+
+
+# Test missing files, directories and binary files map to None without losing the others
+@pytest.mark.asyncio
+async def test_read_blobs_missing_and_binary(repo):
+    repo_path, head = repo
+
+    blobs = await read_blobs(repo_path, head, ["gone.py", "docs", "logo.png", "app.py"])
+
+    assert blobs["gone.py"] is None
+    assert blobs["docs"] is None
+    assert blobs["logo.png"] is None
+    assert blobs["app.py"] == "def main():\n    pass\n"
+
+
+# Test an unknown commit maps every path to None
+@pytest.mark.asyncio
+async def test_read_blobs_unknown_commit(repo):
+    repo_path, _ = repo
+
+    assert await read_blobs(repo_path, "0" * 40, ["app.py"]) == {"app.py": None}
+
+
+# Test no git process is spawned when there is nothing to read
+@pytest.mark.asyncio
+async def test_read_blobs_empty():
+    assert await read_blobs("/nonexistent", "HEAD", []) == {}
+
+
+# =========== read_blob_sizes Tests ===========
+
+
+# Test sizes are probed without reading the files, missing paths and directories map to None
+@pytest.mark.asyncio
+async def test_read_blob_sizes(repo):
+    repo_path, head = repo
+
+    sizes = await read_blob_sizes(repo_path, head, ["app.py", "logo.png", "gone.py", "docs"])
+
+    assert sizes == {"app.py": 21, "logo.png": 10, "gone.py": None, "docs": None}
+
+
+# Test files are split around the byte cap and missing files are left out of both lists
+@pytest.mark.asyncio
+async def test_split_by_size(repo):
+    repo_path, head = repo
+
+    within, over = await split_by_size(repo_path, head, ["app.py", "logo.png", "gone.py"], 15)
+
+    assert within == ["logo.png"]
+    assert over == ["app.py"]
+
+
+# =========== list_files Tests ===========
+
+
+# Test files are listed recursively under a directory of the commit
+@pytest.mark.asyncio
+async def test_list_files_under_directory(repo):
+    repo_path, head = repo
+
+    assert sorted(await list_files(repo_path, head, "docs")) == [
+        "docs/guide/setup.md",
+        "docs/index.md",
+    ]
+    assert len(await list_files(repo_path, head)) == 4
+
+
+# Test a missing directory or unknown commit lists nothing
+@pytest.mark.asyncio
+async def test_list_files_missing(repo):
+    repo_path, head = repo
+
+    assert await list_files(repo_path, head, "nonexistent") == []
+    assert await list_files(repo_path, "0" * 40) == []
@@ -0,0 +1,92 @@
+import subprocess
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.git_service.refs import fetch_refs, has_commits, merge_base
+
+# =========== has_commits Tests ===========
+
+
+# Test commits present in the clone are found without any fetch
+@pytest.mark.asyncio
+async def test_has_commits_finds_local_commits(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    subprocess.run(
+        ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+        + ["commit", "-q", "--allow-empty", "-m", "init"],
+        check=True,
+    )
+    head = subprocess.run(
+        ["git", "-C", str(tmp_path), "rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+
+    assert await has_commits(tmp_path, [head]) is True
+    assert await has_commits(tmp_path, [head, "0" * 40]) is False
+
+
+# =========== merge_base Tests ===========
+
+
+# Test the fork point is found after the base branch moved on, and unknown commits give None
+@pytest.mark.asyncio
+async def test_merge_base_finds_fork_point(tmp_path):
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    subprocess.run(git + ["commit", "-q", "--allow-empty", "-m", "fork"], check=True)
+    fork = subprocess.run(
+        git + ["rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    subprocess.run(git + ["commit", "-q", "--allow-empty", "-m", "base"], check=True)
+    base = subprocess.run(
+        git + ["rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    subprocess.run(git + ["checkout", "-q", "-b", "head", fork], check=True)
+    subprocess.run(git + ["commit", "-q", "--allow-empty", "-m", "head"], check=True)
+    head = subprocess.run(
+        git + ["rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+
+    assert await merge_base(tmp_path, base, head) == fork
+    assert await merge_base(tmp_path, base, "0" * 40) is None
+
+
+# =========== fetch_refs Tests ===========
+
+
+# Test the refspecs are fetched from the authenticated remote
+@pytest.mark.asyncio
+async def test_fetch_refs_fetches_refspecs():
+    mock_result = MagicMock(returncode=0)
+    refspecs = ["+refs/pull/*/head:refs/remotes/origin/pr/*"]
+
+    with (
+        patch("app.services.git_service.refs.run_git", return_value=mock_result) as mock_run,
+        patch("app.services.git_service.utils.settings") as mock_settings,
+        patch.object(Path, "exists", return_value=True),
+    ):
+        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
+
+        result = await fetch_refs("owner/repo", "tok", refspecs)
+
+    assert result is True
+    set_url_args = mock_run.call_args_list[0][0][0]
+    assert "x-access-token:tok@github.com/owner/repo.git" in set_url_args[-1]
+    assert mock_run.call_args_list[1][0][0] == ["fetch", "origin", *refspecs]
+
+
+# Test a failed fetch is reported as False instead of raising
+@pytest.mark.asyncio
+async def test_fetch_refs_failure():
+    def side_effect(args, *_, **__):
+        return MagicMock(returncode=1 if args[0] == "fetch" else 0, stderr="fatal")
+
+    with (
+        patch("app.services.git_service.refs.run_git", side_effect=side_effect),
+        patch("app.services.git_service.utils.settings") as mock_settings,
+        patch.object(Path, "exists", return_value=True),
+    ):
+        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
+
+        assert await fetch_refs("owner/repo", "tok", ["main"]) is False
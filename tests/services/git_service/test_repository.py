@@ -1,7 +1,9 @@
-import pytest
-from unittest.mock import MagicMock, patch
-from pathlib import Path
 import subprocess
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
 from app.services.git_service.repository import clone_repository, remove_cloned_repository
 
 # =========== clone_repository Tests ===========
@@ -20,7 +22,7 @@ async def test_clone_repository_success():
     mock_result.stderr = ""
 
     with (
-        patch("subprocess.run", return_value=mock_result) as mock_run,
+        patch("app.services.git_service.repository.run_git", return_value=mock_result) as mock_run,
         patch("pathlib.Path.mkdir") as mock_mkdir,
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -35,15 +37,14 @@ async def test_clone_repository_success():
         # Verify mkdir was called to create owner directory
         mock_mkdir.assert_called_once()
 
-        # Verify subprocess was called with correct git clone command
+        # Verify git was called with correct clone command
         mock_run.assert_called_once()
         args = mock_run.call_args[0][0]
-        assert args[0] == "git"
-        assert args[1] == "clone"
-        assert args[2] == "--branch"
-        assert args[3] == target_branch
-        assert "x-access-token" in args[4]
-        assert repo_full_name in args[4]
+        assert args[0] == "clone"
+        assert args[1] == "--branch"
+        assert args[2] == target_branch
+        assert "x-access-token" in args[3]
+        assert repo_full_name in args[3]
 
 
 # Test repository cloning with different branch
@@ -57,7 +58,7 @@ async def test_clone_repository_custom_branch():
     mock_result.returncode = 0
 
     with (
-        patch("subprocess.run", return_value=mock_result) as mock_run,
+        patch("app.services.git_service.repository.run_git", return_value=mock_result) as mock_run,
         patch("pathlib.Path.mkdir"),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -67,7 +68,7 @@ async def test_clone_repository_custom_branch():
 
         # Verify custom branch is used
         args = mock_run.call_args[0][0]
-        assert args[3] == "develop"
+        assert args[2] == "develop"
 
 
 # Test failure in repository cloning
@@ -82,7 +83,7 @@ async def test_clone_repository_failure():
     mock_result.stderr = "fatal: repository not found"
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.git_service.repository.run_git", return_value=mock_result),
         patch("pathlib.Path.mkdir"),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -102,7 +103,10 @@ async def test_clone_repository_timeout():
     target_branch = "main"
 
     with (
-        patch("subprocess.run", side_effect=subprocess.TimeoutExpired("git", 1000)),
+        patch(
+            "app.services.git_service.repository.run_git",
+            side_effect=subprocess.TimeoutExpired("git", 1000),
+        ),
         patch("pathlib.Path.mkdir"),
         patch("app.services.git_service.utils.settings") as mock_settings,
     ):
@@ -114,6 +118,27 @@ async def test_clone_repository_timeout():
         assert result is None
 
 
+# Test clone progress is requested from git and streamed to the callback
+@pytest.mark.asyncio
+async def test_clone_repository_streams_progress():
+    mock_result = MagicMock()
+    mock_result.returncode = 0
+    on_progress = MagicMock()
+
+    with (
+        patch("app.services.git_service.repository.run_git", return_value=mock_result) as mock_run,
+        patch("pathlib.Path.mkdir"),
+        patch("app.services.git_service.utils.settings") as mock_settings,
+    ):
+        mock_settings.REPOS_BASE_PATH = "/tmp/repos"
+
+        await clone_repository("owner/repo", "test_token", on_progress=on_progress)
+
+        args = mock_run.call_args[0][0]
+        assert args[:2] == ["clone", "--progress"]
+        assert mock_run.call_args.kwargs["on_output"] is on_progress
+
+
 # =========== remove_cloned_repository Tests ===========
 
 
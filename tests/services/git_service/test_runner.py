@@ -0,0 +1,164 @@
+import asyncio
+import subprocess
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.git_service.runner import run_git
+
+# =========== run_git Tests ===========
+
+
+# Test a git command runs in the repo and returns its decoded output
+@pytest.mark.asyncio
+async def test_run_git_returns_completed_process(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+
+    result = await run_git(["rev-parse", "--is-inside-work-tree"], tmp_path)
+
+    assert isinstance(result, subprocess.CompletedProcess)
+    assert result.returncode == 0
+    assert result.stdout.strip() == "true"
+    assert result.args[:3] == ["git", "-C", str(tmp_path)]
+
+
+# Test a failing git command reports its exit code and stderr instead of raising
+@pytest.mark.asyncio
+async def test_run_git_failure_returns_stderr(tmp_path):
+    result = await run_git(["rev-parse", "HEAD"], tmp_path)
+
+    assert result.returncode != 0
+    assert result.stderr
+
+
+# Test a command that exceeds its timeout is killed and raises TimeoutExpired
+@pytest.mark.asyncio
+async def test_run_git_timeout_kills_process():
+    async def hang(input=None):
+        await asyncio.sleep(10)
+
+    process = MagicMock()
+    process.communicate = hang
+    process.wait = AsyncMock()
+
+    with (
+        patch(
+            "app.services.git_service.runner.asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+            return_value=process,
+        ),
+        pytest.raises(subprocess.TimeoutExpired),
+    ):
+        await run_git(["fetch", "origin"], "/tmp/repo", timeout=0.01)
+
+    process.kill.assert_called_once()
+    process.wait.assert_awaited_once()
+
+
+# Test cancelling the awaiting task kills git instead of leaving it running
+@pytest.mark.asyncio
+async def test_run_git_cancel_kills_process():
+    started = asyncio.Event()
+
+    async def hang(input=None):
+        started.set()
+        await asyncio.sleep(10)
+
+    process = MagicMock()
+    process.communicate = hang
+    process.wait = AsyncMock()
+
+    with patch(
+        "app.services.git_service.runner.asyncio.create_subprocess_exec",
+        new_callable=AsyncMock,
+        return_value=process,
+    ):
+        task = asyncio.create_task(run_git(["status"], "/tmp/repo"))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    process.kill.assert_called_once()
+    process.wait.assert_awaited_once()
+
+
+# Test output lines are streamed to on_output, splitting progress updates on carriage returns
+@pytest.mark.asyncio
+async def test_run_git_streams_output_lines(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    lines = []
+
+    result = await run_git(["-c", "core.pager=cat", "var", "-l"], tmp_path, on_output=lines.append)
+
+    assert result.returncode == 0
+    assert lines == [line for line in result.stdout.splitlines() if line]
+    assert any(line.startswith("core.pager=") for line in lines)
+
+
+# Test network commands against the same host never exceed the concurrency limit
+@pytest.mark.asyncio
+async def test_run_git_limits_network_commands_per_host():
+    running = 0
+    peak = 0
+
+    async def fake_execute(cmd, timeout, on_output, input, text):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    with (
+        patch("app.services.git_service.runner._execute", side_effect=fake_execute),
+        patch("app.services.git_service.runner.settings") as mock_settings,
+    ):
+        mock_settings.GIT_MAX_CONCURRENT_PER_HOST = 2
+        await asyncio.gather(*(run_git(["fetch", "origin"], f"/tmp/repo{i}") for i in range(6)))
+
+    assert peak == 2
+
+
+# Test local commands are not throttled by the per host limit
+@pytest.mark.asyncio
+async def test_run_git_does_not_limit_local_commands():
+    running = 0
+    peak = 0
+
+    async def fake_execute(cmd, timeout, on_output, input, text):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    with (
+        patch("app.services.git_service.runner._execute", side_effect=fake_execute),
+        patch("app.services.git_service.runner.settings") as mock_settings,
+    ):
+        mock_settings.GIT_MAX_CONCURRENT_PER_HOST = 1
+        await asyncio.gather(
+            *(run_git(["-c", "user.name=x", "commit", "-m", "m"], "/tmp/repo") for _ in range(4))
+        )
+
+    assert peak == 4
+
+
+# Test stdin input is passed to git and text=False keeps the raw output bytes
+@pytest.mark.asyncio
+async def test_run_git_writes_input_and_returns_bytes(tmp_path):
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+
+    result = await run_git(["hash-object", "--stdin"], tmp_path, input=b"hello\n", text=False)
+
+    assert result.returncode == 0
+    assert result.stdout == b"ce013625030ba8dba906f756967f9e9ca394464a\n"
+
+
+# Test a command can't both read stdin and stream its output
+@pytest.mark.asyncio
+async def test_run_git_rejects_input_with_streaming():
+    with pytest.raises(ValueError):
+        await run_git(["cat-file", "--batch"], input=b"", on_output=print)
@@ -1,7 +1,12 @@
-import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from app.services.github_api import get_installation_access_token
 
+import pytest
+
+from app.services.github_api import (
+    auth,
+    forget_installation_access_token,
+    get_installation_access_token,
+)
 
 # =========== Fixtures ===========
 
@@ -31,6 +36,29 @@ def mock_jwt():
         yield mock
 
 
+# Auto clear the tokens cached by earlier tests
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    auth._token_cache.clear()
+    yield
+    auth._token_cache.clear()
+
+
+# Patches the GH client to mint the given tokens in turn, returns the mocked client
+def _mock_token_client(mock_client, *tokens, expires_at="2099-01-01T00:00:00Z"):
+    mock_client_instance = AsyncMock()
+    mock_client.return_value.__aenter__.return_value = mock_client_instance
+
+    responses = []
+    for token in tokens:
+        response = MagicMock()
+        response.status_code = 201
+        response.json.return_value = {"token": token, "expires_at": expires_at}
+        responses.append(response)
+    mock_client_instance.post.side_effect = responses
+    return mock_client_instance
+
+
 # =========== get_installation_access_token Tests ===========
 
 
@@ -70,3 +98,30 @@ async def test_get_installation_access_token_error():
         with pytest.raises(Exception) as exc:
             await get_installation_access_token(123)
         assert "Token Error" in str(exc.value)
+
+
+# Test that a token is reused for its installation instead of being minted on every call
+@pytest.mark.asyncio
+async def test_get_installation_access_token_cached():
+    with patch("app.services.github_api.auth.httpx.AsyncClient") as mock_client:
+        client = _mock_token_client(mock_client, "token_a", "token_b")
+
+        assert await get_installation_access_token(123) == "token_a"
+        assert await get_installation_access_token(123) == "token_a"
+        assert await get_installation_access_token(456) == "token_b"
+
+    assert client.post.await_count == 2
+
+
+# Test that a token close to its expiry or forgotten is minted again
+@pytest.mark.asyncio
+async def test_get_installation_access_token_expiring_or_forgotten():
+    with patch("app.services.github_api.auth.httpx.AsyncClient") as mock_client:
+        _mock_token_client(mock_client, "old", "new", "newer", expires_at="2000-01-01T00:00:00Z")
+
+        assert await get_installation_access_token(123) == "old"
+        assert await get_installation_access_token(123) == "new"
+
+        auth._token_cache[123] = ("long_lived", 4102444800.0)
+        forget_installation_access_token(123)
+        assert await get_installation_access_token(123) == "newer"
@@ -1,12 +1,13 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
-from unittest.mock import MagicMock, AsyncMock, patch
+
 from app.services.github_api import (
+    create_docs_pull_request,
     get_commit,
+    get_repo_details,
     request_pr_review,
-    create_docs_pull_request,
 )
-from app.services.github_api import get_repo_details
-
 
 # =========== get_repo_details Tests ===========
 
@@ -39,11 +40,47 @@ async def test_get_repo_details_success():
             result = await get_repo_details(123, "owner", "repo")
 
             # Verify extraction of the right fields
+            assert result is not None
             assert result["name"] == "repo-name"
             assert result["stargazers_count"] == 10
             mock_get_token.assert_awaited_once_with(123)
 
 
+# Test that the ETag of the last fetch is sent and a 304 is returned as None, over the given client
+@pytest.mark.asyncio
+async def test_get_repo_details_not_modified():
+    with patch(
+        "app.services.github_api.repos.get_installation_access_token", new_callable=AsyncMock
+    ) as mock_get_token:
+        mock_get_token.return_value = "mock_token"
+
+        client = AsyncMock()
+        client.get.return_value = MagicMock(status_code=304)
+
+        result = await get_repo_details(123, "owner", "repo", etag='W/"abc"', client=client)
+
+    assert result is None
+    assert client.get.await_args.kwargs["headers"]["If-None-Match"] == 'W/"abc"'
+
+
+# Test that a rejected token is dropped from the cache before the error is raised
+@pytest.mark.asyncio
+async def test_get_repo_details_unauthorized():
+    with (
+        patch(
+            "app.services.github_api.repos.get_installation_access_token", new_callable=AsyncMock
+        ),
+        patch("app.services.github_api.repos.forget_installation_access_token") as mock_forget,
+    ):
+        client = AsyncMock()
+        client.get.return_value = MagicMock(status_code=401, text="Bad credentials")
+
+        with pytest.raises(Exception, match="GitHub API Error"):
+            await get_repo_details(123, "owner", "repo", client=client)
+
+    mock_forget.assert_called_once_with(123)
+
+
 # =========== get_commit Tests ===========
 
 
@@ -1,9 +1,21 @@
-import pytest
 import uuid
-from unittest.mock import MagicMock, patch, AsyncMock
-from app.services.github_webhook import handle_github_event
-from app.models.installation import Installation
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
 from app.models.drift import DriftEvent
+from app.models.installation import Installation
+from app.services.github_webhook import handle_github_event
+
+# =========== Fixtures ===========
+
+
+# Replaces the Redis checkpoint cleanup so the handler tests don't need Redis
+@pytest.fixture(autouse=True)
+def mock_clear_checkpoint():
+    with patch("app.services.github_webhook.check_suite_handlers.clear_checkpoint") as mock_clear:
+        yield mock_clear
 
 
 # =========== Helper Functions ===========
@@ -37,6 +49,7 @@ async def test_check_suite_rerequested_resets_and_requeues():
     drift_event = MagicMock()
     drift_event.id = uuid.uuid4()
     drift_event.head_sha = "sha999"
+    drift_event.created_at = datetime(2026, 10, 1, tzinfo=UTC)
     mock_db = _make_check_suite_db(drift_event)
     payload = _make_check_suite_payload()
 
@@ -53,7 +66,9 @@ async def test_check_suite_rerequested_resets_and_requeues():
     mock_create_check_run.assert_called_once_with(
         mock_db, str(drift_event.id), "owner/repo", drift_event.head_sha, 100
     )
-    mock_task_queue.enqueue.assert_called_once_with(mock_run, str(drift_event.id))
+    mock_task_queue.enqueue.assert_called_once_with(
+        mock_run, str(drift_event.id), "2026-10-01T00:00:00+00:00"
+    )
 
 
 # Test that missing head_sha in payload causes early return without touching DB
@@ -106,7 +121,7 @@ async def test_check_suite_rerequested_no_drift_event_found():
 # Test that stale DriftFindings and CodeChanges are deleted before re-queuing
 @pytest.mark.asyncio
 async def test_check_suite_rerequested_clears_stale_findings_and_changes():
-    from app.models.drift import DriftFinding, CodeChange
+    from app.models.drift import CodeChange, DriftFinding
 
     drift_event = MagicMock()
     drift_event.id = uuid.uuid4()
@@ -168,6 +183,30 @@ async def test_check_suite_rerequested_resets_drift_event_fields():
     mock_db.flush.assert_called_once()
 
 
+# Test that the checkpoints of the previous run are cleared so the re-run starts from scratch
+@pytest.mark.asyncio
+async def test_check_suite_rerequested_clears_checkpoint(mock_clear_checkpoint):
+    drift_event = MagicMock()
+    drift_event.id = uuid.uuid4()
+    drift_event.head_sha = "sha999"
+    drift_event.retry_count = 2
+    mock_db = _make_check_suite_db(drift_event)
+    payload = _make_check_suite_payload()
+
+    with (
+        patch(
+            "app.services.github_webhook.check_suite_handlers.create_queued_check_run",
+            new_callable=AsyncMock,
+        ),
+        patch("app.services.github_webhook.check_suite_handlers.task_queue"),
+    ):
+        await handle_github_event(mock_db, "check_suite", payload)
+
+    mock_clear_checkpoint.assert_called_once()
+    assert mock_clear_checkpoint.call_args[0][1] == f"{drift_event.id}:sha999"
+    assert drift_event.retry_count == 0
+
+
 # Test that unrelated check_suite actions are ignored
 @pytest.mark.asyncio
 async def test_check_suite_non_rerequested_action_ignored():
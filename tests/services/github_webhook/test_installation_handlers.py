@@ -1,10 +1,11 @@
-import pytest
 import uuid
-from unittest.mock import MagicMock, patch, AsyncMock
-from app.services.github_webhook import handle_github_event
+from unittest.mock import MagicMock, patch
+
+import pytest
+
 from app.models.installation import Installation
 from app.models.repository import Repository
-
+from app.services.github_webhook import handle_github_event
 
 # =========== handle_installation Tests ===========
 
@@ -97,14 +98,7 @@ async def test_notification_on_installation_created():
     mock_db.query.return_value.filter.return_value.first.return_value = mock_user
 
     with (
-        patch(
-            "app.services.github_webhook.repository_handlers.get_installation_access_token",
-            new_callable=AsyncMock,
-        ),
-        patch(
-            "app.services.github_webhook.repository_handlers.clone_repository",
-            new_callable=AsyncMock,
-        ),
+        patch("app.services.github_webhook.repository_handlers.enqueue_clone"),
         patch(
             "app.services.github_webhook.installation_handlers.create_notification"
         ) as mock_notif,
@@ -143,14 +137,7 @@ async def test_notification_on_installation_created_singular_repo():
     mock_db.query.return_value.filter.return_value.first.return_value = mock_user
 
     with (
-        patch(
-            "app.services.github_webhook.repository_handlers.get_installation_access_token",
-            new_callable=AsyncMock,
-        ),
-        patch(
-            "app.services.github_webhook.repository_handlers.clone_repository",
-            new_callable=AsyncMock,
-        ),
+        patch("app.services.github_webhook.repository_handlers.enqueue_clone"),
         patch(
             "app.services.github_webhook.installation_handlers.create_notification"
         ) as mock_notif,
@@ -1,11 +1,14 @@
-import pytest
 import uuid
-from unittest.mock import MagicMock, patch, AsyncMock
-from app.services.github_webhook import handle_github_event
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import pytest
+
+from app.models.drift import DriftEvent
 from app.models.installation import Installation
 from app.models.repository import Repository
-from app.models.drift import DriftEvent
-
+from app.services.github_webhook import handle_github_event
+from app.services.repo_sync import sync_repository
 
 # =========== Helper Functions ===========
 
@@ -82,12 +85,14 @@ async def test_handle_pr_opened_success():
             new_callable=AsyncMock,
         ),
         patch("app.services.github_webhook.pr_handlers.create_notification"),
+        patch("app.services.github_webhook.pr_handlers.record_drift_event_created") as mock_record,
     ):
         await handle_github_event(mock_db, "pull_request", payload)
 
-    # Verify drift event was created with correct data
+    # Verify drift event was created with correct data and counted for the dashboard
     mock_db.query.assert_called()
     mock_db.add.assert_called_once()
+    mock_record.assert_called_once_with(mock_db, "uuid-123")
     args, _ = mock_db.add.call_args
     event = args[0]
     assert isinstance(event, DriftEvent)
@@ -264,8 +269,9 @@ async def test_pr_opened_enqueues_task():
 
         await handle_github_event(mock_db, "pull_request", payload)
 
-        # Verify task was enqueued with the drift event ID
-        mock_task_queue.enqueue.assert_called_once()
+        # Verify the repo sync and then the task were enqueued with the drift event ID
+        assert mock_task_queue.enqueue.call_count == 2
+        assert mock_task_queue.enqueue.call_args_list[0] == call(sync_repository, "uuid-123")
         args, _ = mock_task_queue.enqueue.call_args
         assert args[0] == mock_run_drift_analysis
 
@@ -376,6 +382,89 @@ async def test_pr_no_task_when_repo_deactivated():
         mock_task_queue.enqueue.assert_not_called()
 
 
+# Test that drift analysis is deferred while the repository is still being cloned
+@pytest.mark.asyncio
+@pytest.mark.parametrize("clone_status", ["pending", "cloning"])
+async def test_pr_opened_deferred_while_clone_pending(clone_status):
+    mock_db = MagicMock()
+    payload = {
+        "action": "opened",
+        "number": 123,
+        "installation": {"id": 100},
+        "repository": {"full_name": "owner/repo"},
+        "pull_request": {
+            "base": {"sha": "base123", "ref": "main"},
+            "head": {"sha": "head456", "ref": "feature-branch"},
+        },
+    }
+
+    mock_repo = MagicMock()
+    mock_repo.clone_status = clone_status
+    mock_db.query.return_value.filter.return_value.first.return_value = mock_repo
+
+    def capture_drift_event(obj):
+        if isinstance(obj, DriftEvent):
+            obj.id = uuid.uuid4()
+
+    mock_db.add.side_effect = capture_drift_event
+
+    with (
+        patch(
+            "app.services.github_webhook.pr_handlers.create_queued_check_run",
+            new_callable=AsyncMock,
+        ) as mock_check_run,
+        patch("app.services.github_webhook.pr_handlers.task_queue") as mock_task_queue,
+        patch("app.services.github_webhook.pr_handlers.create_notification"),
+    ):
+        await handle_github_event(mock_db, "pull_request", payload)
+
+    # The event and its queued check run exist, the clone job enqueues the analysis later
+    mock_db.add.assert_called_once()
+    mock_check_run.assert_called_once()
+    mock_task_queue.enqueue.assert_not_called()
+
+
+# Test that a PR on a repo whose clone was evicted re-clones it and defers the analysis
+@pytest.mark.asyncio
+async def test_pr_opened_rehydrates_evicted_clone():
+    mock_db = MagicMock()
+    payload = {
+        "action": "opened",
+        "number": 123,
+        "installation": {"id": 100},
+        "repository": {"full_name": "owner/repo"},
+        "pull_request": {
+            "base": {"sha": "base123", "ref": "main"},
+            "head": {"sha": "head456", "ref": "feature-branch"},
+        },
+    }
+
+    mock_repo = MagicMock()
+    mock_repo.clone_status = "evicted"
+    mock_db.query.return_value.filter.return_value.first.return_value = mock_repo
+
+    def capture_drift_event(obj):
+        if isinstance(obj, DriftEvent):
+            obj.id = uuid.uuid4()
+
+    mock_db.add.side_effect = capture_drift_event
+
+    with (
+        patch(
+            "app.services.github_webhook.pr_handlers.create_queued_check_run",
+            new_callable=AsyncMock,
+        ),
+        patch("app.services.github_webhook.pr_handlers.task_queue") as mock_task_queue,
+        patch("app.services.github_webhook.pr_handlers.create_notification"),
+        patch("app.services.repo_clone.enqueue_clone") as mock_enqueue_clone,
+    ):
+        await handle_github_event(mock_db, "pull_request", payload)
+
+    assert mock_repo.clone_status == "pending"
+    mock_enqueue_clone.assert_called_once_with(str(mock_repo.id))
+    mock_task_queue.enqueue.assert_not_called()
+
+
 # =========== GH Check Run Integration Tests ===========
 
 
@@ -426,6 +515,7 @@ async def test_pr_synchronize_resets_existing_event():
 
     drift_event = MagicMock()
     drift_event.id = uuid.uuid4()
+    drift_event.created_at = datetime(2026, 10, 1, tzinfo=UTC)
 
     mock_db = _make_sync_db(mock_repo, drift_event)
     payload = _make_sync_payload()
@@ -450,15 +540,18 @@ async def test_pr_synchronize_resets_existing_event():
     assert drift_event.check_run_id is None
     mock_db.flush.assert_called_once()
 
-    # Check run called and task enqueued
+    # Check run called, repo sync and task enqueued
     mock_check_run.assert_called_once()
-    mock_queue.enqueue.assert_called_once_with(mock_run, str(drift_event.id))
+    assert mock_queue.enqueue.call_args_list == [
+        call(sync_repository, str(mock_repo.id)),
+        call(mock_run, str(drift_event.id), "2026-10-01T00:00:00+00:00"),
+    ]
 
 
 # Test that stale findings and code changes are deleted on synchronize
 @pytest.mark.asyncio
 async def test_pr_synchronize_clears_stale_data():
-    from app.models.drift import DriftFinding, CodeChange
+    from app.models.drift import CodeChange, DriftFinding
 
     mock_repo = MagicMock()
     mock_repo.id = uuid.uuid4()
@@ -530,7 +623,7 @@ async def test_pr_synchronize_creates_new_event_if_none_exists():
     assert new_event.pr_number == 42
     assert new_event.base_sha == "newbase"
     assert new_event.head_sha == "newhead"
-    mock_queue.enqueue.assert_called_once()
+    assert mock_queue.enqueue.call_count == 2
 
 
 # Test that synchronize for a deactivated repo creates a skipped check run
@@ -655,6 +748,10 @@ async def test_pr_synchronize_docs_fix_merge_detected():
     assert existing_event.processing_phase == "fix_pr_merged"
     mock_success.assert_called_once()
 
+    # The merged docs PR is no longer counted as waiting on the dashboard
+    upsert = mock_db.execute.call_args[0][0]
+    assert upsert.table.name == "repo_drift_stats"
+
     # Returns early with no re-queuing
     mock_queue.enqueue.assert_not_called()
 
@@ -698,7 +795,7 @@ async def test_pr_synchronize_docs_fix_not_a_merge_commit_falls_through():
     # Re-queued for normal analysis
     assert existing_event.processing_phase == "queued"
     mock_check_run.assert_called_once()
-    mock_queue.enqueue.assert_called_once()
+    assert mock_queue.enqueue.call_count == 2
 
 
 # Test that a merge commit not mentioning the correct docs PR falls through
@@ -739,7 +836,7 @@ async def test_pr_synchronize_docs_fix_merge_wrong_pr_number_falls_through():
 
     # Re-queued for normal analysis
     assert existing_event.processing_phase == "queued"
-    mock_queue.enqueue.assert_called_once()
+    assert mock_queue.enqueue.call_count == 2
 
 
 # =========== Notification Tests ===========
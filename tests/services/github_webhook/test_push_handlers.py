@@ -0,0 +1,62 @@
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.github_webhook import handle_github_event
+from app.services.repo_sync import sync_repository
+
+# =========== Helper Functions ===========
+
+
+# Helper function to create a push payload
+def _make_push_payload(ref="refs/heads/main", repo_full_name="owner/repo", installation_id=100):
+    return {
+        "ref": ref,
+        "installation": {"id": installation_id},
+        "repository": {"full_name": repo_full_name},
+    }
+
+
+# Helper function that returns a mock db holding the given repo
+def _make_db(repo):
+    mock_db = MagicMock()
+    mock_db.query.return_value.filter.return_value.first.return_value = repo
+    return mock_db
+
+
+# =========== handle_push Tests ===========
+
+
+# Test that a push to the target branch enqueues a sync of the repo
+@pytest.mark.asyncio
+async def test_push_to_target_branch_enqueues_sync():
+    repo = MagicMock(id=uuid.uuid4(), is_active=True, target_branch="main")
+
+    with patch("app.services.github_webhook.push_handlers.task_queue") as mock_queue:
+        await handle_github_event(_make_db(repo), "push", _make_push_payload())
+
+    mock_queue.enqueue.assert_called_once_with(sync_repository, str(repo.id))
+
+
+# Test that pushes to other branches are ignored
+@pytest.mark.asyncio
+async def test_push_to_other_branch_is_ignored():
+    repo = MagicMock(id=uuid.uuid4(), is_active=True, target_branch="main")
+
+    with patch("app.services.github_webhook.push_handlers.task_queue") as mock_queue:
+        await handle_github_event(
+            _make_db(repo), "push", _make_push_payload(ref="refs/heads/feature")
+        )
+
+    mock_queue.enqueue.assert_not_called()
+
+
+# Test that pushes to deactivated or unknown repos are ignored
+@pytest.mark.asyncio
+@pytest.mark.parametrize("repo", [None, MagicMock(is_active=False, target_branch="main")])
+async def test_push_ignored_for_inactive_or_unknown_repo(repo):
+    with patch("app.services.github_webhook.push_handlers.task_queue") as mock_queue:
+        await handle_github_event(_make_db(repo), "push", _make_push_payload())
+
+    mock_queue.enqueue.assert_not_called()
@@ -1,8 +1,10 @@
-import pytest
 import uuid
-from unittest.mock import MagicMock, patch, AsyncMock
-from app.services.github_webhook import handle_github_event
+from unittest.mock import MagicMock, patch
+
+import pytest
+
 from app.models.repository import Repository
+from app.services.github_webhook import handle_github_event
 
 # =========== handle_repos Tests ===========
 
@@ -36,6 +38,27 @@ async def test_handle_repos_removed(mock_db_session):
     mock_db_session.query.return_value.filter.return_value.delete.assert_called_once()
 
 
+# Test that pending repos returned by the upsert are cloned in the background
+@pytest.mark.asyncio
+async def test_handle_repos_added_enqueues_pending_clones(mock_db_session):
+    pending_id, ready_id = uuid.uuid4(), uuid.uuid4()
+    mock_db_session.execute.return_value.all.return_value = [
+        (pending_id, "pending"),
+        (ready_id, "ready"),
+    ]
+    payload = {
+        "action": "added",
+        "installation": {"id": 123, "account": {"avatar_url": "http://avatar.url"}},
+        "repositories_added": [{"full_name": "test-org/new-repo"}, {"full_name": "test-org/old"}],
+    }
+
+    with patch("app.services.github_webhook.repository_handlers.enqueue_clone") as mock_enqueue:
+        await handle_github_event(mock_db_session, "installation_repositories", payload)
+
+    # Only the repo without a clone is enqueued, already cloned repos are left alone
+    mock_enqueue.assert_called_once_with(str(pending_id))
+
+
 # =========== Notification Tests ===========
 
 
@@ -55,25 +78,40 @@ async def test_notification_on_repos_added():
     mock_db.query.return_value.filter.return_value.first.return_value = mock_installation
 
     with (
-        patch(
-            "app.services.github_webhook.repository_handlers.get_installation_access_token",
-            new_callable=AsyncMock,
-        ),
-        patch(
-            "app.services.github_webhook.repository_handlers.clone_repository",
-            new_callable=AsyncMock,
-        ),
-        patch("app.services.github_webhook.repository_handlers.create_notification") as mock_notif,
+        patch("app.services.github_webhook.repository_handlers.enqueue_clone"),
+        patch("app.services.github_webhook.repository_handlers.create_notifications") as mock_notif,
     ):
         await handle_github_event(mock_db, "installation_repositories", payload)
 
     mock_notif.assert_called_once()
-    _, notif_user_id, content = mock_notif.call_args[0]
+    _, notif_user_id, [content] = mock_notif.call_args[0]
     assert notif_user_id == user_id
     assert "test-org/new-repo" in content
     assert "linked" in content
 
 
+# Test that linking many repos creates their notifications in one bulk call
+@pytest.mark.asyncio
+async def test_notifications_on_repos_added_are_bulk_created():
+    mock_db = MagicMock()
+    payload = {
+        "action": "added",
+        "installation": {"id": 123, "account": {"avatar_url": "http://avatar.url"}},
+        "repositories_added": [{"full_name": f"test-org/repo-{i}"} for i in range(3)],
+    }
+    mock_db.query.return_value.filter.return_value.first.return_value.user_id = uuid.uuid4()
+
+    with (
+        patch("app.services.github_webhook.repository_handlers.enqueue_clone"),
+        patch("app.services.github_webhook.repository_handlers.create_notifications") as mock_notif,
+    ):
+        await handle_github_event(mock_db, "installation_repositories", payload)
+
+    mock_notif.assert_called_once()
+    contents = mock_notif.call_args[0][2]
+    assert [f"test-org/repo-{i}" in content for i, content in enumerate(contents)] == [True] * 3
+
+
 # Test notification is sent when repos are unlinked from an installation
 @pytest.mark.asyncio
 async def test_notification_on_repos_removed():
@@ -91,12 +129,12 @@ async def test_notification_on_repos_removed():
 
     with (
         patch("app.services.github_webhook.repository_handlers.remove_cloned_repository"),
-        patch("app.services.github_webhook.repository_handlers.create_notification") as mock_notif,
+        patch("app.services.github_webhook.repository_handlers.create_notifications") as mock_notif,
     ):
         await handle_github_event(mock_db, "installation_repositories", payload)
 
     mock_notif.assert_called_once()
-    _, notif_user_id, content = mock_notif.call_args[0]
+    _, notif_user_id, [content] = mock_notif.call_args[0]
     assert notif_user_id == user_id
     assert "test-org/old-repo" in content
     assert "unlinked" in content
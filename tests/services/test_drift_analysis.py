@@ -1,11 +1,35 @@
-import pytest
+import asyncio
 import subprocess
-from unittest.mock import MagicMock, patch
+from datetime import UTC, datetime
 from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
 from uuid import uuid4
 
+import pytest
+
 from app.services.drift_analysis import _extract_and_save_code_changes, run_drift_analysis
 
+CREATED_AT = datetime(2026, 10, 1, tzinfo=UTC)
+
+
+# =========== Fixtures ===========
+
+
+# Replaces the Redis checkpointing with mocks. The graph has nothing to resume and node
+# retries are exhausted unless a test sets a lower failure count
+@pytest.fixture(autouse=True)
+def checkpointing():
+    graph = MagicMock()
+    graph.aget_state = AsyncMock()
+    graph.aget_state.return_value.next = ()
+    graph.ainvoke = AsyncMock()
+    with (
+        patch("app.services.drift_analysis._build_checkpointed_graph", return_value=graph),
+        patch("app.services.drift_analysis.clear_checkpoint") as mock_clear,
+        patch("app.services.drift_analysis.record_node_failure", return_value=4) as mock_failures,
+    ):
+        yield {"graph": graph, "clear_checkpoint": mock_clear, "record_node_failure": mock_failures}
+
 
 # =========== Helper Functions ===========
 
@@ -26,12 +50,32 @@ def _make_drift_event(
     return drift_event
 
 
+# Helper to build the parsed diff of a PR from "<status letter>\t<path>" lines
+def _file_diffs(name_status: str) -> list[dict]:
+    statuses = {"A": "added", "M": "modified", "D": "deleted", "R": "renamed"}
+    file_diffs = []
+    for line in name_status.splitlines():
+        status, file_path = line.split("\t")
+        file_diffs.append(
+            {
+                "file_path": file_path,
+                "old_path": "old/" + file_path if status == "R" else None,
+                "status": statuses[status],
+                "is_binary": False,
+                "hunks": [],
+                "patch": f"diff --git a/{file_path} b/{file_path}\n",
+            }
+        )
+    return file_diffs
+
+
 # Helper to set up a mock session with a drift event
 def _setup_run_mocks(drift_event_id=None, docs_root_path="/docs"):
     drift_event_id = drift_event_id or str(uuid4())
 
     drift_event = MagicMock()
     drift_event.id = drift_event_id
+    drift_event.created_at = CREATED_AT
     drift_event.repository.repo_name = "owner/repo"
     drift_event.repository.installation_id = 99
     drift_event.repository.docs_root_path = docs_root_path
@@ -39,7 +83,7 @@ def _setup_run_mocks(drift_event_id=None, docs_root_path="/docs"):
     drift_event.check_run_id = 12345
     drift_event.processing_phase = "queued"
     drift_event.drift_result = "pending"
-    drift_event.retry_count = 3  # Setting to 3 directly to prevent retries in error-path tests
+    drift_event.retry_count = 3  # Node retries are exhausted by default (see checkpointing)
 
     session = MagicMock()
     session.query.return_value.filter.return_value.first.return_value = drift_event
@@ -53,9 +97,10 @@ def _setup_failure_mocks(check_run_id=12345):
 
     drift_event = MagicMock()
     drift_event.id = drift_event_id
+    drift_event.created_at = CREATED_AT
     drift_event.pr_number = 42
     drift_event.check_run_id = check_run_id
-    drift_event.retry_count = 3  # Setting as 3 to triggers the final failure path
+    drift_event.retry_count = 3  # Node retries are exhausted by default (see checkpointing)
     drift_event.repository.repo_name = "owner/repo"
     drift_event.repository.installation_id = 99
     drift_event.repository.docs_root_path = "/docs"
@@ -74,6 +119,7 @@ def _setup_retry_mocks(retry_count=0):
 
     drift_event = MagicMock()
     drift_event.id = drift_event_id
+    drift_event.created_at = CREATED_AT
     drift_event.pr_number = 42
     drift_event.check_run_id = 12345
     drift_event.retry_count = retry_count
@@ -93,24 +139,21 @@ def _setup_retry_mocks(retry_count=0):
 
 
 # Test extracting code changes with added, modified, and deleted files
-def test_extract_and_save_code_changes_success():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_success():
     drift_event = _make_drift_event()
     session = MagicMock()
 
     # 3 Changed Files
-    git_diff_output = "A\tsrc/new_file.py\nM\tsrc/existing.py\nD\tsrc/removed.py\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("A\tsrc/new_file.py\nM\tsrc/existing.py\nD\tsrc/removed.py\n")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
     # This should add 3 CodeChange records
     assert session.add.call_count == 3
@@ -123,24 +166,21 @@ def test_extract_and_save_code_changes_success():
 
 
 # Test code vs non code file detection in code changes
-def test_extract_and_save_code_changes_is_code_detection():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_is_code_detection():
     drift_event = _make_drift_event()
     session = MagicMock()
 
     # 4 Changed Files with different types
-    git_diff_output = "A\tsrc/main.py\nA\tREADME.md\nA\timage.png\nA\tsrc/utils.js\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("A\tsrc/main.py\nA\tREADME.md\nA\timage.png\nA\tsrc/utils.js\n")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
     assert session.add.call_count == 4
 
@@ -153,29 +193,52 @@ def test_extract_and_save_code_changes_is_code_detection():
     assert is_code_flags["src/utils.js"] is True
 
 
-# Test with empty git diff output (no changes should be detected)
-def test_extract_and_save_code_changes_empty_diff():
+# Test binary and generated files are not flagged as code
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_binary_and_generated_not_code():
     drift_event = _make_drift_event()
     session = MagicMock()
 
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = ""
+    file_diffs = _file_diffs("M\tsrc/main.py\nM\tassets/logo.bin\nM\tpoetry.lock")
+    file_diffs[1]["is_binary"] = True
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
+
+    added_changes = [c.args[0] for c in session.add.call_args_list]
+    assert {c.file_path: c.is_code for c in added_changes} == {
+        "src/main.py": True,
+        "assets/logo.bin": False,
+        "poetry.lock": False,
+    }
+
+
+# Test with empty git diff output (no changes should be detected)
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_empty_diff():
+    drift_event = _make_drift_event()
+    session = MagicMock()
+
+    with (
+        patch("app.services.drift_analysis.diff_commits", return_value=[]),
+        patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
+    ):
+        mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
+
+        await _extract_and_save_code_changes(session, drift_event)
 
     session.add.assert_not_called()
     session.commit.assert_called_once()
 
 
 # Test raises exception when local repository doesn't exist
-def test_extract_and_save_code_changes_repo_not_found():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_repo_not_found():
     drift_event = _make_drift_event()
     session = MagicMock()
 
@@ -183,138 +246,125 @@ def test_extract_and_save_code_changes_repo_not_found():
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=False))
 
         with pytest.raises(Exception, match="Local repository not found"):
-            _extract_and_save_code_changes(session, drift_event)
+            await _extract_and_save_code_changes(session, drift_event)
 
 
 # Test raises exception when git diff command fails
-def test_extract_and_save_code_changes_git_diff_failure():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_git_diff_failure():
     drift_event = _make_drift_event()
     session = MagicMock()
 
-    mock_result = MagicMock()
-    mock_result.returncode = 1
-    mock_result.stderr = "fatal: bad revision"
-
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch(
+            "app.services.drift_analysis.diff_commits",
+            side_effect=RuntimeError("Git diff failed: fatal: bad revision"),
+        ),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
         with pytest.raises(Exception, match="Git diff failed"):
-            _extract_and_save_code_changes(session, drift_event)
+            await _extract_and_save_code_changes(session, drift_event)
 
     session.rollback.assert_called_once()
 
 
 # Test raises exception on subprocess timeout
-def test_extract_and_save_code_changes_timeout():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_timeout():
     drift_event = _make_drift_event()
     session = MagicMock()
 
     with (
-        patch("subprocess.run", side_effect=subprocess.TimeoutExpired("git", 60)),
+        patch(
+            "app.services.drift_analysis.diff_commits",
+            side_effect=subprocess.TimeoutExpired("git", 120),
+        ),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
         with pytest.raises(Exception, match="Timeout while extracting code changes"):
-            _extract_and_save_code_changes(session, drift_event)
+            await _extract_and_save_code_changes(session, drift_event)
 
 
-# Test unknown git status code defaults to "modified"
-def test_extract_and_save_code_changes_unknown_status():
+# Test renamed files are recorded as modifications of their new path
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_rename_recorded_as_modified():
     drift_event = _make_drift_event()
     session = MagicMock()
 
-    git_diff_output = "R\tsrc/renamed.py\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("R\tsrc/renamed.py\n")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
     added_change = session.add.call_args_list[0].args[0]
+    assert added_change.file_path == "src/renamed.py"
     assert added_change.change_type == "modified"
 
 
-# Test malformed git diff line (insufficient parts) is skipped
-def test_extract_and_save_code_changes_skips_malformed_lines():
+# Test the parsed diff is returned so the graph reads the hunks without diffing again
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_returns_file_diffs():
     drift_event = _make_drift_event()
     session = MagicMock()
 
-    git_diff_output = "A\tsrc/valid.py\nmalformed_line\n\nA\tsrc/other.py\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("A\tsrc/valid.py\nA\tsrc/other.py")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        result = await _extract_and_save_code_changes(session, drift_event)
 
-    # Only 2 valid lines should produce CodeChange records
+    assert result is file_diffs
     assert session.add.call_count == 2
 
 
-# Test that correct git command is constructed with base and head SHAs
-def test_extract_and_save_code_changes_correct_git_command():
+# Test that the PR is diffed once between its base and head SHAs
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_diffs_base_and_head():
     drift_event = _make_drift_event(
         base_sha="sha_base", head_sha="sha_head", repo_name="org/project"
     )
     session = MagicMock()
 
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = ""
-
     with (
-        patch("subprocess.run", return_value=mock_result) as mock_run,
+        patch("app.services.drift_analysis.diff_commits", return_value=[]) as mock_diff,
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_repo_path = MagicMock(spec=Path, exists=MagicMock(return_value=True))
         mock_path.return_value = mock_repo_path
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
-    args = mock_run.call_args[0][0]
-    assert args[0] == "git"
-    assert args[1] == "-C"
-    assert args[2] == str(mock_repo_path)
-    assert args[3] == "diff"
-    assert args[4] == "--name-status"
-    assert args[5] == "sha_base...sha_head"
+    mock_diff.assert_awaited_once_with(mock_repo_path, "sha_base", "sha_head")
 
 
 # Test files matching an ignore pattern are saved with is_ignored=True
-def test_extract_and_save_code_changes_ignores_pattern_match():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_ignores_pattern_match():
     drift_event = _make_drift_event(file_ignore_patterns=["tests/*", "*.lock"])
     session = MagicMock()
 
-    git_diff_output = "A\tsrc/main.py\nA\ttests/test_main.py\nA\tpoetry.lock\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("A\tsrc/main.py\nA\ttests/test_main.py\nA\tpoetry.lock\n")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
     added_changes = [c.args[0] for c in session.add.call_args_list]
     is_ignored_flags = {c.file_path: c.is_ignored for c in added_changes}
@@ -325,69 +375,60 @@ def test_extract_and_save_code_changes_ignores_pattern_match():
 
 
 # Test files not matching any pattern are saved with is_ignored=False
-def test_extract_and_save_code_changes_no_match_not_ignored():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_no_match_not_ignored():
     drift_event = _make_drift_event(file_ignore_patterns=["migrations/*"])
     session = MagicMock()
 
-    git_diff_output = "M\tsrc/api.py\nM\tsrc/models.py\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("M\tsrc/api.py\nM\tsrc/models.py\n")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
     added_changes = [c.args[0] for c in session.add.call_args_list]
     assert all(c.is_ignored is False for c in added_changes)
 
 
 # Test with no ignore patterns set (None), all files should be is_ignored=False
-def test_extract_and_save_code_changes_no_ignore_patterns():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_no_ignore_patterns():
     drift_event = _make_drift_event(file_ignore_patterns=None)
     session = MagicMock()
 
-    git_diff_output = "A\tsrc/app.py\nA\ttests/test_app.py\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("A\tsrc/app.py\nA\ttests/test_app.py\n")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
     added_changes = [c.args[0] for c in session.add.call_args_list]
     assert all(c.is_ignored is False for c in added_changes)
 
 
 # Test wildcard pattern matching (e.g. *.cfg and directory prefix patterns)
-def test_extract_and_save_code_changes_wildcard_pattern():
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_wildcard_pattern():
     drift_event = _make_drift_event(file_ignore_patterns=["*.cfg", "config/*"])
     session = MagicMock()
 
-    git_diff_output = "M\tsetup.cfg\nM\tconfig/settings.py\nM\tsrc/service.py\n"
-
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = git_diff_output
+    file_diffs = _file_diffs("M\tsetup.cfg\nM\tconfig/settings.py\nM\tsrc/service.py\n")
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=file_diffs),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
 
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
     added_changes = [c.args[0] for c in session.add.call_args_list]
     is_ignored_flags = {c.file_path: c.is_ignored for c in added_changes}
@@ -414,6 +455,7 @@ def _make_drift_event_with_branches(
     drift_event.head_sha = "head456"
     drift_event.base_branch = base_branch
     drift_event.head_branch = head_branch
+    drift_event.pr_number = 42
     drift_event.repository.repo_name = repo_name
     drift_event.repository.installation_id = installation_id
     drift_event.repository.target_branch = target_branch
@@ -421,8 +463,9 @@ def _make_drift_event_with_branches(
     return drift_event
 
 
-# Test that pull_branches is called when base_branch matches the target_branch
-def test_extract_and_save_code_changes_pulls_when_base_matches_target():
+# Test that the PR commits are ensured locally and checked out when base_branch matches the target_branch
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_ensures_commits_when_base_matches_target():
     drift_event = _make_drift_event_with_branches(base_branch="main", target_branch="main")
     session = MagicMock()
 
@@ -431,28 +474,27 @@ def test_extract_and_save_code_changes_pulls_when_base_matches_target():
     mock_result.stdout = ""
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.run_git", return_value=mock_result) as mock_run,
+        patch("app.services.drift_analysis.diff_commits", return_value=[]),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
         patch(
-            "app.services.drift_analysis.get_installation_access_token",
-            new_callable=MagicMock,
-            return_value="tok",
-        ),
-        patch(
-            "app.services.drift_analysis.pull_branches",
-            new_callable=MagicMock,
-            return_value=True,
-        ) as mock_pull,
-        patch("asyncio.run", side_effect=lambda coro: coro),
+            "app.services.drift_analysis.ensure_pr_commits", new_callable=AsyncMock
+        ) as mock_ensure,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
+
+    mock_ensure.assert_called_once_with("owner/repo", 99, "main", 42, ["base123", "head456"])
 
-    mock_pull.assert_called_once_with("owner/repo", "tok", ["main", "feature"])
+    # No fetch on the critical path and nothing is checked out, the diff is read from the commits
+    commands = [c[0][0] for c in mock_run.call_args_list]
+    assert not any("fetch" in command for command in commands)
+    assert not any("checkout" in command for command in commands)
 
 
-# Test that pull_branches is NOT called when base_branch does not match target_branch
-def test_extract_and_save_code_changes_skips_pull_when_base_not_target():
+# Test that commits are NOT fetched when base_branch does not match target_branch
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_skips_fetch_when_base_not_target():
     drift_event = _make_drift_event_with_branches(base_branch="develop", target_branch="main")
     session = MagicMock()
 
@@ -461,19 +503,22 @@ def test_extract_and_save_code_changes_skips_pull_when_base_not_target():
     mock_result.stdout = ""
 
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.run_git", return_value=mock_result),
+        patch("app.services.drift_analysis.diff_commits", return_value=[]),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
-        patch("app.services.drift_analysis.pull_branches", new_callable=MagicMock) as mock_pull,
-        patch("app.services.drift_analysis.get_installation_access_token", new_callable=MagicMock),
+        patch(
+            "app.services.drift_analysis.ensure_pr_commits", new_callable=AsyncMock
+        ) as mock_ensure,
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
-    mock_pull.assert_not_called()
+    mock_ensure.assert_not_called()
 
 
-# Test that plain fetch is used as fallback when authenticated pull fails
-def test_extract_and_save_code_changes_falls_back_to_plain_fetch():
+# Test that plain fetch is used as fallback when the authenticated fetch fails
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_falls_back_to_plain_fetch():
     drift_event = _make_drift_event_with_branches(base_branch="main", target_branch="main")
     session = MagicMock()
 
@@ -481,56 +526,46 @@ def test_extract_and_save_code_changes_falls_back_to_plain_fetch():
     diff_result.returncode = 0
     diff_result.stdout = ""
 
-    call_count = [0]
-
-    def subprocess_side_effect(*args, **kwargs):
-        call_count[0] += 1
-        # First subprocess.run call is the plain fetch fallback
-        if call_count[0] == 1:
-            return MagicMock(returncode=0)
-        # Second is the git diff
-        return diff_result
-
     with (
-        patch("subprocess.run", side_effect=subprocess_side_effect) as mock_run,
+        patch("app.services.drift_analysis.run_git", return_value=diff_result) as mock_run,
+        patch("app.services.drift_analysis.diff_commits", return_value=[]),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
         patch(
-            "app.services.drift_analysis.get_installation_access_token",
-            new_callable=MagicMock,
+            "app.services.drift_analysis.ensure_pr_commits",
+            new_callable=AsyncMock,
             side_effect=Exception("auth failed"),
         ),
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
-    # First subprocess call should be the plain fetch fallback
+    # First git call should be the plain fetch fallback
     first_call_args = mock_run.call_args_list[0][0][0]
-    assert "fetch" in first_call_args
-    assert "origin" in first_call_args
+    assert first_call_args == ["fetch", "origin"]
 
 
-# Test that git diff still runs and saves changes even when pull fails with fallback
-def test_extract_and_save_code_changes_continues_after_pull_failure():
+# Test that git diff still runs and saves changes even when the fetch fails with fallback
+@pytest.mark.asyncio
+async def test_extract_and_save_code_changes_continues_after_fetch_failure():
     drift_event = _make_drift_event_with_branches(base_branch="main", target_branch="main")
     session = MagicMock()
 
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = "A\tsrc/app.py\n"
-
     with (
-        patch("subprocess.run", return_value=mock_result),
+        patch("app.services.drift_analysis.run_git", return_value=MagicMock(returncode=0)),
+        patch(
+            "app.services.drift_analysis.diff_commits", return_value=_file_diffs("A\tsrc/app.py")
+        ),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
         patch(
-            "app.services.drift_analysis.get_installation_access_token",
-            new_callable=MagicMock,
+            "app.services.drift_analysis.ensure_pr_commits",
+            new_callable=AsyncMock,
             side_effect=Exception("auth failed"),
         ),
     ):
         mock_path.return_value = MagicMock(spec=Path, exists=MagicMock(return_value=True))
-        _extract_and_save_code_changes(session, drift_event)
+        await _extract_and_save_code_changes(session, drift_event)
 
-    # Code change should still be saved despite pull failure
+    # Code change should still be saved despite fetch failure
     assert session.add.call_count == 1
     session.commit.assert_called_once()
 
@@ -559,16 +594,17 @@ def test_run_drift_analysis_session_closed_on_error():
             "app.services.drift_analysis.get_local_repo_path",
             side_effect=RuntimeError("boom"),
         ),
+        pytest.raises(RuntimeError),
     ):
-        with pytest.raises(RuntimeError):
-            run_drift_analysis(str(drift_event.id))
+        run_drift_analysis(str(drift_event.id))
 
     session.rollback.assert_called_once()
     session.close.assert_called_once()
 
 
 # Test run_drift_analysis sets analyzing phase
-def test_run_drift_analysis_sets_analyzing_phase():
+def test_run_drift_analysis_sets_analyzing_phase(checkpointing):
+    mock_graph = checkpointing["graph"]
     session, drift_event = _setup_run_mocks()
     phase_at_commit = []
 
@@ -584,10 +620,9 @@ def test_run_drift_analysis_sets_analyzing_phase():
         patch("app.services.drift_analysis._create_session", return_value=session),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
         patch("app.services.drift_analysis._extract_and_save_code_changes"),
-        patch("app.services.drift_analysis.drift_analysis_graph") as mock_graph,
     ):
         mock_path.return_value = Path("/repos/owner/repo")
-        mock_graph.invoke.return_value = {"change_elements": [], "findings": []}
+        mock_graph.ainvoke.return_value = {"change_elements": [], "findings": []}
 
         run_drift_analysis(str(drift_event.id))
 
@@ -596,7 +631,8 @@ def test_run_drift_analysis_sets_analyzing_phase():
 
 
 # Test run_drift_analysis builds initial state with correct values
-def test_run_drift_analysis_builds_initial_state():
+def test_run_drift_analysis_builds_initial_state(checkpointing):
+    mock_graph = checkpointing["graph"]
     session, drift_event = _setup_run_mocks(docs_root_path="/documentation")
     drift_event.id = "test-event-id"
     drift_event.base_sha = "base123"
@@ -605,11 +641,13 @@ def test_run_drift_analysis_builds_initial_state():
     with (
         patch("app.services.drift_analysis._create_session", return_value=session),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
-        patch("app.services.drift_analysis._extract_and_save_code_changes"),
-        patch("app.services.drift_analysis.drift_analysis_graph") as mock_graph,
+        patch(
+            "app.services.drift_analysis._extract_and_save_code_changes",
+            return_value=_file_diffs("M\tsrc/api.py"),
+        ),
     ):
         mock_path.return_value = Path("/repos/owner/repo")
-        mock_graph.invoke.return_value = {"change_elements": [], "findings": []}
+        mock_graph.ainvoke.return_value = {"change_elements": [], "findings": []}
 
         run_drift_analysis(str(drift_event.id))
 
@@ -617,23 +655,63 @@ def test_run_drift_analysis_builds_initial_state():
         mock_path.assert_called_once_with("owner/repo")
 
         # Verify the initial state passed to the graph has all correct values
-        invoked_state = mock_graph.invoke.call_args[0][0]
+        invoked_state = mock_graph.ainvoke.call_args[0][0]
         assert invoked_state["drift_event_id"] == "test-event-id"
         assert invoked_state["base_sha"] == "base123"
         assert invoked_state["head_sha"] == "head456"
-        assert invoked_state["session"] is session
+        assert "session" not in invoked_state
+        assert invoked_state["repo_full_name"] == "owner/repo"
+        assert invoked_state["installation_id"] == 99
+        assert invoked_state["code_changes"] == []
         assert invoked_state["repo_path"] == str(Path("/repos/owner/repo"))
         assert invoked_state["docs_root_path"] == "/documentation"
         assert invoked_state["change_elements"] == []
         assert invoked_state["analysis_payloads"] == []
         assert invoked_state["findings"] == []
+        assert list(invoked_state["file_diffs"]) == ["src/api.py"]
+
+
+# Test that the DB connection is released before the graph runs
+def test_run_drift_analysis_closes_session_before_graph(checkpointing):
+    mock_graph = checkpointing["graph"]
+    session, drift_event = _setup_run_mocks()
+    closed_at_invoke = []
+    mock_graph.ainvoke.side_effect = lambda *args: closed_at_invoke.append(session.close.called)
+
+    with (
+        patch("app.services.drift_analysis._create_session", return_value=session),
+        patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
+        patch("app.services.drift_analysis._extract_and_save_code_changes"),
+    ):
+        mock_path.return_value = Path("/repos/owner/repo")
+        run_drift_analysis(str(drift_event.id))
+
+    assert closed_at_invoke == [True]
+
+
+# Test that an event whose repository is still being cloned is left queued for the clone job
+def test_run_drift_analysis_deferred_while_clone_pending():
+    session, drift_event = _setup_run_mocks()
+    drift_event.repository.clone_status = "cloning"
+
+    with (
+        patch("app.services.drift_analysis._create_session", return_value=session),
+        patch("app.services.drift_analysis._build_checkpointed_graph") as mock_build,
+    ):
+        run_drift_analysis(str(drift_event.id))
+
+    assert drift_event.processing_phase == "queued"
+    session.commit.assert_not_called()
+    mock_build.assert_not_called()
+    session.close.assert_called_once()
 
 
 # =========== run_drift_analysis Check Run Tests ===========
 
 
 # Test that update_github_check_run is called with in_progress at the start of analysis
-def test_run_drift_analysis_updates_check_run_to_in_progress():
+def test_run_drift_analysis_updates_check_run_to_in_progress(checkpointing):
+    mock_graph = checkpointing["graph"]
     session, drift_event = _setup_run_mocks()
     drift_event.check_run_id = 77777
 
@@ -641,14 +719,12 @@ def test_run_drift_analysis_updates_check_run_to_in_progress():
         patch("app.services.drift_analysis._create_session", return_value=session),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
         patch("app.services.drift_analysis._extract_and_save_code_changes"),
-        patch("app.services.drift_analysis.drift_analysis_graph") as mock_graph,
-        patch("app.services.drift_analysis.asyncio.run") as mock_asyncio_run,
         patch(
-            "app.services.drift_analysis.update_github_check_run", new_callable=MagicMock
+            "app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock
         ) as mock_update,
     ):
         mock_path.return_value = Path("/repos/owner/repo")
-        mock_graph.invoke.return_value = {}
+        mock_graph.ainvoke.return_value = {}
 
         run_drift_analysis(str(drift_event.id))
 
@@ -660,11 +736,11 @@ def test_run_drift_analysis_updates_check_run_to_in_progress():
         title="Delta Drift Analysis",
         summary="Analysing PR for documentation drift...",
     )
-    mock_asyncio_run.assert_called_once()
 
 
 # Test that in_progress update is skipped when check_run_id is None
-def test_run_drift_analysis_skips_in_progress_when_no_check_run_id():
+def test_run_drift_analysis_skips_in_progress_when_no_check_run_id(checkpointing):
+    mock_graph = checkpointing["graph"]
     session, drift_event = _setup_run_mocks()
     drift_event.check_run_id = None
 
@@ -672,23 +748,21 @@ def test_run_drift_analysis_skips_in_progress_when_no_check_run_id():
         patch("app.services.drift_analysis._create_session", return_value=session),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
         patch("app.services.drift_analysis._extract_and_save_code_changes"),
-        patch("app.services.drift_analysis.drift_analysis_graph") as mock_graph,
-        patch("app.services.drift_analysis.asyncio.run") as mock_asyncio_run,
         patch(
-            "app.services.drift_analysis.update_github_check_run", new_callable=MagicMock
+            "app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock
         ) as mock_update,
     ):
         mock_path.return_value = Path("/repos/owner/repo")
-        mock_graph.invoke.return_value = {}
+        mock_graph.ainvoke.return_value = {}
 
         run_drift_analysis(str(drift_event.id))
 
     mock_update.assert_not_called()
-    mock_asyncio_run.assert_not_called()
 
 
 # Test that a failing in_progress update does not abort the analysis
-def test_run_drift_analysis_in_progress_failure_doesnt_abort():
+def test_run_drift_analysis_in_progress_failure_doesnt_abort(checkpointing):
+    mock_graph = checkpointing["graph"]
     session, drift_event = _setup_run_mocks()
     drift_event.check_run_id = 99999
 
@@ -696,22 +770,21 @@ def test_run_drift_analysis_in_progress_failure_doesnt_abort():
         patch("app.services.drift_analysis._create_session", return_value=session),
         patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
         patch("app.services.drift_analysis._extract_and_save_code_changes") as mock_extract,
-        patch("app.services.drift_analysis.drift_analysis_graph") as mock_graph,
         patch(
-            "app.services.drift_analysis.asyncio.run",
+            "app.services.drift_analysis.update_github_check_run",
+            new_callable=AsyncMock,
             side_effect=Exception("GitHub API unavailable"),
         ),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
     ):
         mock_path.return_value = Path("/repos/owner/repo")
-        mock_graph.invoke.return_value = {}
+        mock_graph.ainvoke.return_value = {}
 
         # Should not raise
         run_drift_analysis(str(drift_event.id))
 
     # Analysis still proceeds after the in_progress update failure
     mock_extract.assert_called_once()
-    mock_graph.invoke.assert_called_once()
+    mock_graph.ainvoke.assert_called_once()
 
 
 # =========== run_drift_analysis Failure Tests ===========
@@ -727,12 +800,11 @@ def test_run_drift_analysis_failure_marks_event_as_failed():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("something broke"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.create_notification"),
+        pytest.raises(RuntimeError),
     ):
-        with pytest.raises(RuntimeError):
-            run_drift_analysis(drift_event_id)
+        run_drift_analysis(drift_event_id)
 
     assert drift_event.processing_phase == "failed"
     assert drift_event.drift_result == "error"
@@ -749,8 +821,7 @@ def test_run_drift_analysis_failure_reraises_exception():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=ValueError("critical failure"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.create_notification"),
     ):
         with pytest.raises(ValueError, match="critical failure"):
@@ -767,12 +838,11 @@ def test_run_drift_analysis_failure_rollback_then_commit():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("something broke"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.create_notification"),
+        pytest.raises(RuntimeError),
     ):
-        with pytest.raises(RuntimeError):
-            run_drift_analysis(drift_event_id)
+        run_drift_analysis(drift_event_id)
 
     session.rollback.assert_called_once()
     # First commit sets "analyzing", second commit is the failure cleanup
@@ -789,14 +859,13 @@ def test_run_drift_analysis_failure_updates_check_run():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("crash"),
         ),
-        patch("app.services.drift_analysis.asyncio.run") as mock_asyncio_run,
         patch(
-            "app.services.drift_analysis.update_github_check_run", new_callable=MagicMock
+            "app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock
         ) as mock_update_check_run,
         patch("app.services.drift_analysis.create_notification"),
+        pytest.raises(RuntimeError),
     ):
-        with pytest.raises(RuntimeError):
-            run_drift_analysis(drift_event_id)
+        run_drift_analysis(drift_event_id)
 
     mock_update_check_run.assert_any_call(
         repo_full_name="owner/repo",
@@ -807,7 +876,6 @@ def test_run_drift_analysis_failure_updates_check_run():
         title="Delta Drift Analysis",
         summary="Drift analysis could not be completed due to an internal error. Please try again after some time by clicking **Re-run all checks**.",
     )
-    assert mock_asyncio_run.call_count >= 1
 
 
 # Test that check run is NOT updated when check_run_id is None
@@ -820,17 +888,15 @@ def test_run_drift_analysis_failure_skips_check_run_when_no_id():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("crash"),
         ),
-        patch("app.services.drift_analysis.asyncio.run") as mock_asyncio_run,
         patch(
-            "app.services.drift_analysis.update_github_check_run", new_callable=MagicMock
+            "app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock
         ) as mock_update_check_run,
         patch("app.services.drift_analysis.create_notification"),
+        pytest.raises(RuntimeError),
     ):
-        with pytest.raises(RuntimeError):
-            run_drift_analysis(drift_event_id)
+        run_drift_analysis(drift_event_id)
 
     mock_update_check_run.assert_not_called()
-    mock_asyncio_run.assert_not_called()
 
 
 # Test that a failing check run update doesn't block the rest of failure cleanup
@@ -844,10 +910,10 @@ def test_run_drift_analysis_failure_check_run_error_doesnt_break_cleanup():
             side_effect=RuntimeError("crash"),
         ),
         patch(
-            "app.services.drift_analysis.asyncio.run",
+            "app.services.drift_analysis.update_github_check_run",
+            new_callable=AsyncMock,
             side_effect=Exception("GitHub API down"),
         ),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
         patch("app.services.drift_analysis.create_notification"),
     ):
         with pytest.raises(RuntimeError, match="crash"):
@@ -859,6 +925,51 @@ def test_run_drift_analysis_failure_check_run_error_doesnt_break_cleanup():
     session.commit.assert_called()
 
 
+# Test that the in_progress update started in the background lands before the failure update
+def test_run_drift_analysis_failure_waits_for_in_progress_update():
+    session, drift_event, drift_event_id = _setup_failure_mocks(check_run_id=12345)
+    statuses = []
+
+    async def record_update(**kwargs):
+        await asyncio.sleep(0.01)
+        statuses.append(kwargs["status"])
+
+    with (
+        patch("app.services.drift_analysis._create_session", return_value=session),
+        patch(
+            "app.services.drift_analysis._extract_and_save_code_changes",
+            side_effect=RuntimeError("crash"),
+        ),
+        patch("app.services.drift_analysis.update_github_check_run", side_effect=record_update),
+        patch("app.services.drift_analysis.create_notification"),
+    ):
+        with pytest.raises(RuntimeError, match="crash"):
+            run_drift_analysis(drift_event_id)
+
+    assert statuses == ["in_progress", "completed"]
+
+
+# Test that the whole job, graph included, runs inside a single event loop
+def test_run_drift_analysis_uses_one_event_loop(checkpointing):
+    session, drift_event = _setup_run_mocks()
+
+    with (
+        patch("app.services.drift_analysis._create_session", return_value=session),
+        patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
+        patch("app.services.drift_analysis._extract_and_save_code_changes"),
+        patch(
+            "app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock
+        ) as mock_update,
+        patch("app.services.drift_analysis.asyncio.run", wraps=asyncio.run) as mock_asyncio_run,
+    ):
+        mock_path.return_value = Path("/repos/owner/repo")
+        run_drift_analysis(str(drift_event.id))
+
+    mock_asyncio_run.assert_called_once()
+    mock_update.assert_awaited_once()
+    checkpointing["graph"].ainvoke.assert_awaited_once()
+
+
 # =========== Notification Tests ===========
 
 
@@ -873,8 +984,7 @@ def test_run_drift_analysis_failure_sends_notification():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("something broke"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.create_notification") as mock_notif,
     ):
         with pytest.raises(RuntimeError):
@@ -899,8 +1009,7 @@ def test_run_drift_analysis_failure_no_notification_when_no_user_id():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("something broke"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.create_notification") as mock_notif,
     ):
         with pytest.raises(RuntimeError):
@@ -913,8 +1022,9 @@ def test_run_drift_analysis_failure_no_notification_when_no_user_id():
 
 
 # Test that failure with retry_count < 3 re-enqueues and does NOT raise
-def test_run_drift_analysis_retries_on_failure():
+def test_run_drift_analysis_retries_on_failure(checkpointing):
     session, drift_event, drift_event_id = _setup_retry_mocks(retry_count=0)
+    checkpointing["record_node_failure"].return_value = 1
 
     with (
         patch("app.services.drift_analysis._create_session", return_value=session),
@@ -922,19 +1032,21 @@ def test_run_drift_analysis_retries_on_failure():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("transient error"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.task_queue") as mock_queue,
     ):
         # Should NOT raise. Job should be re-enqueued instead
         run_drift_analysis(drift_event_id)
 
-    mock_queue.enqueue.assert_called_once_with(run_drift_analysis, drift_event_id)
+    mock_queue.enqueue.assert_called_once_with(
+        run_drift_analysis, drift_event_id, CREATED_AT.isoformat()
+    )
 
 
 # Test that each retry increments retry_count by 1
-def test_run_drift_analysis_retry_increments_count():
+def test_run_drift_analysis_retry_increments_count(checkpointing):
     session, drift_event, drift_event_id = _setup_retry_mocks(retry_count=1)
+    checkpointing["record_node_failure"].return_value = 2
 
     with (
         patch("app.services.drift_analysis._create_session", return_value=session),
@@ -942,8 +1054,7 @@ def test_run_drift_analysis_retry_increments_count():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("transient error"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.task_queue"),
     ):
         run_drift_analysis(drift_event_id)
@@ -952,8 +1063,9 @@ def test_run_drift_analysis_retry_increments_count():
 
 
 # Test that retry resets drift event state
-def test_run_drift_analysis_retry_resets_state():
+def test_run_drift_analysis_retry_resets_state(checkpointing):
     session, drift_event, drift_event_id = _setup_retry_mocks(retry_count=0)
+    checkpointing["record_node_failure"].return_value = 1
 
     with (
         patch("app.services.drift_analysis._create_session", return_value=session),
@@ -961,8 +1073,7 @@ def test_run_drift_analysis_retry_resets_state():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("transient error"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.task_queue"),
     ):
         run_drift_analysis(drift_event_id)
@@ -976,8 +1087,9 @@ def test_run_drift_analysis_retry_resets_state():
 
 
 # Test that retry deletes stale DriftFinding and CodeChange records
-def test_run_drift_analysis_retry_clears_stale_data():
+def test_run_drift_analysis_retry_clears_stale_data(checkpointing):
     session, drift_event, drift_event_id = _setup_retry_mocks(retry_count=0)
+    checkpointing["record_node_failure"].return_value = 1
 
     with (
         patch("app.services.drift_analysis._create_session", return_value=session),
@@ -985,8 +1097,7 @@ def test_run_drift_analysis_retry_clears_stale_data():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("transient error"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.task_queue"),
     ):
         run_drift_analysis(drift_event_id)
@@ -996,8 +1107,9 @@ def test_run_drift_analysis_retry_clears_stale_data():
 
 
 # Test that at retry_count=3 the job is not re-enqueued and is marked as permanently failed
-def test_run_drift_analysis_no_retry_when_max_attempts_reached():
+def test_run_drift_analysis_no_retry_when_max_attempts_reached(checkpointing):
     session, drift_event, drift_event_id = _setup_retry_mocks(retry_count=3)
+    checkpointing["record_node_failure"].return_value = 4
 
     with (
         patch("app.services.drift_analysis._create_session", return_value=session),
@@ -1005,8 +1117,7 @@ def test_run_drift_analysis_no_retry_when_max_attempts_reached():
             "app.services.drift_analysis._extract_and_save_code_changes",
             side_effect=RuntimeError("final failure"),
         ),
-        patch("app.services.drift_analysis.asyncio.run"),
-        patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+        patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
         patch("app.services.drift_analysis.create_notification"),
         patch("app.services.drift_analysis.task_queue") as mock_queue,
     ):
@@ -1019,9 +1130,10 @@ def test_run_drift_analysis_no_retry_when_max_attempts_reached():
 
 
 # Test that all three retry attempts re-enqueue before the final failure
-def test_run_drift_analysis_retries_all_three_times():
+def test_run_drift_analysis_retries_all_three_times(checkpointing):
     for retry_count in range(3):
         session, drift_event, drift_event_id = _setup_retry_mocks(retry_count=retry_count)
+        checkpointing["record_node_failure"].return_value = retry_count + 1
 
         with (
             patch("app.services.drift_analysis._create_session", return_value=session),
@@ -1029,11 +1141,76 @@ def test_run_drift_analysis_retries_all_three_times():
                 "app.services.drift_analysis._extract_and_save_code_changes",
                 side_effect=RuntimeError("error"),
             ),
-            patch("app.services.drift_analysis.asyncio.run"),
-            patch("app.services.drift_analysis.update_github_check_run", new_callable=MagicMock),
+            patch("app.services.drift_analysis.update_github_check_run", new_callable=AsyncMock),
             patch("app.services.drift_analysis.task_queue") as mock_queue,
         ):
             run_drift_analysis(drift_event_id)  # Should not raise
 
-        mock_queue.enqueue.assert_called_once_with(run_drift_analysis, drift_event_id)
+        mock_queue.enqueue.assert_called_once_with(
+            run_drift_analysis, drift_event_id, CREATED_AT.isoformat()
+        )
         assert drift_event.retry_count == retry_count + 1
+
+
+# =========== run_drift_analysis Checkpoint Tests ===========
+
+
+# Test that a run with a checkpoint resumes the graph without re-extracting code changes
+def test_run_drift_analysis_resumes_from_checkpoint(checkpointing):
+    session, drift_event = _setup_run_mocks()
+    drift_event.head_sha = "head456"
+    mock_graph = checkpointing["graph"]
+    mock_graph.aget_state.return_value.next = ("rewrite_docs",)
+
+    with (
+        patch("app.services.drift_analysis._create_session", return_value=session),
+        patch("app.services.drift_analysis._extract_and_save_code_changes") as mock_extract,
+    ):
+        run_drift_analysis(str(drift_event.id))
+
+    mock_extract.assert_not_called()
+    mock_graph.ainvoke.assert_called_once_with(
+        None, {"configurable": {"thread_id": f"{drift_event.id}:head456"}}
+    )
+    session.close.assert_called()
+
+
+# Test that a successful run deletes its checkpoints
+def test_run_drift_analysis_clears_checkpoint_on_success(checkpointing):
+    session, drift_event = _setup_run_mocks()
+    drift_event.head_sha = "head456"
+
+    with (
+        patch("app.services.drift_analysis._create_session", return_value=session),
+        patch("app.services.drift_analysis.get_local_repo_path") as mock_path,
+        patch("app.services.drift_analysis._extract_and_save_code_changes"),
+    ):
+        mock_path.return_value = Path("/repos/owner/repo")
+        run_drift_analysis(str(drift_event.id))
+
+    checkpointing["clear_checkpoint"].assert_called_once()
+    assert checkpointing["clear_checkpoint"].call_args[0][1] == f"{drift_event.id}:head456"
+
+
+# Test that a node failure is counted against that node and the retry keeps completed results
+def test_run_drift_analysis_node_failure_retries_without_clearing(checkpointing):
+    session, drift_event, drift_event_id = _setup_retry_mocks(retry_count=5)
+    drift_event.drift_result = "drift"
+    mock_graph = checkpointing["graph"]
+    mock_graph.aget_state.return_value.next = ("rewrite_docs",)
+    mock_graph.ainvoke.side_effect = TimeoutError("LLM timeout")
+    checkpointing["record_node_failure"].return_value = 2
+
+    with (
+        patch("app.services.drift_analysis._create_session", return_value=session),
+        patch("app.services.drift_analysis.task_queue") as mock_queue,
+    ):
+        run_drift_analysis(drift_event_id)
+
+    assert checkpointing["record_node_failure"].call_args[0][2] == "rewrite_docs"
+    mock_queue.enqueue.assert_called_once_with(
+        run_drift_analysis, drift_event_id, CREATED_AT.isoformat()
+    )
+    session.query.return_value.filter.return_value.delete.assert_not_called()
+    assert drift_event.drift_result == "drift"
+    assert drift_event.processing_phase == "queued"
@@ -0,0 +1,221 @@
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.drift_partitions import (
+    ensure_drift_partitions,
+    expire_drift_partitions,
+    maintain_drift_partitions,
+    split_default_partitions,
+)
+
+NOW = datetime(2026, 11, 20, 8, 0, tzinfo=UTC)
+
+# =========== Fixtures ===========
+
+
+# Replaces the settings with drift partitioning ones
+@pytest.fixture
+def drift_settings():
+    mock_settings = MagicMock()
+    mock_settings.DRIFT_PARTITION_MONTHS_AHEAD = 1
+    mock_settings.DRIFT_HISTORY_RETENTION_DAYS = 0
+    mock_settings.DRIFT_PARTITION_EXPIRY = "drop"
+    with patch("app.services.drift_partitions.settings", mock_settings):
+        yield mock_settings
+
+
+# Replaces the session factory with a mock session
+@pytest.fixture
+def session():
+    mock_session = MagicMock()
+    with patch("app.services.drift_partitions.SessionLocal", return_value=mock_session):
+        yield mock_session
+
+
+# Helper to build the SQL text of every statement a mock session executed
+def _executed_sql(db: MagicMock) -> list[str]:
+    return [str(c.args[0]) for c in db.execute.call_args_list]
+
+
+# Helper to mock a session holding monthly partitions of each drift table. Child partitions
+# report one foreign key each
+def _db_with_partitions(months: list[str]) -> MagicMock:
+    db = MagicMock()
+
+    def execute(statement, params=None):
+        result = MagicMock()
+        sql = str(statement)
+        if "pg_inherits" in sql:
+            assert params is not None
+            result.scalars.return_value.all.return_value = [
+                f"{params['parent']}_p{month}" for month in months
+            ]
+        elif "pg_constraint" in sql:
+            result.scalars.return_value.all.return_value = ["fk_event"]
+        return result
+
+    db.execute.side_effect = execute
+    return db
+
+
+# =========== ensure_drift_partitions Tests ===========
+
+
+# Test that every drift table gets the current month and the months ahead, events first
+def test_ensure_drift_partitions(drift_settings):
+    db = MagicMock()
+
+    names = ensure_drift_partitions(db, NOW)
+
+    assert names == [
+        "drift_events_p202611",
+        "drift_findings_p202611",
+        "code_changes_p202611",
+        "drift_events_p202612",
+        "drift_findings_p202612",
+        "code_changes_p202612",
+    ]
+    assert (
+        "FROM ('2026-12-01T00:00:00+00:00') TO ('2027-01-01T00:00:00+00:00')"
+        in _executed_sql(db)[-1]
+    )
+
+
+# =========== split_default_partitions Tests ===========
+
+
+# Test that the months held by the default partitions get partitions of their own, filled from
+# the defaults before being attached, with findings and code changes leaving the defaults first
+def test_split_default_partitions():
+    db = MagicMock()
+
+    def execute(statement, params=None):
+        result = MagicMock()
+        if "date_trunc" in str(statement):
+            result.scalars.return_value.all.return_value = [datetime(2026, 9, 1)]
+        return result
+
+    db.execute.side_effect = execute
+
+    names = split_default_partitions(db)
+
+    assert names == ["drift_events_p202609", "drift_findings_p202609", "code_changes_p202609"]
+    sql = _executed_sql(db)
+    assert sql[0] == "LOCK TABLE drift_events_default IN EXCLUSIVE MODE"
+    deletes = [s.split(" WHERE")[0] for s in sql if s.startswith("DELETE")]
+    assert deletes == [
+        "DELETE FROM drift_findings_default",
+        "DELETE FROM code_changes_default",
+        "DELETE FROM drift_events_default",
+    ]
+    assert sql.index(
+        "INSERT INTO code_changes_p202609 SELECT * FROM code_changes_default "
+        "WHERE drift_event_created_at >= :start AND drift_event_created_at < :end"
+    ) < sql.index(
+        "DELETE FROM drift_events_default WHERE created_at >= :start AND created_at < :end"
+    )
+    assert sql[-3] == (
+        "ALTER TABLE drift_events ATTACH PARTITION drift_events_p202609 FOR VALUES "
+        "FROM ('2026-09-01T00:00:00+00:00') TO ('2026-10-01T00:00:00+00:00')"
+    )
+    assert db.execute.call_args_list[-4].args[1] == {
+        "start": datetime(2026, 9, 1, tzinfo=UTC),
+        "end": datetime(2026, 10, 1, tzinfo=UTC),
+    }
+
+
+# Test that nothing is created while the default partitions are empty
+def test_split_default_partitions_empty():
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = []
+
+    assert split_default_partitions(db) == []
+    assert not any(s.startswith(("CREATE", "ALTER")) for s in _executed_sql(db))
+
+
+# =========== expire_drift_partitions Tests ===========
+
+
+# Test that months that ended before the cutoff are detached and dropped, findings and code
+# changes before their drift events, and that child partitions lose their foreign key first
+def test_expire_drift_partitions_drops_old_months(drift_settings):
+    db = _db_with_partitions(["202608", "202609", "202610"])
+
+    expired = expire_drift_partitions(db, datetime(2026, 10, 5, tzinfo=UTC))
+
+    assert expired == [
+        "drift_findings_p202608",
+        "drift_findings_p202609",
+        "code_changes_p202608",
+        "code_changes_p202609",
+        "drift_events_p202608",
+        "drift_events_p202609",
+    ]
+    sql = _executed_sql(db)
+    assert "ALTER TABLE drift_findings DETACH PARTITION drift_findings_p202608" in sql
+    assert 'ALTER TABLE drift_findings_p202608 DROP CONSTRAINT "fk_event"' in sql
+    assert "DROP TABLE drift_events_p202609" in sql
+    assert not any("drift_events_p202609 DROP CONSTRAINT" in s for s in sql)
+    assert not any("p202610" in s for s in sql if "pg_" not in s)
+
+
+# Test that detached months are kept as standalone tables when expiry is set to detach
+def test_expire_drift_partitions_detach_only(drift_settings):
+    drift_settings.DRIFT_PARTITION_EXPIRY = "detach"
+    db = _db_with_partitions(["202608"])
+
+    expired = expire_drift_partitions(db, datetime(2026, 10, 5, tzinfo=UTC))
+
+    assert len(expired) == 3
+    assert not any(s.startswith("DROP TABLE") for s in _executed_sql(db))
+
+
+# =========== maintain_drift_partitions Tests ===========
+
+
+# Test that history is kept when no retention is configured
+def test_maintain_drift_partitions_keeps_history(drift_settings, session):
+    with (
+        patch("app.services.drift_partitions.expire_drift_partitions") as mock_expire,
+        patch("app.services.drift_partitions.rebuild_drift_stats") as mock_rebuild,
+    ):
+        result = maintain_drift_partitions()
+
+    assert len(result["partitions"]) == 6
+    assert result["expired"] == []
+    mock_expire.assert_not_called()
+    mock_rebuild.assert_not_called()
+    session.commit.assert_called_once()
+    session.close.assert_called_once()
+
+
+# Test that expired months are removed and the dashboard counters recounted without them
+def test_maintain_drift_partitions_expires_history(drift_settings, session):
+    drift_settings.DRIFT_HISTORY_RETENTION_DAYS = 90
+
+    with (
+        patch(
+            "app.services.drift_partitions.expire_drift_partitions",
+            return_value=["drift_events_p202601"],
+        ) as mock_expire,
+        patch("app.services.drift_partitions.rebuild_drift_stats") as mock_rebuild,
+    ):
+        result = maintain_drift_partitions()
+
+    assert result["expired"] == ["drift_events_p202601"]
+    mock_expire.assert_called_once()
+    mock_rebuild.assert_called_once_with(session)
+    assert session.commit.call_count == 2
+
+
+# Test that a failed run is rolled back and its session closed
+def test_maintain_drift_partitions_rolls_back_on_error(drift_settings, session):
+    session.execute.side_effect = RuntimeError("DB down")
+
+    with pytest.raises(RuntimeError):
+        maintain_drift_partitions()
+
+    session.rollback.assert_called_once()
+    session.close.assert_called_once()
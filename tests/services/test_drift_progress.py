@@ -0,0 +1,70 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.drift_progress import publish_phase_change, publish_progress
+from app.services.live_events import _publish_committed_events
+
+REPO_ID = "00000000-0000-0000-0000-000000000002"
+EVENT_ID = "00000000-0000-0000-0000-000000000003"
+
+
+# =========== publish_phase_change Tests ===========
+
+
+# Test that a phase change is only published once the session commits, to the event and repo
+def test_publish_phase_change_after_commit():
+    session = MagicMock(info={})
+
+    with patch("app.services.live_events.publish_event") as mock_publish:
+        publish_phase_change(session, REPO_ID, EVENT_ID, "analyzing")
+        mock_publish.assert_not_called()
+
+        _publish_committed_events(session)
+
+    data = {"drift_event_id": EVENT_ID, "repo_id": REPO_ID, "processing_phase": "analyzing"}
+    assert [c.args for c in mock_publish.call_args_list] == [
+        (f"drift_event:{EVENT_ID}", "phase", data),
+        (f"repo_drift_events:{REPO_ID}", "phase", data),
+    ]
+    assert session.info == {}
+
+
+# =========== publish_progress Tests ===========
+
+
+# Test that node progress is published straight away to the event and repo channels
+@pytest.mark.asyncio
+async def test_publish_progress():
+    state = {"drift_event_id": EVENT_ID, "repo_id": REPO_ID}
+
+    with patch("app.services.drift_progress.publish_event") as mock_publish:
+        await publish_progress(state, "deep_analyze", 12, 40)
+
+    data = {
+        "drift_event_id": EVENT_ID,
+        "repo_id": REPO_ID,
+        "node": "deep_analyze",
+        "done": 12,
+        "total": 40,
+    }
+    assert [c.args for c in mock_publish.call_args_list] == [
+        (f"drift_event:{EVENT_ID}", "progress", data),
+        (f"repo_drift_events:{REPO_ID}", "progress", data),
+    ]
+
+
+# Test that Redis is published to from a thread, so the event loop isn't blocked meanwhile
+@pytest.mark.asyncio
+async def test_publish_progress_off_the_event_loop():
+    threads = []
+
+    with patch(
+        "app.services.drift_progress.publish_event",
+        side_effect=lambda *args: threads.append(threading.get_ident()),
+    ):
+        await publish_progress({"drift_event_id": EVENT_ID, "repo_id": REPO_ID}, "x", 1, 1)
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
@@ -0,0 +1,164 @@
+import json
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.drift_stats import (
+    get_user_dashboard_stats,
+    rebuild_drift_stats,
+    record_drift_event_created,
+    record_phase_change,
+    set_phase,
+)
+
+REPO_ID = uuid.uuid4()
+USER_ID = uuid.uuid4()
+
+
+# =========== Helper Functions ===========
+
+
+# Helper to render the statement a mock session executed as PostgreSQL
+def _executed_sql(db: MagicMock) -> str:
+    statement = db.execute.call_args[0][0]
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+# Helper to read the bound parameters of the statement a mock session executed
+def _executed_params(db: MagicMock) -> dict:
+    statement = db.execute.call_args[0][0]
+    return statement.compile(dialect=postgresql.dialect()).params
+
+
+# Helper to set the row the dashboard stats query of a mock session returns
+def _set_stats_row(db: MagicMock, row: tuple) -> None:
+    query = db.query.return_value.select_from.return_value.outerjoin.return_value
+    query.outerjoin.return_value.filter.return_value.one.return_value = row
+
+
+# =========== Counter Tests ===========
+
+
+# Tests that a new drift event is counted with an upsert on the repo's row.
+def test_record_drift_event_created_upserts():
+    db = MagicMock()
+
+    record_drift_event_created(db, REPO_ID)
+
+    sql = _executed_sql(db)
+    assert "INSERT INTO repo_drift_stats" in sql
+    assert "ON CONFLICT (repo_id) DO UPDATE" in sql
+    params = _executed_params(db)
+    assert params["drift_events_count"] == 1
+    assert params["pr_waiting_count"] == 0
+
+
+# Tests that only moves into or out of the waiting phase touch the counters.
+@pytest.mark.parametrize(
+    "old_phase, new_phase, delta",
+    [
+        ("generating", "fix_pr_raised", 1),
+        ("fix_pr_raised", "fix_pr_merged", -1),
+        ("fix_pr_raised", "queued", -1),
+        ("queued", "analyzing", None),
+        ("fix_pr_raised", "fix_pr_raised", None),
+    ],
+)
+def test_record_phase_change(old_phase, new_phase, delta):
+    db = MagicMock()
+
+    record_phase_change(db, REPO_ID, old_phase, new_phase)
+
+    if delta is None:
+        db.execute.assert_not_called()
+    else:
+        assert _executed_params(db)["pr_waiting_count_1"] == delta
+
+
+# Tests that drift events without a repo are never counted.
+def test_record_without_repo_is_skipped():
+    db = MagicMock()
+
+    record_drift_event_created(db, None)
+    record_phase_change(db, None, "generating", "fix_pr_raised")
+
+    db.execute.assert_not_called()
+
+
+# Tests that setting a loaded event's phase records the change and updates the event.
+def test_set_phase_updates_event_and_counters():
+    db = MagicMock()
+    drift_event = MagicMock(repo_id=REPO_ID, processing_phase="fix_pr_raised")
+
+    set_phase(db, drift_event, "fix_pr_merged")
+
+    assert drift_event.processing_phase == "fix_pr_merged"
+    assert _executed_params(db)["pr_waiting_count_1"] == -1
+
+
+# Tests that the rebuild recounts every repo from the drift events in one statement.
+def test_rebuild_drift_stats():
+    db = MagicMock()
+    db.execute.return_value.rowcount = 4
+
+    assert rebuild_drift_stats(db) == 4
+
+    sql = _executed_sql(db)
+    assert "SELECT drift_events.repo_id, count(drift_events.id)" in sql
+    assert "GROUP BY drift_events.repo_id" in sql
+    assert "excluded.drift_events_count" in sql
+
+
+# =========== Dashboard Stats Tests ===========
+
+
+# Tests that a cache miss runs the single stats query and caches its result.
+def test_dashboard_stats_cache_miss():
+    db = MagicMock()
+    _set_stats_row(db, (1, 2, 30, 1))
+
+    with patch("app.services.drift_stats.redis_conn") as mock_redis:
+        mock_redis.get.return_value = None
+        stats = get_user_dashboard_stats(db, USER_ID)
+
+    assert stats == {
+        "installations_count": 1,
+        "repos_linked_count": 2,
+        "drift_events_count": 30,
+        "pr_waiting_count": 1,
+    }
+    key, value = mock_redis.set.call_args[0]
+    assert key == f"dashboard_stats:{USER_ID}"
+    assert json.loads(value) == stats
+
+
+# Tests that the database still serves the stats when Redis is down.
+def test_dashboard_stats_redis_down():
+    db = MagicMock()
+    _set_stats_row(db, (1, 0, None, None))
+
+    with patch("app.services.drift_stats.redis_conn") as mock_redis:
+        mock_redis.get.side_effect = ConnectionError("redis down")
+        mock_redis.set.side_effect = ConnectionError("redis down")
+        stats = get_user_dashboard_stats(db, USER_ID)
+
+    assert stats["installations_count"] == 1
+    assert stats["drift_events_count"] == 0
+
+
+# Tests that a TTL of 0 turns the cache off.
+def test_dashboard_stats_cache_disabled():
+    db = MagicMock()
+    _set_stats_row(db, (0, 0, 0, 0))
+
+    with (
+        patch("app.services.drift_stats.redis_conn") as mock_redis,
+        patch("app.services.drift_stats.settings") as mock_settings,
+    ):
+        mock_settings.DASHBOARD_STATS_CACHE_TTL_SECONDS = 0
+        get_user_dashboard_stats(db, USER_ID)
+
+    mock_redis.get.assert_not_called()
+    mock_redis.set.assert_not_called()
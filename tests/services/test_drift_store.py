@@ -0,0 +1,199 @@
+import uuid
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.drift_store import (
+    load_drift_snapshot,
+    save_docs_pr,
+    save_drift_results,
+    set_processing_phase,
+)
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+REPO_ID = "00000000-0000-0000-0000-000000000002"
+
+
+# =========== Fixtures ===========
+
+
+# Replaces the session factory with a mock session
+@pytest.fixture
+def session():
+    mock_session = MagicMock()
+    # The drift event row locked before each update: repo, previous phase and creation time
+    locked = mock_session.query.return_value.filter.return_value.with_for_update.return_value
+    locked.first.return_value = (uuid.UUID(REPO_ID), "analyzing", datetime.now(UTC))
+    with patch("app.services.drift_store.SessionLocal", return_value=mock_session):
+        yield mock_session
+
+
+# =========== load_drift_snapshot Tests ===========
+
+
+# Tests that the snapshot holds plain values only, with the code changes of the event.
+def test_load_drift_snapshot_returns_plain_values():
+    drift_event = MagicMock()
+    drift_event.head_branch = "feature"
+    drift_event.pr_number = 42
+    drift_event.check_run_id = 777
+    drift_event.created_at = datetime(2026, 10, 1, tzinfo=UTC)
+    drift_event.repository.id = uuid.UUID(REPO_ID)
+    drift_event.repository.repo_name = "owner/repo"
+    drift_event.repository.installation_id = 99
+    drift_event.repository.reviewer = "octocat"
+    drift_event.repository.installation.user_id = uuid.UUID(USER_ID)
+
+    change = MagicMock(file_path="app/main.py", change_type="modified", is_code=True)
+    change.is_ignored = False
+    session = MagicMock()
+    session.query.return_value.filter.return_value.all.return_value = [change]
+
+    snapshot = load_drift_snapshot(session, drift_event)
+
+    assert snapshot == {
+        "repo_id": REPO_ID,
+        "repo_full_name": "owner/repo",
+        "installation_id": 99,
+        "head_branch": "feature",
+        "pr_number": 42,
+        "check_run_id": 777,
+        "reviewer": "octocat",
+        "user_id": USER_ID,
+        "drift_event_created_at": "2026-10-01T00:00:00+00:00",
+        "code_changes": [
+            {
+                "file_path": "app/main.py",
+                "change_type": "modified",
+                "is_code": True,
+                "is_ignored": False,
+            }
+        ],
+    }
+
+
+# Tests that a repo without an installation has no user in the snapshot.
+def test_load_drift_snapshot_without_installation():
+    drift_event = MagicMock()
+    drift_event.repository.installation = None
+    session = MagicMock()
+    session.query.return_value.filter.return_value.all.return_value = []
+
+    snapshot = load_drift_snapshot(session, drift_event)
+
+    assert snapshot["user_id"] is None
+
+
+# Tests that a repo without an installation id can't be analysed.
+def test_load_drift_snapshot_without_installation_id():
+    drift_event = MagicMock()
+    drift_event.repository.installation_id = None
+
+    with pytest.raises(ValueError):
+        load_drift_snapshot(MagicMock(), drift_event)
+
+
+# =========== save_drift_results Tests ===========
+
+
+# Tests that findings, result and notification are written in one transaction.
+def test_save_drift_results_writes_in_one_transaction(session):
+    session.query.return_value.filter.return_value.update.return_value = 1
+    findings = [
+        {
+            "code_path": "src/api.py",
+            "change_type": "modified",
+            "drift_type": "outdated_docs",
+            "drift_score": 0.8,
+            "matched_doc_paths": ["docs/api.md", "README.md"],
+        }
+    ]
+
+    with patch("app.services.drift_store.create_notification") as mock_notif:
+        saved = save_drift_results(
+            "evt-1", findings, 0.8, "drift_detected", "summary", USER_ID, "Drift detected"
+        )
+
+    assert saved is True
+    added = list(session.add_all.call_args[0][0])
+    assert len(added) == 1
+    assert added[0].doc_file_path == "docs/api.md"
+    mock_notif.assert_called_once_with(session, uuid.UUID(USER_ID), "Drift detected")
+
+    # Findings of an earlier attempt are replaced, not duplicated
+    session.query.return_value.filter.return_value.delete.assert_called_once()
+    session.commit.assert_called_once()
+    session.close.assert_called_once()
+
+
+# Tests that nothing else is written when the drift event no longer exists.
+def test_save_drift_results_event_not_found(session):
+    session.query.return_value.filter.return_value.update.return_value = 0
+
+    with patch("app.services.drift_store.create_notification") as mock_notif:
+        saved = save_drift_results("evt-1", [], 0.0, "clean", "summary", USER_ID, "Clean")
+
+    assert saved is False
+    session.add_all.assert_not_called()
+    mock_notif.assert_not_called()
+    session.close.assert_called_once()
+
+
+# Tests that a failed write is rolled back and the session is still closed.
+def test_save_drift_results_rolls_back_on_error(session):
+    session.query.return_value.filter.return_value.update.side_effect = RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        save_drift_results("evt-1", [], 0.0, "clean", "summary")
+
+    session.rollback.assert_called_once()
+    session.commit.assert_not_called()
+    session.close.assert_called_once()
+
+
+# =========== Phase and Docs PR Tests ===========
+
+
+# Tests that a phase transition is a single committed update.
+def test_set_processing_phase(session):
+    set_processing_phase("evt-1", "generating")
+
+    update_values = session.query.return_value.filter.return_value.update.call_args[0][0]
+    assert list(update_values.values()) == ["generating"]
+    session.commit.assert_called_once()
+    session.close.assert_called_once()
+
+
+# Tests that the docs PR number, phase and notification are saved together.
+def test_save_docs_pr(session):
+    with patch("app.services.drift_store.create_notification") as mock_notif:
+        save_docs_pr("evt-1", 101, USER_ID, "Docs PR raised")
+
+    update_values = session.query.return_value.filter.return_value.update.call_args[0][0]
+    assert sorted(update_values.values(), key=str) == [101, "fix_pr_raised"]
+    mock_notif.assert_called_once_with(session, uuid.UUID(USER_ID), "Docs PR raised")
+    session.commit.assert_called_once()
+
+
+# Tests that raising the docs PR counts the event as waiting on the dashboard.
+def test_save_docs_pr_counts_waiting_pr(session):
+    repo_id = uuid.uuid4()
+    locked = session.query.return_value.filter.return_value.with_for_update.return_value
+    locked.first.return_value = (repo_id, "generating", datetime.now(UTC))
+    session.query.return_value.filter.return_value.update.return_value = 1
+
+    with patch("app.services.drift_store.record_phase_change") as mock_record:
+        save_docs_pr("evt-1", 101)
+
+    mock_record.assert_called_once_with(session, repo_id, "generating", "fix_pr_raised")
+
+
+# Tests that phase changes of events that no longer exist aren't counted.
+def test_set_processing_phase_missing_event_not_counted(session):
+    session.query.return_value.filter.return_value.update.return_value = 0
+
+    with patch("app.services.drift_store.record_phase_change") as mock_record:
+        set_processing_phase("evt-1", "generating")
+
+    mock_record.assert_not_called()
@@ -0,0 +1,80 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.live_events import (
+    _discard_rolled_back_events,
+    _publish_committed_events,
+    publish_after_commit,
+    publish_event,
+    stream_events,
+)
+
+# =========== publish_event Tests ===========
+
+
+# Test that an event is published as JSON with its name
+def test_publish_event():
+    with patch("app.services.live_events.redis_conn") as mock_redis:
+        publish_event("notifications:1", "notification", {"id": "abc"})
+
+    channel, message = mock_redis.publish.call_args.args
+    assert channel == "notifications:1"
+    assert json.loads(message) == {"event": "notification", "data": {"id": "abc"}}
+
+
+# Test that a Redis failure doesn't fail the caller
+def test_publish_event_redis_down():
+    with patch("app.services.live_events.redis_conn") as mock_redis:
+        mock_redis.publish.side_effect = ConnectionError("Redis down")
+
+        publish_event("notifications:1", "notification", {"id": "abc"})
+
+
+# =========== stream_events Tests ===========
+
+
+# Test that published messages become Server-Sent Events, quiet periods keep-alives, until the
+# client disconnects and the subscription is closed
+@pytest.mark.asyncio
+async def test_stream_events():
+    pubsub = MagicMock()
+    pubsub.subscribe = AsyncMock()
+    pubsub.unsubscribe = AsyncMock()
+    pubsub.aclose = AsyncMock()
+    pubsub.get_message = AsyncMock(
+        side_effect=[
+            {"data": json.dumps({"event": "notification", "data": {"id": "abc"}}).encode()},
+            None,
+            {"data": b"not json", "channel": b"notifications:1"},
+        ]
+    )
+    is_disconnected = AsyncMock(side_effect=[False, False, False, True])
+
+    with patch("app.services.live_events.async_redis_conn", new_callable=MagicMock) as mock_redis:
+        mock_redis.pubsub.return_value = pubsub
+        events = [e async for e in stream_events(is_disconnected, "notifications:1")]
+
+    assert events == [
+        ": connected\n\n",
+        'event: notification\ndata: {"id": "abc"}\n\n',
+        ": keep-alive\n\n",
+    ]
+    pubsub.subscribe.assert_awaited_once_with("notifications:1")
+    pubsub.aclose.assert_awaited_once()
+
+
+# =========== publish_after_commit Tests ===========
+
+
+# Test that events of a rolled back session are never published
+def test_publish_after_commit_discarded_on_rollback():
+    session = MagicMock(info={})
+
+    with patch("app.services.live_events.publish_event") as mock_publish:
+        publish_after_commit(session, "drift_event:1", "phase", {"processing_phase": "failed"})
+        _discard_rolled_back_events(session)
+        _publish_committed_events(session)
+
+    mock_publish.assert_not_called()
@@ -0,0 +1,88 @@
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.notification_archive import _drop_expired_partitions, archive_notifications
+
+# =========== Fixtures ===========
+
+
+# Replaces the session factory with a mock session
+@pytest.fixture
+def session():
+    mock_session = MagicMock()
+    with patch("app.services.notification_archive.SessionLocal", return_value=mock_session):
+        yield mock_session
+
+
+# Helper to build the SQL text of every statement a mock session executed
+def _executed_sql(session: MagicMock) -> list[str]:
+    return [str(c.args[0]) for c in session.execute.call_args_list]
+
+
+# =========== archive_notifications Tests ===========
+
+
+# Test that batches are moved into the partition of their month until nothing is left
+def test_archive_notifications_moves_batches(session):
+    session.query.return_value.filter.return_value.scalar.side_effect = [
+        datetime(2026, 1, 15, tzinfo=UTC),
+        datetime(2026, 2, 3, tzinfo=UTC),
+        None,
+    ]
+    session.execute.return_value.rowcount = 10
+    session.execute.return_value.scalars.return_value.all.return_value = []
+
+    result = archive_notifications()
+
+    assert result == {"archived": 20, "dropped_partitions": []}
+    sql = _executed_sql(session)
+    assert "notifications_archive_p202601 PARTITION OF notifications_archive" in sql[0]
+    assert "notifications_archive_p202602 PARTITION OF notifications_archive" in sql[2]
+    assert session.commit.call_count == 3
+    session.close.assert_called_once()
+
+
+# Test that a batch that moves nothing, because its rows are locked, ends the run
+def test_archive_notifications_stops_on_locked_rows(session):
+    session.query.return_value.filter.return_value.scalar.return_value = datetime(
+        2026, 1, 15, tzinfo=UTC
+    )
+    session.execute.return_value.rowcount = 0
+    session.execute.return_value.scalars.return_value.all.return_value = []
+
+    assert archive_notifications()["archived"] == 0
+
+
+# Test that a failed run is rolled back and its session closed
+def test_archive_notifications_rolls_back_on_error(session):
+    session.query.side_effect = RuntimeError("DB down")
+
+    with pytest.raises(RuntimeError):
+        archive_notifications()
+
+    session.rollback.assert_called_once()
+    session.close.assert_called_once()
+
+
+# =========== _drop_expired_partitions Tests ===========
+
+
+# Test that only archive months that ended before the cutoff are dropped
+def test_drop_expired_partitions():
+    db = MagicMock()
+    db.execute.return_value.scalars.return_value.all.return_value = [
+        "notifications_archive_p202603",
+        "notifications_archive_p202601",
+        "notifications_archive_p202602",
+        "notifications_archive_legacy",
+    ]
+
+    dropped = _drop_expired_partitions(db, datetime(2026, 3, 1, tzinfo=UTC))
+
+    assert dropped == ["notifications_archive_p202601", "notifications_archive_p202602"]
+    assert _executed_sql(db)[1:] == [
+        "DROP TABLE IF EXISTS notifications_archive_p202601",
+        "DROP TABLE IF EXISTS notifications_archive_p202602",
+    ]
@@ -0,0 +1,171 @@
+import uuid
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.notification import Notification
+from app.services.notification_service import (
+    _discard_rolled_back_notifications,
+    _push_committed_notifications,
+    create_notification,
+    create_notifications,
+    drift_queued_group,
+    get_unread_count,
+)
+
+# =========== Fixtures ===========
+
+
+# Replaces Redis behind the unread count cache
+@pytest.fixture
+def mock_redis():
+    with patch("app.services.notification_service.redis_conn") as mock:
+        mock.get.return_value = None
+        yield mock
+
+
+# Captures the events pushed to live streams
+@pytest.fixture
+def mock_publish():
+    with patch("app.services.notification_service.publish_event") as mock:
+        yield mock
+
+
+# =========== create_notification Tests ===========
+
+
+# Test that a notification is pushed with its stored id once its session commits
+def test_create_notification_pushed_after_commit(mock_redis, mock_publish):
+    session = Session()
+    user_id = uuid.uuid4()
+
+    create_notification(session, user_id, "Drift detected in PR #1")
+    [notification] = session.new
+    mock_publish.assert_not_called()
+
+    _push_committed_notifications(session)
+
+    channel, event, data = mock_publish.call_args.args
+    assert channel == f"notifications:{user_id}"
+    assert event == "notification"
+    assert data["id"] == str(notification.id)
+    assert data["content"] == "Drift detected in PR #1"
+    mock_redis.delete.assert_called_once_with(f"notifications_unread:{user_id}")
+
+    # Nothing is pushed twice by a later commit of the same session
+    _push_committed_notifications(session)
+    mock_publish.assert_called_once()
+
+
+# Test that the notifications of a rolled back session are never pushed
+def test_create_notification_rolled_back(mock_redis, mock_publish):
+    session = Session()
+
+    create_notification(session, uuid.uuid4(), "PR #2 queued")
+    _discard_rolled_back_notifications(session)
+    _push_committed_notifications(session)
+
+    mock_publish.assert_not_called()
+
+
+# Test that a grouped notification merges into the user's recent unread one of its group
+def test_create_notification_coalesced(mock_redis, mock_publish):
+    session = Session()
+    user_id = uuid.uuid4()
+    created_at = datetime.now(UTC) - timedelta(minutes=5)
+    existing = Notification(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        content="PR #1 queued",
+        is_read=False,
+        group_count=2,
+        created_at=created_at,
+        last_event_at=created_at,
+    )
+
+    with patch.object(session, "query") as mock_query:
+        lookup = mock_query.return_value.filter.return_value.order_by.return_value
+        lookup.with_for_update.return_value.first.return_value = existing
+
+        create_notification(session, user_id, "PR #3 queued", **drift_queued_group("owner/repo"))
+
+    assert not session.new
+    assert existing.group_count == 3
+    assert existing.content == "3 PRs in owner/repo have been queued for drift analysis."
+    assert existing.created_at == created_at
+    assert existing.last_event_at > created_at
+
+    _push_committed_notifications(session)
+    data = mock_publish.call_args.args[2]
+    assert data["id"] == str(existing.id)
+    assert data["group_count"] == 3
+    assert data["last_event_at"] == existing.last_event_at.isoformat()
+
+
+# Test that a grouped notification without a recent unread one of its group starts the group
+def test_create_notification_starts_group(mock_redis, mock_publish):
+    session = Session()
+
+    with patch.object(session, "query") as mock_query:
+        lookup = mock_query.return_value.filter.return_value.order_by.return_value
+        lookup.with_for_update.return_value.first.return_value = None
+
+        create_notification(
+            session, uuid.uuid4(), "PR #1 queued", **drift_queued_group("owner/repo")
+        )
+
+    [notification] = session.new
+    assert notification.content == "PR #1 queued"
+    assert notification.group_key == "drift_queued:owner/repo"
+    assert notification.group_count == 1
+
+
+# Test that coalescing is skipped when its window is disabled
+def test_create_notification_coalescing_disabled(mock_redis, mock_publish):
+    session = Session()
+
+    with (
+        patch("app.services.notification_service.settings") as mock_settings,
+        patch.object(session, "query") as mock_query,
+    ):
+        mock_settings.NOTIFICATIONS_COALESCE_WINDOW_SECONDS = 0
+        create_notification(
+            session, uuid.uuid4(), "PR #1 queued", **drift_queued_group("owner/repo")
+        )
+
+    mock_query.assert_not_called()
+    assert len(session.new) == 1
+
+
+# =========== create_notifications Tests ===========
+
+
+# Test that bulk created notifications are added together and each pushed once committed
+def test_create_notifications(mock_redis, mock_publish):
+    session = Session()
+    user_id = uuid.uuid4()
+
+    create_notifications(session, user_id, ["Repo a linked", "Repo b linked"])
+
+    assert sorted(n.content for n in session.new) == ["Repo a linked", "Repo b linked"]
+    _push_committed_notifications(session)
+    assert [c.args[2]["content"] for c in mock_publish.call_args_list] == [
+        "Repo a linked",
+        "Repo b linked",
+    ]
+
+
+# =========== get_unread_count Tests ===========
+
+
+# Test that a Redis failure falls back to counting in the database
+def test_get_unread_count_redis_down(mock_redis):
+    mock_redis.get.side_effect = ConnectionError("Redis down")
+    mock_redis.set.side_effect = ConnectionError("Redis down")
+    db = Session()
+
+    with patch.object(db, "query") as mock_query:
+        mock_query.return_value.filter.return_value.scalar.return_value = 3
+        assert get_unread_count(db, uuid.uuid4()) == 3
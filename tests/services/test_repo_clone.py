@@ -0,0 +1,313 @@
+import uuid
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.repo_clone import (
+    RUN_DRIFT_ANALYSIS,
+    _clone_repository,
+    _fail_clone,
+    _finish_clone,
+    _on_clone_job_failure,
+    _progress_recorder,
+    enqueue_clone,
+    is_clone_pending,
+    parse_clone_progress,
+    rehydrate_clone,
+)
+from app.services.repo_storage import enforce_storage_quota
+
+REPO_ID = str(uuid.uuid4())
+
+
+# =========== Fixtures ===========
+
+
+# Replaces the session factory with a mock session
+@pytest.fixture
+def session():
+    mock_session = MagicMock()
+    with patch("app.services.repo_clone.SessionLocal", return_value=mock_session):
+        yield mock_session
+
+
+# =========== Progress Tests ===========
+
+
+# Tests that git progress lines map onto the overall clone progress.
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("Receiving objects:  50% (500/1000), 1.20 MiB | 2.00 MiB/s", 40),
+        ("Receiving objects: 100% (1000/1000), done.", 80),
+        ("Resolving deltas: 100% (10/10), done.", 95),
+        ("Updating files:  40% (4/10)", 97),
+        ("remote: Counting objects:  50% (5/10)", None),
+        ("Cloning into '/tmp/repos/owner/repo'...", None),
+    ],
+)
+def test_parse_clone_progress(line, expected):
+    assert parse_clone_progress(line) == expected
+
+
+# Tests that progress is only persisted once it advances a full step.
+def test_progress_recorder_persists_in_steps():
+    with (
+        patch("app.services.repo_clone._update_clone_state") as mock_update,
+        patch("app.services.repo_clone.settings") as mock_settings,
+    ):
+        mock_settings.CLONE_PROGRESS_STEP = 10
+        record = _progress_recorder(REPO_ID)
+        for percent in range(0, 101, 5):
+            record(f"Receiving objects: {percent:3d}% ({percent}/100)")
+
+    recorded = [list(c[0][1].values())[0] for c in mock_update.call_args_list]
+    assert recorded == [12, 24, 36, 48, 60, 72]
+
+
+# Tests that pending, in-progress and evicted clones defer drift analysis.
+@pytest.mark.parametrize(
+    "status, pending",
+    [
+        ("pending", True),
+        ("cloning", True),
+        ("evicted", True),
+        ("ready", False),
+        ("failed", False),
+    ],
+)
+def test_is_clone_pending(status, pending):
+    assert is_clone_pending(MagicMock(clone_status=status)) is pending
+
+
+# =========== Enqueue Tests ===========
+
+
+# Tests that clones go to the clone queue with backoff retries.
+def test_enqueue_clone_uses_clone_queue_with_retry():
+    with (
+        patch("app.services.repo_clone.clone_queue") as mock_queue,
+        patch("app.services.repo_clone.settings") as mock_settings,
+    ):
+        mock_settings.CLONE_MAX_RETRIES = 3
+        mock_settings.CLONE_RETRY_INTERVAL_SECONDS = 10
+        mock_settings.CLONE_JOB_TIMEOUT_SECONDS = 600
+        enqueue_clone(REPO_ID)
+
+    _, kwargs = mock_queue.enqueue.call_args
+    assert mock_queue.enqueue.call_args[0][1] == REPO_ID
+    assert kwargs["retry"].max == 3
+    assert kwargs["retry"].intervals == [10, 20, 40]
+    assert kwargs["job_timeout"] == 600
+    assert kwargs["on_failure"].func is _on_clone_job_failure
+
+
+# Tests that an evicted clone is marked pending and cloned again.
+def test_rehydrate_clone_enqueues_evicted_repo():
+    repo = MagicMock(id=REPO_ID, repo_name="owner/repo", clone_status="evicted", clone_attempts=3)
+
+    with patch("app.services.repo_clone.enqueue_clone") as mock_enqueue:
+        assert rehydrate_clone(repo) is True
+
+    assert repo.clone_status == "pending"
+    assert repo.clone_attempts == 0
+    mock_enqueue.assert_called_once_with(REPO_ID)
+
+
+# Tests that clones that weren't evicted are left alone.
+@pytest.mark.parametrize("status", ["pending", "cloning", "ready", "failed"])
+def test_rehydrate_clone_ignores_other_states(status):
+    repo = MagicMock(clone_status=status)
+
+    with patch("app.services.repo_clone.enqueue_clone") as mock_enqueue:
+        assert rehydrate_clone(repo) is False
+
+    assert repo.clone_status == status
+    mock_enqueue.assert_not_called()
+
+
+# =========== Clone Job Tests ===========
+
+
+# Tests that a successful clone streams progress and then finishes the repo.
+@pytest.mark.asyncio
+async def test_clone_repository_success(session):
+    repo = MagicMock(repo_name="owner/repo", installation_id=99, target_branch="main")
+    repo.clone_status = "pending"
+    repo.clone_attempts = 0
+    session.query.return_value.filter.return_value.first.return_value = repo
+
+    with (
+        patch("app.services.repo_clone.remove_cloned_repository") as mock_remove,
+        patch(
+            "app.services.repo_clone.get_installation_access_token",
+            new_callable=AsyncMock,
+            return_value="tok",
+        ),
+        patch(
+            "app.services.repo_clone.clone_repository",
+            new_callable=AsyncMock,
+            return_value="/tmp/repos/owner/repo",
+        ) as mock_clone,
+        patch("app.services.repo_clone._finish_clone") as mock_finish,
+        patch("app.services.repo_clone._fail_clone") as mock_fail,
+    ):
+        await _clone_repository(REPO_ID)
+
+    assert repo.clone_status == "cloning"
+    assert repo.clone_attempts == 1
+    mock_remove.assert_called_once_with("owner/repo")
+    args, kwargs = mock_clone.call_args
+    assert args == ("owner/repo", "tok", "main")
+    assert callable(kwargs["on_progress"])
+    mock_finish.assert_called_once_with(REPO_ID)
+    mock_fail.assert_not_called()
+
+
+# Tests that a failed clone is recorded and re-raised so RQ retries it.
+@pytest.mark.asyncio
+async def test_clone_repository_failure_is_recorded_and_raised(session):
+    repo = MagicMock(repo_name="owner/repo", installation_id=99, target_branch="main")
+    repo.clone_status = "pending"
+    repo.clone_attempts = 1
+    session.query.return_value.filter.return_value.first.return_value = repo
+
+    with (
+        patch("app.services.repo_clone.remove_cloned_repository"),
+        patch("app.services.repo_clone.get_installation_access_token", new_callable=AsyncMock),
+        patch(
+            "app.services.repo_clone.clone_repository", new_callable=AsyncMock, return_value=None
+        ),
+        patch("app.services.repo_clone._finish_clone") as mock_finish,
+        patch("app.services.repo_clone._fail_clone") as mock_fail,
+        pytest.raises(RuntimeError),
+    ):
+        await _clone_repository(REPO_ID)
+
+    mock_fail.assert_called_once()
+    assert mock_fail.call_args[0][:2] == (REPO_ID, 2)
+    mock_finish.assert_not_called()
+
+
+# Tests that a repo not committed yet raises so the retry picks it up.
+@pytest.mark.asyncio
+async def test_clone_repository_missing_repo_raises(session):
+    session.query.return_value.filter.return_value.first.return_value = None
+
+    with pytest.raises(LookupError):
+        await _clone_repository(REPO_ID)
+
+
+# Tests that a repo without an installation fails at once instead of retrying.
+@pytest.mark.asyncio
+async def test_clone_repository_without_installation_fails(session):
+    repo = MagicMock(repo_name="owner/repo", installation_id=None, clone_status="pending")
+    session.query.return_value.filter.return_value.first.return_value = repo
+
+    with (
+        patch("app.services.repo_clone.clone_repository", new_callable=AsyncMock) as mock_clone,
+        patch(
+            "app.services.repo_clone.get_installation_access_token", new_callable=AsyncMock
+        ) as mock_token,
+    ):
+        await _clone_repository(REPO_ID)
+
+    assert repo.clone_status == "failed"
+    assert repo.clone_error == "Repository has no installation"
+    session.commit.assert_called_once()
+    mock_token.assert_not_called()
+    mock_clone.assert_not_called()
+
+
+# Tests that an already cloned repo is not cloned again.
+@pytest.mark.asyncio
+async def test_clone_repository_skips_ready_repo(session):
+    session.query.return_value.filter.return_value.first.return_value = MagicMock(
+        clone_status="ready"
+    )
+
+    with patch("app.services.repo_clone.clone_repository", new_callable=AsyncMock) as mock_clone:
+        await _clone_repository(REPO_ID)
+
+    mock_clone.assert_not_called()
+
+
+# =========== Finish and Failure Tests ===========
+
+
+# Tests that finishing a clone enqueues the drift analyses deferred while it was pending.
+def test_finish_clone_enqueues_deferred_events(session):
+    event_ids = [uuid.uuid4(), uuid.uuid4()]
+    created_at = datetime(2026, 10, 1, tzinfo=UTC)
+    session.query.return_value.filter.return_value.all.return_value = [
+        (i, created_at) for i in event_ids
+    ]
+
+    with (
+        patch("app.services.repo_clone.task_queue") as mock_queue,
+        patch("app.services.repo_clone.clone_queue") as mock_clone_queue,
+    ):
+        _finish_clone(REPO_ID)
+
+    update_values = session.query.return_value.filter.return_value.update.call_args[0][0]
+    assert "ready" in update_values.values()
+    session.commit.assert_called_once()
+    assert [c[0] for c in mock_queue.enqueue.call_args_list] == [
+        (RUN_DRIFT_ANALYSIS, str(i), created_at.isoformat()) for i in event_ids
+    ]
+    mock_clone_queue.enqueue.assert_called_once_with(enforce_storage_quota)
+
+
+# Tests that a failed attempt with retries left keeps the repo pending.
+def test_fail_clone_with_retries_left(session):
+    repo = MagicMock()
+    session.query.return_value.filter.return_value.first.return_value = repo
+
+    with patch("app.services.repo_clone.create_notification") as mock_notif:
+        _fail_clone(REPO_ID, 1, "network down")
+
+    assert repo.clone_status == "pending"
+    assert repo.clone_error == "network down"
+    mock_notif.assert_not_called()
+
+
+# Tests that the last failed attempt marks the repo failed and notifies the user.
+def test_fail_clone_exhausted_marks_failed(session):
+    repo = MagicMock(repo_name="owner/repo")
+    session.query.return_value.filter.return_value.first.return_value = repo
+
+    with (
+        patch("app.services.repo_clone.create_notification") as mock_notif,
+        patch("app.services.repo_clone.settings") as mock_settings,
+    ):
+        mock_settings.CLONE_MAX_RETRIES = 3
+        _fail_clone(REPO_ID, 4, "network down")
+
+    assert repo.clone_status == "failed"
+    mock_notif.assert_called_once()
+    assert "owner/repo" in mock_notif.call_args[0][2]
+
+
+# Tests that a clone job killed while cloning, e.g. at its timeout, records its failure.
+def test_clone_job_failure_fails_stalled_clone(session):
+    session.query.return_value.filter.return_value.first.return_value = ("cloning", 2)
+    job = MagicMock(args=(REPO_ID,))
+
+    with patch("app.services.repo_clone._fail_clone") as mock_fail:
+        _on_clone_job_failure(job, MagicMock(), TimeoutError, TimeoutError("timed out"), None)
+
+    mock_fail.assert_called_once_with(REPO_ID, 2, "timed out")
+    session.close.assert_called_once()
+
+
+# Tests that failures the clone job already recorded are left alone.
+@pytest.mark.parametrize("status", ["pending", "failed", "ready"])
+def test_clone_job_failure_ignores_recorded_failures(session, status):
+    session.query.return_value.filter.return_value.first.return_value = (status, 2)
+    job = MagicMock(args=(REPO_ID,))
+
+    with patch("app.services.repo_clone._fail_clone") as mock_fail:
+        _on_clone_job_failure(job, MagicMock(), RuntimeError, RuntimeError("boom"), None)
+
+    mock_fail.assert_not_called()
@@ -0,0 +1,170 @@
+import uuid
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.repository import Repository
+from app.services import repo_metadata
+from app.services.repo_metadata import (
+    fetch_repo_metadata,
+    get_dashboard_repo_details,
+    refresh_repo_metadata,
+)
+
+NOW = datetime.now(UTC)
+
+
+# =========== Fixtures ===========
+
+
+# Metadata settings, fresh for 5 minutes and stale for a day
+@pytest.fixture(autouse=True)
+def mock_settings():
+    with patch("app.services.repo_metadata.settings") as mock:
+        mock.REPO_METADATA_FRESH_SECONDS = 300
+        mock.REPO_METADATA_STALE_SECONDS = 86400
+        mock.REPO_METADATA_TIMEOUT_SECONDS = 10
+        yield mock
+
+
+# Mocks the token minting of the GitHub API
+@pytest.fixture
+def mock_token():
+    with patch(
+        "app.services.repo_metadata.get_installation_access_token", new_callable=AsyncMock
+    ) as mock:
+        yield mock
+
+
+# Mocks the repo details call of the GitHub API
+@pytest.fixture
+def mock_details():
+    with patch("app.services.repo_metadata.get_repo_details", new_callable=AsyncMock) as mock:
+        yield mock
+
+
+# =========== Helper Functions ===========
+
+
+# Builds a repo row with the given stored metadata
+def _repo(name: str = "owner/repo", installation_id: int = 1, **metadata) -> Repository:
+    return Repository(id=uuid.uuid4(), repo_name=name, installation_id=installation_id, **metadata)
+
+
+# Details as returned by get_repo_details
+def _details(stars: int = 10, etag: str = '"new"') -> dict:
+    return {
+        "name": "owner/repo",
+        "description": "desc",
+        "language": "Python",
+        "stargazers_count": stars,
+        "forks_count": 2,
+        "avatar_url": "https://avatars/owner",
+        "etag": etag,
+    }
+
+
+# Snapshot of a repo as passed to the fetch
+def _snapshot(repo: Repository) -> dict:
+    return {
+        "id": str(repo.id),
+        "repo_name": repo.repo_name,
+        "installation_id": repo.installation_id,
+        "metadata_etag": repo.metadata_etag,
+    }
+
+
+# =========== fetch_repo_metadata Tests ===========
+
+
+# Test that one token is minted per installation and each repo is fetched with its ETag
+@pytest.mark.asyncio
+async def test_fetch_repo_metadata_shares_tokens(mock_token, mock_details):
+    repos = [
+        _repo("owner/a", 1, metadata_etag='"a"'),
+        _repo("owner/b", 1),
+        _repo("other/c", 2),
+    ]
+    mock_details.return_value = _details()
+
+    fetched = await fetch_repo_metadata([_snapshot(repo) for repo in repos])
+
+    assert sorted(call.args[0] for call in mock_token.await_args_list) == [1, 2]
+    assert mock_details.await_count == 3
+    assert mock_details.await_args_list[0].kwargs["etag"] == '"a"'
+    assert fetched[str(repos[0].id)]["stargazers_count"] == 10
+    assert fetched[str(repos[2].id)]["metadata_etag"] == '"new"'
+
+
+# Test that a 304 only renews the fetch time and failed repos are left out
+@pytest.mark.asyncio
+async def test_fetch_repo_metadata_not_modified_and_failures(mock_token, mock_details):
+    unchanged, failing = _repo("owner/a"), _repo("owner/b")
+    mock_details.side_effect = [None, Exception("GitHub API down")]
+
+    fetched = await fetch_repo_metadata([_snapshot(unchanged), _snapshot(failing)])
+
+    assert list(fetched) == [str(unchanged.id)]
+    assert list(fetched[str(unchanged.id)]) == ["metadata_fetched_at"]
+
+
+# =========== get_dashboard_repo_details Tests ===========
+
+
+# Test that fresh metadata is served as is and stale metadata is served and sent to revalidation
+@pytest.mark.asyncio
+async def test_get_dashboard_repo_details_fresh_and_stale(mock_token, mock_details):
+    fresh = _repo("owner/fresh", metadata_fetched_at=NOW, stargazers_count=1)
+    stale = _repo("owner/stale", metadata_fetched_at=NOW - timedelta(hours=1), language="Go")
+
+    results, to_revalidate = await get_dashboard_repo_details([fresh, stale])
+
+    assert [r["name"] for r in results] == ["owner/fresh", "owner/stale"]
+    assert results[0]["stargazers_count"] == 1
+    assert results[1]["language"] == "Go"
+    assert [repo["id"] for repo in to_revalidate] == [str(stale.id)]
+    mock_details.assert_not_awaited()
+
+
+# Test that never fetched or expired metadata is fetched first, and kept when GitHub fails
+@pytest.mark.asyncio
+async def test_get_dashboard_repo_details_expired(mock_token, mock_details):
+    never = _repo("owner/never")
+    expired = _repo("owner/expired", metadata_fetched_at=NOW - timedelta(days=2), description="old")
+    unreachable = _repo("owner/unreachable")
+    mock_details.side_effect = [_details(stars=5), Exception("timeout"), Exception("timeout")]
+
+    results, to_revalidate = await get_dashboard_repo_details([never, expired, unreachable])
+
+    assert results[0]["stargazers_count"] == 5
+    assert never.metadata_etag == '"new"'
+    assert never.avatar_url == "https://avatars/owner"
+    assert results[1]["description"] == "old"
+    assert results[2]["description"] == "Error fetching details"
+    assert to_revalidate == []
+
+
+# =========== refresh_repo_metadata Tests ===========
+
+
+# Test that revalidated metadata is written and a repo already refreshing is skipped
+@pytest.mark.asyncio
+async def test_refresh_repo_metadata(mock_token, mock_details):
+    repo, busy = _repo("owner/a"), _repo("owner/busy")
+    mock_details.return_value = _details()
+    repo_metadata._refreshing.add(str(busy.id))
+
+    try:
+        with patch("app.services.repo_metadata.SessionLocal") as mock_session_local:
+            session = MagicMock()
+            mock_session_local.return_value = session
+
+            await refresh_repo_metadata([_snapshot(repo), _snapshot(busy)])
+    finally:
+        repo_metadata._refreshing.discard(str(busy.id))
+
+    mock_details.assert_awaited_once()
+    session.query.return_value.filter.return_value.update.assert_called_once()
+    session.commit.assert_called_once()
+    assert repo_metadata._refreshing == set()
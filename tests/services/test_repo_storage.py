@@ -0,0 +1,333 @@
+import subprocess
+import uuid
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.repository import Repository
+from app.services.repo_storage import (
+    _compact_clone,
+    _enforce_storage_quota,
+    _evict_clone,
+    _eviction_order,
+    _run_storage_pass,
+    directory_size,
+    get_storage_report,
+)
+
+NOW = datetime.now(UTC)
+
+
+# =========== Fixtures ===========
+
+
+# Replaces the per repo sync lock with a mock that is always acquired
+@pytest.fixture
+def mock_sync_lock():
+    lock = MagicMock()
+    lock.acquire.return_value = True
+    with patch("app.services.repo_sync.redis_conn") as mock_redis:
+        mock_redis.lock.return_value = lock
+        yield lock
+
+
+# Storage settings with a 1000 byte quota
+@pytest.fixture
+def mock_settings():
+    with patch("app.services.repo_storage.settings") as mock:
+        mock.REPOS_DISK_QUOTA_BYTES = 1000
+        mock.REPO_COMPACT_IDLE_DAYS = 7
+        mock.REPO_EVICT_MIN_IDLE_HOURS = 24
+        yield mock
+
+
+# =========== Helper Functions ===========
+
+
+# Helper function to build the storage snapshot of a ready clone
+def _clone(
+    name: str,
+    size: int = 100,
+    idle_hours: float = 48,
+    is_active: bool = True,
+    compacted: bool = True,
+) -> dict:
+    last_used = NOW - timedelta(hours=idle_hours)
+    return {
+        "id": str(uuid.uuid4()),
+        "repo_name": name,
+        "clone_status": "ready",
+        "is_active": is_active,
+        "is_suspended": False,
+        "clone_size_bytes": size,
+        "last_used_at": last_used,
+        "last_synced_at": last_used,
+        "last_compacted_at": last_used if compacted else None,
+    }
+
+
+# Runs a storage pass over the given clones, each measuring at its snapshot size
+async def _run_pass(repos: list[dict], compact=None, evict=None):
+    sizes = {repo["repo_name"]: repo["clone_size_bytes"] for repo in repos}
+    with (
+        patch("app.services.repo_storage._load_ready_clones", return_value=repos),
+        patch(
+            "app.services.repo_storage.get_local_repo_path",
+            side_effect=lambda name: name,
+        ),
+        patch("app.services.repo_storage.directory_size", side_effect=lambda name: sizes[name]),
+        patch("app.services.repo_storage._record_sizes") as mock_record,
+        patch(
+            "app.services.repo_storage._compact_clone",
+            new_callable=AsyncMock,
+            side_effect=compact,
+        ) as mock_compact,
+        patch(
+            "app.services.repo_storage._evict_clone",
+            new_callable=AsyncMock,
+            side_effect=evict or (lambda repo, now: True),
+        ) as mock_evict,
+    ):
+        result = await _run_storage_pass()
+
+    return result, mock_record, mock_compact, mock_evict
+
+
+# =========== Measurement and Ordering Tests ===========
+
+
+# Tests that every file under the clone is counted and a missing clone measures 0.
+def test_directory_size(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"x" * 10)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.txt").write_bytes(b"y" * 5)
+
+    assert directory_size(tmp_path) == 15
+    assert directory_size(tmp_path / "missing") == 0
+
+
+# Tests that clones of inactive repos go first, then the least recently used.
+def test_eviction_order_cold_first():
+    recent = _clone("recent", idle_hours=30)
+    old = _clone("old", idle_hours=300)
+    inactive = _clone("inactive", idle_hours=1, is_active=False)
+
+    ordered = _eviction_order([recent, old, inactive])
+
+    assert [repo["repo_name"] for repo in ordered] == ["inactive", "old", "recent"]
+
+
+# Tests that the report sums ready clones and ranks only evictable ones.
+def test_storage_report(mock_settings):
+    db = MagicMock()
+    db.query.return_value.all.return_value = [
+        Repository(
+            id=uuid.uuid4(),
+            repo_name="owner/hot",
+            clone_status="ready",
+            is_active=True,
+            is_suspended=False,
+            clone_size_bytes=600,
+            last_used_at=NOW,
+        ),
+        Repository(
+            id=uuid.uuid4(),
+            repo_name="owner/cold",
+            clone_status="ready",
+            is_active=True,
+            is_suspended=False,
+            clone_size_bytes=500,
+            last_used_at=NOW - timedelta(days=3),
+        ),
+        Repository(
+            id=uuid.uuid4(),
+            repo_name="owner/gone",
+            clone_status="evicted",
+            is_active=False,
+            is_suspended=False,
+            clone_size_bytes=0,
+        ),
+    ]
+
+    report = get_storage_report(db)
+
+    assert report["usage_bytes"] == 1100
+    assert report["quota_bytes"] == 1000
+    assert report["over_quota"] is True
+    ranks = {repo["repo_name"]: repo["eviction_rank"] for repo in report["repositories"]}
+    assert ranks == {"owner/gone": None, "owner/cold": 1, "owner/hot": None}
+
+
+# =========== Storage Pass Tests ===========
+
+
+# Tests that nothing is compacted or evicted under the quota, but the sizes are still recorded.
+@pytest.mark.asyncio
+async def test_storage_pass_under_quota(mock_settings):
+    repos = [_clone("a", size=400), _clone("b", size=500)]
+
+    result, mock_record, mock_compact, mock_evict = await _run_pass(repos)
+
+    assert result["usage_bytes"] == 900
+    assert result["compacted"] == [] and result["evicted"] == []
+    mock_record.assert_called_once_with({repos[0]["id"]: 400, repos[1]["id"]: 500})
+    mock_compact.assert_not_called()
+    mock_evict.assert_not_called()
+
+
+# Tests that compacting an idle clone that brings usage under the quota avoids any eviction.
+@pytest.mark.asyncio
+async def test_storage_pass_compacts_before_evicting(mock_settings):
+    repos = [
+        _clone("stale", size=800, idle_hours=24 * 10, compacted=False),
+        _clone("fresh", size=400, idle_hours=1),
+    ]
+
+    result, _, mock_compact, mock_evict = await _run_pass(repos, compact=lambda repo: 500)
+
+    assert result["compacted"] == ["stale"]
+    assert result["evicted"] == []
+    assert result["usage_bytes"] == 900
+    mock_evict.assert_not_called()
+
+
+# Tests that the coldest evictable clones are evicted until usage is under the quota.
+@pytest.mark.asyncio
+async def test_storage_pass_evicts_least_recently_used(mock_settings):
+    repos = [
+        _clone("hot", size=600, idle_hours=1),
+        _clone("warm", size=300, idle_hours=48),
+        _clone("cold", size=300, idle_hours=96),
+        _clone("inactive", size=200, idle_hours=30, is_active=False),
+    ]
+
+    result, _, mock_compact, _ = await _run_pass(repos)
+
+    # Everything was compacted since its last sync, so only eviction can free space
+    mock_compact.assert_not_called()
+    assert result["evicted"] == ["inactive", "cold"]
+    assert result["usage_bytes"] == 900
+
+
+# Tests that clones used within the minimum idle time are kept even over the quota.
+@pytest.mark.asyncio
+async def test_storage_pass_keeps_recently_used_clones(mock_settings):
+    repos = [_clone("a", size=700, idle_hours=2), _clone("b", size=700, idle_hours=3)]
+
+    result, _, _, mock_evict = await _run_pass(repos)
+
+    mock_evict.assert_not_called()
+    assert result["usage_bytes"] == 1400
+
+
+# Tests that a pass is skipped while another one holds the storage lock.
+@pytest.mark.asyncio
+async def test_enforce_storage_quota_skips_when_locked():
+    lock = MagicMock()
+    lock.acquire.return_value = False
+
+    with (
+        patch("app.services.repo_storage.redis_conn") as mock_redis,
+        patch("app.services.repo_storage._run_storage_pass", new_callable=AsyncMock) as mock_pass,
+    ):
+        mock_redis.lock.return_value = lock
+        assert await _enforce_storage_quota() is None
+
+    mock_pass.assert_not_called()
+    lock.release.assert_not_called()
+
+
+# =========== Compaction and Eviction Tests ===========
+
+
+# Tests that compacting runs git gc on a real clone and records its new size.
+@pytest.mark.asyncio
+async def test_compact_clone_runs_gc(tmp_path, mock_sync_lock):
+    repo_path = tmp_path / "owner" / "repo"
+    repo_path.mkdir(parents=True)
+    env = ["-c", "user.name=t", "-c", "user.email=t@t"]
+    subprocess.run(["git", "init", "-q", str(repo_path)], check=True)
+    (repo_path / "file.txt").write_text("content\n")
+    subprocess.run(["git", "-C", str(repo_path), "add", "."], check=True)
+    subprocess.run(["git", "-C", str(repo_path), *env, "commit", "-qm", "init"], check=True)
+
+    with (
+        patch("app.services.repo_storage.get_local_repo_path", return_value=repo_path),
+        patch("app.services.repo_storage._update_repository") as mock_update,
+    ):
+        size = await _compact_clone(_clone("owner/repo"))
+
+    assert size == directory_size(repo_path)
+    assert list((repo_path / ".git" / "objects" / "pack").glob("*.pack"))
+    values = mock_update.call_args[0][1]
+    assert size in values.values()
+
+
+# Tests that an idle clone is deleted before it is marked evicted.
+@pytest.mark.asyncio
+async def test_evict_clone(tmp_path, mock_sync_lock):
+    repo_path = tmp_path / "owner" / "repo"
+    repo_path.mkdir(parents=True)
+    repo = _clone("owner/repo")
+    removed_first = []
+
+    def update(repo_id, values):
+        removed_first.append(not repo_path.exists())
+
+    with (
+        patch("app.services.repo_storage._is_still_evictable", return_value=True),
+        patch("app.services.repo_storage.get_local_repo_path", return_value=repo_path),
+        patch("app.services.git_service.repository.get_local_repo_path", return_value=repo_path),
+        patch("app.services.repo_storage._update_repository", side_effect=update) as mock_update,
+    ):
+        assert await _evict_clone(repo, NOW) is True
+
+    assert removed_first == [True]
+    assert mock_update.call_args[0] == (
+        repo["id"],
+        {Repository.clone_status: "evicted", Repository.clone_size_bytes: 0},
+    )
+
+
+# Tests that a clone used since the pass loaded it is kept.
+@pytest.mark.asyncio
+async def test_evict_clone_used_meanwhile(mock_sync_lock):
+    with (
+        patch("app.services.repo_storage._is_still_evictable", return_value=False),
+        patch("app.services.repo_storage.remove_cloned_repository") as mock_remove,
+        patch("app.services.repo_storage._update_repository") as mock_update,
+    ):
+        assert await _evict_clone(_clone("owner/repo"), NOW) is False
+
+    mock_remove.assert_not_called()
+    mock_update.assert_not_called()
+
+
+# Tests that eviction is skipped while a sync holds the repo's lock, for the next pass to retry.
+@pytest.mark.asyncio
+async def test_evict_clone_skipped_while_syncing(mock_sync_lock):
+    mock_sync_lock.acquire.return_value = False
+
+    with (
+        patch("app.services.repo_storage._is_still_evictable") as mock_evictable,
+        patch("app.services.repo_storage.remove_cloned_repository") as mock_remove,
+    ):
+        assert await _evict_clone(_clone("owner/repo"), NOW) is False
+
+    mock_evictable.assert_not_called()
+    mock_remove.assert_not_called()
+
+
+# Tests that a clone that couldn't be removed isn't marked evicted.
+@pytest.mark.asyncio
+async def test_evict_clone_removal_failed(tmp_path, mock_sync_lock):
+    with (
+        patch("app.services.repo_storage._is_still_evictable", return_value=True),
+        patch("app.services.repo_storage.get_local_repo_path", return_value=tmp_path),
+        patch("app.services.repo_storage.remove_cloned_repository", return_value=False),
+        patch("app.services.repo_storage._update_repository") as mock_update,
+    ):
+        assert await _evict_clone(_clone("owner/repo"), NOW) is False
+
+    mock_update.assert_not_called()
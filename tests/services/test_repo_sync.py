@@ -0,0 +1,156 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.repo_sync import _sync_repository, ensure_pr_commits
+
+# =========== Fixtures ===========
+
+
+# Replaces the Redis lock with a mock that is always acquired
+@pytest.fixture
+def mock_lock():
+    lock = MagicMock()
+    lock.acquire.return_value = True
+    with patch("app.services.repo_sync.redis_conn") as mock_redis:
+        mock_redis.lock.return_value = lock
+        yield lock
+
+
+# Replaces the token lookup and fetch with mocks
+@pytest.fixture
+def mock_fetch():
+    with (
+        patch(
+            "app.services.repo_sync.get_installation_access_token",
+            new_callable=AsyncMock,
+            return_value="tok",
+        ),
+        patch("app.services.repo_sync.fetch_refs", new_callable=AsyncMock) as mock,
+    ):
+        mock.return_value = True
+        yield mock
+
+
+# =========== ensure_pr_commits Tests ===========
+
+
+# Tests that commits already in the clone need no lock and no fetch.
+@pytest.mark.asyncio
+async def test_ensure_pr_commits_skips_fetch_when_present(mock_lock, mock_fetch):
+    with patch("app.services.repo_sync.has_commits", new_callable=AsyncMock, return_value=True):
+        await ensure_pr_commits("owner/repo", 99, "main", 42, ["base", "head"])
+
+    mock_lock.acquire.assert_not_called()
+    mock_fetch.assert_not_called()
+
+
+# Tests that missing commits are fetched under the lock with the target branch and PR head only.
+@pytest.mark.asyncio
+async def test_ensure_pr_commits_fetches_pr_refs_when_missing(mock_lock, mock_fetch):
+    with patch(
+        "app.services.repo_sync.has_commits",
+        new_callable=AsyncMock,
+        side_effect=[False, False, True],
+    ):
+        await ensure_pr_commits("owner/repo", 99, "main", 42, ["base", "head"])
+
+    mock_fetch.assert_awaited_once_with(
+        "owner/repo",
+        "tok",
+        [
+            "+refs/heads/main:refs/remotes/origin/main",
+            "+refs/pull/42/head:refs/remotes/origin/pr/42",
+        ],
+    )
+    mock_lock.release.assert_called_once()
+
+
+# Tests that a sync finishing while the lock was awaited saves the fetch.
+@pytest.mark.asyncio
+async def test_ensure_pr_commits_rechecks_after_lock(mock_lock, mock_fetch):
+    with patch(
+        "app.services.repo_sync.has_commits", new_callable=AsyncMock, side_effect=[False, True]
+    ):
+        await ensure_pr_commits("owner/repo", 99, "main", 42, ["base", "head"])
+
+    mock_fetch.assert_not_called()
+    mock_lock.release.assert_called_once()
+
+
+# Tests that commits still missing after the fetch raise so the caller can fall back.
+@pytest.mark.asyncio
+async def test_ensure_pr_commits_raises_when_still_missing(mock_lock, mock_fetch):
+    with patch("app.services.repo_sync.has_commits", new_callable=AsyncMock, return_value=False):
+        with pytest.raises(RuntimeError):
+            await ensure_pr_commits("owner/repo", 99, "main", 42, ["base", "head"])
+
+
+# =========== sync_repository Tests ===========
+
+
+# Helper function to mock the session returning the given repo
+def _mock_session(repo):
+    session = MagicMock()
+    session.query.return_value.filter.return_value.first.return_value = repo
+    return session
+
+
+# Tests that a sync fetches the target branch and every PR head, then records last_synced_at.
+@pytest.mark.asyncio
+async def test_sync_repository_fetches_and_marks_synced(mock_lock, mock_fetch):
+    repo_id = str(uuid.uuid4())
+    repo = MagicMock(
+        repo_name="owner/repo", installation_id=99, target_branch="develop", clone_status="ready"
+    )
+    repo.is_active = True
+
+    with (
+        patch("app.services.repo_sync.SessionLocal", return_value=_mock_session(repo)),
+        patch("app.services.repo_sync.get_local_repo_path") as mock_path,
+        patch("app.services.repo_sync._mark_synced") as mock_mark,
+    ):
+        mock_path.return_value.exists.return_value = True
+        await _sync_repository(repo_id)
+
+    mock_fetch.assert_awaited_once_with(
+        "owner/repo",
+        "tok",
+        [
+            "+refs/heads/develop:refs/remotes/origin/develop",
+            "+refs/pull/*/head:refs/remotes/origin/pr/*",
+        ],
+    )
+    mock_mark.assert_called_once_with(repo_id)
+
+
+# Tests that last_synced_at is left alone when the fetch fails.
+@pytest.mark.asyncio
+async def test_sync_repository_failed_fetch_not_marked(mock_lock, mock_fetch):
+    mock_fetch.return_value = False
+    repo = MagicMock(
+        repo_name="owner/repo", installation_id=99, target_branch="main", clone_status="ready"
+    )
+    repo.is_active = True
+
+    with (
+        patch("app.services.repo_sync.SessionLocal", return_value=_mock_session(repo)),
+        patch("app.services.repo_sync.get_local_repo_path") as mock_path,
+        patch("app.services.repo_sync._mark_synced") as mock_mark,
+    ):
+        mock_path.return_value.exists.return_value = True
+        await _sync_repository(str(uuid.uuid4()))
+
+    mock_mark.assert_not_called()
+
+
+# Tests that deactivated repos are not synced.
+@pytest.mark.asyncio
+async def test_sync_repository_skips_inactive_repo(mock_lock, mock_fetch):
+    repo = MagicMock(is_active=False)
+
+    with patch("app.services.repo_sync.SessionLocal", return_value=_mock_session(repo)):
+        await _sync_repository(str(uuid.uuid4()))
+
+    mock_fetch.assert_not_called()
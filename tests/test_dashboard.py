@@ -1,6 +1,8 @@
-import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from app.routers.dashboard import get_dashboard_stats, get_dashboard_repos
+
+import pytest
+
+from app.routers.dashboard import get_dashboard_repos, get_dashboard_stats
 
 # =========== Fixtures ===========
 
@@ -21,30 +23,14 @@ def mock_db():
 # =========== get_dashboard_stats Tests ===========
 
 
-# Test that dashboard stats returns correct counts
+# Test that dashboard stats returns correct counts from the single stats query
 def test_get_dashboard_stats(mock_db, mock_user):
-    query_mock = mock_db.query.return_value
-    _ = query_mock.filter.return_value
-    _ = query_mock.join.return_value
-
-    # Mock the count queries to return specific values
-    mock_db.query.return_value.filter.return_value.scalar.side_effect = [5]
-    mock_db.query.return_value.join.return_value.filter.return_value.scalar.side_effect = [12]
-    mock_db.query.return_value.join.return_value.join.return_value.filter.return_value.scalar.side_effect = [
-        3,
-        0,
-    ]
-    q = mock_db.query.return_value
+    stats_query = mock_db.query.return_value.select_from.return_value.outerjoin.return_value
+    stats_query.outerjoin.return_value.filter.return_value.one.return_value = (5, 12, 3, 0)
 
-    q.filter.return_value.scalar.return_value = 5  # 5 installations
-
-    q.join.return_value.filter.return_value.scalar.return_value = 12  # 12 linked repos
-
-    q.join.return_value.join.return_value.filter.return_value.scalar.return_value = (
-        3  # 3 drift events
-    )
-
-    stats = get_dashboard_stats(mock_db, mock_user)
+    with patch("app.services.drift_stats.redis_conn") as mock_redis:
+        mock_redis.get.return_value = None
+        stats = get_dashboard_stats(mock_db, mock_user)
 
     # Verify all counts are returned correctly
     assert stats["installations_count"] == 5
@@ -53,37 +39,53 @@ def test_get_dashboard_stats(mock_db, mock_user):
     assert stats["pr_waiting_count"] == 0
 
 
-# Test that dashboard repos fetches and returns repo details from github
+# Test that dashboard repos fetches the details of never fetched repos from github concurrently
 @pytest.mark.asyncio
 async def test_get_dashboard_repos(mock_db, mock_user):
-    # Setup mock repos
+    # Setup mock repos, with no stored metadata yet
     repo1 = MagicMock()
     repo1.repo_name = "owner/repo1"
     repo1.installation_id = 101
+    repo1.metadata_fetched_at = None
 
     repo2 = MagicMock()
     repo2.repo_name = "owner/repo2"
     repo2.installation_id = 102
+    repo2.metadata_fetched_at = None
 
     # Mock the DB query to return the test repos
     mock_db.query.return_value.join.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = [
         repo1,
         repo2,
     ]
-
-    # Mock the GH API call
-    with patch("app.routers.dashboard.get_repo_details", new_callable=AsyncMock) as mock_service:
+    background_tasks = MagicMock()
+
+    # Mock the GH API calls
+    with (
+        patch(
+            "app.services.repo_metadata.get_installation_access_token", new_callable=AsyncMock
+        ) as mock_token,
+        patch(
+            "app.services.repo_metadata.get_repo_details", new_callable=AsyncMock
+        ) as mock_service,
+    ):
         mock_service.return_value = {
-            "name": "mock-repo",
+            "name": "owner/repo1",
             "description": "desc",
             "language": "python",
             "stargazers_count": 10,
             "forks_count": 2,
+            "avatar_url": None,
+            "etag": '"etag"',
         }
 
-        results = await get_dashboard_repos(mock_db, mock_user)
+        results = await get_dashboard_repos(background_tasks, mock_db, mock_user)
 
-        # Verify results for both repos
-        assert len(results) == 2
-        assert results[0]["name"] == "mock-repo"
-        assert mock_service.call_count == 2
+    # Verify results for both repos, stored on the rows and committed
+    assert len(results) == 2
+    assert results[0]["name"] == "owner/repo1"
+    assert results[1]["stargazers_count"] == 10
+    assert mock_service.call_count == 2
+    assert mock_token.await_count == 2
+    mock_db.commit.assert_called_once()
+    background_tasks.add_task.assert_not_called()
@@ -1,8 +1,8 @@
-import pytest
-from unittest.mock import MagicMock, patch, call
 import multiprocessing
-from rq import Worker
+from unittest.mock import MagicMock, call, patch
 
+import pytest
+from rq import Worker
 
 # =========== Tests ===========
 
@@ -237,3 +237,50 @@ def test_task_queue_shared():
         # Verify that both workers listen to the same queue
         assert mock_task_queue in mock_worker_class.call_args_list[0][0][0]
         assert mock_task_queue in mock_worker_class.call_args_list[1][0][0]
+
+
+# Test clone workers listen only to the clone queue and run the scheduler for retries
+def test_start_clone_worker():
+    mock_worker = MagicMock(spec=Worker)
+    mock_clone_queue = MagicMock()
+    mock_redis_conn = MagicMock()
+
+    with (
+        patch("workers.Worker", return_value=mock_worker) as mock_worker_class,
+        patch("workers.clone_queue", mock_clone_queue),
+        patch("workers.redis_conn", mock_redis_conn),
+    ):
+        from workers import start_clone_worker
+
+        start_clone_worker(2)
+
+        mock_worker_class.assert_called_once_with(
+            [mock_clone_queue], connection=mock_redis_conn, name="clone-worker-2"
+        )
+        mock_worker.work.assert_called_once_with(with_scheduler=True)
+
+
+# Test that the cron scheduler schedules the notification archive and the drift partition
+# maintenance on the task queue
+def test_start_cron_scheduler():
+    mock_scheduler = MagicMock()
+    mock_settings = MagicMock()
+    mock_settings.NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS = 3600
+    mock_settings.DRIFT_PARTITION_MAINTENANCE_INTERVAL_SECONDS = 86400
+    mock_task_queue = MagicMock()
+    mock_task_queue.name = "default"
+
+    with (
+        patch("workers.CronScheduler", return_value=mock_scheduler),
+        patch("workers.settings", mock_settings),
+        patch("workers.task_queue", mock_task_queue),
+    ):
+        from workers import archive_notifications, maintain_drift_partitions, start_cron_scheduler
+
+        start_cron_scheduler()
+
+    assert mock_scheduler.register.call_args_list == [
+        call(archive_notifications, "default", interval=3600),
+        call(maintain_drift_partitions, "default", interval=86400),
+    ]
+    mock_scheduler.start.assert_called_once()
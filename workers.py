@@ -1,7 +1,12 @@
 import multiprocessing
+
 from rq import Worker
-from app.core.queue import redis_conn, task_queue
+from rq.cron import CronScheduler
+
 from app.core.config import settings
+from app.core.queue import clone_queue, redis_conn, task_queue
+from app.services.drift_partitions import maintain_drift_partitions
+from app.services.notification_archive import archive_notifications
 
 
 # Start a single RQ worker process with a worker_num that listens to the task queue
@@ -11,22 +16,60 @@ def start_worker(worker_num: int):
     worker.work()
 
 
+# Start a single RQ worker process that listens to the clone queue.
+# It runs the scheduler too, which RQ needs to re-enqueue failed clones after their retry interval
+def start_clone_worker(worker_num: int):
+    worker = Worker([clone_queue], connection=redis_conn, name=f"clone-worker-{worker_num}")
+    print(f"Clone worker {worker_num} started... Listening for clones...")
+    worker.work(with_scheduler=True)
+
+
+# Start the scheduler that enqueues the periodic maintenance jobs on the task queue
+def start_cron_scheduler():
+    scheduler = CronScheduler(connection=redis_conn)
+    scheduler.register(
+        archive_notifications,
+        task_queue.name,
+        interval=settings.NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS,
+    )
+    scheduler.register(
+        maintain_drift_partitions,
+        task_queue.name,
+        interval=settings.DRIFT_PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+    )
+    print("Cron scheduler started... Scheduling maintenance jobs...")
+    scheduler.start()
+
+
 if __name__ == "__main__":
     # Read the number of workers to start from settings
     num_workers = settings.NUM_WORKERS
-    print(f"Starting {num_workers} RQ worker(s)...")
+    num_clone_workers = settings.CLONE_WORKERS
+    print(f"Starting {num_workers} RQ worker(s) and {num_clone_workers} clone worker(s)...")
+
+    # Clone workers always run in their own processes, bounding how many repos clone at once
+    processes = []
+
+    # Maintenance jobs are enqueued by one scheduler process and run by the task workers
+    process = multiprocessing.Process(target=start_cron_scheduler)
+    process.start()
+    processes.append(process)
+
+    for i in range(1, num_clone_workers + 1):
+        process = multiprocessing.Process(target=start_clone_worker, args=(i,))
+        process.start()
+        processes.append(process)
 
     if num_workers == 1:
         # If num_workers = 1, then start a single worker in the main process
         start_worker(1)
     else:
         # Else, start multiple workers using multiprocessing
-        processes = []
         for i in range(1, num_workers + 1):
             process = multiprocessing.Process(target=start_worker, args=(i,))
             process.start()
             processes.append(process)
 
-        # Wait for all worker processes to finish
-        for process in processes:
-            process.join()
+    # Wait for all worker processes to finish
+    for process in processes:
+        process.join()